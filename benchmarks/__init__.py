@@ -0,0 +1,4 @@
+"""
+Benchmarks del sistema contable.
+Se ejecutan como módulos: python -m benchmarks.<nombre>
+"""
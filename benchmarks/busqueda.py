@@ -0,0 +1,199 @@
+"""
+Latencia de la búsqueda de cuentas y productos: índice FTS5 contra LIKE.
+
+Uso:
+    python -m benchmarks.busqueda --filas 50000 --repeticiones 200
+
+Genera una BD con `--filas` cuentas y `--filas` productos con nombres en
+español (con tildes), aplica las migraciones (que crean los índices FTS5) y
+mide buscar_cuentas / buscar_productos con varios criterios. Después borra los
+índices y repite la medición con el respaldo LIKE. También verifica que los
+triggers mantengan el índice al día al insertar, renombrar y borrar.
+
+Sale con código 1 si alguna verificación falla o si la búsqueda con FTS5
+supera `--limite-ms` en la mediana (p50). Los criterios de COMUNES coinciden
+con miles de filas que hay que ordenar enteras por bm25 antes de cortar, así
+que se comparan contra `--limite-comun-ms`.
+"""
+import argparse
+import gc
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generador_datos import generar_bd
+from src.base_datos.db import crear_motor
+from src.base_datos.migraciones import TABLAS_BUSQUEDA, ejecutar_migraciones
+from src.modelos.entidades import Cuenta
+from src.servicios.busqueda import buscar_cuentas, buscar_productos
+
+PALABRAS_CUENTAS = [
+    "Depreciación", "Acumulada", "Edificios", "Vehículos", "Maquinaria", "Muebles", "Enseres",
+    "Equipos", "Computación", "Provisión", "Cuentas", "Incobrables", "Anticipos", "Proveedores",
+    "Clientes", "Relacionados", "Impuestos", "Retenciones", "Fuente", "IVA", "Crédito", "Tributario",
+    "Sueldos", "Beneficios", "Sociales", "Décimo", "Tercer", "Cuarto", "Vacaciones", "Jubilación",
+    "Patronal", "Intereses", "Bancarios", "Comisiones", "Préstamos", "Largo", "Plazo", "Corto",
+    "Arriendos", "Seguros", "Publicidad", "Mantenimiento", "Reparaciones", "Combustible", "Energía",
+]
+PALABRAS_PRODUCTOS = [
+    "Camiseta", "Pantalón", "Algodón", "Poliéster", "Café", "Orgánico", "Azúcar", "Morena", "Arroz",
+    "Integral", "Aceite", "Girasol", "Jabón", "Líquido", "Champú", "Cepillo", "Dental", "Lápiz",
+    "Cuaderno", "Cuadriculado", "Batería", "Recargable", "Cable", "Eléctrico", "Tornillo", "Acero",
+    "Inoxidable", "Pintura", "Látex", "Blanca", "Roja", "Azul", "Grande", "Mediano", "Pequeño",
+]
+
+# (función, criterio, kwargs)
+CRITERIOS = [
+    (buscar_cuentas, "depre acum", {}),
+    (buscar_cuentas, "depreciacion vehiculos", {}),
+    (buscar_cuentas, "credito trib", {}),
+    (buscar_cuentas, "1.1.01", {}),
+    (buscar_productos, "cafe org", {}),
+    (buscar_productos, "bateria", {'solo_con_stock': True}),
+    (buscar_productos, "P00012", {}),
+    (buscar_productos, "lapiz azul", {}),
+]
+# Criterios que coinciden con una fracción grande de la tabla
+COMUNES = {"bateria"}
+
+
+def _nombres(rnd, palabras, cantidad):
+    return [" ".join(rnd.sample(palabras, rnd.randint(2, 4))) for _ in range(cantidad)]
+
+
+def preparar_bd(ruta_bd, filas, semilla=7):
+    generar_bd(ruta_bd, cuentas=filas, asientos=100, productos=filas, movimientos_por_producto=2)
+    rnd = random.Random(semilla)
+    con = sqlite3.connect(ruta_bd)
+    with con:
+        ids = [i for (i,) in con.execute("SELECT id FROM cuentas WHERE codigo LIKE '_.9.%'")]
+        con.executemany("UPDATE cuentas SET nombre = ? WHERE id = ?",
+                        zip(_nombres(rnd, PALABRAS_CUENTAS, len(ids)), ids))
+        ids = [i for (i,) in con.execute("SELECT id FROM productos")]
+        con.executemany("UPDATE productos SET nombre = ? WHERE id = ?",
+                        zip(_nombres(rnd, PALABRAS_PRODUCTOS, len(ids)), ids))
+    con.close()
+
+    motor = crear_motor(ruta_bd)
+    ejecutar_migraciones(motor)
+    motor.dispose()
+
+
+def medir(Sesion, repeticiones):
+    """Retorna {criterio: (p50_ms, p95_ms, p99_ms, resultados)}."""
+    medidas = {}
+    gc.collect()
+    with Sesion() as db:
+        for funcion, criterio, kwargs in CRITERIOS:
+            for _ in range(5):
+                funcion(db, criterio, **kwargs)  # calentar caché de páginas y sentencias
+            tiempos = []
+            for _ in range(repeticiones):
+                t0 = time.perf_counter()
+                resultados = funcion(db, criterio, **kwargs)
+                tiempos.append((time.perf_counter() - t0) * 1000)
+            tiempos.sort()
+            medidas[criterio] = (
+                tiempos[len(tiempos) // 2], tiempos[int(len(tiempos) * 0.95) - 1],
+                tiempos[int(len(tiempos) * 0.99) - 1], len(resultados)
+            )
+    return medidas
+
+
+def verificar(Sesion):
+    """Tildes, prefijos y sincronización por triggers."""
+    fallas = []
+    with Sesion() as db:
+        primera = buscar_cuentas(db, "depreciacion")
+        if not primera or "Depreciación" not in primera[0].nombre:
+            fallas.append("'depreciacion' no encuentra 'Depreciación' en el primer lugar.")
+
+        # La mejor coincidencia es la última insertada: solo sale primera si se
+        # ordenan todas las coincidencias y no un grupo tomado por rowid
+        db.add(Cuenta(codigo="9.9.99998", nombre="Depreciación Depreciación", tipo="GASTO", naturaleza="Deudora"))
+        db.commit()
+        if [c.codigo for c in buscar_cuentas(db, "depreciacion", limite=1)] != ["9.9.99998"]:
+            fallas.append("La mejor coincidencia por bm25 no sale primera (orden antes del límite).")
+        db.delete(db.query(Cuenta).filter_by(codigo="9.9.99998").one())
+        db.commit()
+
+        db.add(Cuenta(codigo="9.9.99999", nombre="Ñandú Óptico Zzprueba", tipo="GASTO", naturaleza="Deudora"))
+        db.commit()
+        if [c.codigo for c in buscar_cuentas(db, "nandu zzpru")] != ["9.9.99999"]:
+            fallas.append("Una cuenta nueva no aparece en la búsqueda (trigger de INSERT).")
+
+        cuenta = db.query(Cuenta).filter_by(codigo="9.9.99999").one()
+        cuenta.nombre = "Cuenta Renombrada Yyprueba"
+        db.commit()
+        if buscar_cuentas(db, "zzprueba") or not buscar_cuentas(db, "yyprueba"):
+            fallas.append("El índice no refleja el cambio de nombre (trigger de UPDATE).")
+
+        db.delete(cuenta)
+        db.commit()
+        if buscar_cuentas(db, "yyprueba"):
+            fallas.append("Una cuenta borrada sigue apareciendo (trigger de DELETE).")
+
+        if buscar_cuentas(db, '"*) OR (') != []:
+            fallas.append("Un criterio sin palabras debería devolver una lista vacía.")
+    return fallas
+
+
+def _imprimir(titulo, medidas):
+    print(f"\n{titulo}")
+    print(f"  {'criterio':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'resultados':>12}")
+    for criterio, (p50, p95, p99, n) in medidas.items():
+        print(f"  {criterio:<26}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}{n:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=50000, help="cuentas y productos en la BD")
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--limite-ms", type=float, default=5.0, help="p50 máximo aceptado con FTS5")
+    parser.add_argument("--limite-comun-ms", type=float, default=15.0,
+                        help="p50 máximo aceptado con FTS5 para los criterios de COMUNES")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bd = os.path.join(carpeta, "busqueda.sqlite")
+        t0 = time.perf_counter()
+        preparar_bd(ruta_bd, args.filas)
+        print(f"BD con {args.filas:,} cuentas y {args.filas:,} productos en {time.perf_counter() - t0:.1f}s")
+
+        motor = crear_motor(ruta_bd)
+        Sesion = sessionmaker(bind=motor)
+        fts = medir(Sesion, args.repeticiones)
+        fallas = verificar(Sesion)
+
+        # Mismo criterio sin índice: respaldo LIKE
+        with motor.begin() as conexion:
+            for indice in TABLAS_BUSQUEDA:
+                conexion.execute(text(f"DROP TABLE {indice}"))
+        like = medir(Sesion, max(1, args.repeticiones // 10))
+        motor.dispose()
+
+    _imprimir("FTS5", fts)
+    _imprimir("Respaldo LIKE (sin FTS5)", like)
+
+    lentos = [
+        c for c, (p50, _, _, _) in fts.items()
+        if p50 > (args.limite_comun_ms if c in COMUNES else args.limite_ms)
+    ]
+    if lentos:
+        fallas.append(f"p50 sobre el límite con FTS5: {', '.join(lentos)}")
+    for f in fallas:
+        print(f"✗ {f}")
+    if fallas:
+        sys.exit(1)
+    print(f"\n✓ Búsqueda consistente y p50 < {args.limite_ms} ms con FTS5 "
+          f"({args.limite_comun_ms} ms en criterios comunes).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Prueba de carga de la API HTTP (src/api/servidor.py).
+
+Uso:
+    python -m benchmarks.carga_api --clientes 16 --peticiones 100 --hilos 8 [--cola]
+    python -m benchmarks.carga_api --url http://127.0.0.1:8765 ...   (servidor ya levantado)
+
+Sin --url levanta el servidor en este mismo proceso sobre una BD temporal
+con las cuentas y un producto con stock. Cada cliente es un hilo que mezcla
+asientos, ventas y consultas de saldo; se reporta p50/p99 por endpoint y las
+peticiones por segundo.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+from benchmarks.estres_ventas import CODIGO_PRODUCTO, preparar_bd
+from src.servicios import inventario
+
+# (endpoint, peso) de la mezcla de peticiones
+MEZCLA = [("asiento", 6), ("venta", 2), ("saldo", 2)]
+
+
+def _peticion(base, endpoint, rnd):
+    if endpoint == "asiento":
+        monto = round(rnd.uniform(1, 100), 2)
+        cuerpo = {
+            "fecha": "2025-03-01",
+            "descripcion": "Carga API",
+            "movimientos": [
+                {"cuenta_codigo": inventario.CTA_CAJA, "debe": monto, "haber": 0},
+                {"cuenta_codigo": inventario.CTA_VENTAS, "debe": 0, "haber": monto},
+            ],
+        }
+        return urllib.request.Request(f"{base}/asientos", data=json.dumps(cuerpo).encode(), method="POST",
+                                      headers={"Content-Type": "application/json"})
+    if endpoint == "venta":
+        cuerpo = {"codigo": CODIGO_PRODUCTO, "fecha": "2025-03-01", "cantidad": 1, "precio_unitario": 10.0}
+        return urllib.request.Request(f"{base}/inventario/ventas", data=json.dumps(cuerpo).encode(), method="POST",
+                                      headers={"Content-Type": "application/json"})
+    return urllib.request.Request(f"{base}/cuentas/{inventario.CTA_CAJA}/saldo?fecha=2025-12-31")
+
+
+def cliente(base, peticiones, semilla, latencias, errores):
+    rnd = random.Random(semilla)
+    endpoints = [e for e, peso in MEZCLA for _ in range(peso)]
+    for _ in range(peticiones):
+        endpoint = rnd.choice(endpoints)
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(_peticion(base, endpoint, rnd), timeout=60) as r:
+                r.read()
+        except urllib.error.HTTPError as e:
+            # Una venta sin stock (400) es una respuesta válida de la API
+            cuerpo = e.read().decode("utf-8", "replace")
+            if not (endpoint == "venta" and e.code == 400 and "Stock insuficiente" in cuerpo):
+                errores.append(f"{endpoint}: {e.code} {cuerpo[:120]}")
+        except Exception as e:
+            errores.append(f"{endpoint}: {e}")
+        latencias[endpoint].append(time.perf_counter() - t0)
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, default=16)
+    parser.add_argument("--peticiones", type=int, default=100, help="peticiones por cliente")
+    parser.add_argument("--hilos", type=int, default=8, help="hilos del servidor (sin --url)")
+    parser.add_argument("--cola", action="store_true", help="servidor con ColaAsientos (sin --url)")
+    parser.add_argument("--url", help="usar un servidor ya levantado")
+    args = parser.parse_args()
+
+    servidor = None
+    carpeta = None
+    base = args.url
+    if not base:
+        from src.api.servidor import ServidorAPI
+
+        carpeta = tempfile.TemporaryDirectory()
+        ruta_bd = os.path.join(carpeta.name, "api.sqlite")
+        preparar_bd(ruta_bd, stock_total=args.clientes * args.peticiones, lotes=10)
+        servidor = ServidorAPI(("127.0.0.1", 0), ruta_bd, args.hilos, args.cola)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{servidor.server_address[1]}"
+
+    latencias = defaultdict(list)
+    errores = []
+    hilos = [
+        threading.Thread(target=cliente, args=(base, args.peticiones, n, latencias, errores))
+        for n in range(args.clientes)
+    ]
+    t0 = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    segundos = time.perf_counter() - t0
+
+    if servidor:
+        servidor.shutdown()
+        servidor.server_close()
+        carpeta.cleanup()
+
+    total = sum(len(v) for v in latencias.values())
+    print(f"{'Endpoint':>8} | {'Peticiones':>10} | {'p50 (ms)':>8} | {'p99 (ms)':>8} | {'media (ms)':>10}")
+    for endpoint in sorted(latencias):
+        valores = latencias[endpoint]
+        print(f"{endpoint:>8} | {len(valores):>10} | {percentil(valores, 50) * 1000:>8.1f} | "
+              f"{percentil(valores, 99) * 1000:>8.1f} | {statistics.mean(valores) * 1000:>10.1f}")
+    todas = [v for valores in latencias.values() for v in valores]
+    print(f"{'total':>8} | {total:>10} | {percentil(todas, 50) * 1000:>8.1f} | {percentil(todas, 99) * 1000:>8.1f} | "
+          f"{statistics.mean(todas) * 1000:>10.1f}")
+    print(f"Tiempo: {segundos:.2f}s | {total / segundos:.1f} peticiones/s | Errores: {len(errores)}")
+    for e in errores[:5]:
+        print(f"✗ {e}")
+
+
+if __name__ == "__main__":
+    main()
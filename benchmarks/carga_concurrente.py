@@ -0,0 +1,280 @@
+"""
+Generador de carga concurrente sobre los servicios de registro.
+
+Uso:
+    python -m benchmarks.carga_concurrente --clientes 8 --operaciones 200 --modo procesos
+    python -m benchmarks.carga_concurrente --mezcla asiento=5 compra=3 venta=2 --productos-calientes 3
+
+Cada cliente (hilo o proceso) hace `--operaciones` llamadas elegidas al azar
+según la mezcla entre registrar_asiento, registrar_compra_con_asiento y
+registrar_venta_con_asientos, sobre una misma BD generada con
+benchmarks.generador_datos. Las ventas se concentran en pocos productos para
+provocar contención sobre los mismos lotes.
+
+Al final se muestran histogramas de latencia por operación, las esperas por
+el bloqueo de escritura y los reintentos, los errores y los chequeos de
+consistencia (libro diario, lotes, stock). Sale con código 1 si algo falla.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generador_datos import generar_bd
+from src.base_datos.db import crear_motor, estadisticas_bloqueo
+from src.modelos.entidades import Asiento, DetalleAsiento, LoteInventario, MovimientoInventario, Producto
+from src.servicios import inventario
+from src.servicios.contabilidad import registrar_asiento
+
+FECHA = date(2025, 1, 15)
+
+# Límites superiores (ms) de los grupos del histograma
+GRUPOS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+
+
+def _operacion(db, tipo, rnd, productos):
+    """Ejecuta una operación. Retorna (ok, mensaje)."""
+    if tipo == "asiento":
+        monto = round(rnd.uniform(1, 500), 2)
+        return registrar_asiento(db, FECHA, "Carga concurrente", [
+            {'cuenta_codigo': inventario.CTA_CAJA, 'debe': monto, 'haber': 0.0},
+            {'cuenta_codigo': inventario.CTA_VENTAS, 'debe': 0.0, 'haber': monto},
+        ])
+    if tipo == "compra":
+        ok, msg, _ = inventario.registrar_compra_con_asiento(
+            db, rnd.choice(productos), FECHA, rnd.randint(1, 20), round(rnd.uniform(1, 50), 2),
+            es_credito=rnd.random() < 0.5
+        )
+        return ok, msg
+    ok, msg, _ = inventario.registrar_venta_con_asientos(
+        db, rnd.choice(productos), FECHA, rnd.randint(1, 5), round(rnd.uniform(50, 80), 2),
+        es_credito=rnd.random() < 0.3
+    )
+    return ok, msg
+
+
+def cliente(ruta_bd, operaciones, mezcla, productos, semilla):
+    """Un cliente con su propio motor y sesión. Retorna latencias y conteos por operación."""
+    motor = crear_motor(ruta_bd)
+    Sesion = sessionmaker(bind=motor, autoflush=False)
+    rnd = random.Random(semilla)
+    tipos = [tipo for tipo, peso in mezcla.items() for _ in range(peso)]
+
+    latencias = defaultdict(list)
+    conteos = defaultdict(lambda: {'ok': 0, 'rechazadas': 0, 'errores': 0})
+    errores = []
+
+    with Sesion() as db:
+        for _ in range(operaciones):
+            tipo = rnd.choice(tipos)
+            t0 = time.perf_counter()
+            try:
+                ok, msg = _operacion(db, tipo, rnd, productos)
+            except Exception as e:
+                ok, msg = None, f"{type(e).__name__}: {e}"
+            latencias[tipo].append((time.perf_counter() - t0) * 1000)
+
+            if ok:
+                conteos[tipo]['ok'] += 1
+            elif ok is False and msg.startswith("Stock insuficiente"):
+                # Respuesta de negocio esperada, no un error
+                conteos[tipo]['rechazadas'] += 1
+            else:
+                conteos[tipo]['errores'] += 1
+                errores.append(f"{tipo}: {msg}")
+
+    motor.dispose()
+    return {'latencias': dict(latencias), 'conteos': {k: dict(v) for k, v in conteos.items()}, 'errores': errores}
+
+
+def _cliente_proceso(args, cola):
+    resultado = cliente(*args)
+    resultado['bloqueo'] = estadisticas_bloqueo()
+    cola.put(resultado)
+
+
+def _foto(Sesion):
+    """Conteos antes/después para verificar que lo confirmado quedó en la BD."""
+    with Sesion() as db:
+        return {
+            'asientos': db.query(func.count(Asiento.id)).scalar(),
+            'compras': db.query(func.count(MovimientoInventario.id)).filter_by(tipo="COMPRA").scalar(),
+            'ventas': db.query(func.count(MovimientoInventario.id)).filter_by(tipo="VENTA").scalar(),
+        }
+
+
+def verificar(Sesion, antes, conteos):
+    fallas = []
+    despues = _foto(Sesion)
+    ok = {tipo: conteos.get(tipo, {}).get('ok', 0) for tipo in ("asiento", "compra", "venta")}
+
+    esperados = {
+        'asientos': antes['asientos'] + ok['asiento'] + ok['compra'] + 2 * ok['venta'],
+        'compras': antes['compras'] + ok['compra'],
+        'ventas': antes['ventas'] + ok['venta'],
+    }
+    for clave, valor in esperados.items():
+        if despues[clave] != valor:
+            fallas.append(f"{clave}: hay {despues[clave]} y se esperaban {valor} según las operaciones confirmadas.")
+
+    with Sesion() as db:
+        debe, haber = db.query(func.sum(DetalleAsiento.debe), func.sum(DetalleAsiento.haber)).one()
+        if round(debe or 0, 2) != round(haber or 0, 2):
+            fallas.append(f"Libro diario descuadrado: {debe:.2f} != {haber:.2f}")
+        if db.query(LoteInventario).filter(LoteInventario.saldo_cantidad < 0).count():
+            fallas.append("Hay lotes con saldo negativo (sobreventa).")
+        if db.query(Producto).filter(Producto.stock_actual < 0).count():
+            fallas.append("Hay productos con stock negativo.")
+        diferencias = inventario.verificar_stock_productos(db)
+        if diferencias:
+            fallas.append(f"stock_actual no coincide con los lotes en {len(diferencias)} productos.")
+    return fallas
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _histograma(valores, ancho=40):
+    cuenta = [0] * len(GRUPOS_MS)
+    for v in valores:
+        cuenta[next(i for i, limite in enumerate(GRUPOS_MS) if v <= limite)] += 1
+    maximo = max(cuenta) or 1
+    lineas = []
+    for limite, n in zip(GRUPOS_MS, cuenta):
+        if n:
+            etiqueta = f"≤{limite:g} ms" if limite != float("inf") else f">{GRUPOS_MS[-2]:g} ms"
+            lineas.append(f"    {etiqueta:>10} | {'█' * max(1, n * ancho // maximo):<{ancho}} {n}")
+    return lineas
+
+
+def _parsear_mezcla(partes):
+    mezcla = {}
+    for parte in partes:
+        tipo, _, peso = parte.partition("=")
+        if tipo not in ("asiento", "compra", "venta") or not peso.isdigit():
+            raise argparse.ArgumentTypeError(f"Mezcla inválida: {parte} (use asiento=N compra=N venta=N)")
+        mezcla[tipo] = int(peso)
+    return mezcla
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, default=8)
+    parser.add_argument("--operaciones", type=int, default=200, help="operaciones por cliente")
+    parser.add_argument("--modo", choices=["hilos", "procesos"], default="procesos")
+    parser.add_argument("--mezcla", nargs="+", default=["asiento=5", "compra=2", "venta=3"])
+    parser.add_argument("--productos", type=int, default=50, help="productos en la BD generada")
+    parser.add_argument("--productos-calientes", type=int, default=5, help="productos sobre los que se opera")
+    parser.add_argument("--bd", help="usar esta BD (copia de trabajo) en lugar de generar una")
+    parser.add_argument("--salida", help="guardar los resultados en JSON")
+    args = parser.parse_args()
+    mezcla = _parsear_mezcla(args.mezcla)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bd = args.bd or os.path.join(carpeta, "carga.sqlite")
+        if not args.bd:
+            generar_bd(ruta_bd, cuentas=50, asientos=500, productos=args.productos)
+
+        motor = crear_motor(ruta_bd)
+        Sesion = sessionmaker(bind=motor)
+        with Sesion() as db:
+            productos = [c for (c,) in db.query(Producto.codigo).order_by(Producto.id).limit(args.productos_calientes)]
+        antes = _foto(Sesion)
+
+        argumentos = [(ruta_bd, args.operaciones, mezcla, productos, n) for n in range(args.clientes)]
+        estadisticas_bloqueo(reiniciar=True)
+        t0 = time.perf_counter()
+        if args.modo == "hilos":
+            resultados = [None] * args.clientes
+
+            def ejecutar(n):
+                resultados[n] = cliente(*argumentos[n])
+
+            hilos = [threading.Thread(target=ejecutar, args=(n,)) for n in range(args.clientes)]
+            for h in hilos:
+                h.start()
+            for h in hilos:
+                h.join()
+            bloqueo = estadisticas_bloqueo()
+        else:
+            cola = multiprocessing.Queue()
+            procesos = [multiprocessing.Process(target=_cliente_proceso, args=(a, cola)) for a in argumentos]
+            for p in procesos:
+                p.start()
+            resultados = [cola.get() for _ in procesos]
+            for p in procesos:
+                p.join()
+            bloqueo = defaultdict(float)
+            for r in resultados:
+                for clave, valor in r['bloqueo'].items():
+                    bloqueo[clave] += valor
+        segundos = time.perf_counter() - t0
+
+        # Consolidar
+        latencias = defaultdict(list)
+        conteos = defaultdict(lambda: defaultdict(int))
+        errores = []
+        for r in resultados:
+            for tipo, valores in r['latencias'].items():
+                latencias[tipo].extend(valores)
+            for tipo, c in r['conteos'].items():
+                for clave, valor in c.items():
+                    conteos[tipo][clave] += valor
+            errores.extend(r['errores'])
+
+        fallas = verificar(Sesion, antes, conteos)
+        motor.dispose()
+
+    total = sum(len(v) for v in latencias.values())
+    print(f"{args.clientes} clientes ({args.modo}) x {args.operaciones} operaciones | mezcla {mezcla} | "
+          f"{len(productos)} productos")
+    print(f"Tiempo: {segundos:.2f}s | {total / segundos:.1f} operaciones/s\n")
+
+    for tipo in sorted(latencias):
+        valores = latencias[tipo]
+        c = conteos[tipo]
+        print(f"{tipo}: {len(valores)} (ok {c['ok']}, rechazadas {c['rechazadas']}, errores {c['errores']}) | "
+              f"p50 {_percentil(valores, 50):.1f} ms | p95 {_percentil(valores, 95):.1f} ms | "
+              f"p99 {_percentil(valores, 99):.1f} ms | máx {max(valores):.1f} ms")
+        for linea in _histograma(valores):
+            print(linea)
+
+    print(f"\nBloqueo de escritura: {int(bloqueo['transacciones'])} transacciones, "
+          f"{int(bloqueo['esperas'])} esperaron ({bloqueo['espera_s']:.2f}s en total), "
+          f"{int(bloqueo['reintentos'])} reintentos por 'database is locked'")
+
+    for e in errores[:10]:
+        print(f"✗ {e}")
+    for f in fallas:
+        print(f"✗ {f}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({
+                'parametros': vars(args), 'segundos': segundos, 'bloqueo': dict(bloqueo),
+                'conteos': {k: dict(v) for k, v in conteos.items()}, 'errores': errores, 'fallas': fallas,
+                'latencias_ms': {tipo: {
+                    'p50': _percentil(v, 50), 'p95': _percentil(v, 95), 'p99': _percentil(v, 99), 'max': max(v),
+                    'histograma': {str(limite): sum(1 for x in v if x <= limite) for limite in GRUPOS_MS[:-1]},
+                } for tipo, v in latencias.items()},
+            }, f, indent=2, ensure_ascii=False)
+
+    if fallas or errores:
+        sys.exit(1)
+    print("✓ Libro diario, lotes y stock consistentes.")
+
+
+if __name__ == "__main__":
+    main()
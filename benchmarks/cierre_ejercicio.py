@@ -0,0 +1,317 @@
+"""
+Cierre de ejercicio: tamaño de la BD viva y latencia de los reportes antes y
+después de archivar los años cerrados.
+
+Uso:
+    python -m benchmarks.cierre_ejercicio --asientos 1500 --productos 100 --repeticiones 3
+
+Genera una BD con tres años de datos (2024 a 2026), mide los reportes, cierra
+2024 y 2025 con src.servicios.cierre y vuelve a medir: después del cierre la
+BD viva tiene solo 2026 más los asientos y compras de apertura.
+
+Verifica que el cierre no cambia nada de lo que debe conservarse:
+- los saldos de las cuentas de balance (clases 1 y 2) son los mismos;
+- el patrimonio (clase 3) recibe el resultado de los años cerrados;
+- las cuentas de resultados y el Estado de Resultados muestran solo 2026;
+- el stock de los productos cuadra con sus lotes y el kardex FIFO termina
+  con el mismo saldo (cantidad y valor) de cada producto;
+- las sumas de cada año archivado son las que tenía antes de cerrarlo;
+- los estados comparativos de años cerrados (leídos del archivo) dan lo
+  mismo que antes del cierre, y sin el archivo se rechazan;
+- el saldo a una fecha de un año cerrado (leído del archivo) es el mismo, y
+  el kardex con un período de un año cerrado se rechaza;
+- no se puede registrar un asiento con fecha de un año cerrado.
+
+Sale con código 1 si alguna verificación falla.
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from io import BytesIO
+
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generador_datos import generar_bd
+from src.base_datos.db import crear_motor
+from src.base_datos.migraciones import ejecutar_migraciones
+from src.modelos.entidades import Asiento, Cuenta, DetalleAsiento
+from src.reportes.generadores import (
+    generar_balance_comprobacion, generar_estado_resultados, generar_pdf_estados_comparativos,
+    generar_pdf_libro_diario, generar_pdf_mayor_con_saldo,
+)
+from src.reportes.generadores.comparativos import calcular_estados_comparativos
+from src.reportes.kardex_pdf import _calcular_datos_kardex, generar_reporte_fifo
+from src.servicios.cierre import (
+    CLASES_RESULTADOS, CTA_RESULTADOS_ACUMULADOS, cerrar_ejercicio, ruta_archivo, sumas_archivadas,
+)
+from src.servicios.contabilidad import obtener_saldo_cuenta_a_fecha, preparar_asiento
+from src.servicios.inventario import verificar_stock_productos
+
+ANIOS = (2024, 2025, 2026)
+CERRADOS = (2024, 2025)
+
+# Comparativos (año, modo) con columnas de años cerrados; 2024 anual compara contra 2023, sin datos
+COMPARATIVOS = ((2024, "anual"), (2025, "anual"), (2025, "mensual"), (2026, "anual"))
+
+# Saldos a fecha dentro de los años cerrados, de cuentas de balance (el cierre no las toca)
+SALDOS_A_FECHA = [(codigo, fecha) for codigo in ("1", "2", "1.1.01.01")
+                  for fecha in (date(2024, 6, 30), date(2025, 3, 31), date(2025, 12, 31))]
+
+REPORTES = {
+    'libro_diario': generar_pdf_libro_diario,
+    'libro_mayor_saldos': generar_pdf_mayor_con_saldo,
+    'balance_comprobacion': generar_balance_comprobacion,
+    'estado_resultados': generar_estado_resultados,
+    'kardex_fifo': generar_reporte_fifo,
+}
+
+
+def _generar(ruta_bd, asientos, productos):
+    generar_bd(ruta_bd, cuentas=100, asientos=asientos, productos=productos, movimientos_por_producto=30,
+               anios=len(ANIOS))
+    con = sqlite3.connect(ruta_bd)
+    with con:
+        con.execute(
+            "INSERT INTO cuentas (codigo, nombre, tipo, naturaleza, empresa_id) VALUES (?, ?, ?, ?, 1)",
+            (CTA_RESULTADOS_ACUMULADOS, "Utilidades no distribuidas", "PATRIMONIO", "Acreedora")
+        )
+    con.close()
+    motor = crear_motor(ruta_bd)
+    ejecutar_migraciones(motor)
+    motor.dispose()
+
+
+def tamano_mb(ruta_bd):
+    """Tamaño en disco de la BD con su WAL."""
+    return sum(os.path.getsize(ruta_bd + s) for s in ("", "-wal") if os.path.exists(ruta_bd + s)) / 2**20
+
+
+def medir(Sesion, repeticiones):
+    """Retorna {reporte: (mediana_ms, filas)}."""
+    medidas = {}
+    for nombre, generador in REPORTES.items():
+        tiempos, filas = [], 0
+        for _ in range(repeticiones + 1):
+            with Sesion() as db:
+                t0 = time.perf_counter()
+                resultado = generador(db, nombre_archivo=BytesIO())
+                tiempos.append((time.perf_counter() - t0) * 1000)
+            if not resultado.exito:
+                raise RuntimeError(f"{nombre}: {resultado.mensaje}")
+            filas = resultado.filas
+        medidas[nombre] = (statistics.median(tiempos[1:]), filas)
+    return medidas
+
+
+def sumas(db, desde=None, hasta=None):
+    """{codigo: (debe, haber)} de los asientos entre desde y hasta."""
+    query = (
+        db.query(Cuenta.codigo, func.sum(DetalleAsiento.debe), func.sum(DetalleAsiento.haber))
+        .join(DetalleAsiento, DetalleAsiento.cuenta_id == Cuenta.id)
+        .join(Asiento, DetalleAsiento.asiento_id == Asiento.id)
+    )
+    if desde:
+        query = query.filter(Asiento.fecha >= desde)
+    if hasta:
+        query = query.filter(Asiento.fecha <= hasta)
+    return {codigo: (debe or 0.0, haber or 0.0) for codigo, debe, haber in query.group_by(Cuenta.id)}
+
+
+def saldo_clase(sumas_cuentas, clases):
+    return round(sum(d - h for codigo, (d, h) in sumas_cuentas.items() if codigo.startswith(clases)), 2)
+
+
+def saldos_kardex(db):
+    """{codigo: (cantidad, valor)} de la última fila del kardex FIFO de cada producto."""
+    return {p['codigo']: (int(p['filas'][-1][-3]), float(p['filas'][-1][-1]))
+            for p in _calcular_datos_kardex(db, 'FIFO') if p['filas']}
+
+
+def comparativos(db):
+    """
+    {(año, modo, estado, tipo, código, nombre): valores} de los COMPARATIVOS.
+    Sin el patrimonio del Balance: el cierre pasa el resultado de los años
+    cerrados a resultados acumulados (el total del patrimonio sí se compara).
+    """
+    filas = {}
+    for anio, modo in COMPARATIVOS:
+        estados = calcular_estados_comparativos(db, anio, modo)
+        for clave in ('estado_resultados', 'balance_general'):
+            for tipo, codigo, nombre, valores in estados[clave]['filas']:
+                if clave == 'balance_general' and (codigo.startswith("3") or nombre == "Resultado del Ejercicio"):
+                    continue
+                filas[(anio, modo, clave, tipo, codigo, nombre)] = valores
+    return filas
+
+
+def saldos_a_fecha(db):
+    """{(codigo, fecha): saldo} de SALDOS_A_FECHA."""
+    return {(codigo, fecha): (obtener_saldo_cuenta_a_fecha(db, codigo, fecha) or {}).get('saldo')
+            for codigo, fecha in SALDOS_A_FECHA}
+
+
+def foto(db):
+    """Lo que el cierre debe conservar, tomado antes de cerrar."""
+    return {
+        'total': sumas(db),
+        'abierto': sumas(db, date(ANIOS[-1], 1, 1)),
+        'kardex': saldos_kardex(db),
+        'comparativos': comparativos(db),
+        'saldos_a_fecha': saldos_a_fecha(db),
+        # Sumas de cada año justo antes de cerrarlo (las completa main)
+        'por_anio': {},
+    }
+
+
+def verificar(db, antes, resultados):
+    fallas = []
+    despues = sumas(db)
+
+    # 1. Cuentas de balance intactas, una por una
+    for codigo, (d, h) in antes['total'].items():
+        if codigo.startswith(("1", "2")):
+            saldo = despues.get(codigo, (0.0, 0.0))
+            if abs((d - h) - (saldo[0] - saldo[1])) > 0.01:
+                fallas.append(f"El saldo de {codigo} cambió: {d - h:,.2f} -> {saldo[0] - saldo[1]:,.2f}")
+
+    # 2. Patrimonio + resultados de los años cerrados (saldos en Debe - Haber)
+    esperado = round(saldo_clase(antes['total'], "3") - sum(resultados), 2)
+    if abs(saldo_clase(despues, "3") - esperado) > 0.01:
+        fallas.append(f"Clase 3: {saldo_clase(despues, '3'):,.2f}, se esperaba {esperado:,.2f}")
+
+    # 3. Resultados: solo el año abierto
+    abierto = antes['abierto']
+    if abs(saldo_clase(despues, CLASES_RESULTADOS) - saldo_clase(abierto, CLASES_RESULTADOS)) > 0.01:
+        fallas.append("Las cuentas de resultados no quedaron solo con el año abierto.")
+    er = generar_estado_resultados(db, nombre_archivo=BytesIO())
+    if abs(er.extra.get('utilidad_neta', 0.0) + saldo_clase(abierto, CLASES_RESULTADOS)) > 0.01:
+        fallas.append(f"El Estado de Resultados da {er.extra.get('utilidad_neta', 0.0):,.2f}, "
+                      f"se esperaba {-saldo_clase(abierto, CLASES_RESULTADOS):,.2f}")
+
+    # 4. Inventario
+    descuadres = verificar_stock_productos(db)
+    if descuadres:
+        fallas.append(f"{len(descuadres)} producto(s) con stock distinto de sus lotes.")
+    kardex = saldos_kardex(db)
+    distintos = [c for c, (cantidad, valor) in antes['kardex'].items()
+                 if c not in kardex or kardex[c][0] != cantidad or abs(kardex[c][1] - valor) > 0.01]
+    if distintos:
+        fallas.append(f"El kardex FIFO termina distinto en {len(distintos)} producto(s): {distintos[:5]}")
+
+    # 5. Sumas archivadas = sumas del año antes de cerrarlo
+    for anio in CERRADOS:
+        archivadas = {codigo: (d, h) for codigo, _, d, h in sumas_archivadas(db, anio)}
+        originales = antes['por_anio'][anio]
+        if archivadas.keys() != originales.keys() or any(
+            abs(archivadas[c][0] - d) > 0.005 or abs(archivadas[c][1] - h) > 0.005 for c, (d, h) in originales.items()
+        ):
+            fallas.append(f"Las sumas archivadas de {anio} no coinciden con las de antes del cierre.")
+
+    # 6. Comparativos con años cerrados: del archivo, iguales a los de antes; sin archivo, rechazados
+    despues_comparativos = comparativos(db)
+    distintas = [
+        clave for clave, valores in antes['comparativos'].items()
+        if clave not in despues_comparativos or any(
+            (a is None) != (b is None) or (a is not None and abs(a - b) > 0.01)
+            for a, b in zip(valores, despues_comparativos[clave])
+        )
+    ]
+    if distintas or despues_comparativos.keys() != antes['comparativos'].keys():
+        fallas.append(f"Los comparativos cambiaron con el cierre en {len(distintas)} fila(s): {distintas[:3]}")
+    saldos = saldos_a_fecha(db)
+    distintos = [(clave, saldo, saldos[clave]) for clave, saldo in antes['saldos_a_fecha'].items()
+                 if saldos[clave] is None or abs(saldos[clave] - saldo) > 0.01]
+    if distintos:
+        fallas.append(f"Saldos a fecha de años cerrados distintos después del cierre: {distintos[:3]}")
+    kardex = generar_reporte_fifo(db, fecha_inicio=date(CERRADOS[-1], 6, 1), nombre_archivo=BytesIO())
+    if kardex.exito:
+        fallas.append(f"Se generó el kardex desde {CERRADOS[-1]}, que está cerrado.")
+    archivo = ruta_archivo(db.get_bind(), CERRADOS[-1])
+    os.rename(archivo, f"{archivo}.aparte")
+    try:
+        resultado = generar_pdf_estados_comparativos(db, CERRADOS[-1], "mensual", nombre_archivo=BytesIO())
+        if resultado.exito:
+            fallas.append(f"El comparativo de {CERRADOS[-1]} se generó sin su archivo.")
+        try:
+            obtener_saldo_cuenta_a_fecha(db, "1", date(CERRADOS[-1], 6, 30))
+            fallas.append(f"Se dio un saldo de {CERRADOS[-1]} sin su archivo.")
+        except ValueError:
+            pass
+    finally:
+        os.rename(f"{archivo}.aparte", archivo)
+
+    # 7. Año cerrado: no admite asientos
+    try:
+        preparar_asiento(db, date(CERRADOS[-1], 6, 30), "Asiento en año cerrado", [
+            {'cuenta_codigo': "1.1.01.01", 'debe': 1.0, 'haber': 0.0},
+            {'cuenta_codigo': CTA_RESULTADOS_ACUMULADOS, 'debe': 0.0, 'haber': 1.0},
+        ])
+        fallas.append(f"Se pudo registrar un asiento en {CERRADOS[-1]}, que está cerrado.")
+    except ValueError:
+        pass
+    finally:
+        db.rollback()
+    return fallas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--asientos", type=int, default=1500, help="asientos en los tres años")
+    parser.add_argument("--productos", type=int, default=100)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    fallas = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bd = os.path.join(carpeta, "viva.sqlite")
+        _generar(ruta_bd, args.asientos, args.productos)
+        motor = crear_motor(ruta_bd)
+        Sesion = sessionmaker(bind=motor, autoflush=False)
+
+        tamano_antes = tamano_mb(ruta_bd)
+        antes = medir(Sesion, args.repeticiones)
+        with Sesion() as db:
+            estado = foto(db)
+
+        resultados = []
+        for anio in CERRADOS:
+            t0 = time.perf_counter()
+            with Sesion() as db:
+                estado['por_anio'][anio] = sumas(db, date(anio, 1, 1), date(anio, 12, 31))
+                ok, msg, resumen = cerrar_ejercicio(db, anio)
+            print(f"{'✓' if ok else '✗'} {msg} ({time.perf_counter() - t0:.2f}s)", file=sys.stderr)
+            if not ok:
+                fallas.append(msg)
+                continue
+            resultados.append(resumen['resultado'] or 0.0)
+            print(f"  {os.path.basename(resumen['archivo'])}: {tamano_mb(resumen['archivo']):.2f} MB", file=sys.stderr)
+
+        tamano_despues = tamano_mb(ruta_bd)
+        despues = medir(Sesion, args.repeticiones)
+        if not fallas:
+            with Sesion() as db:
+                fallas += verificar(db, estado, resultados)
+        motor.dispose()
+
+    print(f"\nBD viva: {tamano_antes:.2f} MB -> {tamano_despues:.2f} MB")
+    print(f"\n{'reporte':<24}{'antes ms':>10}{'filas':>8}{'después ms':>12}{'filas':>8}{'factor':>8}")
+    for nombre in REPORTES:
+        (ms_antes, filas_antes), (ms_despues, filas_despues) = antes[nombre], despues[nombre]
+        print(f"{nombre:<24}{ms_antes:>10.1f}{filas_antes:>8}{ms_despues:>12.1f}{filas_despues:>8}"
+              f"{ms_antes / ms_despues:>7.1f}x")
+
+    for f in fallas:
+        print(f"✗ {f}")
+    if fallas:
+        sys.exit(1)
+    print(f"\n✓ Ejercicios {', '.join(map(str, CERRADOS))} cerrados y archivados sin cambiar saldos ni inventario.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compara registrar_asiento (un commit por asiento) contra ColaAsientos
+(group commit con un único hilo escritor) según el número de productores.
+
+Uso:
+    python -m benchmarks.cola_asientos --productores 1 4 16 --asientos 200
+
+Cada productor es un hilo que registra `--asientos` asientos de dos líneas.
+Al final se verifica que el libro diario cuadre y que estén todos los asientos.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from src.base_datos.db import Base, crear_motor
+from src.modelos.entidades import Asiento, Cuenta, DetalleAsiento
+from src.servicios.cola_asientos import ColaAsientos
+from src.servicios.contabilidad import registrar_asiento
+
+
+MOVIMIENTOS = [
+    {'cuenta_codigo': "1.1.01.01", 'debe': 10.0, 'haber': 0.0},
+    {'cuenta_codigo': "4.1.01", 'debe': 0.0, 'haber': 10.0},
+]
+
+
+def preparar_bd(ruta_bd):
+    motor = crear_motor(ruta_bd)
+    Base.metadata.create_all(bind=motor)
+    Sesion = sessionmaker(bind=motor, autoflush=False)
+    with Sesion() as db:
+        db.add_all([
+            Cuenta(codigo="1.1.01.01", nombre="Caja", tipo="ACTIVO", naturaleza="Deudora"),
+            Cuenta(codigo="4.1.01", nombre="Ventas", tipo="INGRESO", naturaleza="Acreedora"),
+        ])
+        db.commit()
+    return motor, Sesion
+
+
+def con_commit_individual(Sesion, productores, asientos):
+    errores = []
+
+    def productor(n):
+        with Sesion() as db:
+            for i in range(asientos):
+                ok, msg = registrar_asiento(db, date(2025, 1, 1), f"P{n}-{i}", MOVIMIENTOS)
+                if not ok:
+                    errores.append(msg)
+
+    hilos = [threading.Thread(target=productor, args=(n,)) for n in range(productores)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return errores
+
+
+def con_cola(Sesion, productores, asientos):
+    errores = []
+
+    with ColaAsientos(fabrica_sesiones=Sesion) as cola:
+        def productor(n):
+            futuros = [cola.enviar_asiento(date(2025, 1, 1), f"P{n}-{i}", MOVIMIENTOS) for i in range(asientos)]
+            for f in futuros:
+                try:
+                    f.result()
+                except Exception as e:
+                    errores.append(str(e))
+
+        hilos = [threading.Thread(target=productor, args=(n,)) for n in range(productores)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        lotes = cola.lotes_confirmados
+    return errores, lotes
+
+
+def verificar(Sesion, esperados):
+    with Sesion() as db:
+        total = db.query(func.count(Asiento.id)).scalar()
+        debe, haber = db.query(func.sum(DetalleAsiento.debe), func.sum(DetalleAsiento.haber)).one()
+    fallas = []
+    if total != esperados:
+        fallas.append(f"Se esperaban {esperados} asientos y hay {total}.")
+    if round(debe or 0, 2) != round(haber or 0, 2):
+        fallas.append(f"Libro diario descuadrado: {debe} != {haber}")
+    return fallas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productores", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--asientos", type=int, default=200, help="asientos por productor")
+    args = parser.parse_args()
+
+    print(f"{'Productores':>11} | {'Individual (as/s)':>17} | {'Cola (as/s)':>11} | {'Commits cola':>12}")
+    for productores in args.productores:
+        esperados = productores * args.asientos
+        fila = []
+        with tempfile.TemporaryDirectory() as carpeta:
+            for modo in ("individual", "cola"):
+                motor, Sesion = preparar_bd(os.path.join(carpeta, f"{modo}.sqlite"))
+                t0 = time.perf_counter()
+                if modo == "individual":
+                    errores = con_commit_individual(Sesion, productores, args.asientos)
+                else:
+                    errores, lotes = con_cola(Sesion, productores, args.asientos)
+                segundos = time.perf_counter() - t0
+                fallas = verificar(Sesion, esperados) + errores[:3]
+                motor.dispose()
+                for f in fallas:
+                    print(f"✗ [{modo}] {f}")
+                fila.append(esperados / segundos)
+        print(f"{productores:>11} | {fila[0]:>17.1f} | {fila[1]:>11.1f} | {lotes:>12}")
+
+
+if __name__ == "__main__":
+    main()
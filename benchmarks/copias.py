@@ -0,0 +1,182 @@
+"""
+Limpieza de datos y copias de seguridad con la API de backup de SQLite.
+
+Uso:
+    python -m benchmarks.copias --asientos 50000 --productos 500
+
+1. Limpieza: sobre dos BD iguales mide la limpieza anterior del menú (un
+   count() y un DELETE por tabla, sin VACUUM) y limpiar_empresa (BD vacía
+   nueva volcada con backup). Informa tiempo y tamaño final del archivo.
+2. Copia en línea: mide la latencia de registrar_asiento desde otro hilo sin
+   copia y mientras se hace crear_copia, y revisa que la copia sea una BD
+   íntegra con una foto consistente (asientos cuadrados).
+3. Restauración: restaurar_copia devuelve la BD al contenido de la copia.
+
+Sale con código 1 si alguna verificación falla.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generador_datos import CTA_CAPITAL, generar_bd
+from src.base_datos.db import crear_motor, init_db
+from src.modelos.entidades import (
+    Asiento, Cuenta, DetalleAsiento, Empresa, LoteInventario, MovimientoInventario, Producto,
+)
+from src.servicios import inventario
+from src.servicios.contabilidad import registrar_asiento
+from src.servicios.copias import crear_copia, limpiar_empresa, restaurar_copia
+
+
+def tamano_mb(ruta_bd):
+    return sum(os.path.getsize(ruta_bd + s) for s in ("", "-wal") if os.path.exists(ruta_bd + s)) / 2**20
+
+
+def limpiar_anterior(db):
+    """La limpieza de antes: contar y borrar tabla por tabla."""
+    modelos = (DetalleAsiento, Asiento, LoteInventario, MovimientoInventario, Producto, Cuenta, Empresa)
+    total = sum(db.query(modelo).count() for modelo in modelos)
+    for modelo in modelos:
+        db.query(modelo).delete()
+    db.commit()
+    return total
+
+
+def medir_limpieza(ruta_original, carpeta):
+    medidas = {}
+    for nombre, limpiar in (('anterior', limpiar_anterior), ('backup', limpiar_empresa)):
+        ruta = os.path.join(carpeta, f"limpiar_{nombre}.sqlite")
+        shutil.copy(ruta_original, ruta)
+        motor = crear_motor(ruta)
+        with sessionmaker(bind=motor, autoflush=False)() as db:
+            t0 = time.perf_counter()
+            limpiar(db)
+            segundos = time.perf_counter() - t0
+            quedan = db.execute(text("SELECT COUNT(*) FROM asientos")).scalar()
+        motor.dispose()
+        medidas[nombre] = (segundos, tamano_mb(ruta), quedan)
+    return medidas
+
+
+def latencias_asientos(Sesion, duracion=None, hasta=None):
+    """Registra asientos en un hilo propio hasta que pase `duracion` o se active `hasta`. Retorna ms."""
+    tiempos = []
+    movimientos = [
+        {'cuenta_codigo': inventario.CTA_CAJA, 'debe': 10.0, 'haber': 0.0},
+        {'cuenta_codigo': CTA_CAPITAL, 'debe': 0.0, 'haber': 10.0},
+    ]
+    fin = time.perf_counter() + duracion if duracion else None
+    with Sesion() as db:
+        while not (hasta.is_set() if hasta else time.perf_counter() > fin):
+            t0 = time.perf_counter()
+            ok, msg = registrar_asiento(db, date(2024, 12, 31), "Asiento durante la copia", movimientos)
+            tiempos.append((time.perf_counter() - t0) * 1000)
+            if not ok:
+                raise RuntimeError(msg)
+    return tiempos
+
+
+def revisar_copia(ruta):
+    """Fallas de la copia: integridad y asientos cuadrados (foto consistente)."""
+    con = sqlite3.connect(ruta)
+    try:
+        fallas = []
+        if con.execute("PRAGMA integrity_check").fetchone()[0] != "ok":
+            fallas.append("La copia no pasa PRAGMA integrity_check.")
+        descuadrados = con.execute("""
+            SELECT COUNT(*) FROM (SELECT asiento_id FROM detalles_asiento GROUP BY asiento_id
+                                  HAVING ROUND(SUM(debe) - SUM(haber), 2) <> 0)
+        """).fetchone()[0]
+        sin_detalle = con.execute(
+            "SELECT COUNT(*) FROM asientos a WHERE NOT EXISTS (SELECT 1 FROM detalles_asiento d WHERE d.asiento_id = a.id)"
+        ).fetchone()[0]
+        if descuadrados or sin_detalle:
+            fallas.append(f"La copia no es una foto consistente: {descuadrados} asientos descuadrados, "
+                          f"{sin_detalle} sin detalle.")
+        asientos = con.execute("SELECT COUNT(*) FROM asientos").fetchone()[0]
+        return fallas, asientos
+    finally:
+        con.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--asientos", type=int, default=50000)
+    parser.add_argument("--productos", type=int, default=500)
+    parser.add_argument("--base-s", type=float, default=1.0, help="segundos de asientos sin copia (referencia)")
+    args = parser.parse_args()
+
+    fallas = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bd = os.path.join(carpeta, "viva.sqlite")
+        generar_bd(ruta_bd, asientos=args.asientos, productos=args.productos)
+        motor = crear_motor(ruta_bd)
+        init_db(motor)
+        motor.dispose()
+        print(f"BD de {tamano_mb(ruta_bd):.1f} MB", file=sys.stderr)
+
+        # 1. Limpieza
+        limpieza = medir_limpieza(ruta_bd, carpeta)
+        for nombre, (_, _, quedan) in limpieza.items():
+            if quedan:
+                fallas.append(f"La limpieza '{nombre}' dejó {quedan} asientos.")
+
+        # 2. Copia mientras otro hilo registra asientos
+        motor = crear_motor(ruta_bd)
+        Sesion = sessionmaker(bind=motor, autoflush=False)
+        referencia = latencias_asientos(Sesion, duracion=args.base_s)
+
+        listo, resultado = threading.Event(), {}
+        hilo = threading.Thread(target=lambda: resultado.update(ms=latencias_asientos(Sesion, hasta=listo)))
+        hilo.start()
+        time.sleep(0.1)
+        t0 = time.perf_counter()
+        ok, msg, ruta_copia = crear_copia(ruta_bd, os.path.join(carpeta, "copia.sqlite"))
+        segundos_copia = time.perf_counter() - t0
+        time.sleep(0.1)
+        listo.set()
+        hilo.join()
+        durante = resultado['ms']
+
+        if not ok:
+            fallas.append(msg)
+        else:
+            fallas_copia, asientos_copia = revisar_copia(ruta_copia)
+            fallas += fallas_copia
+
+            # 3. Restaurar: la BD vuelve a tener exactamente los asientos de la copia
+            ok, msg = restaurar_copia(ruta_copia, ruta_bd, respaldar=False)
+            with Sesion() as db:
+                asientos = db.execute(text("SELECT COUNT(*) FROM asientos")).scalar()
+            if not ok or asientos != asientos_copia:
+                fallas.append(f"Restauración: {msg} ({asientos} asientos, la copia tiene {asientos_copia}).")
+        motor.dispose()
+
+    print(f"\n{'limpieza':<12}{'segundos':>10}{'MB final':>10}")
+    for nombre, (segundos, mb, _) in limpieza.items():
+        print(f"{nombre:<12}{segundos:>10.2f}{mb:>10.2f}")
+
+    print(f"\nCopia en línea: {segundos_copia:.2f}s")
+    print(f"{'asientos':<22}{'cantidad':>10}{'p50 ms':>10}{'máx ms':>10}")
+    for nombre, tiempos in (('sin copia', referencia), ('durante la copia', durante)):
+        print(f"{nombre:<22}{len(tiempos):>10}{statistics.median(tiempos):>10.2f}{max(tiempos):>10.2f}")
+
+    for f in fallas:
+        print(f"✗ {f}")
+    if fallas:
+        sys.exit(1)
+    print("\n✓ Limpieza, copia en línea y restauración correctas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Prueba de estrés de ventas concurrentes desde varios procesos (varias "cajas")
+sobre un mismo archivo SQLite.
+
+Uso:
+    python -m benchmarks.estres_ventas --procesos 4 --ventas 200 --stock 500
+
+Cada proceso intenta vender de a una unidad del mismo producto. Como se
+intentan más ventas que el stock disponible, al final se verifica que no se
+haya sobrevendido ningún lote y que stock, lotes y libro diario cuadren.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy.orm import sessionmaker
+
+from src.base_datos.db import Base, crear_motor
+from src.modelos.entidades import Cuenta, LoteInventario, MovimientoInventario, DetalleAsiento
+from src.servicios import inventario
+
+
+CODIGO_PRODUCTO = "ESTRES-01"
+
+
+def preparar_bd(ruta_bd, stock_total, lotes):
+    """Crea el esquema, las cuentas que usan los servicios y un producto con stock repartido en lotes."""
+    motor = crear_motor(ruta_bd)
+    Base.metadata.create_all(bind=motor)
+    Sesion = sessionmaker(bind=motor, autoflush=False)
+
+    with Sesion() as db:
+        for codigo, naturaleza in [
+            (inventario.CTA_INVENTARIO, "Deudora"), (inventario.CTA_CAJA, "Deudora"),
+            (inventario.CTA_CLIENTES, "Deudora"), (inventario.CTA_PROVEEDORES, "Acreedora"),
+            (inventario.CTA_VENTAS, "Acreedora"), (inventario.CTA_COSTO_VENTAS, "Deudora"),
+        ]:
+            db.add(Cuenta(codigo=codigo, nombre=codigo, tipo="DEMO", naturaleza=naturaleza))
+        db.commit()
+
+        inventario.crear_producto(db, CODIGO_PRODUCTO, "Producto de estrés")
+        por_lote = stock_total // lotes
+        for n in range(lotes):
+            cantidad = por_lote if n < lotes - 1 else stock_total - por_lote * (lotes - 1)
+            inventario.registrar_compra(db, CODIGO_PRODUCTO, date(2025, 1, 1 + n % 28), cantidad, 1.0 + n)
+    motor.dispose()
+
+
+def cajero(ruta_bd, ventas, cola):
+    """Proceso trabajador: intenta `ventas` ventas de 1 unidad y reporta cuántas lograron."""
+    motor = crear_motor(ruta_bd)
+    Sesion = sessionmaker(bind=motor, autoflush=False)
+    exitos = sin_stock = errores = 0
+
+    with Sesion() as db:
+        for _ in range(ventas):
+            ok, msg, _ = inventario.registrar_venta_con_asientos(db, CODIGO_PRODUCTO, date(2025, 2, 1), 1, 10.0)
+            if ok:
+                exitos += 1
+            elif msg.startswith("Stock insuficiente"):
+                sin_stock += 1
+            else:
+                errores += 1
+                print(f"[pid {os.getpid()}] {msg}", file=sys.stderr)
+
+    motor.dispose()
+    cola.put((exitos, sin_stock, errores))
+
+
+def verificar(ruta_bd, stock_total):
+    """Chequeos de consistencia después de la carga. Retorna lista de fallas."""
+    motor = crear_motor(ruta_bd)
+    Sesion = sessionmaker(bind=motor)
+    fallas = []
+
+    with Sesion() as db:
+        vendidas = sum(m.cantidad for m in db.query(MovimientoInventario).filter_by(tipo="VENTA"))
+        saldo_lotes = sum(l.saldo_cantidad for l in db.query(LoteInventario))
+
+        if db.query(LoteInventario).filter(LoteInventario.saldo_cantidad < 0).count():
+            fallas.append("Hay lotes con saldo negativo (sobreventa).")
+        if vendidas + saldo_lotes != stock_total:
+            fallas.append(f"Vendidas ({vendidas}) + saldo lotes ({saldo_lotes}) != stock inicial ({stock_total}).")
+        if inventario.verificar_stock_productos(db):
+            fallas.append("stock_actual no coincide con los lotes.")
+
+        debe = sum(d.debe for d in db.query(DetalleAsiento))
+        haber = sum(d.haber for d in db.query(DetalleAsiento))
+        if round(debe, 2) != round(haber, 2):
+            fallas.append(f"Libro diario descuadrado: {debe:.2f} != {haber:.2f}")
+
+    motor.dispose()
+    return fallas, vendidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--ventas", type=int, default=200, help="intentos de venta por proceso")
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--lotes", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bd = os.path.join(carpeta, "estres.sqlite")
+        preparar_bd(ruta_bd, args.stock, args.lotes)
+
+        cola = multiprocessing.Queue()
+        procesos = [
+            multiprocessing.Process(target=cajero, args=(ruta_bd, args.ventas, cola))
+            for _ in range(args.procesos)
+        ]
+        t0 = time.perf_counter()
+        for p in procesos:
+            p.start()
+        resultados = [cola.get() for _ in procesos]
+        for p in procesos:
+            p.join()
+        segundos = time.perf_counter() - t0
+
+        exitos = sum(r[0] for r in resultados)
+        sin_stock = sum(r[1] for r in resultados)
+        errores = sum(r[2] for r in resultados)
+        fallas, vendidas = verificar(ruta_bd, args.stock)
+
+    intentos = args.procesos * args.ventas
+    print(f"Intentos: {intentos} | Vendidas: {exitos} | Sin stock: {sin_stock} | Errores: {errores}")
+    print(f"Tiempo: {segundos:.2f}s | {intentos / segundos:.1f} operaciones/s | {exitos / segundos:.1f} ventas/s")
+
+    if exitos != vendidas:
+        fallas.append(f"Ventas confirmadas ({exitos}) != movimientos VENTA en la BD ({vendidas}).")
+
+    if fallas or errores:
+        for f in fallas:
+            print(f"✗ {f}")
+        sys.exit(1)
+    print("✓ Sin sobreventa: stock, lotes y libro diario consistentes.")
+
+
+if __name__ == "__main__":
+    main()
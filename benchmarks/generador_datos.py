@@ -0,0 +1,253 @@
+"""
+Generador determinista de datos sintéticos (libro diario + inventario).
+
+Uso:
+    python -m benchmarks.generador_datos salida.sqlite --asientos 20000 --productos 500
+
+Crea un archivo SQLite nuevo con el esquema actual y lo llena con inserciones
+masivas (executemany), sin pasar por los servicios. Con la misma semilla y
+parámetros siempre produce los mismos datos, así dos commits se miden sobre
+la misma BD.
+
+Los datos son coherentes con lo que mantienen los servicios: asientos
+cuadrados (el primero es de apertura), un lote por compra con el saldo que
+dejan las ventas FIFO, y stock_actual/valor_actual iguales a los lotes.
+
+Con --anios N las fechas se reparten en N años desde 2024 (por defecto, solo
+2024), para medir el cierre de ejercicio.
+
+Con --empresas N se repiten los mismos datos para N empresas en la misma BD
+(mismos códigos, ids desplazados): la empresa 1 es idéntica a la BD de una
+sola empresa, así las mediciones por empresa se comparan directamente.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from collections import deque
+from datetime import date, timedelta
+
+from src.base_datos.db import Base, crear_motor
+from src.servicios import inventario
+
+# Tamaños de la escala 1; el runner los multiplica por el factor de escala
+ESCALA_BASE = {
+    'cuentas': 100,
+    'asientos': 1000,
+    'lineas_por_asiento': 4,
+    'productos': 50,
+    'movimientos_por_producto': 20,
+}
+
+FECHA_INICIO = date(2024, 1, 1)
+CTA_CAPITAL = "3.1.01"
+
+# Cuentas que usan los servicios (código, nombre, tipo, naturaleza)
+CUENTAS_FIJAS = [
+    (inventario.CTA_CAJA, "Caja", "ACTIVO", "Deudora"),
+    (inventario.CTA_CLIENTES, "Clientes", "ACTIVO", "Deudora"),
+    (inventario.CTA_INVENTARIO, "Inventario de mercaderías", "ACTIVO", "Deudora"),
+    (inventario.CTA_PROVEEDORES, "Proveedores", "PASIVO", "Acreedora"),
+    (CTA_CAPITAL, "Capital social", "PATRIMONIO", "Acreedora"),
+    (inventario.CTA_VENTAS, "Ventas", "INGRESO", "Acreedora"),
+    (inventario.CTA_COSTO_VENTAS, "Costo de ventas", "GASTO", "Deudora"),
+]
+
+# Clase de cuenta -> (tipo, naturaleza) para las cuentas sintéticas
+CLASES = {
+    1: ("ACTIVO", "Deudora"),
+    2: ("PASIVO", "Acreedora"),
+    3: ("PATRIMONIO", "Acreedora"),
+    4: ("INGRESO", "Acreedora"),
+    5: ("GASTO", "Deudora"),
+    6: ("COSTO", "Deudora"),
+}
+
+
+def _plan_de_cuentas(cuentas):
+    filas = list(CUENTAS_FIJAS)
+    for n in range(max(0, cuentas - len(CUENTAS_FIJAS))):
+        clase = n % 6 + 1
+        tipo, naturaleza = CLASES[clase]
+        filas.append((f"{clase}.9.{n:05d}", f"Cuenta sintética {clase}-{n}", tipo, naturaleza))
+    return filas
+
+
+def _libro_diario(rnd, asientos, lineas_por_asiento, cuenta_ids, anios=1):
+    """Filas de asientos y detalles; el asiento 1 es la apertura (Caja e Inventario contra Capital)."""
+    filas_asiento = []
+    filas_detalle = []
+    caja, inventario_id, capital = cuenta_ids[inventario.CTA_CAJA], cuenta_ids[inventario.CTA_INVENTARIO], cuenta_ids[CTA_CAPITAL]
+    todas = list(cuenta_ids.values())
+
+    filas_asiento.append((1, FECHA_INICIO.isoformat(), "Asiento de apertura"))
+    filas_detalle += [(1, caja, 50000.0, 0.0), (1, inventario_id, 25000.0, 0.0), (1, capital, 0.0, 75000.0)]
+
+    lineas_debe = max(1, lineas_por_asiento // 2)
+    lineas_haber = max(1, lineas_por_asiento - lineas_debe)
+    for asiento_id in range(2, asientos + 1):
+        fecha = FECHA_INICIO + timedelta(days=(asiento_id * 365 * anios) // max(asientos, 1))
+        filas_asiento.append((asiento_id, fecha.isoformat(), f"Asiento sintético {asiento_id}"))
+
+        montos = [round(rnd.uniform(1, 1000), 2) for _ in range(lineas_debe)]
+        total = round(sum(montos), 2)
+        for monto in montos:
+            filas_detalle.append((asiento_id, rnd.choice(todas), monto, 0.0))
+
+        # El Haber reparte el mismo total; la última línea absorbe el redondeo
+        acumulado = 0.0
+        for i in range(lineas_haber):
+            monto = round(total - acumulado, 2) if i == lineas_haber - 1 else round(total / lineas_haber, 2)
+            acumulado += monto
+            filas_detalle.append((asiento_id, rnd.choice(todas), 0.0, monto))
+
+    return filas_asiento, filas_detalle
+
+
+def _inventario(rnd, productos, movimientos_por_producto, anios=1):
+    """Productos, movimientos, lotes (con saldo FIFO) y stock denormalizado."""
+    filas_prod, filas_mov, filas_lote = [], [], []
+    mov_id = 0
+
+    for pid in range(1, productos + 1):
+        lotes_abiertos = deque()   # [indice en filas_lote, saldo]
+        stock = 0
+        valor = 0.0
+
+        for n in range(movimientos_por_producto):
+            fecha = (FECHA_INICIO + timedelta(days=n * 365 * anios // max(movimientos_por_producto, 1))).isoformat()
+            mov_id += 1
+            if stock == 0 or rnd.random() < 0.5:
+                cant = rnd.randint(1, 50)
+                costo = round(rnd.uniform(1, 100), 2)
+                filas_mov.append((mov_id, pid, fecha, 'COMPRA', cant, costo, cant * costo, cant))
+                filas_lote.append([mov_id, pid, fecha, costo, cant, cant])
+                lotes_abiertos.append(len(filas_lote) - 1)
+                stock += cant
+                valor += cant * costo
+            else:
+                cant = rnd.randint(1, stock)
+                pendiente, costo_salida = cant, 0.0
+                while pendiente:
+                    lote = filas_lote[lotes_abiertos[0]]
+                    tomar = min(pendiente, lote[5])
+                    lote[5] -= tomar
+                    costo_salida += tomar * lote[3]
+                    pendiente -= tomar
+                    if lote[5] == 0:
+                        lotes_abiertos.popleft()
+                filas_mov.append((mov_id, pid, fecha, 'VENTA', cant, costo_salida / cant, costo_salida, 0))
+                stock -= cant
+                valor -= costo_salida
+
+        filas_prod.append((pid, f"P{pid:06d}", f"Producto {pid}", "FIFO", stock, round(valor, 6)))
+
+    return filas_prod, filas_mov, filas_lote
+
+
+def _desplazar(filas, empresa_id, desplazamientos):
+    """Suma a cada columna su desplazamiento (los ids) y agrega empresa_id al final."""
+    return [tuple(v + d for v, d in zip(fila, desplazamientos)) + tuple(fila[len(desplazamientos):]) + (empresa_id,)
+            for fila in filas]
+
+
+def generar_bd(ruta_bd, cuentas=100, asientos=1000, lineas_por_asiento=4, productos=50,
+               movimientos_por_producto=20, semilla=42, empresas=1, anios=1):
+    """
+    Crea (o reemplaza) ruta_bd con los datos sintéticos (repetidos por empresa).
+    Returns:
+        dict: cantidad de filas insertadas por tabla
+    """
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(ruta_bd + sufijo):
+            os.remove(ruta_bd + sufijo)
+
+    motor = crear_motor(ruta_bd)
+    Base.metadata.create_all(bind=motor)
+    motor.dispose()
+
+    rnd = random.Random(semilla)
+    plan = _plan_de_cuentas(cuentas)
+    cuenta_ids = {codigo: i for i, (codigo, *_) in enumerate(plan, start=1)}
+    filas_asiento, filas_detalle = _libro_diario(rnd, asientos, lineas_por_asiento, cuenta_ids, anios)
+    filas_prod, filas_mov, filas_lote = _inventario(rnd, productos, movimientos_por_producto, anios)
+
+    filas_cuenta = [(i, *fila) for i, fila in enumerate(plan, start=1)]
+
+    con = sqlite3.connect(ruta_bd)
+    con.execute("PRAGMA synchronous=OFF")
+    with con:
+        for n in range(empresas):
+            empresa_id = n + 1
+            # Ids desplazados por empresa: (cuentas, asientos, productos, movimientos)
+            dc, da, dp, dm = n * len(plan), n * len(filas_asiento), n * len(filas_prod), n * len(filas_mov)
+            con.execute(
+                "INSERT INTO empresa (id, ruc, nombre, nombre_comercial, ciudad, pais) VALUES (?, ?, ?, ?, ?, ?)",
+                (empresa_id, f"0999999{empresa_id:03d}001", f"Empresa Benchmark {empresa_id} S.A.", "Benchmark",
+                 "Babahoyo", "Ecuador")
+            )
+            con.executemany(
+                "INSERT INTO cuentas (id, codigo, nombre, tipo, naturaleza, empresa_id) VALUES (?, ?, ?, ?, ?, ?)",
+                _desplazar(filas_cuenta, empresa_id, (dc,))
+            )
+            con.executemany(
+                "INSERT INTO asientos (id, fecha, descripcion, empresa_id) VALUES (?, ?, ?, ?)",
+                _desplazar(filas_asiento, empresa_id, (da,))
+            )
+            con.executemany(
+                "INSERT INTO detalles_asiento (asiento_id, cuenta_id, debe, haber, empresa_id) VALUES (?, ?, ?, ?, ?)",
+                _desplazar(filas_detalle, empresa_id, (da, dc))
+            )
+            con.executemany(
+                "INSERT INTO productos (id, codigo, nombre, metodo, stock_actual, valor_actual, empresa_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                _desplazar(filas_prod, empresa_id, (dp,))
+            )
+            con.executemany(
+                "INSERT INTO movimientos_inventario "
+                "(id, producto_id, fecha, tipo, cantidad, costo_unitario, costo_total, saldo_cantidad, empresa_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                _desplazar(filas_mov, empresa_id, (dm, dp))
+            )
+            con.executemany(
+                "INSERT INTO lotes_inventario "
+                "(movimiento_id, producto_id, fecha, costo_unitario, cantidad_inicial, saldo_cantidad, empresa_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                _desplazar(filas_lote, empresa_id, (dm, dp))
+            )
+    con.execute("ANALYZE")
+    con.close()
+
+    return {
+        'cuentas': len(plan) * empresas,
+        'asientos': len(filas_asiento) * empresas,
+        'detalles_asiento': len(filas_detalle) * empresas,
+        'productos': len(filas_prod) * empresas,
+        'movimientos_inventario': len(filas_mov) * empresas,
+        'lotes_inventario': len(filas_lote) * empresas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("ruta_bd")
+    for clave, valor in ESCALA_BASE.items():
+        parser.add_argument(f"--{clave.replace('_', '-')}", type=int, default=valor)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--empresas", type=int, default=1, help="empresas con los mismos datos en la BD")
+    parser.add_argument("--anios", type=int, default=1, help="años en los que se reparten las fechas")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    conteos = generar_bd(
+        args.ruta_bd, args.cuentas, args.asientos, args.lineas_por_asiento,
+        args.productos, args.movimientos_por_producto, args.semilla, args.empresas, args.anios
+    )
+    print(f"{args.ruta_bd} generado en {time.perf_counter() - t0:.1f}s")
+    for tabla, cantidad in conteos.items():
+        print(f"  {tabla:<24} {cantidad:>10,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Verificador de integridad incremental (src/servicios/integridad.py).
+
+Uso:
+    python -m benchmarks.integridad --asientos 250000 --nuevos 200
+
+1. Verificación completa del libro generado (crea el punto de control).
+2. Latencia de registrar_asiento con los triggers de integridad y sin ellos.
+3. Verificación incremental después de registrar --nuevos asientos, y sin
+   cambios: debe revisar solo lo nuevo.
+4. Cambios hechos directamente en SQLite, que la verificación incremental
+   debe encontrar: un monto alterado (asiento descuadrado), un asiento
+   borrado (líneas huérfanas) y una cuenta borrada. Al deshacerlos vuelve a
+   dar el libro íntegro.
+5. Un cambio con los triggers borrados: la incremental no lo ve, la
+   completa lo detecta porque la huella no coincide.
+
+Sale con código 1 si alguna verificación falla.
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generador_datos import CTA_CAPITAL, generar_bd
+from src.base_datos.db import crear_motor, init_db
+from src.servicios import inventario
+from src.servicios.contabilidad import registrar_asiento
+from src.servicios.integridad import verificar_integridad
+
+MOVIMIENTOS = [
+    {'cuenta_codigo': inventario.CTA_CAJA, 'debe': 10.0, 'haber': 0.0},
+    {'cuenta_codigo': CTA_CAPITAL, 'debe': 0.0, 'haber': 10.0},
+]
+
+
+def latencias(Sesion, cantidad):
+    """Registra `cantidad` asientos. Retorna ms de cada uno."""
+    tiempos = []
+    with Sesion() as db:
+        for _ in range(cantidad):
+            t0 = time.perf_counter()
+            ok, msg = registrar_asiento(db, date(2024, 12, 31), "Asiento de prueba", MOVIMIENTOS)
+            tiempos.append((time.perf_counter() - t0) * 1000)
+            if not ok:
+                raise RuntimeError(msg)
+    return tiempos
+
+
+def triggers(con):
+    """{nombre: sql} de los triggers de integridad."""
+    return dict(con.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'integridad_%'"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--asientos", type=int, default=50000)
+    parser.add_argument("--productos", type=int, default=100)
+    parser.add_argument("--nuevos", type=int, default=200, help="asientos a registrar entre verificaciones")
+    args = parser.parse_args()
+
+    fallas, medidas = [], {}
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bd = os.path.join(carpeta, "viva.sqlite")
+        generar_bd(ruta_bd, asientos=args.asientos, productos=args.productos)
+        motor = crear_motor(ruta_bd)
+        init_db(motor)
+        Sesion = sessionmaker(bind=motor, autoflush=False)
+        con = sqlite3.connect(ruta_bd, isolation_level=None)
+
+        def verificar(nombre, completa=False, esperado=True, errores=()):
+            with Sesion() as db:
+                ok, msg, informe = verificar_integridad(db, completa)
+            medidas[nombre] = (informe['segundos'], informe['asientos_revisados'], ok)
+            if ok != esperado or not set(errores) <= set(informe['errores']):
+                fallas.append(f"{nombre}: {msg}")
+            return informe
+
+        # 1. Completa (sin punto de control)
+        verificar("completa inicial", completa=True)
+
+        # 2. Latencia de los asientos con y sin triggers
+        con_triggers = latencias(Sesion, args.nuevos)
+        originales = triggers(con)
+        for nombre in originales:
+            con.execute(f"DROP TRIGGER {nombre}")
+        sin_triggers = latencias(Sesion, args.nuevos)
+        for sql in originales.values():
+            con.execute(sql)
+
+        # 3. Incremental: lo nuevo, y luego nada
+        informe = verificar("incremental (nuevos)")
+        if informe['asientos_revisados'] != 2 * args.nuevos:
+            fallas.append(f"La incremental revisó {informe['asientos_revisados']} asientos, "
+                          f"se esperaban {2 * args.nuevos}.")
+        verificar("incremental (sin cambios)")
+
+        # 4. Cambios directos en SQLite
+        linea_id, asiento_id = con.execute(
+            "SELECT id, asiento_id FROM detalles_asiento WHERE debe > 0 ORDER BY id LIMIT 1 OFFSET 100").fetchone()
+        con.execute("UPDATE detalles_asiento SET debe = debe + 1 WHERE id = ?", (linea_id,))
+        verificar("monto alterado", esperado=False, errores=['descuadrados'])
+        con.execute("UPDATE detalles_asiento SET debe = debe - 1 WHERE id = ?", (linea_id,))
+        verificar("monto restaurado")
+
+        asiento = con.execute("SELECT * FROM asientos WHERE id = ?", (asiento_id,)).fetchone()
+        con.execute("DELETE FROM asientos WHERE id = ?", (asiento_id,))
+        verificar("asiento borrado", esperado=False, errores=['lineas_huerfanas'])
+        con.execute(f"INSERT INTO asientos VALUES ({', '.join('?' * len(asiento))})", asiento)
+        verificar("asiento restaurado")
+
+        cuenta = con.execute("SELECT * FROM cuentas WHERE codigo = ?", (CTA_CAPITAL,)).fetchone()
+        con.execute("DELETE FROM cuentas WHERE codigo = ?", (CTA_CAPITAL,))
+        verificar("cuenta borrada", esperado=False, errores=['cuenta_inexistente'])
+        con.execute(f"INSERT INTO cuentas VALUES ({', '.join('?' * len(cuenta))})", cuenta)
+        verificar("cuenta restaurada")
+
+        # 5. Cambio sin triggers: solo lo ve la huella de la completa
+        con.execute("DROP TRIGGER integridad_detalles_au")
+        con.execute("UPDATE detalles_asiento SET cuenta_id = (SELECT id FROM cuentas WHERE codigo = ?) WHERE id = ?",
+                    (inventario.CTA_INVENTARIO, linea_id))
+        con.execute(originales['integridad_detalles_au'])
+        verificar("sin triggers: incremental")
+        informe = verificar("sin triggers: completa", completa=True, esperado=False)
+        if informe['huella_coincide'] is not False:
+            fallas.append("La verificación completa no detectó el cambio hecho sin triggers.")
+        verificar("completa (nueva referencia)", completa=True)
+
+        con.close()
+        motor.dispose()
+
+    print(f"\n{'verificación':<30}{'segundos':>10}{'asientos':>10}  resultado")
+    for nombre, (segundos, asientos, ok) in medidas.items():
+        print(f"{nombre:<30}{segundos:>10.3f}{asientos:>10}  {'íntegro' if ok else 'con errores'}")
+
+    print(f"\n{'registrar_asiento':<22}{'p50 ms':>10}{'máx ms':>10}")
+    for nombre, tiempos in (('con triggers', con_triggers), ('sin triggers', sin_triggers)):
+        print(f"{nombre:<22}{statistics.median(tiempos):>10.2f}{max(tiempos):>10.2f}")
+
+    for f in fallas:
+        print(f"✗ {f}")
+    if fallas:
+        sys.exit(1)
+    print("\n✓ El verificador encontró cada cambio y revisó solo lo nuevo en las incrementales.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Curva de escalamiento del kardex FIFO/PMP según el número de procesos.
+
+Uso:
+    python -m benchmarks.kardex_paralelo --productos 20000 --movimientos 30
+
+Genera una BD temporal con datos sintéticos y mide solo la fase de cálculo
+(la que se reparte entre procesos); el armado del PDF no se paraleliza.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.base_datos.db import Base
+from src.reportes.kardex_pdf import _calcular_datos_kardex
+
+
+def poblar_inventario(ruta_bd, productos, movimientos_por_producto, semilla=42):
+    """Crea el esquema y carga productos con compras/ventas coherentes (sin stock negativo)."""
+    motor = create_engine(f"sqlite:///{ruta_bd}")
+    Base.metadata.create_all(bind=motor)
+    motor.dispose()
+
+    rnd = random.Random(semilla)
+    inicio = date(2024, 1, 1)
+    filas_prod = []
+    filas_mov = []
+
+    for pid in range(1, productos + 1):
+        filas_prod.append((pid, f"P{pid:06d}", f"Producto {pid}", "NEUTRO"))
+        stock = 0
+        for n in range(movimientos_por_producto):
+            fecha = (inicio + timedelta(days=n)).isoformat()
+            if stock == 0 or rnd.random() < 0.5:
+                cant = rnd.randint(1, 50)
+                costo = round(rnd.uniform(1, 100), 2)
+                filas_mov.append((pid, fecha, 'COMPRA', cant, costo, cant * costo, cant))
+                stock += cant
+            else:
+                cant = rnd.randint(1, stock)
+                filas_mov.append((pid, fecha, 'VENTA', cant, 0.0, 0.0, 0))
+                stock -= cant
+
+    con = sqlite3.connect(ruta_bd)
+    with con:
+        con.executemany("INSERT INTO productos (id, codigo, nombre, metodo) VALUES (?, ?, ?, ?)", filas_prod)
+        con.executemany(
+            "INSERT INTO movimientos_inventario "
+            "(producto_id, fecha, tipo, cantidad, costo_unitario, costo_total, saldo_cantidad) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            filas_mov
+        )
+    con.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productos", type=int, default=5000)
+    parser.add_argument("--movimientos", type=int, default=20, help="movimientos por producto")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--metodo", choices=["FIFO", "PMP"], default="FIFO")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bd = os.path.join(carpeta, "bench_kardex.sqlite")
+        t0 = time.perf_counter()
+        poblar_inventario(ruta_bd, args.productos, args.movimientos)
+        print(f"Datos: {args.productos} productos x {args.movimientos} movimientos "
+              f"({time.perf_counter() - t0:.1f}s de carga)")
+
+        motor = create_engine(f"sqlite:///{ruta_bd}")
+        base = None
+        print(f"{'workers':>8} {'segundos':>10} {'aceleración':>12}")
+        for workers in args.workers:
+            with Session(motor) as db:
+                t0 = time.perf_counter()
+                datos = _calcular_datos_kardex(db, args.metodo, workers=workers)
+                segundos = time.perf_counter() - t0
+            base = base or segundos
+            print(f"{workers:>8} {segundos:>10.2f} {base / segundos:>11.2f}x  ({len(datos)} productos)")
+        motor.dispose()
+
+
+if __name__ == "__main__":
+    main()
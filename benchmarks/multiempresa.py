@@ -0,0 +1,184 @@
+"""
+Latencia de los reportes de una empresa según cuántas empresas hay en la BD.
+
+Uso:
+    python -m benchmarks.multiempresa --empresas 1 10 50 --asientos 2000 --repeticiones 5
+
+Para cada cantidad de empresas genera una BD con los mismos datos repetidos
+por empresa (benchmarks.generador_datos --empresas) y mide, con sesiones de
+una sola empresa, los reportes de la primera y de la última. Como los índices
+empiezan por empresa_id, cada reporte recorre solo las filas de su empresa:
+la mediana no debería crecer con la cantidad de empresas.
+
+Como los tiempos tienen ruido, además se revisa el plan (EXPLAIN QUERY PLAN)
+de cada sentencia de los reportes: ninguna debe recorrer completa (SCAN) una
+tabla con empresa_id, porque ese recorrido sí crece con las empresas.
+
+También verifica el aislamiento: cada empresa ve solo sus cuentas, sus
+productos y sus saldos, y los reportes de todas dan los mismos totales.
+
+Sale con código 1 si alguna verificación falla, si algún plan recorre una
+tabla completa o si la mediana con más empresas supera `--tolerancia` veces
+la de una sola empresa.
+"""
+import argparse
+import gc
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generador_datos import generar_bd
+from src.base_datos.db import crear_motor
+from src.base_datos.migraciones import TABLAS_POR_EMPRESA, ejecutar_migraciones
+from src.base_datos.multiempresa import sesion_de_empresa
+from src.modelos.entidades import Cuenta
+from src.reportes.generadores import (
+    generar_balance_comprobacion, generar_estado_resultados, generar_pdf_libro_diario, generar_pdf_mayor_con_saldo,
+)
+from src.reportes.kardex_pdf import generar_reporte_fifo
+from src.servicios.busqueda import buscar_productos
+
+REPORTES = {
+    'libro_diario': generar_pdf_libro_diario,
+    'libro_mayor_saldos': generar_pdf_mayor_con_saldo,
+    'balance_comprobacion': generar_balance_comprobacion,
+    'estado_resultados': generar_estado_resultados,
+    'kardex_fifo': generar_reporte_fifo,
+}
+
+
+def _generar(ruta_bd, empresas, asientos, productos):
+    generar_bd(ruta_bd, cuentas=100, asientos=asientos, productos=productos, movimientos_por_producto=20,
+               empresas=empresas)
+    motor = crear_motor(ruta_bd)
+    ejecutar_migraciones(motor)
+    motor.dispose()
+
+
+def medir(Sesion, empresa_id, repeticiones):
+    """Retorna {reporte: (mediana_ms, filas)} para una empresa."""
+    medidas = {}
+    gc.collect()
+    for nombre, generador in REPORTES.items():
+        tiempos, filas = [], 0
+        for _ in range(repeticiones + 1):
+            with sesion_de_empresa(Sesion, empresa_id) as db:
+                t0 = time.perf_counter()
+                resultado = generador(db, nombre_archivo=BytesIO())
+                tiempos.append((time.perf_counter() - t0) * 1000)
+            if not resultado.exito:
+                raise RuntimeError(f"{nombre} (empresa {empresa_id}): {resultado.mensaje}")
+            filas = resultado.filas
+        # La primera vuelta calienta la caché de páginas y de sentencias
+        medidas[nombre] = (statistics.median(tiempos[1:]), filas)
+    return medidas
+
+
+def auditar_planes(motor, Sesion, empresa_id):
+    """Sentencias de los reportes cuyo plan recorre completa una tabla con empresa_id."""
+    sentencias = {}
+
+    def capturar(conexion, cursor, sql, parametros, contexto, executemany):
+        sentencias.setdefault(sql, parametros)
+
+    event.listen(motor, "before_cursor_execute", capturar)
+    try:
+        for generador in REPORTES.values():
+            with sesion_de_empresa(Sesion, empresa_id) as db:
+                generador(db, nombre_archivo=BytesIO())
+    finally:
+        event.remove(motor, "before_cursor_execute", capturar)
+
+    recorrido = re.compile(rf"SCAN ({'|'.join(TABLAS_POR_EMPRESA)})\b")
+    fallas = []
+    with motor.connect() as conexion:
+        for sql, parametros in sentencias.items():
+            if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                continue
+            plan = [fila[3] for fila in conexion.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+            if any(recorrido.match(paso) for paso in plan):
+                fallas.append(f"Recorre una tabla completa: {' '.join(sql.split())[:160]}... -> {plan}")
+    return fallas
+
+
+def verificar(Sesion, empresas):
+    """Cada empresa ve solo lo suyo y todas (datos iguales) dan los mismos totales."""
+    fallas = []
+    vistas = {}
+    for empresa_id in sorted({1, empresas}):
+        with sesion_de_empresa(Sesion, empresa_id) as db:
+            cuentas = db.query(Cuenta).count()
+            propias = db.execute(text("SELECT COUNT(*) FROM cuentas WHERE empresa_id = :e"), {'e': empresa_id}).scalar()
+            productos = [p.empresa_id for p in buscar_productos(db, "P0000")]
+            er = generar_estado_resultados(db, nombre_archivo=BytesIO())
+            vistas[empresa_id] = (cuentas, round(er.extra.get('utilidad_neta', 0.0), 2))
+            if cuentas != propias or not productos or any(e != empresa_id for e in productos):
+                fallas.append(f"La empresa {empresa_id} ve filas de otra empresa.")
+
+    if len(set(vistas.values())) > 1:
+        fallas.append(f"Las empresas no dan los mismos totales: {vistas}")
+
+    with Sesion() as db:
+        total = db.execute(text("SELECT COUNT(*) FROM cuentas")).scalar()
+    if total != vistas[1][0] * empresas:
+        fallas.append(f"Se esperaban {vistas[1][0] * empresas} cuentas en la BD y hay {total}.")
+    return fallas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--empresas", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--asientos", type=int, default=2000, help="asientos por empresa")
+    parser.add_argument("--productos", type=int, default=50, help="productos por empresa")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--tolerancia", type=float, default=1.5,
+                        help="mediana máxima con más empresas, en veces la de una sola")
+    args = parser.parse_args()
+
+    resultados = {}
+    fallas = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        for empresas in args.empresas:
+            ruta_bd = os.path.join(carpeta, f"empresas_{empresas}.sqlite")
+            t0 = time.perf_counter()
+            _generar(ruta_bd, empresas, args.asientos, args.productos)
+            print(f"BD con {empresas} empresa(s) en {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+            motor = crear_motor(ruta_bd)
+            Sesion = sessionmaker(bind=motor, autoflush=False)
+            fallas += verificar(Sesion, empresas)
+            if empresas == max(args.empresas):
+                fallas += auditar_planes(motor, Sesion, empresas)
+            resultados[empresas] = {'primera': medir(Sesion, 1, args.repeticiones),
+                                    'ultima': medir(Sesion, empresas, args.repeticiones)}
+            motor.dispose()
+
+    base = min(args.empresas)
+    print(f"\n{'reporte':<24}{'empresas':>10}{'primera ms':>12}{'última ms':>12}{'filas':>8}")
+    for nombre in REPORTES:
+        referencia = resultados[base]['primera'][nombre][0]
+        for empresas, medidas in resultados.items():
+            primera, filas = medidas['primera'][nombre]
+            ultima, _ = medidas['ultima'][nombre]
+            print(f"{nombre:<24}{empresas:>10}{primera:>12.2f}{ultima:>12.2f}{filas:>8}")
+            peor = max(primera, ultima)
+            # 2 ms de margen: en los reportes más cortos el ruido pesa más que la tendencia
+            if peor > referencia * args.tolerancia + 2:
+                fallas.append(f"{nombre} con {empresas} empresas: {peor:.1f} ms contra {referencia:.1f} ms con {base}.")
+
+    for f in fallas:
+        print(f"✗ {f}")
+    if fallas:
+        sys.exit(1)
+    print(f"\n✓ Empresas aisladas, sin recorridos completos y latencia por empresa estable (≤ {args.tolerancia}x).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Presupuesto de consultas SQL por reporte y servicio (detecta patrones N+1).
+
+Uso:
+    python -m benchmarks.presupuesto_consultas
+    python -m benchmarks.presupuesto_consultas --escala 8 --solo libro_diario libro_mayor
+
+Genera dos BD con benchmarks.generador_datos (una chica y otra `--escala`
+veces más grande), ejecuta cada caso sobre ambas con una sesión nueva y cuenta
+las sentencias que llegan al cursor (sin contar BEGIN). Un caso falla si
+supera su presupuesto o si hace más consultas en la BD grande que en la
+chica: recorrer relaciones como cuenta.detalles o detalle.cuenta dentro de un
+bucle hace crecer la cuenta con los datos. En ese caso se muestran las
+sentencias más repetidas.
+
+Sale con código 1 si algún caso falla.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from collections import Counter
+from datetime import date
+from io import BytesIO
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generador_datos import generar_bd
+from src.base_datos.db import crear_motor
+from src.reportes.generadores import (
+    generar_balance_comprobacion, generar_balance_general, generar_balance_situacion_inicial,
+    generar_estado_resultados, generar_pdf_estados_comparativos, generar_pdf_libro_diario, generar_pdf_libro_mayor,
+    generar_pdf_mayor_con_saldo,
+)
+from src.reportes.kardex_pdf import generar_reporte_fifo, generar_reporte_pmp
+from src.servicios import inventario
+from src.servicios.contabilidad import obtener_saldo_cuenta_a_fecha, registrar_asiento
+
+# Tamaño de la BD chica; la grande multiplica asientos y productos por --escala
+BASE = {'cuentas': 60, 'asientos': 150, 'productos': 8, 'movimientos_por_producto': 12}
+
+FECHA = date(2025, 1, 15)
+
+
+def _reporte(generador, **kwargs):
+    def caso(db):
+        resultado = generador(db, nombre_archivo=BytesIO(), **kwargs)
+        if not resultado.exito:
+            raise RuntimeError(resultado.mensaje)
+    return caso
+
+
+def _servicio(funcion, *args, **kwargs):
+    def caso(db):
+        respuesta = funcion(db, *args, **kwargs)
+        if isinstance(respuesta, tuple) and not respuesta[0]:
+            raise RuntimeError(respuesta[1])
+    return caso
+
+
+# nombre -> (máximo de sentencias, caso(db))
+CASOS = {
+    'libro_diario': (3, _reporte(generar_pdf_libro_diario)),
+    'libro_mayor': (3, _reporte(generar_pdf_libro_mayor)),
+    'libro_mayor_saldos': (3, _reporte(generar_pdf_mayor_con_saldo)),
+    'balance_comprobacion': (3, _reporte(generar_balance_comprobacion)),
+    'balance_situacion_inicial': (3, _reporte(generar_balance_situacion_inicial)),
+    'estado_resultados': (5, _reporte(generar_estado_resultados)),
+    'balance_general': (5, _reporte(generar_balance_general, utilidad_ejercicio=0.0)),
+    'estados_comparativos': (3, _reporte(generar_pdf_estados_comparativos)),
+    'estados_comparativos_anual': (3, _reporte(generar_pdf_estados_comparativos, modo="anual")),
+    'kardex_fifo': (4, _reporte(generar_reporte_fifo)),
+    'kardex_pmp': (4, _reporte(generar_reporte_pmp)),
+    'registrar_asiento': (4, _servicio(registrar_asiento, FECHA, "Presupuesto", [
+        {'cuenta_codigo': inventario.CTA_CAJA, 'debe': 10.0, 'haber': 0.0},
+        {'cuenta_codigo': inventario.CTA_VENTAS, 'debe': 0.0, 'haber': 10.0},
+    ])),
+    'compra_con_asiento': (8, _servicio(inventario.registrar_compra_con_asiento, "P000001", FECHA, 10, 5.0)),
+    'venta_con_asientos': (13, _servicio(inventario.registrar_venta_con_asientos, "P000001", FECHA, 3, 9.0)),
+    # La tercera es la empresa (cierre_hasta): una fecha de un año cerrado se lee del archivo
+    'saldo_cuenta_a_fecha': (3, _servicio(obtener_saldo_cuenta_a_fecha, inventario.CTA_CAJA, FECHA)),
+    'verificar_stock': (1, _servicio(inventario.verificar_stock_productos)),
+}
+
+
+class ContadorSQL:
+    """Cuenta las sentencias enviadas al cursor por un motor mientras está activo (salvo BEGIN)."""
+
+    def __init__(self, motor):
+        self.motor = motor
+        self.sentencias = Counter()
+
+    def _contar(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith("BEGIN"):
+            self.sentencias[" ".join(statement.split())] += 1
+
+    def __enter__(self):
+        self.sentencias.clear()
+        event.listen(self.motor, "before_cursor_execute", self._contar)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.motor, "before_cursor_execute", self._contar)
+
+
+def medir(ruta_bd, nombres):
+    """Ejecuta los casos sobre ruta_bd. Retorna {nombre: Counter de sentencias}."""
+    motor = crear_motor(ruta_bd)
+    Sesion = sessionmaker(bind=motor, autoflush=False)
+    medidas = {}
+    try:
+        for nombre in nombres:
+            _, caso = CASOS[nombre]
+            with Sesion() as db:
+                with ContadorSQL(motor) as contador:
+                    caso(db)
+                medidas[nombre] = Counter(contador.sentencias)
+    finally:
+        motor.dispose()
+    return medidas
+
+
+def _repetidas(sentencias: Counter, cuantas=3):
+    return [(n, sql) for sql, n in sentencias.most_common(cuantas) if n > 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", type=int, default=4, help="factor de la BD grande respecto de la chica")
+    parser.add_argument("--solo", nargs="+", choices=list(CASOS), help="medir solo estos casos")
+    parser.add_argument("--detalle", action="store_true", help="listar todas las sentencias de cada caso")
+    args = parser.parse_args()
+    nombres = args.solo or list(CASOS)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        medidas = []
+        for factor in (1, args.escala):
+            ruta_bd = os.path.join(carpeta, f"presupuesto_x{factor}.sqlite")
+            generar_bd(
+                ruta_bd, cuentas=BASE['cuentas'], asientos=BASE['asientos'] * factor,
+                productos=BASE['productos'] * factor, movimientos_por_producto=BASE['movimientos_por_producto']
+            )
+            medidas.append(medir(ruta_bd, nombres))
+
+    chica, grande = medidas
+    fallas = 0
+    print(f"{'caso':<28}{'presupuesto':>12}{'x1':>8}{f'x{args.escala}':>8}")
+    for nombre in nombres:
+        presupuesto = CASOS[nombre][0]
+        n_chica, n_grande = sum(chica[nombre].values()), sum(grande[nombre].values())
+        problemas = []
+        if n_grande > presupuesto:
+            problemas.append(f"supera el presupuesto de {presupuesto} sentencias")
+        if n_grande > n_chica:
+            problemas.append(f"crece con los datos ({n_chica} -> {n_grande})")
+
+        marca = "✗" if problemas else "✓"
+        print(f"{nombre:<28}{presupuesto:>12}{n_chica:>8}{n_grande:>8}  {marca}")
+        if args.detalle:
+            for sql, veces in grande[nombre].items():
+                print(f"    {veces}x {sql[:160]}")
+        if problemas:
+            fallas += 1
+            print(f"    {'; '.join(problemas)}")
+            for veces, sql in _repetidas(grande[nombre]):
+                print(f"    {veces}x {sql[:200]}")
+
+    if fallas:
+        print(f"\n✗ {fallas} caso(s) fuera de presupuesto.")
+        sys.exit(1)
+    print("\n✓ Todos los casos dentro del presupuesto y sin crecer con los datos.")
+
+
+if __name__ == "__main__":
+    main()
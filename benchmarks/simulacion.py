@@ -0,0 +1,146 @@
+"""
+Simulación "qué pasaría si" sobre una copia en memoria de la BD.
+
+Uso:
+    python -m benchmarks.simulacion --asientos 250000 --productos 500
+
+Con --asientos 250000 (4 líneas por asiento) el libro tiene 1.000.000 de
+líneas. Mide, con src.servicios.simulacion:
+
+1. Copia: volcar la BD viva a `:memory:` con la API de backup, y abrir la
+   simulación (copia + saldos de partida).
+2. Asientos tentativos: registrar_asiento sobre la sesión de la copia.
+3. Comparación antes/después (solo se recalculan las cuentas tocadas).
+4. Estado de Resultados y Balance General sobre la copia, y de referencia
+   los mismos estados sobre la BD en disco.
+
+Verifica que la variación de la utilidad, el activo y el pasivo sea la de
+los asientos tentativos, que el Estado de Resultados de la copia dé la
+utilidad de la comparación, que el Balance General cuadre y que la BD viva
+no cambie.
+
+Sale con código 1 si alguna verificación falla.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+from io import BytesIO
+
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generador_datos import generar_bd
+from src.base_datos.db import crear_motor
+from src.modelos.entidades import Asiento, DetalleAsiento
+from src.reportes.generadores import generar_balance_general, generar_estado_resultados
+from src.servicios import inventario
+from src.servicios.contabilidad import registrar_asiento
+from src.servicios.simulacion import Simulacion, copiar_a_memoria
+
+# Asientos tentativos y su efecto esperado en los totales
+TENTATIVOS = [
+    ("Provisión de costo pendiente de factura", [
+        {'cuenta_codigo': inventario.CTA_COSTO_VENTAS, 'debe': 1500.0, 'haber': 0.0},
+        {'cuenta_codigo': inventario.CTA_PROVEEDORES, 'debe': 0.0, 'haber': 1500.0},
+    ]),
+    ("Venta a crédito por facturar", [
+        {'cuenta_codigo': inventario.CTA_CLIENTES, 'debe': 4000.0, 'haber': 0.0},
+        {'cuenta_codigo': inventario.CTA_VENTAS, 'debe': 0.0, 'haber': 4000.0},
+    ]),
+]
+EFECTO = {'utilidad_neta': 2500.0, 'activo': 4000.0, 'pasivo': 1500.0, 'patrimonio': 0.0}
+
+
+def foto(db):
+    """Cantidad de asientos y sumas del libro: lo que la simulación no debe tocar."""
+    debe, haber = db.query(func.sum(DetalleAsiento.debe), func.sum(DetalleAsiento.haber)).one()
+    return db.query(Asiento).count(), round(debe or 0.0, 2), round(haber or 0.0, 2)
+
+
+def estados(db):
+    """ER y BG en memoria (BytesIO). Retorna (segundos, er, bg)."""
+    t0 = time.perf_counter()
+    er = generar_estado_resultados(db, nombre_archivo=BytesIO())
+    bg = generar_balance_general(db, er.extra.get('utilidad_neta', 0.0), nombre_archivo=BytesIO())
+    return time.perf_counter() - t0, er, bg
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--asientos", type=int, default=50000)
+    parser.add_argument("--productos", type=int, default=500)
+    args = parser.parse_args()
+
+    fallas, tiempos = [], {}
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bd = os.path.join(carpeta, "viva.sqlite")
+        generar_bd(ruta_bd, asientos=args.asientos, productos=args.productos)
+        mb = os.path.getsize(ruta_bd) / 2**20
+        motor = crear_motor(ruta_bd)
+        Sesion = sessionmaker(bind=motor, autoflush=False)
+
+        with Sesion() as db:
+            antes = foto(db)
+            tiempos['estados sobre el disco'], _, _ = estados(db)
+
+            # 1. Copia a memoria sola, y la simulación completa
+            t0 = time.perf_counter()
+            copiar_a_memoria(ruta_bd).dispose()
+            tiempos['copia a memoria'] = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            with Simulacion(db) as sim:
+                tiempos['abrir simulación'] = time.perf_counter() - t0
+
+                # 2. Asientos tentativos
+                t0 = time.perf_counter()
+                for descripcion, movimientos in TENTATIVOS:
+                    ok, msg = registrar_asiento(sim.db, date(2024, 12, 31), descripcion, movimientos)
+                    if not ok:
+                        fallas.append(f"Asiento tentativo: {msg}")
+                tiempos['asientos tentativos'] = time.perf_counter() - t0
+
+                # 3. Comparación
+                t0 = time.perf_counter()
+                comparacion = sim.comparacion()
+                tiempos['comparación'] = time.perf_counter() - t0
+                for clave, esperado in EFECTO.items():
+                    variacion = comparacion['despues'][clave] - comparacion['antes'][clave]
+                    if abs(variacion - esperado) > 0.01:
+                        fallas.append(f"{clave}: varió {variacion:,.2f}, se esperaba {esperado:,.2f}")
+                if abs(comparacion['despues']['diferencia']) > 0.01:
+                    fallas.append(f"La comparación deja el balance descuadrado en "
+                                  f"{comparacion['despues']['diferencia']:,.2f}")
+
+                # 4. Estados sobre la copia
+                tiempos['estados sobre la copia'], er, bg = estados(sim.db)
+                utilidad = er.extra.get('utilidad_neta', 0.0)
+                if abs(utilidad - comparacion['despues']['utilidad_neta']) > 0.01:
+                    fallas.append(f"El Estado de Resultados simulado da {utilidad:,.2f}, la comparación "
+                                  f"{comparacion['despues']['utilidad_neta']:,.2f}")
+                if abs(bg.extra.get('diferencia', 0.0)) > 0.01:
+                    fallas.append(f"El Balance General simulado no cuadra: {bg.extra['diferencia']:,.2f}")
+
+        with Sesion() as db:
+            despues = foto(db)
+        if despues != antes:
+            fallas.append(f"La BD viva cambió: {antes} -> {despues}")
+        motor.dispose()
+
+    print(f"\nBD de {mb:.1f} MB, {args.asientos:,} asientos")
+    print(f"{'paso':<28}{'segundos':>10}")
+    for nombre, segundos in tiempos.items():
+        print(f"{nombre:<28}{segundos:>10.3f}")
+
+    for f in fallas:
+        print(f"✗ {f}")
+    if fallas:
+        sys.exit(1)
+    print("\n✓ La simulación refleja los asientos tentativos y la BD viva no cambió.")
+
+
+if __name__ == "__main__":
+    main()
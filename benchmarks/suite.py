@@ -0,0 +1,299 @@
+"""
+Suite de benchmarks: mide cada servicio y cada generador de src/reportes a
+varios factores de escala y guarda los tiempos en JSON para comparar commits.
+
+Uso:
+    python -m benchmarks.suite --escalas 1 4 16 --salida resultados.json
+    python -m benchmarks.suite --solo libro --escalas 8          (filtra por nombre)
+    python -m benchmarks.suite --comparar antes.json despues.json
+
+Cada escala usa una BD nueva de benchmarks.generador_datos (mismos datos para
+la misma semilla). Primero se miden las lecturas y los reportes, que no
+modifican la BD; después las escrituras, que se miden por operación.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from io import BytesIO
+
+import pandas as pd
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generador_datos import ESCALA_BASE, generar_bd
+from src.base_datos.db import crear_motor
+from src.modelos.entidades import Producto
+from src.reportes.generadores import (
+    generar_pdf_libro_diario,
+    generar_pdf_libro_mayor,
+    generar_balance_comprobacion,
+    generar_estado_resultados,
+    generar_balance_general,
+    generar_balance_situacion_inicial
+)
+from src.reportes.kardex_pdf import generar_reporte_fifo, generar_reporte_pmp
+from src.servicios import inventario
+from src.servicios.carga_masiva import importar_movimientos_csv
+from src.servicios.cola_asientos import ColaAsientos
+from src.servicios.contabilidad import (
+    importar_plan_cuentas_desde_excel,
+    obtener_saldo_cuenta_a_fecha,
+    registrar_asiento
+)
+from src.servicios.empresa import configurar_empresa, obtener_empresa, empresa_configurada
+
+FECHA = date(2024, 12, 31)
+MOVIMIENTOS_ASIENTO = [
+    {'cuenta_codigo': inventario.CTA_CAJA, 'debe': 10.0, 'haber': 0.0},
+    {'cuenta_codigo': inventario.CTA_VENTAS, 'debe': 0.0, 'haber': 10.0},
+]
+
+
+def _reporte(generador, **kwargs):
+    """El PDF se genera en memoria: se mide el reporte, no el disco."""
+    def medir(db):
+        resultado = generador(db, nombre_archivo=BytesIO(), **kwargs)
+        if not resultado.exito:
+            raise RuntimeError(resultado.mensaje)
+        return {'paginas': resultado.paginas, 'filas': resultado.filas}
+    return medir
+
+
+def _ok(respuesta):
+    """Los servicios devuelven (ok, mensaje, ...): un fallo invalida la medición."""
+    if not respuesta[0]:
+        raise RuntimeError(respuesta[1])
+
+
+# Operaciones que no modifican la BD: se repiten y se toma el mínimo y la mediana
+LECTURAS = {
+    'reporte.libro_diario': _reporte(generar_pdf_libro_diario),
+    'reporte.libro_mayor': _reporte(generar_pdf_libro_mayor),
+    'reporte.balance_comprobacion': _reporte(generar_balance_comprobacion),
+    'reporte.balance_situacion_inicial': _reporte(generar_balance_situacion_inicial),
+    'reporte.estado_resultados': _reporte(generar_estado_resultados),
+    'reporte.balance_general': _reporte(generar_balance_general, utilidad_ejercicio=0.0),
+    'reporte.kardex_fifo': _reporte(generar_reporte_fifo),
+    'reporte.kardex_pmp': _reporte(generar_reporte_pmp),
+    'servicio.obtener_saldo_cuenta_a_fecha': lambda db: {'saldo': obtener_saldo_cuenta_a_fecha(db, "1", FECHA)['saldo']},
+    'servicio.verificar_stock_productos': lambda db: {'diferencias': len(inventario.verificar_stock_productos(db))},
+    'servicio.obtener_empresa': lambda db: obtener_empresa(db) and None,
+    'servicio.empresa_configurada': lambda db: empresa_configurada(db) and None,
+}
+
+
+def _producto_con_stock(db):
+    return db.query(Producto.codigo).order_by(Producto.stock_actual.desc()).first()[0]
+
+
+# Escrituras: operacion(db, i, contexto) repetida `n` veces; se informa el tiempo por operación
+ESCRITURAS = {
+    'servicio.registrar_asiento':
+        lambda db, i, ctx: _ok(registrar_asiento(db, FECHA, f"Bench {i}", MOVIMIENTOS_ASIENTO)),
+    'servicio.crear_producto':
+        lambda db, i, ctx: inventario.crear_producto(db, f"BENCH{i:06d}", f"Producto bench {i}"),
+    'servicio.registrar_compra':
+        lambda db, i, ctx: _ok(inventario.registrar_compra(db, ctx['producto'], FECHA, 5, 10.0)),
+    'servicio.registrar_compra_con_asiento':
+        lambda db, i, ctx: _ok(inventario.registrar_compra_con_asiento(db, ctx['producto'], FECHA, 5, 10.0)),
+    'servicio.registrar_venta':
+        lambda db, i, ctx: _ok(inventario.registrar_venta(db, ctx['producto'], FECHA, 1)),
+    'servicio.registrar_venta_con_asientos':
+        lambda db, i, ctx: _ok(inventario.registrar_venta_con_asientos(db, ctx['producto'], FECHA, 1, 20.0)),
+    'servicio.configurar_empresa':
+        lambda db, i, ctx: _ok(configurar_empresa(db, {'telefono': f"{i:07d}"})),
+}
+
+
+def _medir_lectura(Sesion, funcion, repeticiones):
+    tiempos, info = [], None
+    for _ in range(repeticiones):
+        with Sesion() as db:
+            t0 = time.perf_counter()
+            info = funcion(db)
+            tiempos.append(time.perf_counter() - t0)
+    medicion = {'min_s': round(min(tiempos), 5), 'mediana_s': round(statistics.median(tiempos), 5),
+                'repeticiones': repeticiones}
+    if isinstance(info, dict):
+        medicion.update(info)
+    return medicion
+
+
+def _medir_escritura(Sesion, operacion, n, contexto):
+    with Sesion() as db:
+        t0 = time.perf_counter()
+        for i in range(n):
+            operacion(db, i, contexto)
+        segundos = time.perf_counter() - t0
+    return {'total_s': round(segundos, 5), 'operaciones': n, 'por_operacion_ms': round(segundos / n * 1000, 4)}
+
+
+def _medir_cola(Sesion, n):
+    with ColaAsientos(fabrica_sesiones=Sesion) as cola:
+        t0 = time.perf_counter()
+        futuros = [cola.enviar_asiento(FECHA, f"Cola {i}", MOVIMIENTOS_ASIENTO) for i in range(n)]
+        for f in futuros:
+            f.result()
+        segundos = time.perf_counter() - t0
+    return {'total_s': round(segundos, 5), 'operaciones': n, 'por_operacion_ms': round(segundos / n * 1000, 4)}
+
+
+def _medir_carga_csv(Sesion, carpeta, filas):
+    """importar_movimientos_csv con un archivo de `filas` compras/ventas sobre productos existentes."""
+    with Sesion() as db:
+        codigos = [c for (c,) in db.query(Producto.codigo).order_by(Producto.id).limit(50)]
+    registros = []
+    for i in range(filas):
+        codigo = codigos[i % len(codigos)]
+        if i % 3 == 2:
+            registros.append(("2024-12-31", "VENTA", codigo, 1, "", 15.0, "NO"))
+        else:
+            registros.append(("2024-12-31", "COMPRA", codigo, 2, 8.5, "", "SI"))
+    ruta = os.path.join(carpeta, "movimientos.csv")
+    pd.DataFrame(registros, columns=["FECHA", "TIPO", "CODIGO", "CANTIDAD", "COSTO_UNITARIO",
+                                     "PRECIO_UNITARIO", "CREDITO"]).to_csv(ruta, index=False)
+    with Sesion() as db:
+        t0 = time.perf_counter()
+        _ok(importar_movimientos_csv(db, ruta))
+        segundos = time.perf_counter() - t0
+    return {'total_s': round(segundos, 5), 'filas': filas, 'filas_por_s': round(filas / segundos, 1)}
+
+
+def _medir_plan_excel(Sesion, carpeta, cuentas):
+    ruta = os.path.join(carpeta, "plan.xlsx")
+    pd.DataFrame({
+        'CÓDIGO': [f"5.8.{i:05d}" for i in range(cuentas)],
+        'NOMBRE': [f"Gasto importado {i}" for i in range(cuentas)],
+        'TIPO': "GASTO",
+        'NATURALEZA': "Deudora",
+    }).to_excel(ruta, index=False)
+    with Sesion() as db:
+        t0 = time.perf_counter()
+        _ok(importar_plan_cuentas_desde_excel(ruta, db))
+        segundos = time.perf_counter() - t0
+    return {'total_s': round(segundos, 5), 'cuentas': cuentas}
+
+
+def ejecutar_escala(factor, carpeta, repeticiones, escrituras, filtro=None):
+    parametros = {clave: valor * factor if clave != 'lineas_por_asiento' else valor
+                  for clave, valor in ESCALA_BASE.items()}
+    ruta_bd = os.path.join(carpeta, f"escala_{factor}.sqlite")
+
+    t0 = time.perf_counter()
+    conteos = generar_bd(ruta_bd, **parametros)
+    generacion = time.perf_counter() - t0
+
+    motor = crear_motor(ruta_bd)
+    Sesion = sessionmaker(bind=motor, autoflush=False)
+    resultados = {}
+
+    def incluir(nombre):
+        return not filtro or filtro in nombre
+
+    for nombre, funcion in LECTURAS.items():
+        if incluir(nombre):
+            print(f"  [x{factor}] {nombre}...", file=sys.stderr)
+            resultados[nombre] = _medir_lectura(Sesion, funcion, repeticiones)
+
+    with Sesion() as db:
+        contexto = {'producto': _producto_con_stock(db)}
+    for nombre, operacion in ESCRITURAS.items():
+        if incluir(nombre):
+            print(f"  [x{factor}] {nombre}...", file=sys.stderr)
+            resultados[nombre] = _medir_escritura(Sesion, operacion, escrituras, contexto)
+
+    extra = {
+        'servicio.cola_asientos': lambda: _medir_cola(Sesion, escrituras * 4),
+        'servicio.importar_movimientos_csv': lambda: _medir_carga_csv(Sesion, carpeta, 500 * factor),
+        'servicio.importar_plan_cuentas_desde_excel': lambda: _medir_plan_excel(Sesion, carpeta, 50 * factor),
+    }
+    for nombre, medir in extra.items():
+        if incluir(nombre):
+            print(f"  [x{factor}] {nombre}...", file=sys.stderr)
+            resultados[nombre] = medir()
+
+    motor.dispose()
+    return {'parametros': parametros, 'datos': conteos, 'generacion_s': round(generacion, 3),
+            'resultados': resultados}
+
+
+def _metadatos():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'fecha': datetime.now().isoformat(timespec="seconds"),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+    }
+
+
+def _tiempo_clave(medicion):
+    """Número comparable de una medición (lecturas: mínimo; escrituras: total)."""
+    return medicion.get('min_s', medicion.get('total_s'))
+
+
+def comparar(ruta_antes, ruta_despues):
+    with open(ruta_antes, encoding="utf-8") as f:
+        antes = json.load(f)
+    with open(ruta_despues, encoding="utf-8") as f:
+        despues = json.load(f)
+
+    print(f"Antes: {antes['meta'].get('commit')}  |  Después: {despues['meta'].get('commit')}")
+    print(f"{'escala':>6} {'operación':<45} {'antes (s)':>10} {'después (s)':>12} {'cambio':>8}")
+    for escala, datos in despues['escalas'].items():
+        previos = antes['escalas'].get(escala, {}).get('resultados', {})
+        for nombre, medicion in datos['resultados'].items():
+            if nombre not in previos:
+                continue
+            a, d = _tiempo_clave(previos[nombre]), _tiempo_clave(medicion)
+            cambio = (d - a) / a * 100 if a else 0.0
+            marca = "  ⚠" if cambio > 20 else ""
+            print(f"{escala:>6} {nombre:<45} {a:>10.4f} {d:>12.4f} {cambio:>+7.1f}%{marca}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeticiones", type=int, default=3, help="repeticiones de cada lectura")
+    parser.add_argument("--escrituras", type=int, default=50, help="operaciones por servicio de escritura")
+    parser.add_argument("--solo", help="medir solo las operaciones cuyo nombre contenga este texto")
+    parser.add_argument("--salida", default="benchmarks_resultados.json")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DESPUES"))
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    informe = {'meta': _metadatos(), 'escalas': {}}
+    with tempfile.TemporaryDirectory() as carpeta:
+        for factor in args.escalas:
+            print(f"Escala x{factor}", file=sys.stderr)
+            informe['escalas'][str(factor)] = ejecutar_escala(
+                factor, carpeta, args.repeticiones, args.escrituras, args.solo
+            )
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+
+    print(f"{'escala':>6} {'operación':<45} {'segundos':>10}")
+    for escala, datos in informe['escalas'].items():
+        for nombre, medicion in datos['resultados'].items():
+            print(f"{escala:>6} {nombre:<45} {_tiempo_clave(medicion):>10.4f}")
+    print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
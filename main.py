@@ -1,7 +1,9 @@
 import sys
 import os
+import time
 from datetime import datetime
 from rich.console import Console
+from rich.live import Live
 from rich.panel import Panel
 from rich.prompt import Prompt, IntPrompt, Confirm
 from rich.table import Table
@@ -11,26 +13,47 @@ from rich import print as rprint
 # Importaciones locales
 from src.base_datos.db import init_db, get_db, close_engine
 from src.servicios.contabilidad import importar_plan_cuentas_desde_excel, registrar_asiento
-from src.modelos.entidades import Cuenta, Producto, MovimientoInventario
+from src.modelos.entidades import Cuenta, Producto
 from src.reportes.generador import (
     generar_pdf_libro_diario, 
     generar_pdf_libro_mayor, 
+    generar_pdf_mayor_con_saldo,
     generar_balance_comprobacion,
-    generar_estado_resultados, 
-    generar_balance_general,
-    generar_balance_situacion_inicial
+    generar_estados_financieros,
+    generar_balance_situacion_inicial,
+    generar_pdf_estados_comparativos,
+    generar_xlsx_estados_comparativos
 )
 from src.servicios.inventario import (
     crear_producto,
     registrar_compra_con_asiento,
-    registrar_venta_con_asientos
+    registrar_venta_con_asientos,
+    verificar_stock_productos
 )
 
+from src.servicios.carga_masiva import importar_movimientos_csv
+from src.servicios.busqueda import buscar_cuentas, buscar_productos
+from src.servicios.trabajos import GestorTrabajos, COMPLETADO, FALLIDO, CANCELADO
+from src.base_datos import instrumentacion
+from src.vistas.interfaz import selector_paginado
 from src.reportes.kardex_pdf import generar_reporte_fifo, generar_reporte_pmp
-from src.servicios.empresa import configurar_empresa, obtener_empresa, empresa_configurada
+from src.reportes.generadores.utilidades import rango_fechas_asientos
+from src.servicios.empresa import (
+    configurar_empresa, crear_empresa, listar_empresas, obtener_empresa, empresa_configurada
+)
+from src.base_datos.multiempresa import empresa_activa, fijar_empresa_activa
+from src.servicios.cierre import CTA_RESULTADOS_ACUMULADOS, cerrar_ejercicio, sesion_archivo
+from src.servicios.copias import (
+    crear_copia, generar_copia, limpiar_empresa, listar_copias, restaurar_copia, ruta_nueva_copia
+)
+from src.servicios.simulacion import Simulacion
+from src.servicios.integridad import MUESTRA, REGLAS, verificar_integridad
 
 console = Console()
 
+# Reportes que corren en segundo plano mientras se sigue usando el menú
+trabajos = GestorTrabajos()
+
 # ============================================
 # CONSTANTES DEL MENÚ
 # ============================================
@@ -47,6 +70,12 @@ class OpcionMenu:
     ESTADOS_FINANCIEROS = "8"
     INVENTARIOS = "9"
     SALIR = "10"
+    TRABAJOS = "11"
+    DIAGNOSTICO = "12"
+    CIERRE_EJERCICIO = "13"
+    COPIAS_SEGURIDAD = "14"
+    SIMULACION = "15"
+    INTEGRIDAD = "16"
 
 # ============================================
 # FUNCIONES DE UTILIDAD
@@ -75,18 +104,68 @@ def confirmar_accion(mensaje: str, advertencia: str = None) -> bool:
 # CONFIGURACIÓN DE EMPRESA
 # ============================================
 def vista_configurar_empresa():
-    """Configurar o editar datos de la empresa"""
+    """Configurar o editar datos de la empresa, cambiar de empresa o registrar otra"""
     console.clear()
     console.print(Panel("[bold cyan]CONFIGURACIÓN DE EMPRESA[/bold cyan]"))
     
     db = next(get_db())
     empresa_actual = obtener_empresa(db)
+    empresas = listar_empresas(db)
+    
+    if empresas:
+        tabla = Table(title="Empresas registradas", show_header=True, header_style="bold magenta")
+        tabla.add_column("N°", style="cyan", width=4)
+        tabla.add_column("RUC", style="white")
+        tabla.add_column("Nombre", style="white")
+        for e in empresas:
+            activa = " [green](activa)[/green]" if e.id == empresa_activa() else ""
+            tabla.add_row(str(e.id), e.ruc, f"{e.nombre}{activa}")
+        console.print(tabla)
+        
+        console.print("\n1. Editar la empresa activa")
+        console.print("2. Cambiar de empresa")
+        console.print("3. Registrar otra empresa")
+        console.print("0. Volver")
+        op = Prompt.ask("Opción", choices=["0", "1", "2", "3"], default="1")
+        
+        if op == "0":
+            return
+        if op == "2":
+            numero = Prompt.ask("Número de empresa", choices=[str(e.id) for e in empresas])
+            fijar_empresa_activa(int(numero))
+            console.print(f"\n[bold green]✓ Trabajando con la empresa {numero}[/bold green]")
+            pausar()
+            return
+        if op == "3":
+            exito, msg, empresa = crear_empresa(db, pedir_datos_empresa(None))
+            if exito:
+                # Cada empresa tiene su propio plan de cuentas: se importa después de cambiar
+                fijar_empresa_activa(empresa.id)
+                console.print(f"\n[bold green]✓ {msg}[/bold green]")
+                console.print("[cyan]Es ahora la empresa activa. Importe su plan de cuentas (Opción 2).[/cyan]")
+            else:
+                console.print(f"\n[bold red]✗ {msg}[/bold red]")
+            pausar()
+            return
     
     if empresa_actual:
         console.print("\n[yellow]Empresa existente encontrada. Los datos actuales se sobrescribirán.[/yellow]")
         console.print(f"Nombre actual: {empresa_actual.nombre}")
     
-    # Solicitar datos
+    # Guardar
+    exito, msg, empresa = configurar_empresa(db, pedir_datos_empresa(empresa_actual))
+    
+    if exito:
+        console.print(f"\n[bold green]✓ {msg}[/bold green]")
+        console.print(f"\n[cyan]Empresa: {empresa.nombre}[/cyan]")
+        console.print(f"[cyan]RUC: {empresa.ruc}[/cyan]")
+    else:
+        console.print(f"\n[bold red]✗ {msg}[/bold red]")
+    
+    pausar()
+
+def pedir_datos_empresa(empresa_actual) -> dict:
+    """Solicita los datos de una empresa (con los actuales como valores por defecto)"""
     datos = {}
     datos['ruc'] = Prompt.ask("RUC/Identificación Fiscal", 
                                default=empresa_actual.ruc if empresa_actual else "")
@@ -104,18 +183,7 @@ def vista_configurar_empresa():
                                  default=empresa_actual.ciudad if empresa_actual else "Babahoyo")
     datos['pais'] = Prompt.ask("País",
                                default=empresa_actual.pais if empresa_actual else "Ecuador")
-    
-    # Guardar
-    exito, msg, empresa = configurar_empresa(db, datos)
-    
-    if exito:
-        console.print(f"\n[bold green]✓ {msg}[/bold green]")
-        console.print(f"\n[cyan]Empresa: {empresa.nombre}[/cyan]")
-        console.print(f"[cyan]RUC: {empresa.ruc}[/cyan]")
-    else:
-        console.print(f"\n[bold red]✗ {msg}[/bold red]")
-    
-    pausar()
+    return datos
 
 # ============================================
 # SELECTOR DE CUENTAS
@@ -126,52 +194,24 @@ def seleccionar_cuenta_interactiva(db):
     """
     while True:
         console.print("\n[bold cyan]--- BUSCADOR DE CUENTAS ---[/bold cyan]")
-        console.print("Escriba parte del nombre (ej: 'Caja') o presione [Enter] para ver todo.")
+        console.print("Escriba el código o el inicio de palabras del nombre (ej: 'depre acum') o [Enter] para ver todo.")
         criterio = Prompt.ask("[bold yellow]Buscar[/bold yellow]", default="VER")
 
         if criterio.upper() == "VER":
-            # Mostrar Árbol Completo
-            cuentas = db.query(Cuenta).order_by(Cuenta.codigo).all()
-            if not cuentas:
+            # Plan de cuentas paginado: solo se consulta y dibuja la página visible
+            if db.query(Cuenta.id).first() is None:
                 console.print("[red]No hay cuentas. Importe el Excel primero.[/red]")
                 return None
-            
-            # Crear tabla visual
-            console.print("\n[bold white]PLAN DE CUENTAS[/bold white]")
-            
-            table = Table(show_header=True, header_style="bold magenta")
-            table.add_column("#", style="dim", width=4)
-            table.add_column("Código", style="cyan", width=12)
-            table.add_column("Cuenta", style="white")
-            table.add_column("Tipo", style="green")
 
-            opciones_validas = []
-            
-            for idx, c in enumerate(cuentas):
-                # Indentación visual simple basada en los puntos del código
-                indent = "  " * (c.codigo.count('.')) 
-                nombre_fmt = f"{indent}{c.nombre}"
-                
-                table.add_row(str(idx + 1), c.codigo, nombre_fmt, c.naturaleza)
-                opciones_validas.append(c)
-
-            console.print(table)
-            
-            # Selección
-            try:
-                seleccion = IntPrompt.ask("\n[bold green]Seleccione el número (#)[/bold green] o 0 para cancelar")
-                if seleccion == 0: 
-                    return None
-                if 1 <= seleccion <= len(opciones_validas):
-                    return opciones_validas[seleccion - 1].codigo
-                else:
-                    console.print("[red]Número inválido[/red]")
-            except:
-                pass
+            return selector_paginado(
+                db, Cuenta, "PLAN DE CUENTAS",
+                [("Cuenta", lambda c: c.nombre, "white"), ("Tipo", lambda c: c.naturaleza, "green")],
+                jerarquia=True
+            )
 
         else:
-            # Buscar por texto (filtro)
-            cuentas = db.query(Cuenta).filter(Cuenta.nombre.ilike(f"%{criterio}%")).all()
+            # Buscar por texto (índice FTS5: sin tildes, por prefijo y ordenado por relevancia)
+            cuentas = buscar_cuentas(db, criterio)
             
             if not cuentas:
                 console.print(f"[red]No se encontraron cuentas con '{criterio}'[/red]")
@@ -194,15 +234,6 @@ def seleccionar_cuenta_interactiva(db):
                 if 1 <= sel <= len(cuentas):
                     return cuentas[sel - 1].codigo
                 
-def obtener_stock_producto(db, producto_id: int) -> int:
-    """Stock disponible = suma de saldo_cantidad de los lotes de COMPRA."""
-    filas = db.query(MovimientoInventario.saldo_cantidad).filter(
-        MovimientoInventario.producto_id == producto_id,
-        MovimientoInventario.tipo == "COMPRA"
-    ).all()
-    return sum(f[0] for f in filas) if filas else 0
-
-
 def seleccionar_producto_interactivo(db, solo_con_stock: bool = False):
     """
     Muestra una tabla de productos para seleccionar sin memorizar el código.
@@ -214,22 +245,30 @@ def seleccionar_producto_interactivo(db, solo_con_stock: bool = False):
         console.print("Escriba parte del nombre/código o presione [Enter] para ver todo.")
         criterio = Prompt.ask("[bold yellow]Buscar[/bold yellow]", default="VER")
 
-        query = db.query(Producto).order_by(Producto.codigo)
-
         if criterio and criterio.upper() != "VER":
-            query = query.filter(
-                (Producto.nombre.ilike(f"%{criterio}%")) |
-                (Producto.codigo.ilike(f"%{criterio}%"))
-            )
+            # Índice FTS5: sin tildes, por prefijo y ordenado por relevancia
+            productos = buscar_productos(db, criterio, solo_con_stock=solo_con_stock)
+        else:
+            # Sin criterio: listado paginado (el stock está denormalizado en el producto,
+            # el filtro va en la misma consulta de cada página)
+            filtros = [Producto.stock_actual > 0] if solo_con_stock else []
+            if db.query(Producto.id).filter(*filtros).first() is None:
+                if solo_con_stock:
+                    console.print("[yellow]No hay productos con stock disponible.[/yellow]")
+                else:
+                    console.print("[red]No hay productos registrados.[/red]")
+                return None
 
-        productos = query.all()
+            return selector_paginado(
+                db, Producto, "PRODUCTOS",
+                [("Producto", lambda p: p.nombre, "white"), ("Stock", lambda p: str(p.stock_actual), "green")],
+                filtros=filtros
+            )
 
         if not productos:
             console.print("[red]No hay productos que coincidan.[/red]")
-            # si el usuario escribió un criterio, que pueda volver a intentar
-            if criterio.upper() != "VER":
-                continue
-            return None
+            # el usuario escribió un criterio: que pueda volver a intentar
+            continue
 
         # Construir tabla
         table = Table(show_header=True, header_style="bold magenta")
@@ -238,17 +277,9 @@ def seleccionar_producto_interactivo(db, solo_con_stock: bool = False):
         table.add_column("Producto", style="white")
         table.add_column("Stock", justify="right", style="green")
 
-        opciones_validas = []
+        opciones_validas = productos
         for idx, p in enumerate(productos, start=1):
-            stock = obtener_stock_producto(db, p.id)
-            if solo_con_stock and stock <= 0:
-                continue
-            table.add_row(str(len(opciones_validas) + 1), p.codigo, p.nombre, str(stock))
-            opciones_validas.append(p)
-
-        if not opciones_validas:
-            console.print("[yellow]No hay productos con stock disponible.[/yellow]")
-            return None
+            table.add_row(str(idx), p.codigo, p.nombre, str(p.stock_actual))
 
         console.print(table)
 
@@ -265,10 +296,10 @@ def seleccionar_producto_interactivo(db, solo_con_stock: bool = False):
 # ============================================
 # REGISTRO DE ASIENTOS
 # ============================================
-def vista_registrar_asiento():
-    """Interfaz interactiva para crear un asiento"""
+def vista_registrar_asiento(db=None, titulo="NUEVO ASIENTO CONTABLE"):
+    """Interfaz interactiva para crear un asiento (en `db` si se indica, p. ej. una simulación)"""
     console.clear()
-    console.print(Panel("[bold cyan]NUEVO ASIENTO CONTABLE[/bold cyan]"))
+    console.print(Panel(f"[bold cyan]{titulo}[/bold cyan]"))
     
     fecha_str = Prompt.ask("Fecha (YYYY-MM-DD)", default=datetime.now().strftime("%Y-%m-%d"))
     descripcion = Prompt.ask("Descripción del asiento")
@@ -276,8 +307,8 @@ def vista_registrar_asiento():
     movimientos = []
     
     # Obtenemos sesión de BD una vez para usarla en el selector
-    db_gen = get_db()
-    db = next(db_gen)
+    if db is None:
+        db = next(get_db())
     
     while True:
         console.clear()
@@ -380,9 +411,11 @@ def menu_inventario():
         console.print("[2] 📥 Registrar COMPRA (Entrada)")
         console.print("[3] 📤 Registrar VENTA (Salida)")
         console.print("[4] 📄 Reportes KARDEX (PDF)")
-        console.print("[5] 🔙 Volver al Menú Principal")
+        console.print("[5] 🔍 Verificar consistencia de stock")
+        console.print("[6] 📑 Importar movimientos desde CSV (POS)")
+        console.print("[7] 🔙 Volver al Menú Principal")
         
-        op = Prompt.ask("Seleccione", choices=["1", "2", "3", "4", "5"])
+        op = Prompt.ask("Seleccione", choices=["1", "2", "3", "4", "5", "6", "7"])
         
         db = next(get_db())
         
@@ -416,7 +449,7 @@ def menu_inventario():
 
             es_credito = Confirm.ask("¿Compra a crédito (Proveedores)?", default=False)
 
-            ok, msg = registrar_compra_con_asiento(db, cod, fecha, cant, costo, es_credito=es_credito)
+            ok, msg, _ = registrar_compra_con_asiento(db, cod, fecha, cant, costo, es_credito=es_credito)
             console.print(f"[{'green' if ok else 'red'}]{msg}[/]")
             pausar()
 
@@ -436,7 +469,7 @@ def menu_inventario():
         
             es_credito = Confirm.ask("¿Venta a crédito (Clientes)?", default=False)
         
-            ok, msg = registrar_venta_con_asientos(db, cod, fecha, cant, precio_unit_venta=precio, es_credito=es_credito)
+            ok, msg, _ = registrar_venta_con_asientos(db, cod, fecha, cant, precio_unit_venta=precio, es_credito=es_credito)
             console.print(f"[{'green' if ok else 'red'}]{msg}[/]")
             pausar()
 
@@ -448,32 +481,82 @@ def menu_inventario():
             console.print("[0] Cancelar")
             
             sub_op = Prompt.ask("Opción", choices=["1", "2", "0"])
+
+            if sub_op in ("1", "2"):
+                filtros = pedir_filtros_kardex(db)
             
             if sub_op == "1":
-                if generar_reporte_fifo(db):
-                     console.print("[bold green]✔ Reporte generado: reporte_fifo.pdf[/bold green]")
-                     try: 
-                         os.startfile("reporte_fifo.pdf")
-                     except: 
-                         pass
-                else:
-                    console.print("[yellow]No se pudo generar el reporte FIFO.[/yellow]")
+                enviar_trabajo_reporte("Kardex FIFO", generar_reporte_fifo, "reporte_fifo.pdf", **filtros)
             
             elif sub_op == "2":
-                if generar_reporte_pmp(db):
-                     console.print("[bold green]✔ Reporte generado: reporte_pmp.pdf[/bold green]")
-                     try: 
-                         os.startfile("reporte_pmp.pdf")
-                     except: 
-                         pass
-                else:
-                    console.print("[yellow]No se pudo generar el reporte PMP.[/yellow]")
+                enviar_trabajo_reporte("Kardex PMP", generar_reporte_pmp, "reporte_pmp.pdf", **filtros)
             
             pausar()
 
         elif op == "5":
+            diferencias = verificar_stock_productos(db)
+            if not diferencias:
+                console.print("[bold green]✔ El stock de todos los productos coincide con sus lotes.[/bold green]")
+            else:
+                table = Table(title="Productos descuadrados")
+                table.add_column("Código", style="cyan")
+                table.add_column("Stock", justify="right")
+                table.add_column("Stock lotes", justify="right")
+                table.add_column("Valor", justify="right")
+                table.add_column("Valor lotes", justify="right")
+                for d in diferencias:
+                    table.add_row(d['codigo'], str(d['stock_actual']), str(d['stock_lotes']),
+                                  f"{d['valor_actual']:.2f}", f"{d['valor_lotes']:.2f}")
+                console.print(table)
+                if Confirm.ask("¿Corregir usando el saldo de los lotes?", default=False):
+                    verificar_stock_productos(db, corregir=True)
+                    console.print("[green]✓ Stock corregido.[/green]")
+            pausar()
+
+        elif op == "6":
+            console.print("[dim]Columnas: fecha (YYYY-MM-DD), tipo (COMPRA/VENTA), codigo, cantidad, "
+                          "costo_unitario, precio_unitario, credito (SI/NO)[/dim]")
+            ruta = Prompt.ask("Ruta del archivo CSV", default="datos/movimientos.csv")
+
+            with console.status("[bold blue]Importando movimientos...[/bold blue]"):
+                ok, msg, resumen = importar_movimientos_csv(db, ruta)
+
+            console.print(f"[{'green' if ok else 'red'}]{msg}[/]")
+            if resumen and resumen['rechazadas']:
+                table = Table(title="Filas rechazadas")
+                table.add_column("Línea", justify="right", style="cyan")
+                table.add_column("Motivo", style="red")
+                for linea, motivo in resumen['rechazadas'][:50]:
+                    table.add_row(str(linea), motivo)
+                console.print(table)
+            pausar()
+
+        elif op == "7":
             break
 
+def pedir_filtros_kardex(db) -> dict:
+    """
+    Pregunta por un producto y un rango de fechas opcionales para el kardex.
+    Retorna los argumentos para generar_reporte_fifo / generar_reporte_pmp.
+    """
+    filtros = {'codigo_producto': None, 'fecha_inicio': None, 'fecha_fin': None}
+
+    if Confirm.ask("¿Filtrar un solo producto?", default=False):
+        filtros['codigo_producto'] = seleccionar_producto_interactivo(db)
+
+    desde = Prompt.ask("Desde (YYYY-MM-DD, Enter = inicio)", default="")
+    hasta = Prompt.ask("Hasta (YYYY-MM-DD, Enter = último movimiento)", default="")
+    try:
+        if desde:
+            filtros['fecha_inicio'] = datetime.strptime(desde, "%Y-%m-%d").date()
+        if hasta:
+            filtros['fecha_fin'] = datetime.strptime(hasta, "%Y-%m-%d").date()
+    except ValueError:
+        console.print("[yellow]Fecha inválida, se usará todo el período.[/yellow]")
+        filtros['fecha_inicio'] = filtros['fecha_fin'] = None
+
+    return filtros
+
 # ============================================
 # OPCIONES DEL MENÚ PRINCIPAL
 # ============================================
@@ -483,7 +566,7 @@ def opcion_limpiar_datos():
     console.print(Panel(
         "[bold cyan]🧹 LIMPIAR TODOS LOS DATOS[/bold cyan]\n\n"
         "[yellow]Esta opción es ideal para demostraciones en clase[/yellow]\n\n"
-        "Se eliminarán:\n"
+        "Se eliminarán (solo de la empresa activa):\n"
         "  ✓ Todos los asientos contables\n"
         "  ✓ Todas las cuentas del plan\n"
         "  ✓ Todos los productos e inventarios\n"
@@ -498,54 +581,87 @@ def opcion_limpiar_datos():
         console.print("[yellow]Operación cancelada[/yellow]")
         pausar()
         return
-    
+
+    if Confirm.ask("¿Guardar antes una copia de seguridad?", default=True):
+        with console.status("[bold blue]Copiando base de datos...[/bold blue]", spinner="dots"):
+            ok, msg, _ = crear_copia()
+        console.print(f"[{'green' if ok else 'red'}]{'✔' if ok else '✗'} {msg}[/{'green' if ok else 'red'}]")
+        if not ok:
+            pausar()
+            return
+
+    db = next(get_db())
     try:
-        db = next(get_db())
-        
         with console.status("[bold blue]Limpiando base de datos...[/bold blue]", spinner="dots"):
-            # Importar los modelos necesarios
-            from src.modelos.entidades import (
-                Empresa, Cuenta, Asiento, DetalleAsiento,
-                Producto, MovimientoInventario
-            )
-            
-            # Contar registros antes de eliminar
-            total_registros = (
-                db.query(DetalleAsiento).count() +
-                db.query(Asiento).count() +
-                db.query(MovimientoInventario).count() +
-                db.query(Producto).count() +
-                db.query(Cuenta).count() +
-                db.query(Empresa).count()
-            )
-            
-            # Eliminar en orden: primero detalles, luego maestros
-            db.query(DetalleAsiento).delete()
-            db.query(Asiento).delete()
-            db.query(MovimientoInventario).delete()
-            db.query(Producto).delete()
-            db.query(Cuenta).delete()
-            db.query(Empresa).delete()
-            
-            # Guardar cambios
-            db.commit()
-        
-        console.print("\n" + "="*60)
-        console.print("[bold green]✔ DATOS LIMPIADOS EXITOSAMENTE[/bold green]")
-        console.print("="*60)
-        console.print(f"[cyan]Se eliminaron {total_registros} registros en total[/cyan]\n")
-        console.print("[yellow]💡 Pasos sugeridos para nueva demostración:[/yellow]")
-        console.print("   1️⃣  Configurar empresa (Opción 0)")
-        console.print("   2️⃣  Importar plan de cuentas (Opción 2)")
-        console.print("   3️⃣  ¡Listo para registrar asientos!")
-        
-    except Exception as e:
-        db.rollback()
-        console.print(f"\n[bold red]✗ ERROR: {str(e)}[/bold red]")
-        console.print("[yellow]No se pudieron limpiar los datos[/yellow]")
+            ok, msg = limpiar_empresa(db)
     finally:
         db.close()
-    
+
+    if not ok:
+        console.print(f"\n[bold red]✗ {msg}[/bold red]")
+        console.print("[yellow]No se pudieron limpiar los datos[/yellow]")
+        pausar()
+        return
+
+    console.print("\n" + "="*60)
+    console.print("[bold green]✔ DATOS LIMPIADOS EXITOSAMENTE[/bold green]")
+    console.print("="*60)
+    console.print(f"[cyan]{msg}[/cyan]\n")
+    console.print("[yellow]💡 Pasos sugeridos para nueva demostración:[/yellow]")
+    console.print("   1️⃣  Configurar empresa (Opción 0)")
+    console.print("   2️⃣  Importar plan de cuentas (Opción 2)")
+    console.print("   3️⃣  ¡Listo para registrar asientos!")
+
+    pausar()
+
+def opcion_copias_seguridad():
+    """Copias de seguridad de la BD: crear (en segundo plano), listar y restaurar"""
+    console.clear()
+    console.print(Panel("[bold cyan]COPIAS DE SEGURIDAD[/bold cyan]"))
+
+    copias = listar_copias()
+    if copias:
+        table = Table(title="Copias guardadas")
+        table.add_column("#", justify="right", style="cyan")
+        table.add_column("Fecha")
+        table.add_column("Tamaño", justify="right")
+        table.add_column("Archivo", style="dim")
+        for i, (ruta, fecha, mb) in enumerate(copias, start=1):
+            table.add_row(str(i), f"{fecha:%d/%m/%Y %H:%M:%S}", f"{mb:.1f} MB", ruta)
+        console.print(table)
+    else:
+        console.print("[yellow]Todavía no hay copias guardadas.[/yellow]")
+
+    console.print("\n[1] 💾 Crear una copia ahora (en segundo plano, se puede seguir registrando)")
+    console.print("[2] ♻️  Restaurar una copia")
+    console.print("[0] 🔙 Volver")
+    op = Prompt.ask("Seleccione", choices=["0", "1", "2"], default="0")
+
+    if op == "1":
+        ruta = ruta_nueva_copia()
+        trabajo = trabajos.enviar("Copia de seguridad", generar_copia, ruta, en_memoria=False)
+        console.print(f"[bold green]✔ Copia enviada como trabajo #{trabajo.id}: {ruta}[/bold green]")
+        console.print(f"[dim]Vea el avance en [{OpcionMenu.TRABAJOS}] Trabajos en segundo plano.[/dim]")
+
+    elif op == "2":
+        if not copias:
+            console.print("[red]No hay copias para restaurar.[/red]")
+        else:
+            numero = IntPrompt.ask("Número de la copia", choices=[str(i) for i in range(1, len(copias) + 1)],
+                                   show_choices=False)
+            ruta = copias[numero - 1][0]
+            if trabajos.activos():
+                console.print("[red]Espere a que terminen los trabajos en segundo plano antes de restaurar.[/red]")
+            elif confirmar_accion(
+                f"¿Restaurar {ruta}?",
+                "Todos los datos actuales (de todas las empresas) se reemplazarán por los de la copia. "
+                "Antes se guardará una copia del estado actual."
+            ):
+                with console.status("[bold blue]Restaurando...[/bold blue]"):
+                    ok, msg = restaurar_copia(ruta)
+                console.print(f"[bold {'green' if ok else 'red'}]{'✔' if ok else '✗'} {msg}[/bold {'green' if ok else 'red'}]")
+    else:
+        return
     pausar()
 
 def opcion_importar_plan():
@@ -573,40 +689,363 @@ def opcion_importar_plan():
     
     pausar()
 
-def opcion_generar_reporte_simple(db, generador_func, nombre_archivo, titulo):
-    """Generar reporte PDF simple"""
-    with console.status(f"[bold blue]Generando {titulo}...[/bold blue]"):
-        if generador_func(db):
-            console.print(f"[bold green]✔ {titulo} generado: {nombre_archivo}[/bold green]")
-            try: 
-                os.startfile(nombre_archivo)
-            except: 
-                console.print(f"[yellow]Abra manualmente: {nombre_archivo}[/yellow]")
-        else:
-            console.print(f"[bold red]✗ Error al generar {titulo}[/bold red]")
+def mostrar_resultado_reporte(resultado, nombre_archivo: str) -> bool:
+    """Muestra el ResultadoReporte de un generador. Retorna resultado.exito."""
+    for aviso in resultado.advertencias:
+        console.print(f"[yellow]⚠ {aviso}[/yellow]")
+
+    if not resultado.exito:
+        console.print(f"[bold red]✗ {resultado.mensaje}[/bold red]")
+        return False
+
+    segundos = sum(resultado.tiempos.values())
+    console.print(f"[bold green]✔ {resultado.mensaje} → {nombre_archivo}[/bold green]")
+    console.print(f"[dim]{resultado.paginas} páginas | {resultado.filas} filas | {segundos:.2f}s[/dim]")
+    return True
+
+def enviar_trabajo_reporte(titulo, generador_func, nombre_archivo, **kwargs):
+    """Envía el reporte al gestor de trabajos; el menú queda libre mientras se genera."""
+    trabajo = trabajos.enviar(titulo, generador_func, nombre_archivo, **kwargs)
+    console.print(f"[bold green]✔ {titulo} enviado como trabajo #{trabajo.id}.[/bold green]")
+    console.print(f"[dim]Puede seguir trabajando; vea el avance en [{OpcionMenu.TRABAJOS}] Trabajos en segundo plano.[/dim]")
+
+def opcion_generar_reporte_simple(generador_func, nombre_archivo, titulo):
+    """Generar reporte PDF simple (en segundo plano)"""
+    enviar_trabajo_reporte(titulo, generador_func, nombre_archivo)
     pausar()
 
+def tabla_trabajos() -> Table:
+    """Tabla con el estado actual de cada trabajo."""
+    colores = {COMPLETADO: "green", FALLIDO: "red", CANCELADO: "yellow"}
+    table = Table(title="Trabajos en segundo plano")
+    table.add_column("ID", justify="right", style="cyan")
+    table.add_column("Reporte")
+    table.add_column("Estado")
+    table.add_column("Fase", style="dim")
+    table.add_column("Filas", justify="right")
+    table.add_column("Páginas", justify="right")
+    table.add_column("Tiempo", justify="right")
+    table.add_column("Detalle", style="dim")
+
+    for t in trabajos.listar():
+        color = colores.get(t.estado, "blue")
+        table.add_row(
+            str(t.id), t.titulo, f"[{color}]{t.estado}[/{color}]", t.fase,
+            f"{t.filas:,}", str(t.paginas), f"{t.segundos:.1f}s",
+            t.mensaje if t.terminado else t.nombre_archivo
+        )
+    return table
+
+def vista_trabajos():
+    """Seguimiento, cancelación y apertura de los reportes en segundo plano"""
+    while True:
+        console.clear()
+        console.print(Panel("[bold cyan]TRABAJOS EN SEGUNDO PLANO[/bold cyan]"))
+
+        if not trabajos.listar():
+            console.print("[yellow]No hay trabajos. Los reportes del menú se generan aquí.[/yellow]")
+            pausar()
+            return
+
+        console.print(tabla_trabajos())
+        console.print("[1] 👀 Seguir el avance en vivo (Ctrl+C para dejar de mirar)")
+        console.print("[2] ⛔ Cancelar un trabajo")
+        console.print("[3] 📂 Abrir el PDF de un trabajo completado")
+        console.print("[4] 🧹 Quitar los trabajos terminados de la lista")
+        console.print("[0] 🔙 Volver")
+        op = Prompt.ask("Seleccione", choices=["1", "2", "3", "4", "0"])
+
+        if op == "1":
+            try:
+                with Live(tabla_trabajos(), console=console, refresh_per_second=4) as live:
+                    while trabajos.activos():
+                        time.sleep(0.25)
+                        live.update(tabla_trabajos())
+            except KeyboardInterrupt:
+                pass
+
+        elif op == "2":
+            trabajo_id = IntPrompt.ask("ID del trabajo a cancelar")
+            if trabajos.cancelar(trabajo_id):
+                console.print("[yellow]Cancelación solicitada; se detendrá en unos instantes.[/yellow]")
+            else:
+                console.print("[red]Ese trabajo no existe o ya terminó.[/red]")
+            pausar()
+
+        elif op == "3":
+            trabajo_id = IntPrompt.ask("ID del trabajo")
+            trabajo = next((t for t in trabajos.listar() if t.id == trabajo_id), None)
+            if trabajo and trabajo.estado == COMPLETADO:
+                try:
+                    os.startfile(trabajo.nombre_archivo)
+                except:
+                    console.print(f"[yellow]Abra manualmente: {trabajo.nombre_archivo}[/yellow]")
+            else:
+                console.print("[red]Ese trabajo no existe o no terminó correctamente.[/red]")
+            pausar()
+
+        elif op == "4":
+            trabajos.limpiar_terminados()
+
+        else:
+            return
+
+def tabla_diagnostico() -> Table:
+    """Últimas operaciones medidas: tiempo total, consultas SQL y desglose por fase."""
+    table = Table(title="Últimas operaciones medidas")
+    table.add_column("Hora", style="dim")
+    table.add_column("Operación", style="cyan")
+    table.add_column("Total", justify="right")
+    table.add_column("Consultas", justify="right")
+    table.add_column("SQL", justify="right")
+    table.add_column("Objetos", justify="right")
+    table.add_column("Fases", style="dim")
+
+    for m in instrumentacion.mediciones_recientes()[-20:]:
+        fases = ", ".join(
+            f"{nombre} {f['segundos']:.2f}s/{f['consultas']}q" for nombre, f in m['fases'].items()
+        )
+        operacion = m['operacion'] if 'error' not in m else f"[red]{m['operacion']} ✗[/red]"
+        table.add_row(
+            m['fecha'][11:19], operacion, f"{m['duracion_s']:.3f}s", str(m['consultas']),
+            f"{m['tiempo_sql_s']:.3f}s", f"{m['objetos_cargados']:,}", fases
+        )
+    return table
+
+def vista_diagnostico():
+    """Activar/desactivar la instrumentación y ver las últimas mediciones"""
+    while True:
+        console.clear()
+        console.print(Panel("[bold cyan]DIAGNÓSTICO DE RENDIMIENTO[/bold cyan]"))
+
+        if instrumentacion.activo():
+            console.print(f"[green]● Instrumentación activa[/green] → {instrumentacion.archivo_salida()}")
+        else:
+            console.print("[yellow]○ Instrumentación desactivada[/yellow] "
+                          "[dim](también se activa con CONTABILIDAD_DIAGNOSTICO=1)[/dim]")
+
+        if instrumentacion.mediciones_recientes():
+            console.print(tabla_diagnostico())
+        else:
+            console.print("[dim]Sin mediciones todavía: active la instrumentación y genere un reporte o registre operaciones.[/dim]")
+
+        console.print("\n[1] 🔁 Activar / desactivar")
+        console.print("[2] 🔄 Actualizar")
+        console.print("[0] 🔙 Volver")
+        op = Prompt.ask("Seleccione", choices=["1", "2", "0"])
+
+        if op == "1":
+            if instrumentacion.activo():
+                instrumentacion.desactivar()
+            else:
+                instrumentacion.activar()
+        elif op == "0":
+            return
+
 def opcion_estados_financieros():
     """Generar Estados Financieros"""
     console.clear()
     console.print(Panel("[bold cyan]ESTADOS FINANCIEROS[/bold cyan]"))
     
     db = next(get_db())
-    
-    with console.status("[bold blue]Generando Estados Financieros...[/bold blue]"):
-        utilidad = generar_estado_resultados(db)
-        console.print(f"[green]✔ Estado de Resultados generado (Utilidad: ${utilidad:,.2f})[/green]")
-        
-        if generar_balance_general(db, utilidad):
-            console.print("[green]✔ Balance General generado correctamente[/green]")
-            try:
-                os.startfile("estado_resultados.pdf")
-                os.startfile("balance_general.pdf")
-            except: 
-                console.print("[yellow]Abra los archivos manualmente[/yellow]")
-        else:
-            console.print("[red]✗ Error generando Balance General[/red]")
-    
+
+    console.print("[1] Del período completo (una columna)")
+    console.print("[2] Comparativo mensual (12 meses + acumulado del año)")
+    console.print("[3] Comparativo anual (año anterior vs. año actual)")
+    tipo = Prompt.ask("Seleccione", choices=["1", "2", "3"], default="1")
+    if tipo != "1":
+        opcion_estados_comparativos(db, "mensual" if tipo == "2" else "anual")
+        return
+
+    # El Balance General necesita la utilidad del ER: los dos van en el mismo trabajo
+    enviar_trabajo_reporte("Estados Financieros", generar_estados_financieros, "estado_resultados.pdf",
+                           en_memoria=False, nombre_balance="balance_general.pdf")
+    pausar()
+
+def opcion_estados_comparativos(db, modo):
+    """Estados comparativos en PDF y/o Excel (en segundo plano)"""
+    _, ultima = rango_fechas_asientos(db)
+    if ultima is None:
+        console.print("[red]No hay asientos para comparar.[/red]")
+        pausar()
+        return
+
+    anio = IntPrompt.ask("Año a presentar", default=ultima.year)
+    formato = Prompt.ask("Formato [1] PDF [2] Excel [3] Ambos", choices=["1", "2", "3"], default="3")
+    nombre = f"estados_comparativos_{modo}_{anio}"
+    if formato in ("1", "3"):
+        enviar_trabajo_reporte(f"Comparativo {modo} {anio} (PDF)", generar_pdf_estados_comparativos,
+                               f"{nombre}.pdf", anio=anio, modo=modo)
+    if formato in ("2", "3"):
+        enviar_trabajo_reporte(f"Comparativo {modo} {anio} (Excel)", generar_xlsx_estados_comparativos,
+                               f"{nombre}.xlsx", anio=anio, modo=modo)
+    pausar()
+
+def opcion_cierre_ejercicio():
+    """Cerrar un ejercicio o consultar uno ya archivado"""
+    console.clear()
+    console.print(Panel("[bold cyan]CIERRE DE EJERCICIO[/bold cyan]"))
+
+    db = next(get_db())
+    empresa = obtener_empresa(db)
+    if empresa and empresa.cierre_hasta:
+        console.print(f"[dim]Último ejercicio cerrado: {empresa.cierre_hasta.year}[/dim]\n")
+
+    console.print("[1] Cerrar un ejercicio y archivar su detalle")
+    console.print("[2] Balance de Comprobación de un ejercicio archivado")
+    console.print("[0] Volver")
+    op = Prompt.ask("Seleccione", choices=["0", "1", "2"], default="0")
+    if op == "0":
+        return
+
+    if op == "2":
+        anio = IntPrompt.ask("Año archivado", default=empresa.cierre_hasta.year if empresa and empresa.cierre_hasta
+                             else datetime.now().year - 1)
+        nombre = f"balance_comprobacion_{anio}.pdf"
+        try:
+            # En este proceso: los trabajos en segundo plano abren la BD viva, no el archivo
+            with sesion_archivo(db, anio) as historico, console.status("[bold blue]Generando...[/bold blue]"):
+                resultado = generar_balance_comprobacion(historico, nombre_archivo=nombre)
+            mostrar_resultado_reporte(resultado, nombre)
+        except ValueError as e:
+            console.print(f"[bold red]✗ {e}[/bold red]")
+        pausar()
+        return
+
+    primera, _ = rango_fechas_asientos(db)
+    anio = IntPrompt.ask("Año a cerrar", default=primera.year if primera else datetime.now().year - 1)
+    cuenta = Prompt.ask("Cuenta de resultados acumulados", default=CTA_RESULTADOS_ACUMULADOS)
+    if not confirmar_accion(
+        f"¿Cerrar el ejercicio {anio}?",
+        "Se registrarán los asientos de cierre y apertura, el detalle del año pasará a un archivo "
+        "aparte y no se podrán registrar más asientos con fecha de ese año."
+    ):
+        return
+
+    with console.status(f"[bold blue]Cerrando el ejercicio {anio}...[/bold blue]"):
+        ok, msg, resumen = cerrar_ejercicio(db, anio, cuenta)
+
+    if ok:
+        console.print(f"[bold green]✔ {msg}[/bold green]")
+        if resumen['resultado'] is not None:
+            console.print(f"[cyan]Resultado del ejercicio: ${resumen['resultado']:,.2f}[/cyan]")
+        console.print(f"[cyan]Archivo: {resumen['archivo']}[/cyan]")
+    else:
+        console.print(f"[bold red]✗ {msg}[/bold red]")
+    pausar()
+
+def tabla_simulacion(comparacion) -> Table:
+    """Totales de los estados antes y después de los asientos simulados."""
+    table = Table(title="Efecto de los asientos simulados")
+    table.add_column("Rubro")
+    table.add_column("Antes", justify="right")
+    table.add_column("Después", justify="right")
+    table.add_column("Variación", justify="right")
+    rubros = [
+        ("Activo", 'activo'), ("Pasivo", 'pasivo'), ("Patrimonio", 'patrimonio'),
+        ("Ingresos", 'ingresos'), ("Costos", 'costos'), ("Gastos", 'gastos'),
+        ("[bold]Utilidad neta[/bold]", 'utilidad_neta'), ("Diferencia del balance", 'diferencia'),
+    ]
+    antes, despues = comparacion['antes'], comparacion['despues']
+    for nombre, clave in rubros:
+        variacion = round(despues[clave] - antes[clave], 2)
+        color = "green" if variacion > 0 else "red" if variacion < 0 else "dim"
+        table.add_row(nombre, f"{antes[clave]:,.2f}", f"{despues[clave]:,.2f}", f"[{color}]{variacion:+,.2f}[/{color}]")
+    return table
+
+def opcion_simulacion():
+    """Simular asientos sobre una copia en memoria y ver su efecto en los estados"""
+    console.clear()
+    console.print(Panel(
+        "[bold cyan]SIMULACIÓN (¿QUÉ PASARÍA SI...?)[/bold cyan]\n"
+        "[dim]Los asientos se registran en una copia en memoria de la base de datos, "
+        "que se descarta al salir.[/dim]"
+    ))
+
+    db = next(get_db())
+    inicio = time.perf_counter()
+    try:
+        with console.status("[bold blue]Copiando la base de datos a memoria...[/bold blue]"):
+            sim = Simulacion(db)
+    finally:
+        db.close()
+    console.print(f"[dim]Copia lista en {time.perf_counter() - inicio:.2f}s[/dim]")
+
+    with sim:
+        while True:
+            simulados = len(sim.asientos_simulados())
+            console.print(f"\n[bold]Asientos simulados: {simulados}[/bold]")
+            console.print("[1] 📝 Registrar asiento tentativo")
+            console.print("[2] 📊 Ver efecto en los estados")
+            console.print("[3] 💰 Generar Estados Financieros simulados (PDF)")
+            console.print("[0] 🔙 Salir y descartar la simulación")
+            op = Prompt.ask("Seleccione", choices=["0", "1", "2", "3"], default="1" if not simulados else "2")
+
+            if op == "0":
+                break
+
+            if op == "1":
+                vista_registrar_asiento(sim.db, "ASIENTO TENTATIVO (SIMULACIÓN)")
+                continue
+
+            if op == "2":
+                comparacion = sim.comparacion()
+                console.print(tabla_simulacion(comparacion))
+                if comparacion['cuentas']:
+                    table = Table(title="Cuentas afectadas")
+                    table.add_column("Código", style="cyan")
+                    table.add_column("Cuenta")
+                    table.add_column("Saldo antes", justify="right")
+                    table.add_column("Saldo después", justify="right")
+                    for codigo, nombre, antes, despues in comparacion['cuentas']:
+                        table.add_row(codigo, nombre, f"{antes:,.2f}", f"{despues:,.2f}")
+                    console.print(table)
+
+            elif op == "3":
+                # En este proceso: los trabajos en segundo plano abren la BD viva, no la copia
+                with console.status("[bold blue]Generando estados simulados...[/bold blue]"):
+                    resultado_er, resultado_bg = sim.generar_estados()
+                mostrar_resultado_reporte(resultado_er, "simulacion_estado_resultados.pdf")
+                mostrar_resultado_reporte(resultado_bg, "simulacion_balance_general.pdf")
+            pausar()
+
+    console.print("[yellow]Simulación descartada: la base de datos no cambió.[/yellow]")
+    pausar()
+
+def opcion_verificar_integridad():
+    """Verificar el libro diario: asientos cuadrados, referencias y cambios hechos fuera del sistema"""
+    console.clear()
+    console.print(Panel("[bold cyan]VERIFICAR INTEGRIDAD DEL LIBRO[/bold cyan]"))
+
+    console.print("[1] Rápida: solo lo nuevo o cambiado desde la última verificación")
+    console.print("[2] Completa: todo el libro (recalcula la huella de las líneas ya verificadas)")
+    console.print("[0] Volver")
+    op = Prompt.ask("Seleccione", choices=["0", "1", "2"], default="1")
+    if op == "0":
+        return
+
+    db = next(get_db())
+    try:
+        with console.status("[bold blue]Verificando...[/bold blue]"):
+            ok, msg, informe = verificar_integridad(db, completa=(op == "2"))
+    finally:
+        db.close()
+
+    console.print(f"[bold {'green' if ok else 'red'}]{'✔' if ok else '✗'} {msg}[/bold {'green' if ok else 'red'}]")
+    if informe:
+        console.print(f"[dim]{informe['lineas_nuevas']} línea(s) nuevas | {informe['segundos']:.2f}s[/dim]")
+        if informe['errores']:
+            table = Table(title="Problemas encontrados")
+            table.add_column("Regla")
+            table.add_column("Cantidad", justify="right", style="red")
+            table.add_column("Ids (asiento o línea)", style="dim")
+            for regla, ids in informe['errores'].items():
+                table.add_row(REGLAS[regla], str(len(ids)),
+                              ", ".join(map(str, ids[:MUESTRA])) + (" ..." if len(ids) > MUESTRA else ""))
+            console.print(table)
+        if informe['huella_coincide'] is False:
+            console.print("[yellow]⚠ Líneas ya verificadas cambiaron sin quedar anotadas (¿se restauró un "
+                          "archivo viejo o se editó la BD sin los triggers?).[/yellow]")
     pausar()
 
 # ============================================
@@ -651,10 +1090,13 @@ def mostrar_menu():
     tabla.add_row("[0]", "⚙️  Configurar Datos de Empresa")
     tabla.add_row("[1]", "🧹 Limpiar Datos (Reset para Demo)")
     tabla.add_row("[2]", "📥 Importar Plan de Cuentas (Excel)")
+    tabla.add_row("[14]", "💾 Copias de Seguridad")
+    tabla.add_row("[16]", "🛡️  Verificar Integridad del Libro")
     
     # Operaciones
     tabla.add_row("", "\n[bold green]═══ OPERACIONES ═══[/bold green]")
     tabla.add_row("[3]", "📝 Registrar Asiento Contable")
+    tabla.add_row("[15]", "🧪 Simulación (¿qué pasaría si...?)")
     
     # Reportes
     tabla.add_row("", "\n[bold yellow]═══ REPORTES ═══[/bold yellow]")
@@ -667,6 +1109,10 @@ def mostrar_menu():
     # Módulos
     tabla.add_row("", "\n[bold blue]═══ MÓDULOS ═══[/bold blue]")
     tabla.add_row("[9]", "📦 Inventarios (FIFO/PMP)")
+    activos = trabajos.activos()
+    tabla.add_row("[11]", f"⏳ Trabajos en segundo plano{f' ({activos} en curso)' if activos else ''}")
+    tabla.add_row("[12]", f"🩺 Diagnóstico de rendimiento{' (activo)' if instrumentacion.activo() else ''}")
+    tabla.add_row("[13]", "🔒 Cierre de ejercicio")
     
     # Salir
     tabla.add_row("", "")
@@ -691,7 +1137,7 @@ def main():
                 
                 opcion = Prompt.ask(
                     "\n[bold yellow]Seleccione una opción[/bold yellow]",
-                    choices=[str(i) for i in range(0, 11)],
+                    choices=[str(i) for i in range(0, 17)],
                     show_choices=False
                 )
                 
@@ -709,30 +1155,33 @@ def main():
                     vista_registrar_asiento()
                 
                 elif opcion == OpcionMenu.BALANCE_SITUACION:
-                    db = next(get_db())
                     opcion_generar_reporte_simple(
-                        db, generar_balance_situacion_inicial, 
+                        generar_balance_situacion_inicial, 
                         "balance_situacion_inicial.pdf", "Balance de Situación Inicial"
                     )
                     
                 elif opcion == OpcionMenu.LIBRO_DIARIO:
-                    db = next(get_db())
                     opcion_generar_reporte_simple(
-                        db, generar_pdf_libro_diario, 
+                        generar_pdf_libro_diario, 
                         "libro_diario.pdf", "Libro Diario"
                     )
                 
                 elif opcion == OpcionMenu.LIBRO_MAYOR:
-                    db = next(get_db())
-                    opcion_generar_reporte_simple(
-                        db, generar_pdf_libro_mayor, 
-                        "libro_mayor.pdf", "Libro Mayor"
-                    )
+                    console.print("[1] Cuentas T   [2] Columnas con saldo después de cada movimiento")
+                    if Prompt.ask("Formato", choices=["1", "2"], default="1") == "1":
+                        opcion_generar_reporte_simple(
+                            generar_pdf_libro_mayor, 
+                            "libro_mayor.pdf", "Libro Mayor"
+                        )
+                    else:
+                        opcion_generar_reporte_simple(
+                            generar_pdf_mayor_con_saldo,
+                            "libro_mayor_saldos.pdf", "Libro Mayor con saldos"
+                        )
                 
                 elif opcion == OpcionMenu.BALANCE_COMPROBACION:
-                    db = next(get_db())
                     opcion_generar_reporte_simple(
-                        db, generar_balance_comprobacion, 
+                        generar_balance_comprobacion, 
                         "balance_comprobacion.pdf", "Balance de Comprobación"
                     )
                 
@@ -742,6 +1191,24 @@ def main():
                 elif opcion == OpcionMenu.INVENTARIOS:
                     menu_inventario()
                 
+                elif opcion == OpcionMenu.TRABAJOS:
+                    vista_trabajos()
+
+                elif opcion == OpcionMenu.DIAGNOSTICO:
+                    vista_diagnostico()
+
+                elif opcion == OpcionMenu.CIERRE_EJERCICIO:
+                    opcion_cierre_ejercicio()
+
+                elif opcion == OpcionMenu.COPIAS_SEGURIDAD:
+                    opcion_copias_seguridad()
+
+                elif opcion == OpcionMenu.SIMULACION:
+                    opcion_simulacion()
+
+                elif opcion == OpcionMenu.INTEGRIDAD:
+                    opcion_verificar_integridad()
+                
                 elif opcion == OpcionMenu.SALIR:
                     console.clear()
                     console.print(Panel.fit(
@@ -770,8 +1237,9 @@ def main():
         console.print(f"\n[bold red]ERROR CRÍTICO: {str(e)}[/bold red]")
         sys.exit(1)
     finally:
-        # Limpiar recursos
+        # Limpiar recursos (los reportes en curso se cancelan)
         try:
+            trabajos.cerrar()
             close_engine()
         except:
             pass
@@ -0,0 +1,354 @@
+"""
+API HTTP/JSON local para que otros sistemas registren operaciones y
+consulten saldos sin pasar por el menú interactivo.
+
+Uso:
+    python -m src.api.servidor --puerto 8765 --hilos 8 [--cola]
+
+Endpoints:
+    POST /asientos              {"fecha", "descripcion", "movimientos": [{"cuenta_codigo", "debe", "haber"}]}
+    POST /inventario/compras    {"codigo", "fecha", "cantidad", "costo_unitario", "credito"}
+    POST /inventario/ventas     {"codigo", "fecha", "cantidad", "precio_unitario", "credito"}
+    GET  /cuentas/<codigo>/saldo?fecha=YYYY-MM-DD
+    GET  /reportes/<nombre>?codigo=&desde=&hasta=   (devuelve el PDF en el cuerpo;
+                                                     estados_comparativos usa el año de 'hasta')
+
+Con varias empresas en la BD, la cabecera `X-Empresa: <id>` indica sobre cuál
+trabaja la petición (sin cabecera, la empresa 1).
+
+Las peticiones las atiende un grupo fijo de hilos; cada hilo reutiliza su
+propia sesión (scoped_session) y el motor tiene un pool de conexiones del
+mismo tamaño. Con --cola los asientos sueltos se confirman en grupo a través
+de ColaAsientos.
+"""
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from src.base_datos.db import DB_NAME, crear_motor, init_db
+from src.base_datos.multiempresa import EMPRESA_POR_DEFECTO, empresa_de_sesion
+from src.servicios.cola_asientos import ColaAsientos
+from src.servicios.contabilidad import obtener_saldo_cuenta_a_fecha, registrar_asiento
+from src.servicios.inventario import registrar_compra_con_asiento, registrar_venta_con_asientos
+from src.reportes.generadores import (
+    generar_pdf_libro_diario,
+    generar_pdf_libro_mayor,
+    generar_pdf_mayor_con_saldo,
+    generar_balance_comprobacion,
+    generar_estado_resultados,
+    generar_balance_general,
+    generar_balance_situacion_inicial,
+    generar_pdf_estados_comparativos
+)
+from src.reportes.kardex_pdf import generar_reporte_fifo, generar_reporte_pmp
+
+# Tiempo máximo que una petición espera su lote en la cola de asientos
+ESPERA_COLA_S = 30
+
+
+class ErrorPeticion(Exception):
+    """Datos de entrada inválidos: se responde 400 con el mensaje."""
+
+
+def _fecha(valor, campo="fecha", obligatoria=True):
+    if not valor:
+        if obligatoria:
+            raise ErrorPeticion(f"Falta el campo '{campo}'.")
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise ErrorPeticion(f"'{campo}' debe tener formato YYYY-MM-DD.")
+
+
+def _campo(datos: dict, nombre: str, tipo):
+    if nombre not in datos:
+        raise ErrorPeticion(f"Falta el campo '{nombre}'.")
+    try:
+        return tipo(datos[nombre])
+    except (TypeError, ValueError):
+        raise ErrorPeticion(f"El campo '{nombre}' no es válido.")
+
+
+def _booleano(datos: dict, nombre: str, defecto=False):
+    # bool("false") es True: solo se aceptan true/false de JSON
+    valor = datos.get(nombre, defecto)
+    if not isinstance(valor, bool):
+        raise ErrorPeticion(f"El campo '{nombre}' debe ser true o false.")
+    return valor
+
+
+# ==========================================
+# REPORTES: generan el PDF en memoria
+# ==========================================
+
+def _reporte_balance_general(db, destino, **_):
+    utilidad = generar_estado_resultados(db, nombre_archivo=BytesIO()).extra.get('utilidad_neta', 0.0)
+    return generar_balance_general(db, utilidad, nombre_archivo=destino)
+
+
+def _reporte_kardex(generador):
+    def generar(db, destino, codigo=None, desde=None, hasta=None):
+        return generador(db, codigo_producto=codigo, fecha_inicio=desde, fecha_fin=hasta, nombre_archivo=destino)
+    return generar
+
+
+REPORTES = {
+    "libro_diario": lambda db, destino, **_: generar_pdf_libro_diario(db, nombre_archivo=destino),
+    "libro_mayor": lambda db, destino, **_: generar_pdf_libro_mayor(db, nombre_archivo=destino),
+    "libro_mayor_saldos": lambda db, destino, **_: generar_pdf_mayor_con_saldo(db, nombre_archivo=destino),
+    "balance_comprobacion": lambda db, destino, **_: generar_balance_comprobacion(db, nombre_archivo=destino),
+    "balance_situacion_inicial": lambda db, destino, **_: generar_balance_situacion_inicial(db, nombre_archivo=destino),
+    "estado_resultados": lambda db, destino, **_: generar_estado_resultados(db, nombre_archivo=destino),
+    "balance_general": _reporte_balance_general,
+    "estados_comparativos": lambda db, destino, hasta=None, **_: generar_pdf_estados_comparativos(
+        db, anio=hasta.year if hasta else None, nombre_archivo=destino),
+    "kardex_fifo": _reporte_kardex(generar_reporte_fifo),
+    "kardex_pmp": _reporte_kardex(generar_reporte_pmp),
+}
+
+
+# ==========================================
+# MANEJADOR DE PETICIONES
+# ==========================================
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    server_version = "SistemaContableAPI/1.0"
+
+    RUTA_SALDO = re.compile(r"^/cuentas/([^/]+)/saldo$")
+    RUTA_REPORTE = re.compile(r"^/reportes/([a-z_]+)$")
+
+    def log_message(self, formato, *args):
+        if self.server.verboso:
+            super().log_message(formato, *args)
+
+    # --- Respuestas --------------------------------------------------------
+
+    def _responder(self, estado: int, cuerpo: bytes, tipo: str):
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _json(self, estado: int, datos: dict):
+        cuerpo = json.dumps(datos, ensure_ascii=False, default=str).encode("utf-8")
+        self._responder(estado, cuerpo, "application/json; charset=utf-8")
+
+    def _leer_json(self) -> dict:
+        largo = int(self.headers.get("Content-Length") or 0)
+        try:
+            datos = json.loads(self.rfile.read(largo) or b"{}")
+        except json.JSONDecodeError:
+            raise ErrorPeticion("El cuerpo no es JSON válido.")
+        if not isinstance(datos, dict):
+            raise ErrorPeticion("El cuerpo debe ser un objeto JSON.")
+        return datos
+
+    def _atender(self, accion):
+        """Ejecuta la acción con la sesión del hilo y traduce errores a códigos HTTP."""
+        db = self.server.sesiones()
+        try:
+            # La sesión del hilo se reutiliza: la empresa se fija en cada petición
+            empresa = self.headers.get("X-Empresa") or EMPRESA_POR_DEFECTO
+            if not str(empresa).isdigit():
+                raise ErrorPeticion("La cabecera X-Empresa debe ser el número de la empresa.")
+            db.info['empresa_id'] = int(empresa)
+            accion(db)
+        except ErrorPeticion as e:
+            self._json(400, {"ok": False, "mensaje": str(e)})
+        except Exception as e:
+            self._json(500, {"ok": False, "mensaje": f"Error interno: {str(e)}"})
+        finally:
+            # Devuelve la conexión al pool; la sesión queda lista para la próxima petición
+            db.close()
+
+    # --- Rutas -------------------------------------------------------------
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        coincide = self.RUTA_SALDO.match(url.path)
+        if coincide:
+            return self._atender(lambda db: self._saldo(db, coincide.group(1), params))
+
+        coincide = self.RUTA_REPORTE.match(url.path)
+        if coincide:
+            return self._atender(lambda db: self._reporte(db, coincide.group(1), params))
+
+        self._json(404, {"ok": False, "mensaje": "Ruta no encontrada."})
+
+    def do_POST(self):
+        rutas = {
+            "/asientos": self._asiento,
+            "/inventario/compras": self._compra,
+            "/inventario/ventas": self._venta,
+        }
+        accion = rutas.get(urlparse(self.path).path)
+        if not accion:
+            return self._json(404, {"ok": False, "mensaje": "Ruta no encontrada."})
+        self._atender(lambda db: accion(db, self._leer_json()))
+
+    # --- Acciones ----------------------------------------------------------
+
+    def _asiento(self, db, datos):
+        fecha = _fecha(datos.get("fecha"))
+        descripcion = str(datos.get("descripcion", "")).strip()
+        movimientos = datos.get("movimientos")
+        if not descripcion or not isinstance(movimientos, list) or not movimientos:
+            raise ErrorPeticion("Se requieren 'descripcion' y una lista de 'movimientos'.")
+        if not all(isinstance(m, dict) for m in movimientos):
+            raise ErrorPeticion("Cada movimiento debe ser un objeto con 'cuenta_codigo', 'debe' y 'haber'.")
+        movimientos = [
+            {
+                'cuenta_codigo': _campo(m, "cuenta_codigo", str),
+                'debe': _campo(m, "debe", float),
+                'haber': _campo(m, "haber", float),
+            }
+            for m in movimientos
+        ]
+
+        if self.server.cola:
+            try:
+                asiento_id = self.server.cola.enviar_asiento(
+                    fecha, descripcion, movimientos, empresa_id=empresa_de_sesion(db)
+                ).result(ESPERA_COLA_S)
+            except ValueError as e:
+                return self._json(400, {"ok": False, "mensaje": str(e)})
+            except TimeoutError:
+                # El asiento sigue en la cola: no se puede afirmar que falló
+                return self._json(202, {
+                    "ok": False,
+                    "mensaje": f"La cola no confirmó el asiento en {ESPERA_COLA_S} s; "
+                               "el asiento puede registrarse todavía, verifique antes de reenviarlo.",
+                })
+            return self._json(201, {"ok": True, "mensaje": "Asiento registrado correctamente.", "asiento_id": asiento_id})
+
+        ok, msg = registrar_asiento(db, fecha, descripcion, movimientos)
+        self._json(201 if ok else 400, {"ok": ok, "mensaje": msg})
+
+    def _compra(self, db, datos):
+        ok, msg, resultado = registrar_compra_con_asiento(
+            db,
+            _campo(datos, "codigo", str),
+            _fecha(datos.get("fecha")),
+            _campo(datos, "cantidad", int),
+            _campo(datos, "costo_unitario", float),
+            es_credito=_booleano(datos, "credito"),
+        )
+        self._json(201 if ok else 400, {"ok": ok, "mensaje": msg, "resultado": resultado})
+
+    def _venta(self, db, datos):
+        ok, msg, resultado = registrar_venta_con_asientos(
+            db,
+            _campo(datos, "codigo", str),
+            _fecha(datos.get("fecha")),
+            _campo(datos, "cantidad", int),
+            _campo(datos, "precio_unitario", float),
+            es_credito=_booleano(datos, "credito"),
+        )
+        self._json(201 if ok else 400, {"ok": ok, "mensaje": msg, "resultado": resultado})
+
+    def _saldo(self, db, codigo, params):
+        fecha = _fecha(params.get("fecha"), obligatoria=False)
+        try:
+            saldo = obtener_saldo_cuenta_a_fecha(db, codigo, fecha)
+        except ValueError as e:
+            # Ejercicio cerrado sin su archivo: no se puede dar el saldo
+            return self._json(409, {"ok": False, "mensaje": str(e)})
+        if saldo is None:
+            return self._json(404, {"ok": False, "mensaje": f"La cuenta código '{codigo}' no existe."})
+        self._json(200, {"ok": True, **saldo})
+
+    def _reporte(self, db, nombre, params):
+        generador = REPORTES.get(nombre)
+        if not generador:
+            return self._json(404, {"ok": False, "mensaje": f"Reporte desconocido. Disponibles: {sorted(REPORTES)}"})
+
+        destino = BytesIO()
+        resultado = generador(
+            db, destino,
+            codigo=params.get("codigo") or None,
+            desde=_fecha(params.get("desde"), "desde", obligatoria=False),
+            hasta=_fecha(params.get("hasta"), "hasta", obligatoria=False),
+        )
+        if not resultado.exito:
+            return self._json(404, {"ok": False, "mensaje": resultado.mensaje})
+        self._responder(200, destino.getvalue(), "application/pdf")
+
+
+# ==========================================
+# SERVIDOR
+# ==========================================
+
+class ServidorAPI(HTTPServer):
+    """
+    HTTPServer que reparte las conexiones entre un grupo fijo de hilos
+    (ThreadingHTTPServer abriría un hilo, y una sesión, por conexión).
+    """
+
+    def __init__(self, direccion, ruta_bd=DB_NAME, hilos=8, usar_cola=False, verboso=False):
+        super().__init__(direccion, ManejadorAPI)
+        self.verboso = verboso
+        self.motor = crear_motor(ruta_bd, pool_size=hilos, max_overflow=2)
+        # Tablas y columnas nuevas (empresa_id, lotes...) antes de atender
+        init_db(self.motor)
+        fabrica = sessionmaker(bind=self.motor, autoflush=False)
+        # Una sesión por hilo trabajador, reutilizada entre peticiones
+        self.sesiones = scoped_session(fabrica)
+        self.cola = ColaAsientos(fabrica_sesiones=fabrica).iniciar() if usar_cola else None
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="api")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._procesar, request, client_address)
+
+    def _procesar(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True)
+        if self.cola:
+            self.cola.detener()
+        self.sesiones.remove()
+        self.motor.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--hilos", type=int, default=8)
+    parser.add_argument("--bd", default=DB_NAME, help="archivo SQLite a servir")
+    parser.add_argument("--cola", action="store_true", help="confirmar asientos en grupo (ColaAsientos)")
+    parser.add_argument("--verboso", action="store_true", help="registrar cada petición en consola")
+    args = parser.parse_args()
+    if not os.path.exists(args.bd):
+        parser.error(f"no existe la BD '{args.bd}'")
+
+    servidor = ServidorAPI((args.host, args.puerto), args.bd, args.hilos, args.cola, args.verboso)
+    print(f"API contable escuchando en http://{args.host}:{args.puerto} ({args.hilos} hilos, BD: {args.bd})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
 # src/base_datos/db.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
+import random
+import threading
+import time
+import unicodedata
+
+from src.base_datos.instrumentacion import marcar_fase
 
 # Nombre de la base de datos
 DB_NAME = "datos/contabilidad.sqlite"
@@ -10,8 +17,45 @@ DB_NAME = "datos/contabilidad.sqlite"
 if not os.path.exists("datos"):
     os.makedirs("datos")
 
+# Espera máxima (ms) de SQLite antes de reportar "database is locked"
+BUSY_TIMEOUT_MS = 5000
+
+def sin_acentos(texto):
+    """Minúsculas y sin tildes ("Depreciación" -> "depreciacion"), para comparar textos en español."""
+    if texto is None:
+        return None
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+def _configurar_conexion(dbapi_conn, connection_record):
+    """Cada conexión nueva: WAL para lectores concurrentes y BEGIN controlado por SQLAlchemy."""
+    dbapi_conn.isolation_level = None
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.close()
+    # Búsqueda sin tildes cuando no hay índice FTS5 (ver src/servicios/busqueda.py)
+    dbapi_conn.create_function("sin_acentos", 1, sin_acentos, deterministic=True)
+
+def _iniciar_transaccion(conn):
+    """BEGIN IMMEDIATE para escrituras (toma el bloqueo de escritura de entrada), BEGIN para el resto."""
+    if conn.get_execution_options().get("escritura"):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    else:
+        conn.exec_driver_sql("BEGIN")
+
+def crear_motor(ruta_bd: str, **kwargs):
+    """
+    Crea un motor SQLite con la misma configuración que el principal.
+    Lo usan también los procesos trabajadores y las herramientas que abren otros archivos.
+    """
+    motor = create_engine(f"sqlite:///{ruta_bd}", echo=False, **kwargs)
+    event.listen(motor, "connect", _configurar_conexion)
+    event.listen(motor, "begin", _iniciar_transaccion)
+    return motor
+
 # Crear motor de conexión
-engine = create_engine(f"sqlite:///{DB_NAME}", echo=False)
+engine = crear_motor(DB_NAME)
 
 # Crear sesión para interactuar con la BD
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -27,9 +71,90 @@ def get_db():
     finally:
         db.close()
 
-def init_db():
-    """Crea las tablas en la base de datos"""
-    Base.metadata.create_all(bind=engine)
+# Contención de escritura en este proceso (los leen las herramientas de carga)
+_contadores_bloqueo = {'transacciones': 0, 'esperas': 0, 'espera_s': 0.0, 'reintentos': 0}
+_candado_contadores = threading.Lock()
+
+# Tomar el bloqueo de escritura más lento que esto cuenta como una espera
+UMBRAL_ESPERA_S = 0.001
+
+def _contar(clave: str, valor=1):
+    with _candado_contadores:
+        _contadores_bloqueo[clave] += valor
+
+def estadisticas_bloqueo(reiniciar: bool = False) -> dict:
+    """
+    Transacciones de escritura, cuántas esperaron el bloqueo (BEGIN IMMEDIATE),
+    el tiempo total de espera y los reintentos por "database is locked".
+    """
+    with _candado_contadores:
+        copia = dict(_contadores_bloqueo)
+        if reiniciar:
+            for clave in _contadores_bloqueo:
+                _contadores_bloqueo[clave] = 0 if clave != 'espera_s' else 0.0
+    return copia
+
+def es_bloqueo(error: Exception) -> bool:
+    """True si el error es el "database is locked/busy" de SQLite."""
+    texto = str(getattr(error, "orig", error)).lower()
+    return isinstance(error, OperationalError) and ("locked" in texto or "busy" in texto)
+
+def ejecutar_en_transaccion(db, operacion, intentos: int = 6, espera_inicial: float = 0.02):
+    """
+    Ejecuta operacion() dentro de una transacción de escritura (BEGIN IMMEDIATE)
+    y hace commit. Si SQLite sigue bloqueado tras el busy_timeout, deshace y
+    reintenta con espera exponencial (con algo de azar para no chocar de nuevo).
+
+    operacion no debe hacer commit: solo agregar/modificar objetos en la sesión.
+    Cualquier otra excepción deshace la transacción y se propaga al llamador.
+    """
+    if db.new or db.dirty or db.deleted:
+        raise RuntimeError("La sesión tiene cambios sin confirmar; no se puede abrir la transacción de escritura.")
+
+    marcar_fase("preparacion")
+    for intento in range(1, intentos + 1):
+        # Cerrar una posible lectura previa: su instantánea podría estar vieja
+        if db.in_transaction():
+            db.rollback()
+        try:
+            # BEGIN IMMEDIATE: aquí se espera (busy_timeout) si otra conexión está escribiendo
+            inicio = time.perf_counter()
+            db.connection(execution_options={"escritura": True})
+            espera = time.perf_counter() - inicio
+            _contar('transacciones')
+            if espera > UMBRAL_ESPERA_S:
+                _contar('esperas')
+                _contar('espera_s', espera)
+            marcar_fase("espera_bloqueo")
+
+            resultado = operacion()
+            marcar_fase("operacion")
+            db.commit()
+            marcar_fase("commit")
+            return resultado
+        except Exception as e:
+            db.rollback()
+            if not es_bloqueo(e) or intento == intentos:
+                raise
+            _contar('reintentos')
+            marcar_fase("reintento")
+            time.sleep(espera_inicial * (2 ** (intento - 1)) * random.uniform(0.5, 1.5))
+
+def init_db(motor=None):
+    """Crea las tablas en la base de datos (la principal u otra, p. ej. una copia restaurada)"""
+    motor = motor or engine
+    # Registrar los modelos en Base.metadata aunque el llamador no los haya importado
+    import src.modelos.entidades  # noqa: F401
+    Base.metadata.create_all(bind=motor)
+
+    # Columnas y datos nuevos sobre tablas que ya existían
+    from src.base_datos.migraciones import ejecutar_migraciones
+    ejecutar_migraciones(motor)
+
+    # create_all no agrega índices nuevos a tablas que ya existían
+    for tabla in Base.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            indice.create(bind=motor, checkfirst=True)
 
 def close_engine():
     """Cierra todas las conexiones del motor para liberar el archivo."""
@@ -0,0 +1,218 @@
+"""
+Instrumentación de rutas calientes: consultas SQL y tiempos por fase.
+
+Se activa con la variable de entorno CONTABILIDAD_DIAGNOSTICO=1 (o desde el
+menú de diagnóstico). Cada llamada a una función marcada con @instrumentado
+produce una línea JSON en CONTABILIDAD_DIAGNOSTICO_ARCHIVO
+(por defecto datos/diagnostico.jsonl) con:
+
+    duración total, consultas SQL, tiempo en SQL, filas afectadas por
+    INSERT/UPDATE/DELETE, objetos ORM cargados y el desglose por fase
+    (las fases las marcan los generadores y ejecutar_en_transaccion).
+
+Desactivada, los listeners de SQLAlchemy no están registrados y el costo por
+llamada es una consulta a un diccionario.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper
+
+ARCHIVO_POR_DEFECTO = "datos/diagnostico.jsonl"
+
+# Cuántas consultas lentas se guardan por medición
+CONSULTAS_LENTAS = 3
+
+_estado = {'activo': False, 'archivo': ARCHIVO_POR_DEFECTO}
+_candado = threading.Lock()
+_local = threading.local()
+_recientes = deque(maxlen=50)
+
+
+class _Medicion:
+    def __init__(self, operacion: str):
+        self.operacion = operacion
+        self.inicio = time.perf_counter()
+        self.marca = self.inicio
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.filas_afectadas = 0
+        self.objetos_cargados = 0
+        self.lentas = []
+        self.fases = {}
+        # Acumulado de la fase en curso (se asigna al marcar la fase)
+        self._fase = {'consultas': 0, 'tiempo_sql_s': 0.0}
+
+    def registrar_consulta(self, sentencia: str, segundos: float, filas: int):
+        self.consultas += 1
+        self.tiempo_sql += segundos
+        self._fase['consultas'] += 1
+        self._fase['tiempo_sql_s'] += segundos
+        if filas > 0:
+            self.filas_afectadas += filas
+        self.lentas.append((segundos, sentencia))
+        if len(self.lentas) > CONSULTAS_LENTAS * 4:
+            self.lentas = sorted(self.lentas, reverse=True)[:CONSULTAS_LENTAS]
+
+    def cerrar_fase(self, nombre: str):
+        ahora = time.perf_counter()
+        fase = self.fases.setdefault(nombre, {'segundos': 0.0, 'consultas': 0, 'tiempo_sql_s': 0.0})
+        fase['segundos'] += ahora - self.marca
+        fase['consultas'] += self._fase['consultas']
+        fase['tiempo_sql_s'] += self._fase['tiempo_sql_s']
+        self.marca = ahora
+        self._fase = {'consultas': 0, 'tiempo_sql_s': 0.0}
+
+    def a_dict(self, error=None) -> dict:
+        registro = {
+            'fecha': datetime.now().isoformat(timespec="milliseconds"),
+            'operacion': self.operacion,
+            'hilo': threading.current_thread().name,
+            'duracion_s': round(time.perf_counter() - self.inicio, 6),
+            'consultas': self.consultas,
+            'tiempo_sql_s': round(self.tiempo_sql, 6),
+            'filas_afectadas': self.filas_afectadas,
+            'objetos_cargados': self.objetos_cargados,
+            'fases': {
+                nombre: {clave: round(valor, 6) if isinstance(valor, float) else valor for clave, valor in f.items()}
+                for nombre, f in self.fases.items()
+            },
+            'consultas_lentas': [
+                {'segundos': round(s, 6), 'sql': " ".join(sql.split())[:300]}
+                for s, sql in sorted(self.lentas, reverse=True)[:CONSULTAS_LENTAS]
+            ],
+        }
+        if error:
+            registro['error'] = error
+        return registro
+
+
+def _medicion_actual():
+    return getattr(_local, 'medicion', None)
+
+
+# --- Listeners (solo registrados mientras la instrumentación está activa) ---
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    if _medicion_actual():
+        conn.info.setdefault('_inicio_consulta', []).append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    medicion = _medicion_actual()
+    inicios = conn.info.get('_inicio_consulta')
+    if medicion and inicios:
+        segundos = time.perf_counter() - inicios.pop()
+        medicion.registrar_consulta(statement, segundos, cursor.rowcount)
+
+
+def _al_cargar_objeto(objetivo, contexto):
+    medicion = _medicion_actual()
+    if medicion:
+        medicion.objetos_cargados += 1
+
+
+_LISTENERS = [
+    (Engine, "before_cursor_execute", _antes_de_ejecutar),
+    (Engine, "after_cursor_execute", _despues_de_ejecutar),
+    (Mapper, "load", _al_cargar_objeto),
+]
+
+
+# --- API pública -------------------------------------------------------------
+
+def activo() -> bool:
+    return _estado['activo']
+
+
+def activar(archivo: str = None):
+    """Registra los listeners y empieza a escribir mediciones en `archivo` (JSON lines)."""
+    with _candado:
+        _estado['archivo'] = archivo or os.environ.get("CONTABILIDAD_DIAGNOSTICO_ARCHIVO", ARCHIVO_POR_DEFECTO)
+        if _estado['activo']:
+            return
+        for objetivo, evento, funcion in _LISTENERS:
+            event.listen(objetivo, evento, funcion)
+        _estado['activo'] = True
+
+
+def desactivar():
+    with _candado:
+        if not _estado['activo']:
+            return
+        for objetivo, evento, funcion in _LISTENERS:
+            event.remove(objetivo, evento, funcion)
+        _estado['activo'] = False
+
+
+def archivo_salida() -> str:
+    return _estado['archivo']
+
+
+def mediciones_recientes() -> list:
+    """Últimas mediciones de este proceso (las más nuevas al final)."""
+    with _candado:
+        return list(_recientes)
+
+
+def marcar_fase(nombre: str):
+    """
+    Cierra la fase en curso de la medición activa con este nombre (tiempo desde
+    la marca anterior). Sin medición activa no hace nada.
+    """
+    medicion = _medicion_actual()
+    if medicion:
+        medicion.cerrar_fase(nombre)
+
+
+def _guardar(registro: dict):
+    with _candado:
+        _recientes.append(registro)
+        ruta = _estado['archivo']
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        with open(ruta, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+def instrumentado(operacion: str):
+    """
+    Decorador para servicios y generadores. Solo mide la llamada más externa de
+    cada hilo: un servicio llamado desde otro queda incluido en la medición del primero.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _estado['activo'] or _medicion_actual():
+                return funcion(*args, **kwargs)
+
+            medicion = _local.medicion = _Medicion(operacion)
+            error = None
+            try:
+                return funcion(*args, **kwargs)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                _local.medicion = None
+                if medicion.fases:
+                    medicion.cerrar_fase("otros")
+                try:
+                    _guardar(medicion.a_dict(error))
+                except OSError:
+                    pass  # El diagnóstico nunca debe romper la operación
+        return envoltura
+    return decorador
+
+
+# Activación por variable de entorno al importar
+if os.environ.get("CONTABILIDAD_DIAGNOSTICO") == "1":
+    activar()
@@ -0,0 +1,232 @@
+# src/base_datos/migraciones.py
+"""
+Migraciones de datos idempotentes que se aplican al iniciar el sistema.
+create_all crea las tablas nuevas; aquí se completan los datos que dependen
+de tablas que ya existían.
+"""
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# Índices de búsqueda de texto: tabla FTS5 -> tabla de origen.
+# Solo se indexan código y nombre; los triggers mantienen el índice al día.
+TABLAS_BUSQUEDA = {
+    'cuentas_busqueda': 'cuentas',
+    'productos_busqueda': 'productos',
+}
+
+# Tablas con columna empresa_id (modelos con el mixin PorEmpresa)
+TABLAS_POR_EMPRESA = (
+    'cuentas', 'asientos', 'detalles_asiento', 'productos', 'movimientos_inventario', 'lotes_inventario',
+)
+
+# Índices de cuando había una sola empresa: los reemplazan los que empiezan por empresa_id.
+# Los únicos de código impedirían que dos empresas usen el mismo plan de cuentas.
+INDICES_REEMPLAZADOS = (
+    'ix_cuentas_codigo', 'ix_productos_codigo', 'ix_productos_con_stock',
+    'ix_movimientos_producto_fecha', 'ix_lotes_abiertos',
+)
+
+
+def migrar_lotes_inventario(conexion):
+    """
+    Crea un registro en lotes_inventario por cada COMPRA que todavía no lo tenga,
+    tomando como saldo el saldo_cantidad que se llevaba en el propio movimiento.
+    Se insertan en orden (fecha, id) para conservar el orden FIFO.
+    """
+    conexion.execute(text("""
+        INSERT INTO lotes_inventario
+            (empresa_id, movimiento_id, producto_id, fecha, costo_unitario, cantidad_inicial, saldo_cantidad)
+        SELECT m.empresa_id, m.id, m.producto_id, m.fecha, m.costo_unitario, m.cantidad,
+               COALESCE(m.saldo_cantidad, 0)
+        FROM movimientos_inventario m
+        WHERE m.tipo = 'COMPRA'
+          AND NOT EXISTS (SELECT 1 FROM lotes_inventario l WHERE l.movimiento_id = m.id)
+        ORDER BY m.fecha, m.id
+    """))
+
+
+def _agregar_columna(conexion, tabla: str, columna: str, definicion: str) -> bool:
+    """ALTER TABLE ADD COLUMN solo si la columna no existe. Retorna True si la agregó."""
+    existentes = {fila[1] for fila in conexion.execute(text(f"PRAGMA table_info({tabla})"))}
+    if columna in existentes:
+        return False
+
+    conexion.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}"))
+    return True
+
+
+def migrar_empresas(conexion):
+    """
+    Agrega empresa_id a las tablas de cada empresa. Los datos que ya había
+    quedan en la empresa 1; si la BD tenía su única empresa con otro id, se
+    renumera a 1 para que siga siendo la dueña de esos datos.
+    """
+    nuevas = [_agregar_columna(conexion, tabla, "empresa_id", "INTEGER NOT NULL DEFAULT 1")
+              for tabla in TABLAS_POR_EMPRESA]
+    if any(nuevas):
+        ids = [i for (i,) in conexion.execute(text("SELECT id FROM empresa"))]
+        if len(ids) == 1 and ids[0] != 1:
+            conexion.execute(text("UPDATE empresa SET id = 1 WHERE id = :id"), {'id': ids[0]})
+
+    for indice in INDICES_REEMPLAZADOS:
+        conexion.execute(text(f"DROP INDEX IF EXISTS {indice}"))
+
+
+def migrar_cierre_ejercicio(conexion):
+    """Agrega empresa.cierre_hasta (NULL: ningún ejercicio cerrado)."""
+    _agregar_columna(conexion, "empresa", "cierre_hasta", "DATE")
+
+
+def migrar_stock_productos(conexion):
+    """
+    Agrega stock_actual / valor_actual a productos y, si las columnas son nuevas,
+    las calcula desde los lotes abiertos.
+    """
+    nueva_stock = _agregar_columna(conexion, "productos", "stock_actual", "INTEGER NOT NULL DEFAULT 0")
+    nueva_valor = _agregar_columna(conexion, "productos", "valor_actual", "FLOAT NOT NULL DEFAULT 0")
+    if not (nueva_stock or nueva_valor):
+        return
+
+    conexion.execute(text("""
+        UPDATE productos SET
+            stock_actual = COALESCE((
+                SELECT SUM(l.saldo_cantidad) FROM lotes_inventario l
+                WHERE l.producto_id = productos.id AND l.saldo_cantidad > 0), 0),
+            valor_actual = COALESCE((
+                SELECT SUM(l.saldo_cantidad * l.costo_unitario) FROM lotes_inventario l
+                WHERE l.producto_id = productos.id AND l.saldo_cantidad > 0), 0)
+    """))
+
+
+def _crear_indice_busqueda(conexion, indice: str, tabla: str):
+    existe = conexion.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nombre"), {'nombre': indice}
+    ).first()
+
+    # Tabla de contenido externo: el texto vive en `tabla`, FTS5 guarda solo el índice.
+    # remove_diacritics 2: "depreciacion" encuentra "Depreciación"; prefix: índices para 2 y 3 letras
+    conexion.execute(text(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {indice} USING fts5(
+            codigo, nombre, content='{tabla}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """))
+    conexion.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {indice}_ai AFTER INSERT ON {tabla} BEGIN
+            INSERT INTO {indice}(rowid, codigo, nombre) VALUES (new.id, new.codigo, new.nombre);
+        END
+    """))
+    conexion.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {indice}_ad AFTER DELETE ON {tabla} BEGIN
+            INSERT INTO {indice}({indice}, rowid, codigo, nombre) VALUES ('delete', old.id, old.codigo, old.nombre);
+        END
+    """))
+    # Solo cambios de código o nombre: las ventas actualizan stock_actual todo el tiempo
+    conexion.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {indice}_au AFTER UPDATE OF codigo, nombre ON {tabla} BEGIN
+            INSERT INTO {indice}({indice}, rowid, codigo, nombre) VALUES ('delete', old.id, old.codigo, old.nombre);
+            INSERT INTO {indice}(rowid, codigo, nombre) VALUES (new.id, new.codigo, new.nombre);
+        END
+    """))
+
+    if not existe:
+        # Indexar las filas que ya estaban antes de crear el índice
+        conexion.execute(text(f"INSERT INTO {indice}({indice}) VALUES ('rebuild')"))
+
+
+def crear_indices_busqueda(conexion):
+    """
+    Crea los índices FTS5 de cuentas y productos con sus triggers. Si este
+    SQLite no tiene FTS5 no hace nada: la búsqueda usa entonces LIKE.
+    """
+    for indice, tabla in TABLAS_BUSQUEDA.items():
+        try:
+            with conexion.begin_nested():
+                _crear_indice_busqueda(conexion, indice, tabla)
+        except OperationalError as e:
+            if "fts5" not in str(e).lower():
+                raise
+            return
+
+
+def crear_registro_integridad(conexion):
+    """
+    Tablas del verificador de integridad (src/servicios/integridad.py) y los
+    triggers que anotan en integridad_cambios cada cambio a asientos, líneas
+    y cuentas de una empresa que ya tiene punto de control. Las líneas se
+    anotan con sus valores (signo -1 la versión que se va, +1 la que queda)
+    para poder actualizar la huella sin volver a leer todo el libro.
+
+    Los asientos nuevos no pasan por aquí: el verificador los encuentra por
+    id. Solo se anota un INSERT con un id ya verificado (SQLite reutiliza el
+    id más alto si se borró).
+    """
+    conexion.execute(text("""
+        CREATE TABLE IF NOT EXISTS integridad_control (
+            empresa_id INTEGER PRIMARY KEY,
+            ultimo_asiento INTEGER NOT NULL,
+            ultimo_detalle INTEGER NOT NULL,
+            huella TEXT NOT NULL,
+            lineas INTEGER NOT NULL,
+            fecha TEXT NOT NULL
+        )
+    """))
+    conexion.execute(text("""
+        CREATE TABLE IF NOT EXISTS integridad_cambios (
+            id INTEGER PRIMARY KEY,
+            empresa_id INTEGER NOT NULL,
+            asiento_id INTEGER,
+            detalle_id INTEGER,
+            cuenta_id INTEGER,
+            debe FLOAT,
+            haber FLOAT,
+            signo INTEGER NOT NULL DEFAULT 0
+        )
+    """))
+    conexion.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_integridad_cambios_empresa ON integridad_cambios (empresa_id, id)"
+    ))
+
+    controlada = "EXISTS (SELECT 1 FROM integridad_control WHERE empresa_id = {fila}.empresa_id)"
+    linea = ("INSERT INTO integridad_cambios (empresa_id, asiento_id, detalle_id, cuenta_id, debe, haber, signo) "
+             "SELECT {fila}.empresa_id, {fila}.asiento_id, {fila}.id, {fila}.cuenta_id, {fila}.debe, {fila}.haber, "
+             "{signo} WHERE " + controlada + ";")
+    asiento = ("INSERT INTO integridad_cambios (empresa_id, asiento_id) "
+               "SELECT {fila}.empresa_id, {fila}.id WHERE " + controlada + ";")
+    cuenta = ("INSERT INTO integridad_cambios (empresa_id, asiento_id) "
+              "SELECT DISTINCT d.empresa_id, d.asiento_id FROM detalles_asiento d "
+              "WHERE d.empresa_id = {fila}.empresa_id AND d.cuenta_id = {fila}.id AND " + controlada + ";")
+
+    triggers = {
+        # Solo los id ya verificados: los demás los encuentra el verificador por id
+        'integridad_detalles_ai': (
+            "AFTER INSERT ON detalles_asiento WHEN new.id <= "
+            "(SELECT ultimo_detalle FROM integridad_control WHERE empresa_id = new.empresa_id)",
+            linea.format(fila="new", signo=1)),
+        'integridad_detalles_au': (
+            "AFTER UPDATE ON detalles_asiento",
+            linea.format(fila="old", signo=-1) + linea.format(fila="new", signo=1)),
+        'integridad_detalles_ad': (
+            "AFTER DELETE ON detalles_asiento", linea.format(fila="old", signo=-1)),
+        'integridad_asientos_au': (
+            "AFTER UPDATE ON asientos", asiento.format(fila="old") + asiento.format(fila="new")),
+        'integridad_asientos_ad': (
+            "AFTER DELETE ON asientos", asiento.format(fila="old")),
+        'integridad_cuentas_au': (
+            "AFTER UPDATE OF id, empresa_id ON cuentas", cuenta.format(fila="old")),
+        'integridad_cuentas_ad': (
+            "AFTER DELETE ON cuentas", cuenta.format(fila="old")),
+    }
+    for nombre, (evento, cuerpo) in triggers.items():
+        conexion.execute(text(f"CREATE TRIGGER IF NOT EXISTS {nombre} {evento} BEGIN {cuerpo} END"))
+
+
+def ejecutar_migraciones(engine):
+    """Aplica todas las migraciones en una sola transacción."""
+    with engine.begin() as conexion:
+        migrar_empresas(conexion)
+        migrar_lotes_inventario(conexion)
+        migrar_stock_productos(conexion)
+        migrar_cierre_ejercicio(conexion)
+        crear_indices_busqueda(conexion)
+        crear_registro_integridad(conexion)
@@ -0,0 +1,81 @@
+# src/base_datos/multiempresa.py
+"""
+Varias empresas en una misma BD.
+
+Cuentas, asientos (con sus detalles) e inventario llevan la columna empresa_id
+(mixin PorEmpresa). Cada sesión trabaja sobre una sola empresa: un evento
+do_orm_execute agrega `empresa_id = ?` a todo SELECT, UPDATE y DELETE del ORM
+que toque esas tablas, y before_flush asigna la empresa a los objetos nuevos.
+Así los servicios y generadores no cambian: db.query(Cuenta) ya devuelve solo
+las cuentas de la empresa de la sesión.
+
+La empresa de una sesión es db.info['empresa_id']; si no tiene, la empresa
+activa del proceso (1 por defecto, la que ya tenían las BD de una sola
+empresa). Los índices compuestos empiezan por empresa_id, de modo que cada
+consulta recorre solo el rango de su empresa y su costo no crece con la
+cantidad de empresas de la BD.
+
+Lo que no pasa por el ORM no se filtra solo: las consultas con text() y los
+INSERT masivos (insert(Modelo) con lista de diccionarios) deben poner
+empresa_id ellos mismos, con empresa_de_sesion(db).
+"""
+from sqlalchemy import Column, ForeignKey, Integer, event
+from sqlalchemy.orm import Session, declared_attr, with_loader_criteria
+
+# Empresa de las BD creadas antes de que hubiera varias
+EMPRESA_POR_DEFECTO = 1
+
+_empresa_activa = EMPRESA_POR_DEFECTO
+
+
+class PorEmpresa:
+    """Mixin de los modelos que pertenecen a una empresa."""
+
+    @declared_attr
+    def empresa_id(cls):
+        return Column(Integer, ForeignKey("empresa.id"), nullable=False,
+                      server_default=str(EMPRESA_POR_DEFECTO))
+
+
+def fijar_empresa_activa(empresa_id: int):
+    """Empresa de las sesiones que no indican otra (la elegida en el menú)."""
+    global _empresa_activa
+    _empresa_activa = empresa_id
+
+
+def empresa_activa() -> int:
+    return _empresa_activa
+
+
+def empresa_de_sesion(db: Session) -> int:
+    """Empresa sobre la que trabaja la sesión."""
+    return db.info.get('empresa_id') or _empresa_activa
+
+
+def sesion_de_empresa(fabrica, empresa_id: int) -> Session:
+    """Abre una sesión de `fabrica` limitada a la empresa indicada."""
+    db = fabrica()
+    db.info['empresa_id'] = empresa_id
+    return db
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _filtrar_por_empresa(estado):
+    # Las cargas de relaciones y columnas diferidas parten de un objeto ya filtrado
+    if estado.is_column_load or estado.is_relationship_load:
+        return
+    if not (estado.is_select or estado.is_update or estado.is_delete):
+        return
+    empresa = empresa_de_sesion(estado.session)
+    estado.statement = estado.statement.options(with_loader_criteria(
+        PorEmpresa, lambda cls: cls.empresa_id == empresa, include_aliases=True
+    ))
+
+
+@event.listens_for(Session, "before_flush")
+def _asignar_empresa(db, contexto, instancias):
+    empresa = None
+    for objeto in db.new:
+        if isinstance(objeto, PorEmpresa) and objeto.empresa_id is None:
+            empresa = empresa or empresa_de_sesion(db)
+            objeto.empresa_id = empresa
@@ -1,13 +1,14 @@
 # src/modelos/entidades.py
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from src.base_datos.db import Base
+from src.base_datos.multiempresa import PorEmpresa
 
-class Cuenta(Base):
+class Cuenta(PorEmpresa, Base):
     __tablename__ = "cuentas"
 
     id = Column(Integer, primary_key=True, index=True)
-    codigo = Column(String, unique=True, index=True, nullable=False)
+    codigo = Column(String, nullable=False)
     nombre = Column(String, nullable=False)
     tipo = Column(String, nullable=False)       # Activo, Pasivo, Patrimonio, etc.
     naturaleza = Column(String, nullable=False) # Deudora, Acreedora
@@ -15,10 +16,18 @@ class Cuenta(Base):
     # Relación para ver los movimientos de esta cuenta
     detalles = relationship("DetalleAsiento", back_populates="cuenta")
 
+    # El código es único dentro de cada empresa. El índice solo por empresa_id
+    # entrega las cuentas en orden de id (rowid): los saldos agrupados por
+    # cuenta lo usan en vez de recorrer las cuentas de todas las empresas
+    __table_args__ = (
+        Index("ux_cuentas_empresa_codigo", "empresa_id", "codigo", unique=True),
+        Index("ix_cuentas_empresa", "empresa_id"),
+    )
+
     def __repr__(self):
         return f"<Cuenta {self.codigo} - {self.nombre}>"
 
-class Asiento(Base):
+class Asiento(PorEmpresa, Base):
     __tablename__ = "asientos"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -28,7 +37,12 @@ class Asiento(Base):
     # Relación: Un asiento tiene muchos detalles (líneas)
     detalles = relationship("DetalleAsiento", back_populates="asiento", cascade="all, delete-orphan")
 
-class DetalleAsiento(Base):
+    # Libro diario y rangos de fechas de una empresa
+    __table_args__ = (
+        Index("ix_asientos_empresa_fecha", "empresa_id", "fecha", "id"),
+    )
+
+class DetalleAsiento(PorEmpresa, Base):
     __tablename__ = "detalles_asiento"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -42,20 +56,38 @@ class DetalleAsiento(Base):
     asiento = relationship("Asiento", back_populates="detalles")
     cuenta = relationship("Cuenta", back_populates="detalles")
 
+    # Mayor y saldos por cuenta; líneas de un asiento
+    __table_args__ = (
+        Index("ix_detalles_empresa_cuenta", "empresa_id", "cuenta_id", "asiento_id"),
+        Index("ix_detalles_empresa_asiento", "empresa_id", "asiento_id"),
+    )
+
 # --- Agregar al final de src/modelos/entidades.py ---
 
-class Producto(Base):
+class Producto(PorEmpresa, Base):
     __tablename__ = "productos"
 
     id = Column(Integer, primary_key=True, index=True)
-    codigo = Column(String, unique=True, index=True, nullable=False)
+    codigo = Column(String, nullable=False)
     nombre = Column(String, nullable=False)
     metodo = Column(String, default="FIFO") # FIFO o PMP (Promedio)
+
+    # Saldo denormalizado: lo mantienen registrar_compra / registrar_venta
+    # en la misma transacción que los lotes (ver verificar_stock_productos)
+    stock_actual = Column(Integer, nullable=False, default=0, server_default="0")
+    valor_actual = Column(Float, nullable=False, default=0.0, server_default="0")
     
     # Relación
     movimientos = relationship("MovimientoInventario", back_populates="producto", cascade="all, delete-orphan")
+    lotes = relationship("LoteInventario", back_populates="producto", cascade="all, delete-orphan")
 
-class MovimientoInventario(Base):
+    # Código único por empresa; índice parcial para el selector "solo con stock", ya ordenado por código
+    __table_args__ = (
+        Index("ux_productos_empresa_codigo", "empresa_id", "codigo", unique=True),
+        Index("ix_productos_empresa_con_stock", "empresa_id", "codigo", sqlite_where=text("stock_actual > 0")),
+    )
+
+class MovimientoInventario(PorEmpresa, Base):
     __tablename__ = "movimientos_inventario"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -67,12 +99,39 @@ class MovimientoInventario(Base):
     costo_unitario = Column(Float, nullable=False)
     costo_total = Column(Float, nullable=False)
     
-    # Campos exclusivos para control FIFO
-    # saldo_cantidad: Cuánto queda de ESTE lote de compra específico
+    # saldo_cantidad: cantidad del lote al momento de la compra.
+    # El saldo vigente de cada lote se lleva en LoteInventario.
     saldo_cantidad = Column(Integer, default=0) 
     
     producto = relationship("Producto", back_populates="movimientos")
 
+    # Índice compuesto para el kardex: movimientos de un producto en orden cronológico
+    __table_args__ = (
+        Index("ix_movimientos_empresa_producto_fecha", "empresa_id", "producto_id", "fecha", "id"),
+    )
+
+class LoteInventario(PorEmpresa, Base):
+    """Lote de compra disponible para consumo FIFO (uno por cada movimiento COMPRA)."""
+    __tablename__ = "lotes_inventario"
+
+    id = Column(Integer, primary_key=True, index=True)
+    movimiento_id = Column(Integer, ForeignKey("movimientos_inventario.id"), unique=True, nullable=False)
+    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
+    fecha = Column(Date, nullable=False)
+
+    costo_unitario = Column(Float, nullable=False)
+    cantidad_inicial = Column(Integer, nullable=False)
+    saldo_cantidad = Column(Integer, nullable=False)  # Cuánto queda de ESTE lote
+
+    movimiento = relationship("MovimientoInventario")
+    producto = relationship("Producto", back_populates="lotes")
+
+    # Índice parcial: solo los lotes con saldo, en el orden en que se consumen
+    __table_args__ = (
+        Index("ix_lotes_empresa_abiertos", "empresa_id", "producto_id", "fecha", "id",
+              sqlite_where=text("saldo_cantidad > 0")),
+    )
+
 # Al final de src/modelos/entidades.py, después de MovimientoInventario
 
 class Empresa(Base):
@@ -87,6 +146,10 @@ class Empresa(Base):
     email = Column(String)
     ciudad = Column(String, default="Babahoyo")
     pais = Column(String, default="Ecuador")
+
+    # Último día del último ejercicio cerrado (ver src/servicios/cierre.py):
+    # no se registran asientos con esa fecha o anteriores
+    cierre_hasta = Column(Date)
     
     def __repr__(self):
         return f"<Empresa {self.nombre}>"
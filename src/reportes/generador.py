@@ -4,17 +4,26 @@ Re-exporta todas las funciones desde los módulos especializados.
 """
 
 from .generadores.libro_diario import generar_pdf_libro_diario
-from .generadores.libro_mayor import generar_pdf_libro_mayor
+from .generadores.libro_mayor import generar_pdf_libro_mayor, generar_pdf_mayor_con_saldo
 from .generadores.balance_comprobacion import generar_balance_comprobacion
-from .generadores.estados_financieros import generar_estado_resultados, generar_balance_general
+from .generadores.estados_financieros import (
+    generar_estado_resultados, generar_balance_general, generar_estados_financieros
+)
 from .generadores.balance_situacion_inicial import generar_balance_situacion_inicial
+from .generadores.comparativos import generar_pdf_estados_comparativos, generar_xlsx_estados_comparativos
+from .generadores.balance_consolidado import generar_pdf_balance_consolidado
 
 # Re-exportar para mantener compatibilidad con main.py
 __all__ = [
     'generar_pdf_libro_diario',
     'generar_pdf_libro_mayor',
+    'generar_pdf_mayor_con_saldo',
     'generar_balance_comprobacion',
     'generar_estado_resultados',
     'generar_balance_general',
-    'generar_balance_situacion_inicial'
+    'generar_estados_financieros',
+    'generar_balance_situacion_inicial',
+    'generar_pdf_estados_comparativos',
+    'generar_xlsx_estados_comparativos',
+    'generar_pdf_balance_consolidado'
 ]
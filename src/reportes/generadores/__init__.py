@@ -4,16 +4,25 @@ Cada generador es responsable de un tipo específico de reporte.
 """
 
 from .libro_diario import generar_pdf_libro_diario
-from .libro_mayor import generar_pdf_libro_mayor
+from .libro_mayor import generar_pdf_libro_mayor, generar_pdf_mayor_con_saldo
 from .balance_comprobacion import generar_balance_comprobacion
-from .estados_financieros import generar_estado_resultados, generar_balance_general
+from .estados_financieros import (
+    generar_estado_resultados, generar_balance_general, generar_estados_financieros
+)
 from .balance_situacion_inicial import generar_balance_situacion_inicial
+from .comparativos import generar_pdf_estados_comparativos, generar_xlsx_estados_comparativos
+from .balance_consolidado import generar_pdf_balance_consolidado
 
 __all__ = [
     'generar_pdf_libro_diario',
     'generar_pdf_libro_mayor',
+    'generar_pdf_mayor_con_saldo',
     'generar_balance_comprobacion',
     'generar_estado_resultados',
     'generar_balance_general',
-    'generar_balance_situacion_inicial'
+    'generar_estados_financieros',
+    'generar_balance_situacion_inicial',
+    'generar_pdf_estados_comparativos',
+    'generar_xlsx_estados_comparativos',
+    'generar_pdf_balance_consolidado'
 ]
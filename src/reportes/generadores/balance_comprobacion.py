@@ -6,21 +6,26 @@ from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from sqlalchemy.orm import Session
-from src.modelos.entidades import Cuenta,Asiento
+from src.base_datos.instrumentacion import instrumentado
+from .utilidades import rango_fechas_asientos, sumas_por_cuenta
 from src.servicios.empresa import obtener_empresa
 from src.reportes.encabezado import crear_encabezado_empresa
+from src.reportes.resultado import ResultadoReporte, construir_pdf
 
-def generar_balance_comprobacion(db: Session, nombre_archivo="balance_comprobacion.pdf"):
+@instrumentado("reporte.balance_comprobacion")
+def generar_balance_comprobacion(db: Session, nombre_archivo="balance_comprobacion.pdf", progreso=None):
     """
     Genera el Balance de Comprobación de Sumas y Saldos.
     Verifica que (Sumas Debe == Sumas Haber) y (Saldo Deudor == Saldo Acreedor).
+    nombre_archivo puede ser una ruta o un objeto tipo archivo (BytesIO).
+    Returns:
+        ResultadoReporte (extra: 'cuadra')
     """
+    resultado = ResultadoReporte(progreso=progreso)
+
     # 1. OBTENER EMPRESA Y PERÍODO
     empresa = obtener_empresa(db)
-    asientos = db.query(Asiento).order_by(Asiento.fecha).all()
-    
-    fecha_inicio = asientos[0].fecha if asientos else None
-    fecha_fin = asientos[-1].fecha if asientos else None
+    fecha_inicio, fecha_fin = rango_fechas_asientos(db)
 
     doc = SimpleDocTemplate(nombre_archivo, pagesize=A4)
     elements = []
@@ -54,20 +59,12 @@ def generar_balance_comprobacion(db: Session, nombre_archivo="balance_comprobaci
     total_sal_deudor = 0.0
     total_sal_acreedor = 0.0
     
-    # 4. Procesar Cuentas
-    cuentas = db.query(Cuenta).order_by(Cuenta.codigo).all()
+    # 4. Procesar Cuentas (sumas agrupadas en una sola consulta)
     hay_datos = False
     
-    for cuenta in cuentas:
-        if not cuenta.detalles:
-            continue
-        
+    for cuenta, sum_debe, sum_haber in sumas_por_cuenta(db):
         hay_datos = True
         
-        # Calcular sumas
-        sum_debe = sum(d.debe for d in cuenta.detalles)
-        sum_haber = sum(d.haber for d in cuenta.detalles)
-        
         # Calcular saldos
         sal_deudor = 0.0
         sal_acreedor = 0.0
@@ -92,6 +89,8 @@ def generar_balance_comprobacion(db: Session, nombre_archivo="balance_comprobaci
             f"{sal_deudor:,.2f}",
             f"{sal_acreedor:,.2f}"
         ])
+        resultado.filas = len(data) - 1
+        resultado.notificar("datos")
     
     # 5. Fila de Totales Finales
     data.append([
@@ -103,8 +102,7 @@ def generar_balance_comprobacion(db: Session, nombre_archivo="balance_comprobaci
     ])
     
     if not hay_datos:
-        print("No hay datos para generar el balance.")
-        return False
+        return resultado.fallo("No hay datos para generar el balance.")
     
     # 6. Estilos
     t = Table(data, colWidths=[50, 140, 65, 65, 65, 65])
@@ -144,10 +142,6 @@ def generar_balance_comprobacion(db: Session, nombre_archivo="balance_comprobaci
     )
     elements.append(p_valid)
     
-    try:
-        doc.build(elements)
-        print(f"✅ Balance de Comprobación generado: {nombre_archivo}")
-        return True
-    except Exception as e:
-        print(f"❌ Error PDF Balance: {e}")
-        return False
+    resultado.filas = len(data) - 2  # sin encabezado ni totales
+    resultado.extra['cuadra'] = cuadra_sumas and cuadra_saldos
+    return construir_pdf(doc, elements, resultado, "Balance de Comprobación generado.")
@@ -0,0 +1,100 @@
+"""
+Generador del Balance de Comprobación consolidado (una columna por empresa,
+las eliminaciones y el saldo consolidado).
+"""
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from src.base_datos.instrumentacion import instrumentado
+from src.reportes.resultado import ResultadoReporte, construir_pdf
+
+# Ancho útil de A4 horizontal con márgenes de 25 pt, menos código y nombre de cuenta
+ANCHO_MONTOS = 792 - 45 - 150
+
+
+@instrumentado("reporte.balance_consolidado")
+def generar_pdf_balance_consolidado(consolidado: dict, nombre_archivo="balance_consolidado.pdf", progreso=None):
+    """
+    Genera el Balance de Comprobación consolidado a partir del resultado de
+    src.servicios.consolidacion.consolidar(). Los montos por empresa y las
+    eliminaciones se muestran como Debe - Haber (negativo = acreedor).
+    nombre_archivo puede ser una ruta o un objeto tipo archivo (BytesIO).
+    Returns:
+        ResultadoReporte (extra: 'cuadra')
+    """
+    resultado = ResultadoReporte(progreso=progreso)
+    resultado.advertencias.extend(consolidado['advertencias'])
+    if not consolidado['cuentas']:
+        return resultado.fallo("Ninguna empresa tiene movimientos.")
+
+    empresas = consolidado['empresas']
+    doc = SimpleDocTemplate(nombre_archivo, pagesize=landscape(A4), leftMargin=25, rightMargin=25)
+    elements = []
+    styles = getSampleStyleSheet()
+    estilo_encabezado = ParagraphStyle('Encabezado', parent=styles['Normal'], fontSize=7, leading=8,
+                                       textColor=colors.white, fontName='Helvetica-Bold', alignment=1)
+
+    # 1. Título y período
+    elements.append(Paragraph("BALANCE DE COMPROBACIÓN CONSOLIDADO", styles['Title']))
+    if consolidado['fecha_inicio']:
+        elements.append(Paragraph(
+            f"Del {consolidado['fecha_inicio']:%d/%m/%Y} al {consolidado['fecha_fin']:%d/%m/%Y} - "
+            f"{len(empresas)} empresas", styles['Normal']
+        ))
+    elements.append(Spacer(1, 12))
+
+    # 2. Encabezados: una columna por empresa
+    data = [
+        ["CÓDIGO", "CUENTA"]
+        + [Paragraph(e['nombre'], estilo_encabezado) for e in empresas]
+        + [Paragraph(t, estilo_encabezado) for t in ("ELIMINACIONES", "SALDO DEUDOR", "SALDO ACREEDOR")]
+    ]
+    totales = [0.0] * (len(empresas) + 3)
+
+    # 3. Cuentas
+    for c in consolidado['cuentas']:
+        deudor, acreedor = max(c['consolidado'], 0.0), max(-c['consolidado'], 0.0)
+        montos = c['saldos'] + [c['eliminacion'], deudor, acreedor]
+        totales = [t + m for t, m in zip(totales, montos)]
+        data.append([c['codigo'], c['nombre'][:38]] + [f"{m:,.2f}" if abs(m) > 0.005 else "" for m in montos])
+    resultado.filas = len(data) - 1
+    resultado.notificar("datos")
+
+    data.append(["TOTALES", ""] + [f"{t:,.2f}" for t in totales])
+
+    ancho = min(80, ANCHO_MONTOS / (len(empresas) + 3))
+    t = Table(data, colWidths=[45, 150] + [ancho] * (len(empresas) + 3), repeatRows=1)
+    t.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkgreen),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
+        ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
+        ('FONTSIZE', (0, 0), (-1, -1), 7 if len(empresas) <= 4 else 6),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        # Columna de eliminaciones y consolidado separadas de las empresas
+        ('LINEBEFORE', (2 + len(empresas), 0), (2 + len(empresas), -1), 1.5, colors.darkgreen),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgreen),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ]))
+    elements.append(t)
+
+    # 4. Validación y empresas incluidas
+    cuadra = abs(totales[-2] - totales[-1]) < 0.01
+    elements.append(Spacer(1, 15))
+    if cuadra:
+        msg, color_msg = "✓ VALIDACIÓN: EL BALANCE CONSOLIDADO CUADRA.", colors.green
+    else:
+        msg = f"✗ ALERTA: DESCUADRE DE ${abs(totales[-2] - totales[-1]):,.2f}. REVISAR ELIMINACIONES."
+        color_msg = colors.red
+    elements.append(Paragraph(msg, ParagraphStyle('Valid', parent=styles['Normal'], textColor=color_msg)))
+
+    elements.append(Spacer(1, 10))
+    for e in empresas:
+        elements.append(Paragraph(f"• {e['nombre']} (RUC {e['ruc'] or 's/n'}): {e['archivo']}", styles['Normal']))
+    for advertencia in consolidado['advertencias']:
+        elements.append(Paragraph(f"⚠ {advertencia}", styles['Normal']))
+
+    resultado.extra['cuadra'] = cuadra
+    return construir_pdf(doc, elements, resultado, "Balance de Comprobación consolidado generado.")
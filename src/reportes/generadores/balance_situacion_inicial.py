@@ -6,26 +6,37 @@ from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from sqlalchemy.orm import Session
-from src.modelos.entidades import Asiento, Cuenta
+from sqlalchemy.orm import Session, joinedload, selectinload
+from src.base_datos.instrumentacion import instrumentado
+from src.modelos.entidades import Asiento, Cuenta, DetalleAsiento
 from src.servicios.empresa import obtener_empresa
 from src.reportes.encabezado import crear_encabezado_empresa
+from src.reportes.resultado import ResultadoReporte, construir_pdf
 
-def generar_balance_situacion_inicial(db: Session, nombre_archivo="balance_situacion_inicial.pdf"):
+@instrumentado("reporte.balance_situacion_inicial")
+def generar_balance_situacion_inicial(db: Session, nombre_archivo="balance_situacion_inicial.pdf", progreso=None):
     """
     Genera el Balance de Situación Inicial usando el PRIMER asiento registrado.
     Este asiento debe ser el "Asiento de Apertura" que registra los saldos iniciales.
     
+    nombre_archivo puede ser una ruta o un objeto tipo archivo (BytesIO).
+
     Returns:
-        bool: True si se generó exitosamente, False en caso contrario
+        ResultadoReporte (extra: 'diferencia' entre activo y pasivo + patrimonio)
     """
+    resultado = ResultadoReporte(progreso=progreso)
+
     # 1. OBTENER DATOS
     empresa = obtener_empresa(db)
-    primer_asiento = db.query(Asiento).order_by(Asiento.fecha).first()
+    primer_asiento = (
+        db.query(Asiento)
+        .options(selectinload(Asiento.detalles).joinedload(DetalleAsiento.cuenta))
+        .order_by(Asiento.fecha)
+        .first()
+    )
     
     if not primer_asiento:
-        print("❌ No hay asientos registrados.")
-        return False
+        return resultado.fallo("No hay asientos registrados. Crea primero un asiento de apertura.")
 
 
     doc = SimpleDocTemplate(nombre_archivo, pagesize=landscape(A4))
@@ -46,13 +57,6 @@ def generar_balance_situacion_inicial(db: Session, nombre_archivo="balance_situa
         elements.append(Paragraph("BALANCE DE SITUACIÓN INICIAL", styles['Title']))
         elements.append(Spacer(1, 12))
     
-    # --- OBTENER EL PRIMER ASIENTO ---
-    primer_asiento = db.query(Asiento).order_by(Asiento.fecha).first()
-    
-    if not primer_asiento:
-        print("❌ No hay asientos registrados. Crea primero un asiento de apertura.")
-        return False
-    
     # Mostrar información del asiento de apertura
     fecha_texto = f"Al: {primer_asiento.fecha.strftime('%d de %B de %Y')}"
     elements.append(Paragraph(fecha_texto, styles['Heading3']))
@@ -213,10 +217,6 @@ def generar_balance_situacion_inicial(db: Session, nombre_archivo="balance_situa
     detalle = f"Activos: ${total_activo:,.2f} | Pasivos: ${total_pasivo:,.2f} | Patrimonio: ${total_patrimonio:,.2f}"
     elements.append(Paragraph(detalle, styles['Normal']))
     
-    try:
-        doc.build(elements)
-        print(f"✅ Balance de Situación Inicial generado: {nombre_archivo}")
-        return True
-    except Exception as e:
-        print(f"❌ Error al generar PDF: {e}")
-        return False
+    resultado.filas = max_rows
+    resultado.extra['diferencia'] = diferencia
+    return construir_pdf(doc, elements, resultado, "Balance de Situación Inicial generado.")
@@ -0,0 +1,363 @@
+"""
+Generador de Estados Financieros comparativos (Estado de Resultados y Balance
+General en varias columnas), en PDF horizontal y en Excel.
+
+Modos:
+- "mensual": los 12 meses del año más el acumulado del año.
+- "anual": año anterior contra año actual, con variación absoluta y porcentual.
+
+Todas las columnas salen de UNA consulta agregada (monto por cuenta y mes)
+que luego se pivotea en memoria; generar cada columna con los reportes de una
+sola columna serían decenas de recorridos completos de los asientos.
+
+Los años cerrados (hasta empresa.cierre_hasta) ya no están en la BD viva: se
+leen de su archivo (src/servicios/cierre.py), sin el asiento de cierre, con
+una consulta más por año.
+"""
+from collections import defaultdict
+from datetime import date
+
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Font, PatternFill
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from src.base_datos.instrumentacion import instrumentado
+from src.modelos.entidades import Asiento, Cuenta, DetalleAsiento
+from src.servicios.cierre import sumas_archivadas, tiene_archivo
+from src.servicios.empresa import obtener_empresa
+from src.reportes.encabezado import crear_encabezado_empresa
+from src.reportes.resultado import ResultadoReporte, construir_pdf
+from .utilidades import rango_fechas_asientos
+
+MODOS = ("mensual", "anual")
+MESES = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+
+# Periodo en el que se acumula todo lo anterior al rango pedido (ordena antes que "AAAA-MM")
+APERTURA = "0000-00"
+
+
+def montos_por_cuenta_y_periodo(db: Session, desde: date, hasta: date):
+    """
+    Monto neto de cada cuenta en cada mes entre `desde` y `hasta`, en una sola
+    consulta agrupada. Lo anterior a `desde` se suma en el periodo APERTURA
+    (lo necesita el Balance General, que muestra saldos acumulados).
+    El signo respeta la naturaleza: Debe - Haber en deudoras, Haber - Debe en acreedoras.
+
+    Returns:
+        list: [(codigo, nombre, periodo 'AAAA-MM', monto)]
+    """
+    periodo = case((Asiento.fecha < desde, APERTURA), else_=func.strftime('%Y-%m', Asiento.fecha))
+    monto = case(
+        (func.upper(Cuenta.naturaleza) == 'DEUDORA', DetalleAsiento.debe - DetalleAsiento.haber),
+        else_=DetalleAsiento.haber - DetalleAsiento.debe
+    )
+    return (
+        db.query(Cuenta.codigo, Cuenta.nombre, periodo.label("periodo"), func.sum(monto))
+        .join(DetalleAsiento, DetalleAsiento.cuenta_id == Cuenta.id)
+        .join(Asiento, DetalleAsiento.asiento_id == Asiento.id)
+        .filter(Asiento.fecha <= hasta)
+        .group_by(Cuenta.id, periodo)
+        .all()
+    )
+
+
+def montos_archivados(db: Session, desde: date, hasta: date):
+    """
+    Lo mismo que montos_por_cuenta_y_periodo para los años cerrados entre
+    `desde` y `hasta`, leído de sus archivos y sin el asiento de cierre.
+
+    Raises:
+        ValueError: si falta el archivo de un año cerrado con asientos (ver tiene_archivo)
+    """
+    naturalezas = dict(db.query(Cuenta.codigo, Cuenta.naturaleza))
+    filas = []
+    for anio in range(desde.year, hasta.year + 1):
+        if not tiene_archivo(db.get_bind(), anio):
+            continue
+        for codigo, nombre, periodo, debe, haber in sumas_archivadas(db, anio, por_mes=True):
+            debe, haber = debe or 0.0, haber or 0.0
+            deudora = (naturalezas.get(codigo) or "").upper() == 'DEUDORA'
+            filas.append((codigo, nombre, periodo, debe - haber if deudora else haber - debe))
+    return filas
+
+
+def _columnas(anio: int, modo: str):
+    """[(título, primer periodo, último periodo)] para el Estado de Resultados y para el Balance."""
+    if modo == "anual":
+        columnas = [(str(a), f"{a}-01", f"{a}-12") for a in (anio - 1, anio)]
+        return columnas, columnas
+    meses = [(MESES[m - 1], f"{anio}-{m:02d}", f"{anio}-{m:02d}") for m in range(1, 13)]
+    # En el Balance el acumulado del año es el saldo de diciembre: no se repite
+    return meses + [("Acumulado", f"{anio}-01", f"{anio}-12")], meses
+
+
+def _con_variacion(valores):
+    """[anterior, actual] -> [anterior, actual, variación, variación % (None si no hay base)]"""
+    anterior, actual = valores
+    variacion = actual - anterior
+    return [anterior, actual, variacion, variacion / abs(anterior) * 100 if abs(anterior) > 0.005 else None]
+
+
+def calcular_estados_comparativos(db: Session, anio: int = None, modo: str = "mensual"):
+    """
+    Arma las filas de ambos estados para todas las columnas del modo.
+    anio: año a presentar (por defecto el del último asiento).
+
+    Returns:
+        dict con 'anio', 'modo', 'estado_resultados' y 'balance_general'; cada
+        estado es {'columnas': [títulos], 'filas': [(tipo, código, nombre, [valores])]}
+        donde tipo es 'titulo', 'cuenta', 'total' o 'resultado'. None si no hay asientos.
+
+    Raises:
+        ValueError: modo desconocido, o falta el archivo de un año cerrado
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo desconocido: {modo}. Use uno de {MODOS}.")
+    if anio is None:
+        _, ultima = rango_fechas_asientos(db)
+        if ultima is None:
+            return None
+        anio = ultima.year
+
+    columnas_er, columnas_bg = _columnas(anio, modo)
+    desde, hasta = date(anio - 1 if modo == "anual" else anio, 1, 1), date(anio, 12, 31)
+    empresa = obtener_empresa(db)
+    cierre = empresa.cierre_hasta if empresa else None
+
+    # 1. Una consulta (más una por año cerrado), pivoteada: cuenta -> {periodo: monto}
+    filas = []
+    if cierre and desde <= cierre:
+        filas += montos_archivados(db, desde, min(hasta, cierre))
+    if not cierre or hasta > cierre:
+        filas += montos_por_cuenta_y_periodo(db, desde, hasta)
+    nombres = {}
+    montos = defaultdict(dict)
+    for codigo, nombre, periodo, monto in filas:
+        nombres[codigo] = nombre
+        montos[codigo][periodo] = monto or 0.0
+
+    corte = cierre.strftime('%Y-%m') if cierre else None
+
+    def tramo(periodo):
+        """Año del archivo del que sale el periodo, o "viva" si sale de la BD viva."""
+        return periodo[:4] if corte and APERTURA < periodo <= corte else "viva"
+
+    def flujo(codigo):
+        """Movimiento de cada columna (Estado de Resultados)."""
+        return [sum(m for p, m in montos[codigo].items() if ini <= p <= fin) for _, ini, fin in columnas_er]
+
+    def acumulado(codigo):
+        """
+        Saldo al cierre de cada columna (Balance General). Se acumula solo
+        dentro de su tramo: cada archivo y la BD viva empiezan con el asiento
+        de apertura, que ya trae los saldos anteriores.
+        """
+        return [sum(m for p, m in montos[codigo].items() if p <= fin and tramo(p) == tramo(fin))
+                for _, _, fin in columnas_bg]
+
+    def seccion(filas, titulo, prefijo, valores_de, columnas):
+        filas.append(('titulo', "", titulo, []))
+        total = [0.0] * len(columnas)
+        for codigo in sorted(c for c in montos if c.startswith(prefijo)):
+            valores = valores_de(codigo)
+            if any(abs(v) > 0.01 for v in valores):
+                filas.append(('cuenta', codigo, nombres[codigo], valores))
+                total = [t + v for t, v in zip(total, valores)]
+        filas.append(('total', "", f"TOTAL {titulo}", total))
+        return total
+
+    # 2. Estado de Resultados (mismas clases que generar_estado_resultados)
+    er = []
+    ingresos = seccion(er, "INGRESOS OPERACIONALES", "4", flujo, columnas_er)
+    costos = seccion(er, "COSTO DE VENTAS", "6", flujo, columnas_er)
+    bruta = [i - c for i, c in zip(ingresos, costos)]
+    er.append(('resultado', "", "UTILIDAD BRUTA", bruta))
+    gastos = seccion(er, "GASTOS OPERACIONALES", "5", flujo, columnas_er)
+    er.append(('resultado', "", "UTILIDAD NETA", [b - g for b, g in zip(bruta, gastos)]))
+
+    # 3. Balance General: saldos acumulados al cierre de cada columna
+    bg = []
+    activo = seccion(bg, "ACTIVOS", "1", acumulado, columnas_bg)
+    pasivo = seccion(bg, "PASIVOS", "2", acumulado, columnas_bg)
+    patrimonio = seccion(bg, "PATRIMONIO", "3", acumulado, columnas_bg)
+    resultado_acumulado = [0.0] * len(columnas_bg)
+    for prefijo, signo in (("4", 1), ("6", -1), ("5", -1)):
+        for codigo in (c for c in montos if c.startswith(prefijo)):
+            resultado_acumulado = [r + signo * v for r, v in zip(resultado_acumulado, acumulado(codigo))]
+    bg.insert(len(bg) - 1, ('cuenta', "", "Resultado del Ejercicio", resultado_acumulado))
+    patrimonio = [p + r for p, r in zip(patrimonio, resultado_acumulado)]
+    bg[-1] = ('total', "", "TOTAL PATRIMONIO", patrimonio)
+    bg.append(('resultado', "", "TOTAL PASIVO + PATRIMONIO", [p + q for p, q in zip(pasivo, patrimonio)]))
+    bg.append(('resultado', "", "DIFERENCIA (ACTIVO - PASIVO - PATRIMONIO)",
+               [round(a - p - q, 2) for a, p, q in zip(activo, pasivo, patrimonio)]))
+
+    estados = {
+        'estado_resultados': {'columnas': [c[0] for c in columnas_er], 'filas': er},
+        'balance_general': {'columnas': [c[0] for c in columnas_bg], 'filas': bg},
+    }
+    if modo == "anual":
+        for estado in estados.values():
+            estado['columnas'] += ["Variación", "Var. %"]
+            estado['filas'] = [
+                (tipo, codigo, nombre, _con_variacion(valores) if valores else valores)
+                for tipo, codigo, nombre, valores in estado['filas']
+            ]
+    return {'anio': anio, 'modo': modo, **estados}
+
+
+def _celdas(valores, modo):
+    """Montos con dos decimales; en el modo anual la última columna es un porcentaje."""
+    if modo == "anual" and valores:
+        porcentaje = "—" if valores[3] is None else f"{valores[3]:,.1f}%"
+        return [f"{v:,.2f}" for v in valores[:3]] + [porcentaje]
+    return [f"{v:,.2f}" for v in valores]
+
+
+def _tabla_pdf(estado, modo):
+    columnas = estado['columnas']
+    data = [["CÓD", "CUENTA"] + columnas]
+    estilo = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+        # 13 columnas en A4 horizontal: letra chica y poco relleno para que quepan montos de millones
+        ('FONTSIZE', (0, 0), (-1, -1), 6 if modo == "mensual" else 8),
+        ('LEFTPADDING', (2, 0), (-1, -1), 2),
+        ('RIGHTPADDING', (2, 0), (-1, -1), 2),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.lightgrey),
+    ]
+    for tipo, codigo, nombre, valores in estado['filas']:
+        fila = len(data)
+        if tipo == 'cuenta':
+            nombre = f"{'  ' * codigo.count('.')}{nombre}"
+        data.append([codigo, nombre[:42]] + (_celdas(valores, modo) or [""] * len(columnas)))
+
+        if tipo == 'titulo':
+            estilo += [('SPAN', (1, fila), (-1, fila)), ('FONTNAME', (0, fila), (-1, fila), 'Helvetica-Bold'),
+                       ('BACKGROUND', (0, fila), (-1, fila), colors.whitesmoke)]
+        elif tipo in ('total', 'resultado'):
+            estilo += [('FONTNAME', (0, fila), (-1, fila), 'Helvetica-Bold'),
+                       ('LINEABOVE', (0, fila), (-1, fila), 0.75, colors.black)]
+        if tipo == 'resultado':
+            estilo.append(('BACKGROUND', (0, fila), (-1, fila), colors.lightgrey))
+
+    ancho_valores = 46 if modo == "mensual" else 95
+    t = Table(data, colWidths=[42, 150] + [ancho_valores] * len(columnas), repeatRows=1)
+    t.setStyle(TableStyle(estilo))
+    return t
+
+
+@instrumentado("reporte.estados_comparativos")
+def generar_pdf_estados_comparativos(db: Session, anio: int = None, modo: str = "mensual",
+                                     nombre_archivo="estados_comparativos.pdf", progreso=None):
+    """
+    Estado de Resultados y Balance General comparativos en un PDF horizontal.
+    nombre_archivo puede ser una ruta o un objeto tipo archivo (BytesIO).
+    Returns:
+        ResultadoReporte (extra: 'anio', 'modo', 'diferencias' del Balance por columna)
+    """
+    resultado = ResultadoReporte(progreso=progreso)
+    empresa = obtener_empresa(db)
+    try:
+        estados = calcular_estados_comparativos(db, anio, modo)
+    except ValueError as e:
+        return resultado.fallo(str(e))
+    if estados is None:
+        return resultado.fallo("No hay asientos para comparar.")
+    resultado.notificar("datos")
+
+    doc = SimpleDocTemplate(nombre_archivo, pagesize=landscape(A4), leftMargin=25, rightMargin=25,
+                            topMargin=30, bottomMargin=30)
+    elements = []
+    styles = getSampleStyleSheet()
+    subtitulo = "MENSUAL" if modo == "mensual" else f"{estados['anio'] - 1} vs {estados['anio']}"
+
+    for clave, titulo in (('estado_resultados', "ESTADO DE RESULTADOS"), ('balance_general', "BALANCE GENERAL")):
+        if elements:
+            elements.append(PageBreak())
+        encabezado = f"{titulo} COMPARATIVO ({subtitulo})"
+        if empresa:
+            elements.extend(crear_encabezado_empresa(
+                empresa, encabezado,
+                date(estados['anio'] - (1 if modo == "anual" else 0), 1, 1), date(estados['anio'], 12, 31)
+            ))
+        else:
+            elements.append(Paragraph(encabezado, styles['Title']))
+            elements.append(Spacer(1, 12))
+        elements.append(_tabla_pdf(estados[clave], modo))
+        resultado.filas += len(estados[clave]['filas'])
+
+    resultado.extra.update(anio=estados['anio'], modo=modo, diferencias=estados['balance_general']['filas'][-1][3])
+    return construir_pdf(doc, elements, resultado, f"Estados comparativos {estados['anio']} generados.")
+
+
+@instrumentado("reporte.estados_comparativos_xlsx")
+def generar_xlsx_estados_comparativos(db: Session, anio: int = None, modo: str = "mensual",
+                                      nombre_archivo="estados_comparativos.xlsx", progreso=None):
+    """
+    Los mismos estados comparativos en un libro de Excel (una hoja por estado,
+    con los montos como números para poder seguir trabajándolos).
+    nombre_archivo puede ser una ruta o un objeto tipo archivo (BytesIO).
+    Returns:
+        ResultadoReporte
+    """
+    resultado = ResultadoReporte(progreso=progreso)
+    try:
+        estados = calcular_estados_comparativos(db, anio, modo)
+    except ValueError as e:
+        return resultado.fallo(str(e))
+    if estados is None:
+        return resultado.fallo("No hay asientos para comparar.")
+    resultado.notificar("datos")
+
+    libro = Workbook()
+    negrita = Font(bold=True)
+    relleno_titulo = PatternFill("solid", fgColor="1F3864")
+    libro.remove(libro.active)
+
+    for clave, titulo in (('estado_resultados', "Estado de Resultados"), ('balance_general', "Balance General")):
+        estado = estados[clave]
+        hoja = libro.create_sheet(titulo)
+        hoja.append(["Código", "Cuenta"] + estado['columnas'])
+        for celda in hoja[1]:
+            celda.font = Font(bold=True, color="FFFFFF")
+            celda.fill = relleno_titulo
+            celda.alignment = Alignment(horizontal="center")
+
+        for tipo, codigo, nombre, valores in estado['filas']:
+            if modo == "anual" and valores:
+                # La variación % se guarda como fracción para el formato de porcentaje de Excel
+                valores = valores[:3] + [valores[3] / 100 if valores[3] is not None else None]
+            hoja.append([codigo, nombre] + list(valores))
+            fila = hoja.max_row
+            if tipo == 'cuenta':
+                hoja.cell(fila, 2).alignment = Alignment(indent=codigo.count('.'))
+            else:
+                for celda in hoja[fila]:
+                    celda.font = negrita
+            for columna in range(3, 3 + len(valores)):
+                es_porcentaje = modo == "anual" and columna == 3 + 3
+                hoja.cell(fila, columna).number_format = '0.0%' if es_porcentaje else '#,##0.00'
+
+        hoja.freeze_panes = "C2"
+        hoja.column_dimensions['A'].width = 12
+        hoja.column_dimensions['B'].width = 40
+        for columna in range(3, 3 + len(estado['columnas'])):
+            hoja.column_dimensions[hoja.cell(1, columna).column_letter].width = 14
+        resultado.filas += len(estado['filas'])
+
+    resultado.marcar("datos")
+    try:
+        libro.save(nombre_archivo)
+    except Exception as e:
+        resultado.marcar("render")
+        return resultado.fallo(f"Error al generar Excel: {e}")
+    resultado.marcar("render")
+    resultado.exito = True
+    resultado.mensaje = f"Estados comparativos {estados['anio']} exportados a Excel."
+    return resultado
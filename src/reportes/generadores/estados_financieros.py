@@ -1,25 +1,33 @@
 """
 Generador de Estados Financieros (Estado de Resultados y Balance General).
 """
+import os
+from io import BytesIO
+
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from sqlalchemy.orm import Session
-from .utilidades import obtener_saldo_cuenta, obtener_cuentas_con_saldo_detallado
-from src.modelos.entidades import Asiento
+from src.base_datos.instrumentacion import instrumentado
+from .utilidades import obtener_saldo_cuenta, obtener_cuentas_con_saldo_detallado, rango_fechas_asientos
 from src.servicios.empresa import obtener_empresa
 from src.reportes.encabezado import crear_encabezado_empresa
+from src.reportes.resultado import ResultadoReporte, construir_pdf
 
 
-def generar_estado_resultados(db: Session, nombre_archivo="estado_resultados.pdf"):
+@instrumentado("reporte.estado_resultados")
+def generar_estado_resultados(db: Session, nombre_archivo="estado_resultados.pdf", progreso=None):
     """
     Estado de Resultados SIMPLE - CORREGIDO
+    nombre_archivo puede ser una ruta o un objeto tipo archivo (BytesIO).
+
+    Returns:
+        ResultadoReporte (extra: 'utilidad_neta', que necesita generar_balance_general)
     """
+    resultado = ResultadoReporte(progreso=progreso)
     empresa = obtener_empresa(db)
-    asientos = db.query(Asiento).order_by(Asiento.fecha).all()
-    fecha_inicio = asientos[0].fecha if asientos else None
-    fecha_fin = asientos[-1].fecha if asientos else None
+    fecha_inicio, fecha_fin = rango_fechas_asientos(db)
     
     doc = SimpleDocTemplate(nombre_archivo, pagesize=A4)
     elements = []
@@ -107,16 +115,15 @@ def generar_estado_resultados(db: Session, nombre_archivo="estado_resultados.pdf
     
     elements.append(t)
     
-    try:
-        doc.build(elements)
-        print(f"✅ Reporte generado: ${utilidad_neta:,.2f}")
-        return utilidad_neta
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        return 0.0
+    # La utilidad se informa aunque falle el PDF: el Balance General la necesita igual
+    resultado.filas = len(data) - 1
+    resultado.extra['utilidad_neta'] = utilidad_neta
+    return construir_pdf(doc, elements, resultado, f"Estado de Resultados generado (Utilidad: ${utilidad_neta:,.2f}).")
 
 
-def generar_balance_general(db: Session, utilidad_ejercicio: float, nombre_archivo="balance_general.pdf"):
+@instrumentado("reporte.balance_general")
+def generar_balance_general(db: Session, utilidad_ejercicio: float, nombre_archivo="balance_general.pdf",
+                            progreso=None):
     """
     Genera el Balance General (Estado de Situación Financiera).
     
@@ -125,11 +132,16 @@ def generar_balance_general(db: Session, utilidad_ejercicio: float, nombre_archi
     2. Mejora la presentación con subtotales
     3. Incluye validación de la ecuación contable
     4. Formato más profesional y legible
+
+    nombre_archivo puede ser una ruta o un objeto tipo archivo (BytesIO).
+    Returns:
+        ResultadoReporte (extra: 'diferencia' entre activo y pasivo + patrimonio)
     """
+    resultado = ResultadoReporte(progreso=progreso)
+
     # Usamos landscape (horizontal) para que quepan bien las dos columnas
     empresa = obtener_empresa(db)
-    asientos = db.query(Asiento).order_by(Asiento.fecha).all()
-    fecha_corte = asientos[-1].fecha if asientos else None
+    _, fecha_corte = rango_fechas_asientos(db)
 
     doc = SimpleDocTemplate(nombre_archivo, pagesize=landscape(A4))
     elements = []
@@ -254,10 +266,43 @@ def generar_balance_general(db: Session, utilidad_ejercicio: float, nombre_archi
     detalle_ec = f"Activos: ${total_activo:,.2f} | Pasivos: ${total_pasivo:,.2f} | Patrimonio: ${total_patrimonio_final:,.2f}"
     elements.append(Paragraph(detalle_ec, styles['Normal']))
     
-    try:
-        doc.build(elements)
-        print(f"✅ Balance General generado exitosamente: {nombre_archivo}")
-        return True
-    except Exception as e:
-        print(f"❌ Error al generar PDF Balance General: {e}")
-        return False
+    resultado.filas = max_rows
+    resultado.extra['diferencia'] = diferencia
+    return construir_pdf(doc, elements, resultado, "Balance General generado.")
+
+
+def generar_estados_financieros(db: Session, nombre_archivo="estado_resultados.pdf", progreso=None,
+                                nombre_balance="balance_general.pdf"):
+    """
+    Estado de Resultados y, con su utilidad, el Balance General en un solo
+    trabajo del GestorTrabajos (en_memoria=False: escribe los dos archivos).
+    Los dos PDF se arman en memoria y se escriben solo si ambos salieron bien.
+
+    Returns:
+        ResultadoReporte con los totales de ambos (extra: 'utilidad_neta' y 'diferencia')
+    """
+    pdf_er, pdf_bg = BytesIO(), BytesIO()
+    er = generar_estado_resultados(db, pdf_er, progreso)
+    if not er.exito:
+        return er
+    bg = generar_balance_general(db, er.extra.get('utilidad_neta', 0.0), pdf_bg, progreso)
+    bg.advertencias[:0] = er.advertencias
+    if not bg.exito:
+        return bg
+
+    for destino, pdf in ((nombre_archivo, pdf_er), (nombre_balance, pdf_bg)):
+        temporal = f"{destino}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(pdf.getvalue())
+        os.replace(temporal, destino)
+
+    return ResultadoReporte(
+        exito=True,
+        mensaje=f"{er.mensaje} {bg.mensaje}",
+        paginas=er.paginas + bg.paginas,
+        filas=er.filas + bg.filas,
+        tiempos={fase: round(er.tiempos.get(fase, 0.0) + bg.tiempos.get(fase, 0.0), 4)
+                 for fase in {**er.tiempos, **bg.tiempos}},
+        advertencias=bg.advertencias,
+        extra={**er.extra, **bg.extra},
+    )
@@ -1,17 +1,21 @@
 """
 Generador de Libro Diario en formato PDF.
 """
+from itertools import groupby
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from sqlalchemy.orm import Session
-from src.modelos.entidades import Asiento
+from src.base_datos.instrumentacion import instrumentado
+from src.modelos.entidades import Asiento, Cuenta, DetalleAsiento
 from src.servicios.empresa import obtener_empresa
 from src.reportes.encabezado import crear_encabezado_empresa
+from src.reportes.resultado import ResultadoReporte, construir_pdf
 
 
-def generar_pdf_libro_diario(db: Session, nombre_archivo="libro_diario.pdf"):
+@instrumentado("reporte.libro_diario")
+def generar_pdf_libro_diario(db: Session, nombre_archivo="libro_diario.pdf", progreso=None):
     """
     Genera un PDF con todos los asientos contables ordenados por fecha.
     Incluye encabezado profesional con datos de la empresa.
@@ -19,17 +23,33 @@ def generar_pdf_libro_diario(db: Session, nombre_archivo="libro_diario.pdf"):
     FORMATO CONTABLE TRADICIONAL:
     - Cuentas del DEBE: Sin sangría (izquierda)
     - Cuentas del HABER: Con sangría (derecha) mediante indentación
+
+    nombre_archivo puede ser una ruta o un objeto tipo archivo (BytesIO).
+    Returns:
+        ResultadoReporte
     """
+    resultado = ResultadoReporte(progreso=progreso)
+
     # 1. OBTENER EMPRESA
     empresa = obtener_empresa(db)
     if not empresa:
-        print("⚠️ [ADVERTENCIA] No hay empresa configurada. El reporte no tendrá encabezado.")
+        resultado.advertencias.append("No hay empresa configurada. El reporte no tendrá encabezado.")
     
     # 2. CONSULTAR DATOS PRIMERO (para obtener el período)
     asientos = db.query(Asiento).order_by(Asiento.fecha).all()
     if not asientos:
-        print("❌ No hay datos para generar el reporte.")
-        return False
+        return resultado.fallo("No hay datos para generar el reporte.")
+    
+    # Detalles de todos los asientos con su cuenta en una sola consulta
+    # (recorrer asiento.detalles y detalle.cuenta hacía una consulta por asiento y por cuenta)
+    filas_detalle = (
+        db.query(DetalleAsiento.asiento_id, DetalleAsiento.debe, DetalleAsiento.haber, Cuenta.codigo, Cuenta.nombre)
+        .join(Cuenta, DetalleAsiento.cuenta_id == Cuenta.id)
+        .order_by(DetalleAsiento.asiento_id, DetalleAsiento.id)
+    )
+    detalles_por_asiento = {
+        asiento_id: list(grupo) for asiento_id, grupo in groupby(filas_detalle, key=lambda d: d.asiento_id)
+    }
     
     # 3. OBTENER RANGO DE FECHAS (del primer al último asiento)
     fecha_inicio = asientos[0].fecha
@@ -75,16 +95,16 @@ def generar_pdf_libro_diario(db: Session, nombre_archivo="libro_diario.pdf"):
         filas_debe = []
         filas_haber = []
         
-        for detalle in asiento.detalles:
+        for detalle in detalles_por_asiento.get(asiento.id, []):
             # Cuenta del DEBE (sin sangría)
             if detalle.debe > 0:
                 nombre_cuenta_debe = Paragraph(
-                    f"{detalle.cuenta.nombre}",
+                    f"{detalle.nombre}",
                     styles['Normal']
                 )
                 filas_debe.append([
                     "",  # Fecha vacía
-                    detalle.cuenta.codigo,
+                    detalle.codigo,
                     nombre_cuenta_debe,
                     f"{detalle.debe:,.2f}",
                     ""  # Haber vacío
@@ -93,12 +113,12 @@ def generar_pdf_libro_diario(db: Session, nombre_archivo="libro_diario.pdf"):
             # Cuenta del HABER (con sangría)
             if detalle.haber > 0:
                 nombre_cuenta_haber = Paragraph(
-                    f"    {detalle.cuenta.nombre}",
+                    f"    {detalle.nombre}",
                     styles['Normal']
                 )
                 filas_haber.append([
                     "",  # Fecha vacía
-                    detalle.cuenta.codigo,
+                    detalle.codigo,
                     nombre_cuenta_haber,
                     "",  # Debe vacío
                     f"{detalle.haber:,.2f}"
@@ -117,6 +137,8 @@ def generar_pdf_libro_diario(db: Session, nombre_archivo="libro_diario.pdf"):
             data.append(fila)
         
         data.append(["", "", "", "", ""])
+        resultado.filas = len(data) - 1
+        resultado.notificar("datos")
     
     # Fila de Totales Generales
     data.append([
@@ -174,10 +196,5 @@ def generar_pdf_libro_diario(db: Session, nombre_archivo="libro_diario.pdf"):
     elements.append(validacion)
     
     # 9. CONSTRUIR PDF
-    try:
-        doc.build(elements)
-        print(f"✅ PDF generado exitosamente: {nombre_archivo}")
-        return True
-    except Exception as e:
-        print(f"❌ Error al generar PDF: {e}")
-        return False
+    resultado.filas = len(data) - 2  # sin encabezado ni totales
+    return construir_pdf(doc, elements, resultado, "Libro Diario generado.")
@@ -1,24 +1,32 @@
 """
-Generador de Libro Mayor en formato de Cuentas T.
+Generador de Libro Mayor: formato de Cuentas T y formato en columnas con saldo.
 """
+from itertools import groupby
+from xml.sax.saxutils import escape
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from sqlalchemy.orm import Session
-from src.modelos.entidades import Cuenta, Asiento
+from src.base_datos.instrumentacion import instrumentado
+from src.modelos.entidades import Cuenta, Asiento, DetalleAsiento
 from src.servicios.empresa import obtener_empresa
 from src.reportes.encabezado import crear_encabezado_empresa
+from src.reportes.resultado import ResultadoReporte, construir_pdf
+from .utilidades import movimientos_mayor_con_saldo, rango_fechas_asientos
 
 
-def generar_pdf_libro_mayor(db: Session, nombre_archivo="libro_mayor.pdf"):
+@instrumentado("reporte.libro_mayor")
+def generar_pdf_libro_mayor(db: Session, nombre_archivo="libro_mayor.pdf", progreso=None):
     """
     Genera un reporte visual en forma de "CUENTAS T".
+    nombre_archivo puede ser una ruta o un objeto tipo archivo (BytesIO).
+    Returns:
+        ResultadoReporte
     """
+    resultado = ResultadoReporte(progreso=progreso)
     empresa = obtener_empresa(db)
-    asientos = db.query(Asiento).order_by(Asiento.fecha).all()
-    fecha_inicio = asientos[0].fecha if asientos else None
-    fecha_fin = asientos[-1].fecha if asientos else None
+    fecha_inicio, fecha_fin = rango_fechas_asientos(db)
 
     doc = SimpleDocTemplate(nombre_archivo, pagesize=A4)
     elements = []
@@ -35,14 +43,22 @@ def generar_pdf_libro_mayor(db: Session, nombre_archivo="libro_mayor.pdf"):
         elements.append(Paragraph("LIBRO MAYOR (FORMATO T)", styles['Title']))
         elements.append(Spacer(1, 15))
     
-    # Consultar cuentas
-    cuentas = db.query(Cuenta).order_by(Cuenta.codigo).all()
+    # Consultar todos los movimientos con su cuenta y fecha en una sola consulta,
+    # ordenados por cuenta para agruparlos en memoria
+    movimientos = (
+        db.query(
+            Cuenta.id, Cuenta.codigo, Cuenta.nombre,
+            DetalleAsiento.asiento_id, DetalleAsiento.debe, DetalleAsiento.haber, Asiento.fecha
+        )
+        .join(DetalleAsiento, DetalleAsiento.cuenta_id == Cuenta.id)
+        .join(Asiento, DetalleAsiento.asiento_id == Asiento.id)
+        .order_by(Cuenta.codigo, Cuenta.id, DetalleAsiento.id)
+    )
     hay_datos = False
     
-    for cuenta in cuentas:
-        if not cuenta.detalles:
-            continue
-        
+    for _, grupo in groupby(movimientos, key=lambda m: m.id):
+        detalles = list(grupo)
+        cuenta = detalles[0]
         hay_datos = True
         
         # --- PREPARACIÓN DE DATOS TIPO T ---
@@ -52,8 +68,8 @@ def generar_pdf_libro_mayor(db: Session, nombre_archivo="libro_mayor.pdf"):
         sum_debe = 0.0
         sum_haber = 0.0
         
-        for d in cuenta.detalles:
-            txt_detalle = f"{d.asiento.fecha} (As. {d.asiento_id})\n"
+        for d in detalles:
+            txt_detalle = f"{d.fecha} (As. {d.asiento_id})\n"
             
             if d.debe > 0:
                 movs_debe.append((txt_detalle, d.debe))
@@ -87,6 +103,8 @@ def generar_pdf_libro_mayor(db: Session, nombre_archivo="libro_mayor.pdf"):
                 celda_der = ""
             
             data.append([celda_izq, celda_der])
+        resultado.filas += max_filas
+        resultado.notificar("datos")
         
         # 4. Filas de Sumas y Saldos
         data.append([
@@ -133,12 +151,87 @@ def generar_pdf_libro_mayor(db: Session, nombre_archivo="libro_mayor.pdf"):
         elements.append(Spacer(1, 25))
     
     if not hay_datos:
-        print("No hay movimientos.")
-        return False
+        return resultado.fallo("No hay movimientos.")
     
-    try:
-        doc.build(elements)
-        return True
-    except Exception as e:
-        print(f"Error PDF Mayor T: {e}")
-        return False
+    return construir_pdf(doc, elements, resultado, "Libro Mayor generado.")
+
+
+@instrumentado("reporte.libro_mayor_saldos")
+def generar_pdf_mayor_con_saldo(db: Session, nombre_archivo="libro_mayor_saldos.pdf", progreso=None):
+    """
+    Genera el Libro Mayor en columnas: por cada cuenta, sus movimientos en orden
+    de fecha con el saldo después de cada uno (útil para conciliar).
+    El saldo acumulado viene calculado de la base de datos (función de ventana).
+    nombre_archivo puede ser una ruta o un objeto tipo archivo (BytesIO).
+    Returns:
+        ResultadoReporte
+    """
+    resultado = ResultadoReporte(progreso=progreso)
+    empresa = obtener_empresa(db)
+    fecha_inicio, fecha_fin = rango_fechas_asientos(db)
+    if fecha_inicio is None:
+        return resultado.fallo("No hay movimientos.")
+
+    doc = SimpleDocTemplate(nombre_archivo, pagesize=A4)
+    elements = []
+    styles = getSampleStyleSheet()
+    estilo_detalle = ParagraphStyle('Detalle', parent=styles['Normal'], fontSize=8, leading=10)
+
+    if empresa:
+        elements.extend(crear_encabezado_empresa(empresa, "LIBRO MAYOR (SALDOS)", fecha_inicio, fecha_fin))
+    else:
+        elements.append(Paragraph("LIBRO MAYOR (SALDOS)", styles['Title']))
+        elements.append(Spacer(1, 15))
+
+    for _, grupo in groupby(movimientos_mayor_con_saldo(db), key=lambda m: m.cuenta_id):
+        # 1. Encabezados: cuenta y columnas
+        data = None
+        sum_debe = sum_haber = saldo = 0.0
+        for m in grupo:
+            if data is None:
+                data = [
+                    [f"{m.codigo} - {m.nombre} ({m.naturaleza.capitalize()})", "", "", "", "", ""],
+                    ["FECHA", "AS.", "DESCRIPCIÓN", "DEBE", "HABER", "SALDO"],
+                ]
+
+            # 2. Una fila por movimiento, con el saldo que trae la consulta
+            data.append([
+                str(m.fecha), str(m.asiento_id), Paragraph(escape(m.descripcion), estilo_detalle),
+                f"{m.debe:,.2f}" if m.debe else "",
+                f"{m.haber:,.2f}" if m.haber else "",
+                f"{m.saldo:,.2f}"
+            ])
+            sum_debe += m.debe
+            sum_haber += m.haber
+            saldo = m.saldo
+
+        movimientos = len(data) - 2
+        resultado.filas += movimientos
+        resultado.notificar("datos")
+
+        # 3. Totales y saldo final de la cuenta
+        data.append(["", "", "SUMAS Y SALDO", f"{sum_debe:,.2f}", f"{sum_haber:,.2f}", f"{saldo:,.2f}"])
+
+        t = Table(data, colWidths=[58, 32, 195, 62, 62, 68], repeatRows=2)
+        t.setStyle(TableStyle([
+            # Título de la cuenta
+            ('SPAN', (0, 0), (-1, 0)),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.navy),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            # Encabezados de columna
+            ('BACKGROUND', (0, 1), (-1, 1), colors.lightgrey),
+            ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),
+            ('VALIGN', (0, 2), (-1, -1), 'TOP'),
+            ('GRID', (0, 1), (-1, -1), 0.5, colors.lightgrey),
+            # Fila de totales
+            ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('BOX', (0, 0), (-1, -1), 0.5, colors.grey),
+        ]))
+        elements.append(t)
+        elements.append(Spacer(1, 18))
+
+    return construir_pdf(doc, elements, resultado, "Libro Mayor con saldos generado.")
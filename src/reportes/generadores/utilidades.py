@@ -1,8 +1,68 @@
 """
 Funciones auxiliares compartidas entre generadores de reportes.
 """
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
-from src.modelos.entidades import Cuenta
+from src.modelos.entidades import Asiento, Cuenta, DetalleAsiento
+
+
+def rango_fechas_asientos(db: Session):
+    """Fecha del primer y del último asiento, (None, None) si no hay asientos."""
+    return db.query(func.min(Asiento.fecha), func.max(Asiento.fecha)).one()
+
+
+def sumas_por_cuenta(db: Session, prefijo: str = "", cuenta_ids=None):
+    """
+    Sumas del Debe y del Haber de cada cuenta con movimientos, en una sola
+    consulta agrupada (en vez de recorrer cuenta.detalles cuenta por cuenta).
+    Con cuenta_ids se suman solo esas cuentas.
+
+    Returns:
+        list: [(Cuenta, suma_debe, suma_haber)] ordenada por código
+    """
+    query = (
+        db.query(Cuenta, func.sum(DetalleAsiento.debe), func.sum(DetalleAsiento.haber))
+        .join(DetalleAsiento, DetalleAsiento.cuenta_id == Cuenta.id)
+    )
+    if prefijo:
+        query = query.filter(Cuenta.codigo.like(f"{prefijo}%"))
+    if cuenta_ids is not None:
+        query = query.filter(Cuenta.id.in_(cuenta_ids))
+    return query.group_by(Cuenta.id).order_by(Cuenta.codigo).all()
+
+
+def movimientos_mayor_con_saldo(db: Session, por_lote: int = 1000):
+    """
+    Todas las líneas del mayor en una sola consulta, ordenadas por
+    (cuenta, fecha, asiento) y con el saldo acumulado después de cada línea.
+
+    El saldo lo calcula SQLite con SUM() OVER (PARTITION BY cuenta ...) y ya
+    respeta la naturaleza: Debe - Haber en las deudoras, Haber - Debe en las
+    acreedoras. Las filas se leen de a `por_lote` para no cargarlas todas.
+
+    Returns:
+        Query iterable de filas con: cuenta_id, codigo, nombre, naturaleza,
+        fecha, asiento_id, descripcion, debe, haber, saldo
+    """
+    movimiento = case(
+        (func.upper(Cuenta.naturaleza) == 'DEUDORA', DetalleAsiento.debe - DetalleAsiento.haber),
+        else_=DetalleAsiento.haber - DetalleAsiento.debe
+    )
+    orden = (Asiento.fecha, DetalleAsiento.asiento_id, DetalleAsiento.id)
+    saldo = func.sum(movimiento).over(
+        partition_by=DetalleAsiento.cuenta_id, order_by=orden, rows=(None, 0)
+    )
+    return (
+        db.query(
+            Cuenta.id.label("cuenta_id"), Cuenta.codigo, Cuenta.nombre, Cuenta.naturaleza,
+            Asiento.fecha, DetalleAsiento.asiento_id, Asiento.descripcion,
+            DetalleAsiento.debe, DetalleAsiento.haber, saldo.label("saldo")
+        )
+        .join(DetalleAsiento, DetalleAsiento.cuenta_id == Cuenta.id)
+        .join(Asiento, DetalleAsiento.asiento_id == Asiento.id)
+        .order_by(Cuenta.codigo, Cuenta.id, *orden)
+        .yield_per(por_lote)
+    )
 
 
 def obtener_saldo_cuenta(db: Session, codigo_cuenta: str):
@@ -17,16 +77,9 @@ def obtener_saldo_cuenta(db: Session, codigo_cuenta: str):
     Returns:
         float: Saldo total calculado según naturaleza
     """
-    cuentas = db.query(Cuenta).filter(Cuenta.codigo.like(f"{codigo_cuenta}%")).all()
     saldo_total = 0.0
     
-    for cuenta in cuentas:
-        if not cuenta.detalles:
-            continue
-        
-        debe = sum(d.debe for d in cuenta.detalles)
-        haber = sum(d.haber for d in cuenta.detalles)
-        
+    for cuenta, debe, haber in sumas_por_cuenta(db, codigo_cuenta):
         # Respetar la naturaleza de la cuenta
         if cuenta.naturaleza.upper() == 'DEUDORA':
             # Para cuentas deudoras: DEBE aumenta, HABER disminuye
@@ -52,20 +105,10 @@ def obtener_cuentas_con_saldo_detallado(db: Session, prefijo: str, styles):
     """
     from reportlab.platypus import Paragraph
     
-    cuentas = db.query(Cuenta).filter(
-        Cuenta.codigo.like(f"{prefijo}%")
-    ).order_by(Cuenta.codigo).all()
-    
     lista_resultado = []
     total_grupo = 0.0
     
-    for c in cuentas:
-        if not c.detalles:
-            continue
-        
-        debe = sum(d.debe for d in c.detalles)
-        haber = sum(d.haber for d in c.detalles)
-        
+    for c, debe, haber in sumas_por_cuenta(db, prefijo):
         # Calcular saldo según naturaleza
         if c.naturaleza.upper() == 'DEUDORA':
             saldo = debe - haber
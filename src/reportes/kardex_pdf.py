@@ -1,23 +1,108 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from src.base_datos.db import crear_motor
+from src.base_datos.instrumentacion import instrumentado
+from src.base_datos.multiempresa import empresa_de_sesion
 from src.modelos.entidades import Producto, MovimientoInventario
+from src.servicios.cierre import fecha_cerrada
 from src.servicios.empresa import obtener_empresa
 from src.reportes.encabezado import crear_encabezado_empresa
+from src.reportes.resultado import ResultadoReporte, construir_pdf
 
-def _crear_pdf_kardex(db: Session, nombre_archivo, titulo, lista_datos_productos):
+def _consultar_productos(db: Session, codigo_producto=None, rango_codigos=None):
+    """Productos a incluir en el kardex (todos, uno solo o un rango de códigos)."""
+    query = db.query(Producto).order_by(Producto.codigo)
+    if codigo_producto:
+        query = query.filter(Producto.codigo == codigo_producto)
+    if rango_codigos:
+        query = query.filter(Producto.codigo.between(*rango_codigos))
+    return query.all()
+
+def _consultar_movimientos(db: Session, productos, codigo_producto=None, fecha_fin=None, rango_codigos=None):
+    """
+    Trae los movimientos de los productos en un solo recorrido ordenado por
+    (producto_id, fecha, id), que es el orden del índice ix_movimientos_empresa_producto_fecha.
+    Incluye los movimientos anteriores a la fecha de inicio porque hacen falta
+    para calcular el saldo inicial.
+
+    Solo se leen las columnas que usa el cálculo (filas livianas, sin objetos ORM).
+
+    Returns:
+        dict: {producto_id: [fila, ...]}
+    """
+    query = db.query(
+        MovimientoInventario.producto_id,
+        MovimientoInventario.fecha,
+        MovimientoInventario.tipo,
+        MovimientoInventario.cantidad,
+        MovimientoInventario.costo_unitario,
+        MovimientoInventario.costo_total,
+    )
+    if codigo_producto:
+        query = query.filter(MovimientoInventario.producto_id.in_([p.id for p in productos]))
+    if rango_codigos:
+        ids_rango = select(Producto.id).where(Producto.codigo.between(*rango_codigos))
+        query = query.filter(MovimientoInventario.producto_id.in_(ids_rango))
+    if fecha_fin:
+        query = query.filter(MovimientoInventario.fecha <= fecha_fin)
+
+    query = query.order_by(
+        MovimientoInventario.producto_id,
+        MovimientoInventario.fecha,
+        MovimientoInventario.id
+    )
+    return {pid: list(movs) for pid, movs in groupby(query, key=lambda m: m.producto_id)}
+
+def _rango_fechas(db: Session, codigo_producto=None, fecha_inicio=None, fecha_fin=None):
+    """Primera y última fecha del reporte, resueltas con un MIN/MAX sobre el índice."""
+    if fecha_inicio and fecha_fin:
+        return fecha_inicio, fecha_fin
+
+    query = db.query(func.min(MovimientoInventario.fecha), func.max(MovimientoInventario.fecha))
+    if codigo_producto:
+        id_producto = select(Producto.id).where(Producto.codigo == codigo_producto)
+        query = query.filter(MovimientoInventario.producto_id.in_(id_producto))
+    if fecha_inicio:
+        query = query.filter(MovimientoInventario.fecha >= fecha_inicio)
+    if fecha_fin:
+        query = query.filter(MovimientoInventario.fecha <= fecha_fin)
+    primera, ultima = query.one()
+
+    return fecha_inicio or primera, fecha_fin or ultima
+
+def _periodo_cerrado(db: Session, fecha_inicio=None, fecha_fin=None):
+    """
+    Mensaje de error si el período empieza o termina en un ejercicio cerrado
+    (sus movimientos ya no están en la BD viva), o None.
+    """
+    for fecha in (fecha_inicio, fecha_fin):
+        if fecha_cerrada(db, fecha):
+            return (f"{fecha} es de un ejercicio cerrado: sus movimientos están en el archivo del "
+                    f"ejercicio {fecha.year}. El kardex de la BD viva empieza en el primer año abierto.")
+    return None
+
+def _fila_saldo_inicial(fecha_inicio, saldo_cant, costo_unit, saldo_valor):
+    """Fila de arrastre con el saldo acumulado antes del período."""
+    return [str(fecha_inicio), "SALDO INICIAL", "", "", "", "", "", "",
+            str(saldo_cant), f"{costo_unit:.2f}", f"{saldo_valor:.2f}"]
+
+def _crear_pdf_kardex(db: Session, nombre_archivo, titulo, lista_datos_productos, fecha_inicio=None, fecha_fin=None,
+                      resultado: ResultadoReporte = None):
     """
     Función visual que genera el documento PDF. 
     Recibe los datos ya calculados por FIFO o PMP.
     """
-    # 1. OBTENER DATOS DE EMPRESA Y FECHAS PARA EL ENCABEZADO
+    resultado = resultado or ResultadoReporte()
+    resultado.extra['productos'] = len(lista_datos_productos)
+
+    # 1. OBTENER DATOS DE EMPRESA (las fechas del encabezado ya vienen resueltas)
     empresa = obtener_empresa(db)
-    # Buscamos el rango de fechas de todos los movimientos para el encabezado
-    todos_movs = db.query(MovimientoInventario).order_by(MovimientoInventario.fecha).all()
-    fecha_inicio = todos_movs[0].fecha if todos_movs else None
-    fecha_fin = todos_movs[-1].fecha if todos_movs else None
 
     doc = SimpleDocTemplate(nombre_archivo, pagesize=landscape(A4))
     elements = []
@@ -39,10 +124,7 @@ def _crear_pdf_kardex(db: Session, nombre_archivo, titulo, lista_datos_productos
 
     if not lista_datos_productos:
         elements.append(Paragraph("No hay movimientos registrados en el sistema.", styles['Normal']))
-        try:
-            doc.build(elements)
-            return True
-        except: return False
+        return construir_pdf(doc, elements, resultado, f"{titulo}: sin movimientos en el período.")
 
     for prod_data in lista_datos_productos:
         elements.append(Paragraph(f"PRODUCTO: {prod_data['codigo']} - {prod_data['nombre']}", styles['Heading2']))
@@ -53,6 +135,8 @@ def _crear_pdf_kardex(db: Session, nombre_archivo, titulo, lista_datos_productos
 
         data = [headers_1, headers_2]
         data.extend(prod_data['filas'])
+        resultado.filas += len(prod_data['filas'])
+        resultado.notificar("datos")
 
         t = Table(data, colWidths=[65, 60, 40, 45, 55, 40, 45, 55, 40, 45, 55])
         
@@ -72,96 +156,217 @@ def _crear_pdf_kardex(db: Session, nombre_archivo, titulo, lista_datos_productos
         elements.append(t)
         elements.append(Spacer(1, 20))
 
-    try:
-        doc.build(elements)
-        return True
-    except Exception as e:
-        print(f"Error PDF: {e}")
-        return False
+    return construir_pdf(doc, elements, resultado, f"{titulo} generado.")
 
 # ==========================================
 # LÓGICA DE RECALCULO FIFO (PEPS)
 # ==========================================
-def generar_reporte_fifo(db: Session):
-    productos = db.query(Producto).all()
-    datos_procesados = []
+def _calcular_kardex_fifo(movimientos, fecha_inicio=None):
+    """
+    Recalcula las filas FIFO de un producto.
+    Los movimientos anteriores a fecha_inicio solo alimentan los lotes y se
+    resumen en una fila de SALDO INICIAL.
+    """
+    filas = []
+    lotes_fifo = [] # Memoria temporal: [{'cant': int, 'costo': float}]
+    saldo_cant = 0
+    saldo_valor = 0.0
+    saldo_inicial_pendiente = fecha_inicio is not None
 
-    for prod in productos:
-        filas = []
-        lotes_fifo = [] # Memoria temporal: [{'cant': int, 'costo': float}]
-        saldo_cant = 0
-        saldo_valor = 0.0
+    for m in movimientos:
+        es_previo = fecha_inicio is not None and m.fecha < fecha_inicio
 
-        movimientos = sorted(prod.movimientos, key=lambda x: (x.fecha, x.id))
+        if saldo_inicial_pendiente and not es_previo:
+            saldo_inicial_pendiente = False
+            if saldo_cant:
+                filas.append(_fila_saldo_inicial(fecha_inicio, saldo_cant, saldo_valor / saldo_cant, saldo_valor))
 
-        for m in movimientos:
-            row = [str(m.fecha), m.tipo]
+        row = [str(m.fecha), m.tipo]
+        
+        if m.tipo == 'COMPRA':
+            lotes_fifo.append({'cant': m.cantidad, 'costo': m.costo_unitario})
+            row.extend([str(m.cantidad), f"{m.costo_unitario:.2f}", f"{m.costo_total:.2f}", "", "", ""])
+            saldo_cant += m.cantidad
+            saldo_valor += m.costo_total
+        else: # VENTA
+            cant_a_vender = m.cantidad
+            costo_venta_total = 0.0
             
-            if m.tipo == 'COMPRA':
-                lotes_fifo.append({'cant': m.cantidad, 'costo': m.costo_unitario})
-                row.extend([str(m.cantidad), f"{m.costo_unitario:.2f}", f"{m.costo_total:.2f}", "", "", ""])
-                saldo_cant += m.cantidad
-                saldo_valor += m.costo_total
-            else: # VENTA
-                cant_a_vender = m.cantidad
-                costo_venta_total = 0.0
-                
-                # Consumimos lotes virtuales para el reporte
-                while cant_a_vender > 0 and lotes_fifo:
-                    lote = lotes_fifo[0]
-                    tomar = min(cant_a_vender, lote['cant'])
-                    costo_venta_total += tomar * lote['costo']
-                    lote['cant'] -= tomar
-                    cant_a_vender -= tomar
-                    if lote['cant'] == 0:
-                        lotes_fifo.pop(0)
-
-                costo_unit_puro = costo_venta_total / m.cantidad if m.cantidad > 0 else 0
-                row.extend(["", "", "", str(m.cantidad), f"{costo_unit_puro:.2f}", f"{costo_venta_total:.2f}"])
-                saldo_cant -= m.cantidad
-                saldo_valor -= costo_venta_total
-
-            unit_saldo = saldo_valor / saldo_cant if saldo_cant > 0 else 0
-            row.extend([str(saldo_cant), f"{unit_saldo:.2f}", f"{saldo_valor:.2f}"])
-            filas.append(row)
-
-        datos_procesados.append({'codigo': prod.codigo, 'nombre': prod.nombre, 'filas': filas})
-
-    return _crear_pdf_kardex(db, "reporte_fifo.pdf", "KARDEX MÉTODO FIFO (RECALCULADO)", datos_procesados)
+            # Consumimos lotes virtuales para el reporte
+            while cant_a_vender > 0 and lotes_fifo:
+                lote = lotes_fifo[0]
+                tomar = min(cant_a_vender, lote['cant'])
+                costo_venta_total += tomar * lote['costo']
+                lote['cant'] -= tomar
+                cant_a_vender -= tomar
+                if lote['cant'] == 0:
+                    lotes_fifo.pop(0)
+
+            costo_unit_puro = costo_venta_total / m.cantidad if m.cantidad > 0 else 0
+            row.extend(["", "", "", str(m.cantidad), f"{costo_unit_puro:.2f}", f"{costo_venta_total:.2f}"])
+            saldo_cant -= m.cantidad
+            saldo_valor -= costo_venta_total
+
+        if es_previo:
+            continue
+
+        unit_saldo = saldo_valor / saldo_cant if saldo_cant > 0 else 0
+        row.extend([str(saldo_cant), f"{unit_saldo:.2f}", f"{saldo_valor:.2f}"])
+        filas.append(row)
+
+    # Producto sin movimientos dentro del período: solo se muestra el arrastre
+    if saldo_inicial_pendiente and saldo_cant:
+        filas.append(_fila_saldo_inicial(fecha_inicio, saldo_cant, saldo_valor / saldo_cant, saldo_valor))
+
+    return filas
+
+@instrumentado("reporte.kardex_fifo")
+def generar_reporte_fifo(db: Session, codigo_producto=None, fecha_inicio=None, fecha_fin=None, workers=1,
+                        nombre_archivo="reporte_fifo.pdf", progreso=None):
+    """
+    Kardex FIFO de todos los productos, o de uno solo si se indica codigo_producto.
+    fecha_inicio/fecha_fin acotan el período; lo anterior se resume como SALDO INICIAL.
+    Con workers > 1 el cálculo se reparte por rangos de productos entre procesos.
+    nombre_archivo también puede ser un objeto tipo archivo (por ejemplo BytesIO).
+    Retorna un ResultadoReporte; el tiempo del recálculo queda en tiempos['calculo'].
+    """
+    resultado = ResultadoReporte(progreso=progreso)
+    error = _periodo_cerrado(db, fecha_inicio, fecha_fin)
+    if error:
+        return resultado.fallo(error)
+    datos_procesados = _calcular_datos_kardex(db, 'FIFO', codigo_producto, fecha_inicio, fecha_fin, workers)
+    resultado.marcar("calculo")
+    inicio, fin = _rango_fechas(db, codigo_producto, fecha_inicio, fecha_fin)
+    return _crear_pdf_kardex(db, nombre_archivo, "KARDEX MÉTODO FIFO (RECALCULADO)", datos_procesados, inicio, fin,
+                             resultado)
 
 # ==========================================
 # LÓGICA DE RECALCULO PMP (PROMEDIO)
 # ==========================================
-def generar_reporte_pmp(db: Session):
-    productos = db.query(Producto).all()
-    datos_procesados = []
+def _calcular_kardex_pmp(movimientos, fecha_inicio=None):
+    """
+    Recalcula las filas de promedio ponderado de un producto.
+    Igual que en FIFO, lo anterior a fecha_inicio se resume en el SALDO INICIAL.
+    """
+    filas = []
+    saldo_cant = 0
+    saldo_valor = 0.0
+    promedio_actual = 0.0
+    saldo_inicial_pendiente = fecha_inicio is not None
+
+    for m in movimientos:
+        es_previo = fecha_inicio is not None and m.fecha < fecha_inicio
+
+        if saldo_inicial_pendiente and not es_previo:
+            saldo_inicial_pendiente = False
+            if saldo_cant:
+                filas.append(_fila_saldo_inicial(fecha_inicio, saldo_cant, promedio_actual, saldo_valor))
+
+        row = [str(m.fecha), m.tipo]
+        
+        if m.tipo == 'COMPRA':
+            row.extend([str(m.cantidad), f"{m.costo_unitario:.2f}", f"{m.costo_total:.2f}", "", "", ""])
+            saldo_cant += m.cantidad
+            saldo_valor += m.costo_total
+            promedio_actual = saldo_valor / saldo_cant if saldo_cant > 0 else 0
+        else: # VENTA
+            costo_venta = m.cantidad * promedio_actual
+            row.extend(["", "", "", str(m.cantidad), f"{promedio_actual:.2f}", f"{costo_venta:.2f}"])
+            saldo_cant -= m.cantidad
+            saldo_valor -= costo_venta
+            # El promedio no cambia en la venta, solo en la compra
+
+        if es_previo:
+            continue
+
+        row.extend([str(saldo_cant), f"{promedio_actual:.2f}", f"{saldo_valor:.2f}"])
+        filas.append(row)
+
+    if saldo_inicial_pendiente and saldo_cant:
+        filas.append(_fila_saldo_inicial(fecha_inicio, saldo_cant, promedio_actual, saldo_valor))
+
+    return filas
+
+@instrumentado("reporte.kardex_pmp")
+def generar_reporte_pmp(db: Session, codigo_producto=None, fecha_inicio=None, fecha_fin=None, workers=1,
+                        nombre_archivo="reporte_pmp.pdf", progreso=None):
+    """
+    Kardex de promedio ponderado, con los mismos filtros que generar_reporte_fifo.
+    """
+    resultado = ResultadoReporte(progreso=progreso)
+    error = _periodo_cerrado(db, fecha_inicio, fecha_fin)
+    if error:
+        return resultado.fallo(error)
+    datos_procesados = _calcular_datos_kardex(db, 'PMP', codigo_producto, fecha_inicio, fecha_fin, workers)
+    resultado.marcar("calculo")
+    inicio, fin = _rango_fechas(db, codigo_producto, fecha_inicio, fecha_fin)
+    return _crear_pdf_kardex(db, nombre_archivo, "KARDEX PROMEDIO PONDERADO (RECALCULADO)", datos_procesados, inicio, fin,
+                             resultado)
+
+# ==========================================
+# CÁLCULO POR PRODUCTO (SECUENCIAL O EN PARALELO)
+# ==========================================
+_CALCULOS = {'FIFO': _calcular_kardex_fifo, 'PMP': _calcular_kardex_pmp}
 
-    for prod in productos:
-        filas = []
-        saldo_cant = 0
-        saldo_valor = 0.0
-        promedio_actual = 0.0
+def _procesar_productos(db: Session, metodo, codigo_producto=None, fecha_inicio=None, fecha_fin=None, rango_codigos=None):
+    """Calcula las filas del kardex de cada producto, en orden de código."""
+    calcular = _CALCULOS[metodo]
+    productos = _consultar_productos(db, codigo_producto, rango_codigos)
+    movimientos = _consultar_movimientos(db, productos, codigo_producto, fecha_fin, rango_codigos)
 
-        movimientos = sorted(prod.movimientos, key=lambda x: (x.fecha, x.id))
+    return [
+        {'codigo': prod.codigo, 'nombre': prod.nombre,
+         'filas': calcular(movimientos.get(prod.id, []), fecha_inicio)}
+        for prod in productos
+    ]
 
-        for m in movimientos:
-            row = [str(m.fecha), m.tipo]
-            
-            if m.tipo == 'COMPRA':
-                row.extend([str(m.cantidad), f"{m.costo_unitario:.2f}", f"{m.costo_total:.2f}", "", "", ""])
-                saldo_cant += m.cantidad
-                saldo_valor += m.costo_total
-                promedio_actual = saldo_valor / saldo_cant if saldo_cant > 0 else 0
-            else: # VENTA
-                costo_venta = m.cantidad * promedio_actual
-                row.extend(["", "", "", str(m.cantidad), f"{promedio_actual:.2f}", f"{costo_venta:.2f}"])
-                saldo_cant -= m.cantidad
-                saldo_valor -= costo_venta
-                # El promedio no cambia en la venta, solo en la compra
-
-            row.extend([str(saldo_cant), f"{promedio_actual:.2f}", f"{saldo_valor:.2f}"])
-            filas.append(row)
-
-        datos_procesados.append({'codigo': prod.codigo, 'nombre': prod.nombre, 'filas': filas})
-
-    return _crear_pdf_kardex(db,"reporte_pmp.pdf", "KARDEX PROMEDIO PONDERADO (RECALCULADO)", datos_procesados)
\ No newline at end of file
+def _kardex_rango_trabajador(ruta_bd, empresa_id, metodo, rango_codigos, fecha_inicio, fecha_fin):
+    """
+    Trabajador del pool: abre su propia conexión (de la misma empresa que el
+    padre), calcula un rango de productos y devuelve tuplas compactas
+    (codigo, nombre, filas) para el proceso padre.
+    """
+    motor = crear_motor(ruta_bd)
+    try:
+        with Session(motor, info={'empresa_id': empresa_id}) as db:
+            datos = _procesar_productos(db, metodo, None, fecha_inicio, fecha_fin, rango_codigos)
+    finally:
+        motor.dispose()
+
+    return [(d['codigo'], d['nombre'], d['filas']) for d in datos]
+
+def _rangos_de_codigos(db: Session, partes):
+    """Divide los productos (ordenados por código) en rangos contiguos [desde, hasta]."""
+    codigos = [c for (c,) in db.query(Producto.codigo).order_by(Producto.codigo)]
+    tamanio = max(1, -(-len(codigos) // partes))
+    return [
+        (codigos[i], codigos[min(i + tamanio, len(codigos)) - 1])
+        for i in range(0, len(codigos), tamanio)
+    ]
+
+def _calcular_datos_kardex(db: Session, metodo, codigo_producto=None, fecha_inicio=None, fecha_fin=None, workers=1):
+    """
+    Punto único de cálculo. Con un solo producto, workers <= 1 o una BD en
+    memoria (que otro proceso no puede abrir) se calcula en este proceso.
+    """
+    url = db.get_bind().url
+    if workers <= 1 or codigo_producto or url.database in (None, "", ":memory:"):
+        return _procesar_productos(db, metodo, codigo_producto, fecha_inicio, fecha_fin)
+
+    # Varios rangos por trabajador para repartir mejor la carga
+    rangos = _rangos_de_codigos(db, workers * 4)
+    datos = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = [
+            pool.submit(_kardex_rango_trabajador, url.database, empresa_de_sesion(db), metodo, rango, fecha_inicio, fecha_fin)
+            for rango in rangos
+        ]
+        # Los rangos ya están en orden de código: basta con concatenar
+        for futuro in futuros:
+            datos.extend(
+                {'codigo': codigo, 'nombre': nombre, 'filas': filas}
+                for codigo, nombre, filas in futuro.result()
+            )
+
+    return datos
@@ -0,0 +1,76 @@
+"""
+Resultado común que devuelven todos los generadores de reportes.
+"""
+import time
+from dataclasses import dataclass, field
+
+from src.base_datos.instrumentacion import marcar_fase
+
+
+class ReporteCancelado(Exception):
+    """La función de progreso pidió detener el reporte."""
+
+
+@dataclass
+class ResultadoReporte:
+    """
+    exito: True si el PDF quedó escrito en el destino
+    mensaje: descripción para mostrar al usuario (o el motivo del fallo)
+    paginas / filas: tamaño del documento generado (filas de datos en las tablas)
+    tiempos: segundos por fase ('datos' = consultas y armado, 'render' = ReportLab)
+    advertencias: avisos que no impiden generar el reporte
+    extra: valores propios de cada reporte (por ejemplo la utilidad del ejercicio)
+    progreso: función opcional progreso(fase, resultado) que se llama mientras se
+              arma y se dibuja el reporte; puede lanzar ReporteCancelado para abortar
+    """
+    exito: bool = False
+    mensaje: str = ""
+    paginas: int = 0
+    filas: int = 0
+    tiempos: dict = field(default_factory=dict)
+    advertencias: list = field(default_factory=list)
+    extra: dict = field(default_factory=dict)
+    progreso: object = field(default=None, repr=False)
+    _ultima_marca: float = field(default_factory=time.perf_counter, repr=False)
+
+    def marcar(self, fase: str):
+        """Registra el tiempo transcurrido desde la marca anterior (o la creación) como `fase`."""
+        ahora = time.perf_counter()
+        self.tiempos[fase] = round(self.tiempos.get(fase, 0.0) + ahora - self._ultima_marca, 4)
+        self._ultima_marca = ahora
+        marcar_fase(fase)
+
+    def notificar(self, fase: str):
+        """Informa el avance (filas/páginas actuales) a quien lo esté siguiendo."""
+        if self.progreso:
+            self.progreso(fase, self)
+
+    def fallo(self, mensaje: str):
+        self.exito = False
+        self.mensaje = mensaje
+        return self
+
+
+def construir_pdf(doc, elements: list, resultado: ResultadoReporte, mensaje: str):
+    """
+    Arma el documento y completa el resultado (páginas y tiempos).
+    doc puede apuntar a una ruta o a cualquier objeto tipo archivo (BytesIO, respuesta HTTP, ...).
+    """
+    def al_dibujar_pagina(canvas, documento):
+        resultado.paginas = documento.page
+        resultado.notificar("render")
+
+    resultado.marcar("datos")
+    try:
+        doc.build(elements, onFirstPage=al_dibujar_pagina, onLaterPages=al_dibujar_pagina)
+    except ReporteCancelado:
+        raise
+    except Exception as e:
+        resultado.marcar("render")
+        return resultado.fallo(f"Error al generar PDF: {e}")
+
+    resultado.marcar("render")
+    resultado.exito = True
+    resultado.paginas = doc.page
+    resultado.mensaje = mensaje
+    return resultado
@@ -0,0 +1,110 @@
+# src/servicios/busqueda.py
+"""
+Búsqueda de cuentas y productos por código o nombre.
+
+Con los índices FTS5 que crean las migraciones (cuentas_busqueda y
+productos_busqueda) cada palabra se busca como prefijo, sin distinguir
+mayúsculas ni tildes ("depre acum" encuentra "Depreciación Acumulada"), y los
+resultados salen ordenados por relevancia (bm25, el código pesa más que el
+nombre).
+
+Si el SQLite instalado no tiene FTS5 se usa LIKE sobre sin_acentos() palabra
+por palabra: también ignora tildes, pero recorre la tabla y ordena por código.
+
+El índice FTS5 es uno solo para todas las empresas; las consultas con text()
+no pasan por el filtro automático de src/base_datos/multiempresa.py, así que
+filtran empresa_id en la misma consulta. Todas las coincidencias se ordenan por
+bm25 antes de aplicar el límite: un criterio muy común ("bateria" con miles de
+productos) cuesta más, pero el primer resultado es siempre el más relevante.
+"""
+from sqlalchemy import and_, func, or_, text
+from sqlalchemy.orm import Session
+
+from src.base_datos.db import sin_acentos
+from src.base_datos.instrumentacion import instrumentado
+from src.base_datos.multiempresa import empresa_de_sesion
+from src.modelos.entidades import Cuenta, Producto
+
+# Pesos de bm25 para las columnas (codigo, nombre)
+PESOS_BM25 = "10.0, 1.0"
+
+
+def _hay_indice(db: Session, indice: str) -> bool:
+    return db.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nombre"), {'nombre': indice}
+    ).first() is not None
+
+
+def _expresion_fts(criterio: str):
+    """
+    'depre acum' -> '"depre"* "acum"*' (todas las palabras, cada una como prefijo).
+    Las comillas evitan que el texto del usuario se interprete como sintaxis FTS5.
+    Retorna None si no queda ninguna palabra.
+    """
+    terminos = [t.replace('"', "") for t in criterio.split()]
+    terminos = [t for t in terminos if any(c.isalnum() for c in t)]
+    if not terminos:
+        return None
+    return " ".join(f'"{t}"*' for t in terminos)
+
+
+def _palabras_sin_acentos(criterio: str):
+    return [sin_acentos(p) for p in criterio.split()]
+
+
+@instrumentado("busqueda.cuentas")
+def buscar_cuentas(db: Session, criterio: str, limite: int = 50):
+    """
+    Cuentas cuyo código o nombre coincide con el criterio, las más relevantes primero.
+    Returns:
+        list[Cuenta]
+    """
+    if _hay_indice(db, "cuentas_busqueda"):
+        expresion = _expresion_fts(criterio)
+        if not expresion:
+            return []
+        # Se ordenan por bm25 todas las coincidencias y recién después se corta en el límite
+        consulta = text(f"""
+            SELECT cuentas.* FROM cuentas_busqueda
+            JOIN cuentas ON cuentas.id = cuentas_busqueda.rowid
+            WHERE cuentas_busqueda MATCH :expresion AND cuentas.empresa_id = :empresa
+            ORDER BY bm25(cuentas_busqueda, {PESOS_BM25}) LIMIT :limite
+        """).bindparams(expresion=expresion, empresa=empresa_de_sesion(db), limite=limite)
+        return db.query(Cuenta).from_statement(consulta).all()
+
+    # Sin FTS5: LIKE sin tildes, cada palabra en el nombre (o el criterio como inicio del código)
+    return db.query(Cuenta).filter(or_(
+        and_(*(func.sin_acentos(Cuenta.nombre).like(f"%{p}%") for p in _palabras_sin_acentos(criterio))),
+        Cuenta.codigo.like(f"{criterio.strip()}%")
+    )).order_by(Cuenta.codigo).limit(limite).all()
+
+
+@instrumentado("busqueda.productos")
+def buscar_productos(db: Session, criterio: str, solo_con_stock: bool = False, limite: int = 50):
+    """
+    Productos cuyo código o nombre coincide con el criterio, los más relevantes primero.
+    Con solo_con_stock=True se excluyen los productos sin existencias.
+    Returns:
+        list[Producto]
+    """
+    if _hay_indice(db, "productos_busqueda"):
+        expresion = _expresion_fts(criterio)
+        if not expresion:
+            return []
+        filtro_stock = "AND productos.stock_actual > 0" if solo_con_stock else ""
+        consulta = text(f"""
+            SELECT productos.* FROM productos_busqueda
+            JOIN productos ON productos.id = productos_busqueda.rowid
+            WHERE productos_busqueda MATCH :expresion AND productos.empresa_id = :empresa {filtro_stock}
+            ORDER BY bm25(productos_busqueda, {PESOS_BM25}) LIMIT :limite
+        """).bindparams(expresion=expresion, empresa=empresa_de_sesion(db), limite=limite)
+        return db.query(Producto).from_statement(consulta).all()
+
+    # Sin FTS5: LIKE sin tildes, cada palabra en el nombre o en el código
+    query = db.query(Producto).filter(*(
+        or_(func.sin_acentos(Producto.nombre).like(f"%{p}%"), func.sin_acentos(Producto.codigo).like(f"%{p}%"))
+        for p in _palabras_sin_acentos(criterio)
+    ))
+    if solo_con_stock:
+        query = query.filter(Producto.stock_actual > 0)
+    return query.order_by(Producto.codigo).limit(limite).all()
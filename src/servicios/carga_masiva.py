@@ -0,0 +1,306 @@
+# src/servicios/carga_masiva.py
+"""
+Carga masiva de movimientos de inventario (compras y ventas) desde un CSV del POS.
+
+En vez de llamar registrar_compra / registrar_venta fila por fila, cada lote
+de filas se procesa así:
+    1. Se precargan los productos y sus lotes abiertos (2 consultas).
+    2. El consumo FIFO se hace en memoria, producto por producto y en orden de fecha.
+    3. Se escriben movimientos, lotes nuevos, saldos de lotes, stock de productos
+       y los asientos agregados por día en pocas sentencias masivas y un solo commit.
+"""
+import os
+from collections import defaultdict, deque
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from src.base_datos.db import ejecutar_en_transaccion
+from src.base_datos.instrumentacion import instrumentado, marcar_fase
+from src.base_datos.multiempresa import empresa_de_sesion
+from src.modelos.entidades import Producto, MovimientoInventario, LoteInventario
+from src.servicios import inventario
+from src.servicios.contabilidad import preparar_asiento
+
+COLUMNAS_REQUERIDAS = ['FECHA', 'TIPO', 'CODIGO', 'CANTIDAD']
+
+
+def _leer_csv(ruta_archivo: str):
+    """
+    Lee y normaliza el CSV. Columnas: FECHA, TIPO (COMPRA/VENTA), CODIGO, CANTIDAD,
+    COSTO_UNITARIO (compras), PRECIO_UNITARIO (ventas) y CREDITO (opcional: SI/NO, 1/0).
+
+    Returns:
+        list: filas como diccionarios, con 'linea' = número de línea en el archivo
+    """
+    df = pd.read_csv(ruta_archivo, dtype={'CODIGO': str, 'codigo': str})
+    df.columns = [str(c).upper().strip() for c in df.columns]
+
+    faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"El CSV debe tener las columnas: {COLUMNAS_REQUERIDAS} (faltan {faltantes})")
+
+    for col in ('COSTO_UNITARIO', 'PRECIO_UNITARIO'):
+        df[col] = df[col].fillna(0.0) if col in df.columns else 0.0
+    df['CREDITO'] = df['CREDITO'].fillna("") if 'CREDITO' in df.columns else ""
+
+    # Conversión vectorizada por columna (convertir fila por fila es mucho más lento)
+    df['FECHA'] = pd.to_datetime(df['FECHA'], format="%Y-%m-%d").dt.date
+    df['TIPO'] = df['TIPO'].astype(str).str.strip().str.upper()
+    df['CODIGO'] = df['CODIGO'].astype(str).str.strip()
+    df['CREDITO'] = df['CREDITO'].astype(str).str.strip().str.upper().isin(
+        ['SI', 'SÍ', 'S', '1', 'TRUE', 'CREDITO', 'CRÉDITO']
+    )
+
+    filas = []
+    columnas = zip(df['FECHA'], df['TIPO'], df['CODIGO'], df['CANTIDAD'].astype(int),
+                   df['COSTO_UNITARIO'].astype(float), df['PRECIO_UNITARIO'].astype(float), df['CREDITO'])
+    for linea, (fecha, tipo, codigo, cantidad, costo, precio, credito) in enumerate(columnas, start=2):  # línea 1 = encabezado
+        filas.append({
+            'linea': linea,
+            'fecha': fecha,
+            'tipo': tipo,
+            'codigo': codigo,
+            'cantidad': int(cantidad),
+            'costo_unitario': float(costo),
+            'precio_unitario': float(precio),
+            'es_credito': bool(credito),
+        })
+    return filas
+
+
+def _agrupar_en_lotes(filas, tamano_lote: int):
+    """
+    Ordena por producto y fecha (conservando el orden del archivo en empates)
+    y arma lotes de trabajo sin partir nunca los movimientos de un producto.
+    """
+    por_producto = defaultdict(list)
+    for fila in filas:
+        por_producto[fila['codigo']].append(fila)
+
+    lotes, actual = [], []
+    for codigo in sorted(por_producto):
+        actual.extend(sorted(por_producto[codigo], key=lambda f: (f['fecha'], f['linea'])))
+        if len(actual) >= tamano_lote:
+            lotes.append(actual)
+            actual = []
+    if actual:
+        lotes.append(actual)
+    return lotes
+
+
+def _asientos_del_dia(db: Session, fecha: date, totales: dict):
+    """Agrega a la sesión los asientos resumen de un día (compras, ingresos y costo de ventas)."""
+    asientos = []
+    totales = {clave: round(totales.get(clave, 0.0), 2) for clave in
+               ('compra_contado', 'compra_credito', 'venta_contado', 'venta_credito', 'costo_ventas')}
+
+    def linea(cuenta, debe=0.0, haber=0.0):
+        return {"cuenta_codigo": cuenta, "debe": debe, "haber": haber}
+
+    compras = totales['compra_contado'] + totales['compra_credito']
+    if compras:
+        movs = [linea(inventario.CTA_INVENTARIO, debe=compras)]
+        if totales['compra_contado']:
+            movs.append(linea(inventario.CTA_CAJA, haber=totales['compra_contado']))
+        if totales['compra_credito']:
+            movs.append(linea(inventario.CTA_PROVEEDORES, haber=totales['compra_credito']))
+        asientos.append(preparar_asiento(db, fecha, f"Compras del {fecha} (carga masiva)", movs))
+
+    ventas = totales['venta_contado'] + totales['venta_credito']
+    if ventas:
+        movs = []
+        if totales['venta_contado']:
+            movs.append(linea(inventario.CTA_CAJA, debe=totales['venta_contado']))
+        if totales['venta_credito']:
+            movs.append(linea(inventario.CTA_CLIENTES, debe=totales['venta_credito']))
+        movs.append(linea(inventario.CTA_VENTAS, haber=ventas))
+        asientos.append(preparar_asiento(db, fecha, f"Ventas del {fecha} (carga masiva)", movs))
+
+    if totales['costo_ventas']:
+        movs = [
+            linea(inventario.CTA_COSTO_VENTAS, debe=totales['costo_ventas']),
+            linea(inventario.CTA_INVENTARIO, haber=totales['costo_ventas']),
+        ]
+        asientos.append(preparar_asiento(db, fecha, f"Costo de ventas del {fecha} (carga masiva)", movs))
+
+    return asientos
+
+
+def _procesar_lote(db: Session, filas: list):
+    """
+    Aplica un lote de filas ya ordenadas. Debe ejecutarse dentro de
+    ejecutar_en_transaccion (no hace commit).
+
+    Returns:
+        dict: {'compras', 'ventas', 'asientos', 'rechazadas': [(linea, motivo)]}
+    """
+    rechazadas = []
+    codigos = {f['codigo'] for f in filas}
+
+    # 1. Precarga: productos y lotes abiertos, en una consulta cada uno
+    productos = {p.codigo: p for p in db.query(Producto).filter(Producto.codigo.in_(codigos))}
+    ids_producto = [p.id for p in productos.values()]
+
+    lotes_abiertos = defaultdict(deque)
+    for lote in db.query(LoteInventario)\
+                  .filter(LoteInventario.producto_id.in_(ids_producto))\
+                  .filter(LoteInventario.saldo_cantidad > 0)\
+                  .order_by(LoteInventario.producto_id, LoteInventario.fecha, LoteInventario.id):
+        lotes_abiertos[lote.producto_id].append(
+            {'id': lote.id, 'saldo': lote.saldo_cantidad, 'costo': lote.costo_unitario, 'fila': None}
+        )
+
+    # 2. Consumo FIFO en memoria
+    movimientos = []          # filas para INSERT de movimientos_inventario
+    lotes_nuevos = []         # lotes creados por compras de este archivo
+    saldos_modificados = {}   # id de lote existente -> saldo final
+    stock = {p.id: [p.stock_actual, p.valor_actual] for p in productos.values()}
+    totales_dia = defaultdict(lambda: defaultdict(float))
+    compras = ventas = 0
+
+    for fila in filas:
+        prod = productos.get(fila['codigo'])
+        if not prod:
+            rechazadas.append((fila['linea'], f"Producto '{fila['codigo']}' no existe"))
+            continue
+        if fila['cantidad'] <= 0 or fila['tipo'] not in ('COMPRA', 'VENTA'):
+            rechazadas.append((fila['linea'], "Tipo o cantidad inválidos"))
+            continue
+
+        totales = totales_dia[fila['fecha']]
+        cantidad = fila['cantidad']
+
+        if fila['tipo'] == 'COMPRA':
+            total = cantidad * fila['costo_unitario']
+            lote = {'id': None, 'saldo': cantidad, 'costo': fila['costo_unitario'], 'fila': len(movimientos),
+                    'cantidad': cantidad, 'producto_id': prod.id, 'fecha': fila['fecha']}
+            lotes_abiertos[prod.id].append(lote)
+            lotes_nuevos.append(lote)
+            movimientos.append({
+                'producto_id': prod.id, 'fecha': fila['fecha'], 'tipo': 'COMPRA', 'cantidad': cantidad,
+                'costo_unitario': fila['costo_unitario'], 'costo_total': total, 'saldo_cantidad': cantidad,
+            })
+            stock[prod.id][0] += cantidad
+            stock[prod.id][1] += total
+            totales['compra_credito' if fila['es_credito'] else 'compra_contado'] += total
+            compras += 1
+            continue
+
+        # VENTA
+        if cantidad > stock[prod.id][0]:
+            rechazadas.append((fila['linea'], f"Stock insuficiente para {prod.codigo}. Disponible: {stock[prod.id][0]}"))
+            continue
+
+        pendientes = lotes_abiertos[prod.id]
+        cantidad_pendiente = cantidad
+        costo_salida = 0.0
+        tomados = []  # (lote, cantidad) para deshacer la fila si los lotes no alcanzan
+        while cantidad_pendiente > 0 and pendientes:
+            lote = pendientes[0]
+            tomar = min(cantidad_pendiente, lote['saldo'])
+            tomados.append((lote, tomar))
+            costo_salida += tomar * lote['costo']
+            lote['saldo'] -= tomar
+            cantidad_pendiente -= tomar
+            if lote['id'] is not None:
+                saldos_modificados[lote['id']] = lote['saldo']
+            if lote['saldo'] == 0:
+                pendientes.popleft()
+
+        if cantidad_pendiente > 0:
+            # El stock del producto alcanza pero sus lotes abiertos no: se devuelve lo tomado
+            for lote, tomar in reversed(tomados):
+                if lote['saldo'] == 0:
+                    pendientes.appendleft(lote)
+                lote['saldo'] += tomar
+                if lote['id'] is not None:
+                    saldos_modificados[lote['id']] = lote['saldo']
+            rechazadas.append((fila['linea'], f"Lotes inconsistentes con el stock de {prod.codigo}"))
+            continue
+
+        movimientos.append({
+            'producto_id': prod.id, 'fecha': fila['fecha'], 'tipo': 'VENTA', 'cantidad': cantidad,
+            'costo_unitario': costo_salida / cantidad, 'costo_total': costo_salida, 'saldo_cantidad': 0,
+        })
+        stock[prod.id][0] -= cantidad
+        stock[prod.id][1] -= costo_salida
+        totales['venta_credito' if fila['es_credito'] else 'venta_contado'] += cantidad * fila['precio_unitario']
+        totales['costo_ventas'] += costo_salida
+        ventas += 1
+
+    if not movimientos:
+        return {'compras': 0, 'ventas': 0, 'asientos': 0, 'rechazadas': rechazadas}
+
+    # 3. Escrituras masivas (los INSERT masivos no pasan por before_flush: la empresa va en cada fila)
+    empresa = empresa_de_sesion(db)
+    # 3a. Movimientos (RETURNING en el mismo orden para enlazar los lotes nuevos)
+    ids_mov = db.execute(
+        insert(MovimientoInventario).returning(MovimientoInventario.id, sort_by_parameter_order=True),
+        [dict(m, empresa_id=empresa) for m in movimientos]
+    ).scalars().all()
+
+    # 3b. Lotes nuevos, ya con el saldo que les quedó tras las ventas del archivo
+    if lotes_nuevos:
+        db.execute(insert(LoteInventario), [
+            {'empresa_id': empresa, 'movimiento_id': ids_mov[l['fila']], 'producto_id': l['producto_id'], 'fecha': l['fecha'],
+             'costo_unitario': l['costo'], 'cantidad_inicial': l['cantidad'], 'saldo_cantidad': l['saldo']}
+            for l in lotes_nuevos
+        ])
+
+    # 3c. Saldos de lotes existentes consumidos (UPDATE masivo por clave primaria)
+    if saldos_modificados:
+        db.execute(update(LoteInventario), [
+            {'id': id_lote, 'saldo_cantidad': saldo} for id_lote, saldo in saldos_modificados.items()
+        ])
+
+    # 3d. Stock denormalizado de los productos tocados
+    db.execute(update(Producto), [
+        {'id': pid, 'stock_actual': cant, 'valor_actual': valor} for pid, (cant, valor) in stock.items()
+    ])
+
+    # 3e. Asientos agregados por día
+    asientos = []
+    for fecha in sorted(totales_dia):
+        asientos.extend(_asientos_del_dia(db, fecha, totales_dia[fecha]))
+    db.flush()
+
+    return {'compras': compras, 'ventas': ventas, 'asientos': len(asientos), 'rechazadas': rechazadas}
+
+
+@instrumentado("carga_masiva.importar_movimientos_csv")
+def importar_movimientos_csv(db: Session, ruta_archivo: str, tamano_lote: int = 5000):
+    """
+    Importa un CSV de movimientos del POS. Cada lote de trabajo se confirma en
+    una sola transacción; las filas inválidas se informan y no detienen la carga.
+
+    Returns:
+        tuple: (ok, mensaje, resumen) con resumen =
+               {'compras', 'ventas', 'asientos', 'rechazadas': [(linea, motivo)]}
+    """
+    if not os.path.exists(ruta_archivo):
+        return False, f"El archivo '{ruta_archivo}' no existe.", None
+
+    try:
+        filas = _leer_csv(ruta_archivo)
+    except Exception as e:
+        return False, f"Error al leer el CSV: {str(e)}", None
+    marcar_fase("lectura_csv")
+
+    resumen = {'compras': 0, 'ventas': 0, 'asientos': 0, 'rechazadas': []}
+
+    try:
+        for filas_lote in _agrupar_en_lotes(filas, tamano_lote):
+            parcial = ejecutar_en_transaccion(db, lambda: _procesar_lote(db, filas_lote))
+            for clave in ('compras', 'ventas', 'asientos'):
+                resumen[clave] += parcial[clave]
+            resumen['rechazadas'].extend(parcial['rechazadas'])
+    except Exception as e:
+        return False, f"Error en la carga (los lotes anteriores quedaron guardados): {str(e)}", resumen
+
+    resumen['rechazadas'].sort()
+    mensaje = (f"Carga completada: {resumen['compras']} compras, {resumen['ventas']} ventas, "
+               f"{resumen['asientos']} asientos. Filas rechazadas: {len(resumen['rechazadas'])}.")
+    return True, mensaje, resumen
@@ -0,0 +1,490 @@
+# src/servicios/cierre.py
+"""
+Cierre de ejercicio con archivo del detalle histórico en otra BD.
+
+Al cerrar un año:
+1. Se registra el asiento de cierre (31/12): las cuentas de resultados
+   (clases 4, 5 y 6) quedan en cero contra la cuenta de resultados acumulados.
+2. Se registra el asiento de apertura (1/1 del año siguiente) con el saldo de
+   cada cuenta que queda con saldo.
+3. Los lotes de inventario que siguen vivos al 31/12 pasan al año siguiente
+   como compras de apertura, con su costo de origen (mismo orden FIFO).
+4. Los asientos, detalles, movimientos y lotes del año se copian a un archivo
+   SQLite por año (<bd>_<año>.sqlite, junto a la BD) y se borran de la BD viva.
+5. Se compacta la BD viva (VACUUM): los reportes del día a día recorren solo
+   los años abiertos.
+
+La BD del año cerrado tiene el mismo esquema que la viva y una copia de las
+cuentas, productos y empresa: se puede abrir con sesion_archivo() y pasar a
+cualquier generador, o adjuntar a la BD viva (ATTACH) con archivo_adjunto()
+para consultas que cruzan el histórico con el plan de cuentas actual.
+
+Desde el cierre, empresa.cierre_hasta impide registrar asientos con fecha
+del año cerrado (ver preparar_asiento).
+
+Uso:
+    python -m src.servicios.cierre 2024 --bd datos/contabilidad.sqlite
+"""
+import argparse
+import glob
+import os
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.base_datos.db import Base, DB_NAME, crear_motor, ejecutar_en_transaccion
+from src.base_datos.instrumentacion import instrumentado
+from src.base_datos.multiempresa import empresa_de_sesion, sesion_de_empresa
+from src.modelos.entidades import (
+    Asiento, Cuenta, DetalleAsiento, Empresa, LoteInventario, MovimientoInventario,
+)
+from src.servicios.contabilidad import preparar_asiento
+from src.servicios.integridad import reiniciar_control
+
+# UTILIDADES NO DISTRIBUIDAS en el plan de cuentas de datos/plan_cuentas.xlsx
+CTA_RESULTADOS_ACUMULADOS = "3.3.01"
+
+# Clases de cuentas de resultados: ingresos, gastos y costos
+CLASES_RESULTADOS = ("4", "5", "6")
+
+DESCRIPCION_CIERRE = "Cierre del ejercicio {anio}"
+DESCRIPCION_APERTURA = "Apertura del ejercicio {anio}"
+
+# Tabla -> filas que van al archivo (:e empresa, :fin último día del año).
+# Las tablas del final son el detalle del año, que además se borra de la BD
+# viva; las primeras son una copia de referencia.
+ARCHIVADO = {
+    'empresa': "id = :e",
+    'cuentas': "empresa_id = :e",
+    'productos': "empresa_id = :e",
+    'asientos': "empresa_id = :e AND fecha <= :fin",
+    'detalles_asiento': "empresa_id = :e AND asiento_id IN "
+                        "(SELECT id FROM main.asientos WHERE empresa_id = :e AND fecha <= :fin)",
+    'movimientos_inventario': "empresa_id = :e AND fecha <= :fin",
+    'lotes_inventario': "empresa_id = :e AND movimiento_id IN "
+                        "(SELECT id FROM main.movimientos_inventario WHERE empresa_id = :e AND fecha <= :fin)",
+}
+TABLAS_DEL_EJERCICIO = ('asientos', 'detalles_asiento', 'movimientos_inventario', 'lotes_inventario')
+
+
+def ruta_archivo(motor, anio: int) -> str:
+    """Archivo del ejercicio `anio`: <carpeta de la BD>/<nombre de la BD>_<anio>.sqlite"""
+    ruta_bd = motor.url.database
+    if not ruta_bd or ruta_bd == ":memory:":
+        raise ValueError("Solo se pueden archivar ejercicios de una BD en archivo.")
+    base, _ = os.path.splitext(os.path.abspath(ruta_bd))
+    return f"{base}_{anio}.sqlite"
+
+
+def ejercicios_archivados(motor) -> list:
+    """Años que tienen archivo junto a la BD (ver ruta_archivo), de menor a mayor."""
+    base = ruta_archivo(motor, 0)[:-len("0.sqlite")]
+    return sorted(
+        int(ruta[len(base):-len(".sqlite")])
+        for ruta in glob.glob(f"{glob.escape(base)}[0-9][0-9][0-9][0-9].sqlite")
+    )
+
+
+def tiene_archivo(motor, anio: int) -> bool:
+    """
+    True si el ejercicio cerrado `anio` tiene archivo. False si es anterior
+    al primer archivo: no tuvo asientos (los cierres van en orden desde el
+    primer año con datos).
+
+    Raises:
+        ValueError: si falta el archivo de un año que sí tuvo asientos
+    """
+    archivados = ejercicios_archivados(motor)
+    if anio in archivados:
+        return True
+    if archivados and archivados[0] > anio:
+        return False
+    raise ValueError(f"El ejercicio {anio} está cerrado y no se encuentra su archivo ({ruta_archivo(motor, anio)}).")
+
+
+def fecha_cerrada(db: Session, fecha: date) -> bool:
+    """True si `fecha` es de un ejercicio ya cerrado (su detalle ya no está en la BD viva)."""
+    if not fecha:
+        return False
+    empresa = db.get(Empresa, empresa_de_sesion(db))
+    return bool(empresa and empresa.cierre_hasta and fecha <= empresa.cierre_hasta)
+
+
+@contextmanager
+def _conexion_con_archivo(motor, ruta: str):
+    """
+    Conexión de `motor` con el archivo adjunto como esquema "archivo".
+    SQLite no permite ATTACH/DETACH dentro de una transacción: se ejecutan
+    directo en la conexión del driver, antes del primer BEGIN y después del último.
+    """
+    with motor.connect() as conexion:
+        driver = conexion.connection.driver_connection
+        driver.execute("ATTACH DATABASE ? AS archivo", (ruta,))
+        try:
+            yield conexion
+        finally:
+            conexion.rollback()
+            driver.execute("DETACH DATABASE archivo")
+
+
+@contextmanager
+def archivo_adjunto(db: Session, anio: int):
+    """
+    Sesión de la misma empresa que `db` con el archivo del ejercicio adjunto
+    (ATTACH ... AS archivo), para consultas con text() que cruzan main.* con
+    archivo.*. Al salir se desadjunta.
+
+    Raises:
+        ValueError: si el ejercicio no tiene archivo
+    """
+    motor = db.get_bind()
+    ruta = ruta_archivo(motor, anio)
+    if not os.path.isfile(ruta):
+        raise ValueError(f"El ejercicio {anio} no tiene archivo ({ruta}).")
+
+    with _conexion_con_archivo(motor, ruta) as conexion:
+        with Session(bind=conexion, autoflush=False, info={'empresa_id': empresa_de_sesion(db)}) as sesion:
+            yield sesion
+
+
+@contextmanager
+def sesion_archivo(db: Session, anio: int):
+    """
+    Sesión sobre el archivo del ejercicio, de la misma empresa que `db`.
+    El archivo tiene el mismo esquema que la BD viva, así que sirve para
+    cualquier generador de reportes (incluye el asiento de cierre).
+
+    Raises:
+        ValueError: si el ejercicio no tiene archivo
+    """
+    ruta = ruta_archivo(db.get_bind(), anio)
+    if not os.path.isfile(ruta):
+        raise ValueError(f"El ejercicio {anio} no tiene archivo ({ruta}).")
+
+    motor = crear_motor(ruta)
+    try:
+        with sesion_de_empresa(sessionmaker(bind=motor, autoflush=False), empresa_de_sesion(db)) as sesion:
+            yield sesion
+    finally:
+        motor.dispose()
+
+
+@instrumentado("cierre.sumas_archivadas")
+def sumas_archivadas(db: Session, anio: int, prefijo: str = "", con_cierre: bool = False,
+                     por_mes: bool = False, hasta: date = None):
+    """
+    Sumas del Debe y del Haber por cuenta de un ejercicio archivado, con el
+    código y nombre del plan de cuentas actual (main.cuentas).
+    Sin con_cierre se excluye el asiento de cierre, es decir, son las sumas
+    del año tal como estaban antes de cerrarlo. Con por_mes se separan por
+    mes; con hasta solo cuentan los asientos hasta esa fecha inclusive.
+
+    Returns:
+        list: [(codigo, nombre, suma_debe, suma_haber)] ordenada por código;
+        con por_mes [(codigo, nombre, 'AAAA-MM', suma_debe, suma_haber)]
+    """
+    filtro_cierre = "" if con_cierre else "AND a.descripcion <> :cierre"
+    mes = ", strftime('%Y-%m', a.fecha)" if por_mes else ""
+    filtro_fecha = "AND a.fecha <= :hasta" if hasta else ""
+    with archivo_adjunto(db, anio) as sesion:
+        filas = sesion.execute(text(f"""
+            SELECT c.codigo, c.nombre{mes}, SUM(d.debe), SUM(d.haber)
+            FROM archivo.detalles_asiento d
+            JOIN archivo.asientos a ON a.id = d.asiento_id
+            JOIN main.cuentas c ON c.id = d.cuenta_id
+            WHERE d.empresa_id = :e AND c.codigo LIKE :prefijo {filtro_cierre} {filtro_fecha}
+            GROUP BY c.id{mes}
+            ORDER BY c.codigo
+        """), {'e': empresa_de_sesion(db), 'prefijo': f"{prefijo}%",
+               'cierre': DESCRIPCION_CIERRE.format(anio=anio), 'hasta': hasta.isoformat() if hasta else None}).all()
+    return [tuple(fila) for fila in filas]
+
+
+def _validar(db: Session, anio: int, cuenta_resultados: str):
+    """
+    Returns:
+        tuple: (mensaje de error o None, True si el cierre ya se registró
+        pero falta archivar el detalle)
+    """
+    inicio, fin = date(anio, 1, 1), date(anio, 12, 31)
+    if db.new or db.dirty or db.deleted:
+        return "La sesión tiene cambios sin confirmar.", False
+
+    empresa = db.get(Empresa, empresa_de_sesion(db))
+    if empresa is None:
+        return "Configure primero los datos de la empresa.", False
+    if fin >= date.today():
+        return f"El ejercicio {anio} todavía no termina.", False
+
+    pendiente = db.query(Asiento.id).filter(Asiento.fecha <= fin).first() is not None
+    if empresa.cierre_hasta and fin <= empresa.cierre_hasta:
+        # Un cierre interrumpido después de registrar los asientos se completa
+        if fin == empresa.cierre_hasta and pendiente:
+            return None, True
+        return f"El ejercicio {anio} ya está cerrado.", False
+
+    primera = min(
+        (f for f in (db.query(func.min(Asiento.fecha)).scalar(),
+                     db.query(func.min(MovimientoInventario.fecha)).scalar()) if f),
+        default=None
+    )
+    if primera and primera < inicio:
+        return f"Hay asientos o movimientos de {primera.year}: cierre primero ese ejercicio.", False
+    if not pendiente:
+        return f"No hay asientos del ejercicio {anio}.", False
+    if not db.query(Cuenta.id).filter(Cuenta.codigo == cuenta_resultados).first():
+        return f"No existe la cuenta de resultados acumulados {cuenta_resultados}.", False
+    return None, False
+
+
+def _asientos_de_cierre(db: Session, anio: int, cuenta_resultados: str):
+    """
+    Asiento de cierre (31/12) y de apertura (1/1 del año siguiente), sin commit.
+    Returns:
+        tuple: (asiento de cierre o None, asiento de apertura o None, resultado del ejercicio)
+    """
+    fin = date(anio, 12, 31)
+    saldos = (
+        db.query(Cuenta.codigo, func.sum(DetalleAsiento.debe) - func.sum(DetalleAsiento.haber))
+        .join(DetalleAsiento, DetalleAsiento.cuenta_id == Cuenta.id)
+        .join(Asiento, DetalleAsiento.asiento_id == Asiento.id)
+        .filter(Asiento.fecha <= fin)
+        .group_by(Cuenta.id)
+        .order_by(Cuenta.codigo)
+        .all()
+    )
+    # Saldos en Debe - Haber, redondeados a centavos
+    saldos = {codigo: round(saldo or 0.0, 2) for codigo, saldo in saldos}
+
+    # 1. Cierre: cada cuenta de resultados contra resultados acumulados
+    lineas = [
+        {'cuenta_codigo': codigo, 'debe': max(-saldo, 0.0), 'haber': max(saldo, 0.0)}
+        for codigo, saldo in saldos.items() if codigo.startswith(CLASES_RESULTADOS) and saldo
+    ]
+    perdida = round(sum(saldo for codigo, saldo in saldos.items() if codigo.startswith(CLASES_RESULTADOS)), 2)
+    cierre = None
+    if lineas:
+        lineas.append({'cuenta_codigo': cuenta_resultados, 'debe': max(perdida, 0.0), 'haber': max(-perdida, 0.0)})
+        cierre = preparar_asiento(db, fin, DESCRIPCION_CIERRE.format(anio=anio), lineas)
+
+    # 2. Apertura: saldos de balance, con el resultado ya en resultados acumulados
+    finales = {codigo: saldo for codigo, saldo in saldos.items() if not codigo.startswith(CLASES_RESULTADOS)}
+    finales[cuenta_resultados] = round(finales.get(cuenta_resultados, 0.0) + perdida, 2)
+    # Un centavo de redondeo entre cuentas se absorbe en resultados acumulados
+    finales[cuenta_resultados] = round(finales[cuenta_resultados] - round(sum(finales.values()), 2), 2)
+    lineas = [
+        {'cuenta_codigo': codigo, 'debe': max(saldo, 0.0), 'haber': max(-saldo, 0.0)}
+        for codigo, saldo in finales.items() if saldo
+    ]
+    apertura = None
+    if lineas:
+        apertura = preparar_asiento(db, fin + timedelta(days=1), DESCRIPCION_APERTURA.format(anio=anio + 1), lineas)
+    return cierre, apertura, -perdida
+
+
+def _arrastrar_lotes(db: Session, anio: int) -> int:
+    """
+    Los lotes que siguen vivos al 31/12 pasan al año siguiente como compras
+    del 1/1 con su costo de origen, sin commit. Las capas vivas se calculan
+    como el kardex (FIFO sobre los movimientos del año), así también se
+    arrastra lo que después vendieron movimientos del año siguiente.
+    El lote conserva su fecha de compra para que el consumo FIFO siga el
+    mismo orden; solo pasa a apuntar al movimiento de apertura.
+
+    Returns:
+        int: lotes arrastrados
+
+    Raises:
+        ValueError: si los lotes no coinciden con los movimientos
+    """
+    fin = date(anio, 12, 31)
+    movimientos = (
+        db.query(MovimientoInventario.id, MovimientoInventario.producto_id, MovimientoInventario.tipo,
+                 MovimientoInventario.cantidad, MovimientoInventario.costo_unitario)
+        .filter(MovimientoInventario.fecha <= fin)
+        .order_by(MovimientoInventario.producto_id, MovimientoInventario.fecha, MovimientoInventario.id)
+    )
+
+    # 1. Capas FIFO vivas al 31/12: [(movimiento_id, producto_id, cantidad, costo)]
+    capas, producto_actual, cola = [], None, deque()
+    for mov_id, producto_id, tipo, cantidad, costo in movimientos:
+        if producto_id != producto_actual:
+            capas += [(m, producto_actual, c, u) for m, c, u in cola]
+            producto_actual, cola = producto_id, deque()
+        if tipo == 'COMPRA':
+            cola.append([mov_id, cantidad, costo])
+            continue
+        while cantidad > 0 and cola:
+            tomar = min(cantidad, cola[0][1])
+            cola[0][1] -= tomar
+            cantidad -= tomar
+            if cola[0][1] == 0:
+                cola.popleft()
+    capas += [(m, producto_actual, c, u) for m, c, u in cola]
+
+    # 2. Un lote con saldo fuera de esas capas se perdería al archivar el año
+    ids_capas = {mov_id for mov_id, *_ in capas}
+    sueltos = (
+        db.query(LoteInventario.movimiento_id)
+        .join(MovimientoInventario, LoteInventario.movimiento_id == MovimientoInventario.id)
+        .filter(MovimientoInventario.fecha <= fin, LoteInventario.saldo_cantidad > 0)
+        .all()
+    )
+    if any(mov_id not in ids_capas for (mov_id,) in sueltos):
+        raise ValueError("Los lotes de inventario no coinciden con los movimientos del año; "
+                         "revise el stock antes de cerrar.")
+
+    # 3. Compras de apertura, en el orden de las capas (ids crecientes = mismo orden en el kardex)
+    lotes = {lote.movimiento_id: lote for lote in
+             db.query(LoteInventario).filter(LoteInventario.movimiento_id.in_(ids_capas))} if capas else {}
+    for mov_id, producto_id, cantidad, costo in capas:
+        lote = lotes.get(mov_id)
+        if lote is None:
+            raise ValueError(f"La compra {mov_id} no tiene lote; ejecute las migraciones antes de cerrar.")
+        apertura = MovimientoInventario(
+            producto_id=producto_id, fecha=fin + timedelta(days=1), tipo='COMPRA',
+            cantidad=cantidad, costo_unitario=costo, costo_total=cantidad * costo, saldo_cantidad=cantidad
+        )
+        db.add(apertura)
+        lote.movimiento = apertura
+        lote.cantidad_inicial = cantidad
+    return len(capas)
+
+
+def _copiar_al_archivo(db: Session, anio: int):
+    """Copia al archivo adjunto las filas del ejercicio (INSERT OR REPLACE: repetirlo no duplica)."""
+    parametros = {'e': empresa_de_sesion(db), 'fin': date(anio, 12, 31).isoformat()}
+    for tabla, condicion in ARCHIVADO.items():
+        # Columnas por nombre: en las BD migradas el orden físico no es el del modelo
+        columnas = ", ".join(c.name for c in Base.metadata.tables[tabla].columns)
+        db.execute(text(
+            f"INSERT OR REPLACE INTO archivo.{tabla} ({columnas}) SELECT {columnas} FROM main.{tabla} WHERE {condicion}"
+        ), parametros)
+
+
+def _borrar_archivado(db: Session, anio: int) -> dict:
+    """Borra de la BD viva el detalle del ejercicio que ya está en el archivo. Returns: {tabla: filas}"""
+    parametros = {'e': empresa_de_sesion(db), 'fin': date(anio, 12, 31).isoformat()}
+    borradas = {}
+    # Sin punto de control los triggers no anotan cada fila borrada; la
+    # próxima verificación de integridad es completa
+    reiniciar_control(db)
+    # Primero las filas que apuntan a otras (lotes -> movimientos, detalles -> asientos)
+    for tabla in reversed(TABLAS_DEL_EJERCICIO):
+        borradas[tabla] = db.execute(text(
+            f"DELETE FROM main.{tabla} WHERE {ARCHIVADO[tabla]} AND id IN (SELECT id FROM archivo.{tabla})"
+        ), parametros).rowcount
+    return borradas
+
+
+def _compactar(motor):
+    """VACUUM y checkpoint del WAL: devuelve al disco el espacio de las filas archivadas."""
+    with motor.connect() as conexion:
+        driver = conexion.connection.driver_connection
+        driver.execute("VACUUM")
+        driver.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+@instrumentado("cierre.cerrar_ejercicio")
+def cerrar_ejercicio(db: Session, anio: int, cuenta_resultados: str = CTA_RESULTADOS_ACUMULADOS,
+                     compactar: bool = True):
+    """
+    Cierra el ejercicio `anio` de la empresa de la sesión y archiva su detalle.
+
+    Se hace en tres transacciones, cada una escribe en un solo archivo:
+    1. BD viva: asientos de cierre y apertura, lotes arrastrados y
+       empresa.cierre_hasta (desde aquí el año ya no admite asientos).
+    2. Archivo: copia de las filas del año.
+    3. BD viva: borra las filas del año que ya están en el archivo.
+    En modo WAL SQLite no garantiza que un COMMIT sobre dos archivos sea
+    atómico entre ellos; así, si el proceso se corta, nunca se borra algo
+    que no llegó al archivo, y volver a ejecutar el cierre del mismo año
+    completa los pasos 2 y 3 (la copia es INSERT OR REPLACE).
+
+    Returns:
+        tuple: (exito, mensaje, resumen) con resumen {'archivo', 'resultado',
+        'asiento_cierre', 'asiento_apertura', 'lotes_arrastrados', 'borradas'}
+    """
+    # 1. Validaciones
+    error, solo_archivar = _validar(db, anio, cuenta_resultados)
+    if error:
+        return False, error, None
+    motor = db.get_bind()
+    try:
+        ruta = ruta_archivo(motor, anio)
+    except ValueError as e:
+        return False, str(e), None
+    db.rollback()
+
+    # 2. Esquema del archivo (si ya existe, create_all no lo toca)
+    motor_archivo = crear_motor(ruta)
+    Base.metadata.create_all(motor_archivo)
+    motor_archivo.dispose()
+
+    resumen = {'archivo': ruta, 'resultado': None, 'asiento_cierre': None, 'asiento_apertura': None,
+               'lotes_arrastrados': 0}
+    try:
+        with _conexion_con_archivo(motor, ruta) as conexion:
+            with Session(bind=conexion, autoflush=False, info={'empresa_id': empresa_de_sesion(db)}) as sesion:
+                # 3. Asientos de cierre y apertura, lotes y fecha de cierre
+                if not solo_archivar:
+                    def operacion():
+                        cierre, apertura, resultado = _asientos_de_cierre(sesion, anio, cuenta_resultados)
+                        lotes = _arrastrar_lotes(sesion, anio)
+                        sesion.get(Empresa, empresa_de_sesion(sesion)).cierre_hasta = date(anio, 12, 31)
+                        sesion.flush()
+                        return (cierre.id if cierre else None, apertura.id if apertura else None, resultado, lotes)
+
+                    (resumen['asiento_cierre'], resumen['asiento_apertura'], resumen['resultado'],
+                     resumen['lotes_arrastrados']) = ejecutar_en_transaccion(sesion, operacion)
+
+                # 4. Copia al archivo y 5. borrado de lo copiado
+                ejecutar_en_transaccion(sesion, lambda: _copiar_al_archivo(sesion, anio))
+                resumen['borradas'] = ejecutar_en_transaccion(sesion, lambda: _borrar_archivado(sesion, anio))
+    except ValueError as e:
+        return False, str(e), None
+
+    # 6. Compactar la BD viva (fuera de toda transacción)
+    if compactar:
+        _compactar(motor)
+
+    borradas = resumen['borradas']
+    mensaje = (f"Ejercicio {anio} cerrado: {borradas['asientos']} asientos y "
+               f"{borradas['movimientos_inventario']} movimientos archivados en {os.path.basename(ruta)}.")
+    if solo_archivar:
+        mensaje = f"Se completó el archivo del ejercicio {anio}: " + mensaje.split(": ", 1)[1]
+    return True, mensaje, resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("anio", type=int, help="año a cerrar")
+    parser.add_argument("--bd", default=DB_NAME, help="BD viva (por defecto la del sistema)")
+    parser.add_argument("--empresa", type=int, default=1, help="id de la empresa")
+    parser.add_argument("--cuenta-resultados", default=CTA_RESULTADOS_ACUMULADOS,
+                        help="cuenta de resultados acumulados que recibe el resultado del año")
+    parser.add_argument("--sin-compactar", action="store_true", help="no ejecutar VACUUM al final")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.bd):
+        raise SystemExit(f"No existe {args.bd}")
+    motor = crear_motor(args.bd)
+    try:
+        with sesion_de_empresa(sessionmaker(bind=motor, autoflush=False), args.empresa) as db:
+            ok, msg, resumen = cerrar_ejercicio(db, args.anio, args.cuenta_resultados, not args.sin_compactar)
+    finally:
+        motor.dispose()
+
+    print(f"{'✓' if ok else '✗'} {msg}")
+    if not ok:
+        raise SystemExit(1)
+    if resumen['resultado'] is not None:
+        print(f"  Resultado del ejercicio: {resumen['resultado']:,.2f}")
+    print(f"  Lotes arrastrados: {resumen['lotes_arrastrados']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Cola de registro con un único hilo escritor (group commit).
+
+SQLite admite un solo escritor y cada commit espera al disco. Cuando muchos
+productores registran a la vez, en lugar de que cada uno haga su propio commit
+los envían a esta cola: el hilo escritor junta lo pendiente (hasta
+`tamano_lote` operaciones o `espera_max` segundos) y lo confirma con un solo
+commit. Cada llamador recibe un Future con su resultado (el ID del asiento).
+
+Cada operación corre dentro de un SAVEPOINT: si una falla (por ejemplo, un
+asiento descuadrado) solo se descarta esa y las demás del lote se confirman.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+from src.base_datos.db import SessionLocal, ejecutar_en_transaccion
+from src.base_datos.multiempresa import empresa_activa
+from src.servicios.contabilidad import preparar_asiento
+
+# Marca para que el hilo escritor termine después de vaciar la cola
+_FIN = object()
+
+
+class ColaAsientos:
+    """
+    Uso:
+        with ColaAsientos() as cola:
+            futuro = cola.enviar_asiento(fecha, "Venta", movimientos)
+            asiento_id = futuro.result()
+    """
+
+    def __init__(self, fabrica_sesiones=SessionLocal, tamano_lote: int = 200, espera_max: float = 0.005):
+        self.fabrica_sesiones = fabrica_sesiones
+        self.tamano_lote = tamano_lote
+        self.espera_max = espera_max
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._cerrada = False
+        self._candado = threading.Lock()
+        # Estadísticas simples para benchmarks y diagnóstico
+        self.lotes_confirmados = 0
+        self.operaciones_confirmadas = 0
+
+    # --- Ciclo de vida -----------------------------------------------------
+
+    def iniciar(self):
+        with self._candado:
+            if self._hilo is None:
+                self._cerrada = False
+                self._hilo = threading.Thread(target=self._escritor, name="escritor-asientos", daemon=True)
+                self._hilo.start()
+        return self
+
+    def detener(self):
+        """Deja de aceptar envíos, confirma lo pendiente y espera al hilo escritor."""
+        with self._candado:
+            if self._hilo is None:
+                return
+            self._cerrada = True
+            self._cola.put(_FIN)
+            hilo, self._hilo = self._hilo, None
+        hilo.join()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    # --- Envíos ------------------------------------------------------------
+
+    def enviar_operacion(self, operacion) -> Future:
+        """
+        Encola operacion(db) para el próximo lote. operacion no debe hacer
+        commit; lo que devuelva (después de un flush) es el resultado del Future.
+        Si lanza una excepción, el Future la recibe y solo esa operación se descarta.
+        """
+        futuro = Future()
+        with self._candado:
+            if self._cerrada or self._hilo is None:
+                raise RuntimeError("La cola de asientos no está iniciada.")
+            self._cola.put((operacion, futuro))
+        return futuro
+
+    def enviar_asiento(self, fecha: date, descripcion: str, movimientos: list, empresa_id: int = None) -> Future:
+        """
+        Equivalente encolado de registrar_asiento: el Future devuelve el ID del asiento.
+        El hilo escritor tiene una sola sesión para todas las empresas; cada
+        operación fija la suya (por defecto, la empresa activa al encolar).
+        """
+        empresa = empresa_id or empresa_activa()
+
+        def operacion(db: Session):
+            db.info['empresa_id'] = empresa
+            asiento = preparar_asiento(db, fecha, descripcion, movimientos)
+            db.flush()
+            return asiento.id
+        return self.enviar_operacion(operacion)
+
+    # --- Hilo escritor -----------------------------------------------------
+
+    def _tomar_lote(self):
+        """Bloquea hasta el primer envío y junta los que lleguen dentro de la ventana."""
+        lote = []
+        terminar = False
+        primero = self._cola.get()
+        if primero is _FIN:
+            return lote, True
+        lote.append(primero)
+
+        limite = time.monotonic() + self.espera_max
+        while len(lote) < self.tamano_lote:
+            restante = limite - time.monotonic()
+            try:
+                item = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if item is _FIN:
+                terminar = True
+                break
+            lote.append(item)
+        return lote, terminar
+
+    def _confirmar_lote(self, db: Session, lote: list):
+        """Ejecuta el lote en una transacción de escritura y resuelve los Futures tras el commit."""
+        def operacion():
+            # Se recalcula en cada reintento de ejecutar_en_transaccion
+            resultados = []
+            for funcion, _ in lote:
+                try:
+                    with db.begin_nested():
+                        resultados.append((True, funcion(db)))
+                except Exception as e:
+                    resultados.append((False, e))
+            return resultados
+
+        try:
+            resultados = ejecutar_en_transaccion(db, operacion)
+        except Exception as e:
+            for _, futuro in lote:
+                futuro.set_exception(e)
+            return
+        finally:
+            # Los objetos ya confirmados no se vuelven a usar
+            db.expunge_all()
+
+        self.lotes_confirmados += 1
+        for (_, futuro), (ok, valor) in zip(lote, resultados):
+            if ok:
+                self.operaciones_confirmadas += 1
+                futuro.set_result(valor)
+            else:
+                futuro.set_exception(valor)
+
+    def _escritor(self):
+        db = self.fabrica_sesiones()
+        try:
+            terminar = False
+            while not terminar:
+                lote, terminar = self._tomar_lote()
+                if lote:
+                    self._confirmar_lote(db, lote)
+            # Lo que quedó después de la marca de fin (no debería haber)
+            while not self._cola.empty():
+                item = self._cola.get_nowait()
+                if item is not _FIN:
+                    self._confirmar_lote(db, [item])
+        finally:
+            db.close()
@@ -0,0 +1,311 @@
+# src/servicios/consolidacion.py
+"""
+Consolidación de estados financieros de varias empresas.
+
+Consolida un archivo por entidad: de cada BD se toma la empresa 1, que es la
+única en las BD de una sola empresa (ver src/base_datos/multiempresa.py). Los
+archivos no se modifican: cada uno se copia a memoria y es la copia la que se
+migra si viene de una versión anterior. Esta herramienta
+lee los saldos de cada archivo en paralelo (un proceso por archivo, una sola
+consulta agrupada en cada uno), los suma por código de cuenta, aplica las
+eliminaciones y genera el Balance de Comprobación consolidado y los Estados
+Financieros.
+
+Uso:
+    python -m src.servicios.consolidacion matriz.sqlite filial.sqlite \\
+        --eliminaciones eliminaciones.csv --carpeta consolidado/
+
+Archivo de eliminaciones (CSV con encabezado, la columna ruc es opcional):
+    codigo,destino,ruc
+    1.1.02.05,,0990000001001
+    2.1.01.05,,
+    1.1.02.09,1.1.02.01,
+La primera fila elimina el saldo de 1.1.02.05 solo en la empresa con ese RUC,
+la segunda elimina 2.1.01.05 en todas y la tercera reclasifica el saldo de
+1.1.02.09 a 1.1.02.01. Las eliminaciones se muestran en su propia columna.
+
+Los Estados Financieros se generan con los mismos generadores del menú,
+sobre una BD en memoria que tiene un único asiento con los saldos consolidados.
+"""
+import argparse
+import csv
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.base_datos.db import Base, crear_motor, init_db
+from src.base_datos.multiempresa import EMPRESA_POR_DEFECTO
+from src.modelos.entidades import Asiento, Cuenta, DetalleAsiento, Empresa
+from src.servicios.copias import TABLAS_REQUERIDAS
+from src.servicios.simulacion import copiar_a_memoria
+
+# Diferencias menores a esto se consideran cero (redondeo a centavos)
+TOLERANCIA = 0.005
+
+
+def _revisar_archivo(ruta_bd: str):
+    """Mensaje de error si ruta_bd no es una BD del sistema, None si está bien. La abre solo para leer."""
+    if not os.path.isfile(ruta_bd):
+        return f"No existe {ruta_bd}"
+    try:
+        conexion = sqlite3.connect(f"file:{ruta_bd}?mode=ro", uri=True)
+        try:
+            tablas = {n for (n,) in conexion.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        finally:
+            conexion.close()
+    except sqlite3.Error as e:
+        return f"{ruta_bd} no es una BD válida: {e}"
+    if not TABLAS_REQUERIDAS <= tablas:
+        return f"{ruta_bd} no es una BD del sistema contable."
+    return None
+
+
+def _saldos_archivo(ruta_bd: str):
+    """
+    Trabajador del pool: copia un archivo a memoria y devuelve, con una sola
+    consulta agrupada, las sumas del Debe y del Haber por cuenta de la
+    empresa 1. Retorna tipos simples para que viajen baratos entre procesos;
+    si el archivo no sirve, {'archivo', 'error'}.
+    """
+    error = _revisar_archivo(ruta_bd)
+    if error:
+        return {'archivo': ruta_bd, 'error': error}
+
+    try:
+        motor = copiar_a_memoria(ruta_bd)
+    except sqlite3.Error as e:
+        return {'archivo': ruta_bd, 'error': f"{ruta_bd} no se pudo leer: {e}"}
+    try:
+        # Archivos de versiones anteriores: las consultas filtran por
+        # empresa_id, así que la copia se migra como al abrir el sistema
+        init_db(motor)
+        with Session(motor, info={'empresa_id': EMPRESA_POR_DEFECTO}) as db:
+            empresa = db.get(Empresa, EMPRESA_POR_DEFECTO)
+            fechas = db.query(func.min(Asiento.fecha), func.max(Asiento.fecha)).one()
+            cuentas = [
+                tuple(fila) for fila in
+                db.query(
+                    Cuenta.codigo, Cuenta.nombre, Cuenta.tipo, Cuenta.naturaleza,
+                    func.sum(DetalleAsiento.debe), func.sum(DetalleAsiento.haber)
+                )
+                .join(DetalleAsiento, DetalleAsiento.cuenta_id == Cuenta.id)
+                .group_by(Cuenta.id)
+                .order_by(Cuenta.codigo)
+            ]
+    except SQLAlchemyError as e:
+        return {'archivo': ruta_bd, 'error': f"{ruta_bd} no se pudo migrar: {e}"}
+    finally:
+        motor.dispose()
+
+    return {
+        'archivo': ruta_bd,
+        'ruc': empresa.ruc if empresa else "",
+        'nombre': empresa.nombre if empresa else os.path.basename(ruta_bd),
+        'fechas': tuple(fechas),
+        'cuentas': cuentas,
+    }
+
+
+def leer_eliminaciones(ruta_csv: str):
+    """
+    Lee el CSV de eliminaciones (codigo, destino, ruc).
+    Returns:
+        tuple: (exito, mensaje, lista de {'codigo', 'destino', 'ruc'})
+    """
+    try:
+        with open(ruta_csv, newline="", encoding="utf-8-sig") as archivo:
+            lector = csv.DictReader(archivo)
+            if not lector.fieldnames or "codigo" not in lector.fieldnames:
+                return False, "El archivo de eliminaciones debe tener al menos la columna 'codigo'.", []
+            reglas = [
+                {'codigo': (fila.get("codigo") or "").strip(),
+                 'destino': (fila.get("destino") or "").strip(),
+                 'ruc': (fila.get("ruc") or "").strip()}
+                for fila in lector
+            ]
+    except OSError as e:
+        return False, f"No se pudo leer {ruta_csv}: {e}", []
+
+    reglas = [r for r in reglas if r['codigo']]
+    return True, f"{len(reglas)} regla(s) de eliminación.", reglas
+
+
+def consolidar(rutas, eliminaciones=(), procesos: int = None):
+    """
+    Suma los saldos de varias BD por código de cuenta y aplica las eliminaciones.
+
+    Saldos en "Debe - Haber" (positivo = deudor, negativo = acreedor), así
+    se pueden sumar cuentas de cualquier naturaleza.
+
+    Returns:
+        tuple: (exito, mensaje, consolidado) donde consolidado es un dict con
+        'empresas' [{archivo, ruc, nombre}], 'cuentas' [{codigo, nombre, tipo,
+        naturaleza, saldos: [uno por empresa], eliminacion, consolidado}],
+        'fecha_inicio', 'fecha_fin' y 'advertencias'
+    """
+    # 1. Validar archivos (SQLite crearía un archivo vacío si no existe)
+    faltantes = [r for r in rutas if not os.path.isfile(r)]
+    if faltantes:
+        return False, f"No existen: {', '.join(faltantes)}", None
+    if len(rutas) < 2:
+        return False, "Se necesitan al menos dos archivos para consolidar.", None
+
+    # 2. Un proceso por archivo
+    procesos = procesos or min(len(rutas), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        leidos = list(pool.map(_saldos_archivo, rutas))
+    errores = [e['error'] for e in leidos if 'error' in e]
+    if errores:
+        return False, " | ".join(errores), None
+
+    advertencias = []
+    rucs = [e['ruc'] for e in leidos if e['ruc']]
+    if len(set(rucs)) != len(rucs):
+        advertencias.append("Hay archivos con el mismo RUC: la misma empresa se estaría sumando dos veces.")
+
+    # 3. Unir por código de cuenta (el nombre es el del primer archivo que la tiene)
+    n = len(leidos)
+    cuentas = {}
+    nombres_distintos = []
+    for i, empresa in enumerate(leidos):
+        for codigo, nombre, tipo, naturaleza, debe, haber in empresa['cuentas']:
+            cuenta = cuentas.setdefault(codigo, {
+                'codigo': codigo, 'nombre': nombre, 'tipo': tipo, 'naturaleza': naturaleza,
+                'saldos': [0.0] * n, 'eliminacion': 0.0,
+            })
+            if cuenta['nombre'].strip().upper() != nombre.strip().upper() and codigo not in nombres_distintos:
+                nombres_distintos.append(codigo)
+            cuenta['saldos'][i] += (debe or 0.0) - (haber or 0.0)
+
+    if nombres_distintos:
+        advertencias.append(
+            f"{len(nombres_distintos)} cuenta(s) con nombres distintos entre empresas "
+            f"(se usa el del primer archivo): {', '.join(nombres_distintos[:10])}"
+        )
+
+    # 4. Eliminaciones: se quita el saldo de la cuenta (de una empresa o de todas)
+    #    y, si hay destino, se reclasifica a esa cuenta
+    indice_ruc = {e['ruc']: i for i, e in enumerate(leidos) if e['ruc']}
+    for regla in eliminaciones:
+        cuenta = cuentas.get(regla['codigo'])
+        if cuenta is None:
+            advertencias.append(f"Eliminación: la cuenta {regla['codigo']} no tiene saldo en ninguna empresa.")
+            continue
+        if regla['ruc'] and regla['ruc'] not in indice_ruc:
+            advertencias.append(f"Eliminación: no se consolidó ninguna empresa con RUC {regla['ruc']}.")
+            continue
+        destino = cuentas.get(regla['destino']) if regla['destino'] else None
+        if regla['destino'] and destino is None:
+            advertencias.append(f"Eliminación: la cuenta destino {regla['destino']} no existe en ningún archivo.")
+            continue
+
+        empresas = [indice_ruc[regla['ruc']]] if regla['ruc'] else range(n)
+        monto = sum(cuenta['saldos'][i] for i in empresas)
+        cuenta['eliminacion'] -= monto
+        if destino:
+            destino['eliminacion'] += monto
+
+    total_eliminado = sum(c['eliminacion'] for c in cuentas.values())
+    if abs(total_eliminado) > TOLERANCIA:
+        advertencias.append(
+            f"Las eliminaciones no cuadran: dejan una diferencia de {total_eliminado:,.2f} "
+            "(elimine ambos lados de cada operación entre empresas)."
+        )
+
+    lista = []
+    for codigo in sorted(cuentas):
+        cuenta = cuentas[codigo]
+        cuenta['consolidado'] = sum(cuenta['saldos']) + cuenta['eliminacion']
+        lista.append(cuenta)
+
+    fechas_inicio = [e['fechas'][0] for e in leidos if e['fechas'][0]]
+    fechas_fin = [e['fechas'][1] for e in leidos if e['fechas'][1]]
+    consolidado = {
+        'empresas': [{k: e[k] for k in ('archivo', 'ruc', 'nombre')} for e in leidos],
+        'cuentas': lista,
+        'fecha_inicio': min(fechas_inicio) if fechas_inicio else None,
+        'fecha_fin': max(fechas_fin) if fechas_fin else None,
+        'advertencias': advertencias,
+    }
+    return True, f"{n} empresas y {len(lista)} cuentas consolidadas.", consolidado
+
+
+def crear_bd_consolidada(consolidado: dict):
+    """
+    BD en memoria con las cuentas consolidadas y un único asiento con sus
+    saldos, para generar los Estados Financieros con los generadores de siempre.
+    Returns:
+        Session (cerrarla libera la BD)
+    """
+    motor = crear_motor(":memory:", poolclass=StaticPool, connect_args={'check_same_thread': False})
+    Base.metadata.create_all(motor)
+    db = sessionmaker(bind=motor, autoflush=False)()
+
+    nombres = ", ".join(e['nombre'] for e in consolidado['empresas'])
+    db.add(Empresa(ruc="CONSOLIDADO", nombre=f"CONSOLIDADO: {nombres}", nombre_comercial="Estados consolidados"))
+
+    asiento = Asiento(fecha=consolidado['fecha_fin'] or date.today(), descripcion="Saldos consolidados")
+    db.add(asiento)
+    for c in consolidado['cuentas']:
+        cuenta = Cuenta(codigo=c['codigo'], nombre=c['nombre'], tipo=c['tipo'], naturaleza=c['naturaleza'])
+        db.add(cuenta)
+        if abs(c['consolidado']) > TOLERANCIA:
+            db.add(DetalleAsiento(
+                asiento=asiento, cuenta=cuenta,
+                debe=max(c['consolidado'], 0.0), haber=max(-c['consolidado'], 0.0)
+            ))
+    db.commit()
+    return db
+
+
+def main():
+    from src.reportes.generadores import generar_balance_general, generar_estado_resultados
+    from src.reportes.generadores.balance_consolidado import generar_pdf_balance_consolidado
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archivos", nargs="+", help="BD SQLite de cada empresa")
+    parser.add_argument("--eliminaciones", help="CSV con las cuentas a eliminar o reclasificar")
+    parser.add_argument("--carpeta", default=".", help="dónde escribir los PDF")
+    parser.add_argument("--procesos", type=int, help="procesos en paralelo (por defecto uno por archivo)")
+    args = parser.parse_args()
+
+    reglas = []
+    if args.eliminaciones:
+        ok, msg, reglas = leer_eliminaciones(args.eliminaciones)
+        print(msg)
+        if not ok:
+            raise SystemExit(1)
+
+    ok, msg, consolidado = consolidar(args.archivos, reglas, args.procesos)
+    print(msg)
+    if not ok:
+        raise SystemExit(1)
+    for advertencia in consolidado['advertencias']:
+        print(f"⚠ {advertencia}")
+
+    os.makedirs(args.carpeta, exist_ok=True)
+    ruta = lambda nombre: os.path.join(args.carpeta, nombre)
+
+    resultados = [generar_pdf_balance_consolidado(consolidado, ruta("balance_consolidado.pdf"))]
+    db = crear_bd_consolidada(consolidado)
+    try:
+        er = generar_estado_resultados(db, nombre_archivo=ruta("estado_resultados_consolidado.pdf"))
+        utilidad = er.extra.get('utilidad_neta', 0.0)
+        resultados += [er, generar_balance_general(db, utilidad, nombre_archivo=ruta("balance_general_consolidado.pdf"))]
+    finally:
+        db.close()
+
+    for r in resultados:
+        print(f"{'✓' if r.exito else '✗'} {r.mensaje}")
+    if not all(r.exito for r in resultados):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
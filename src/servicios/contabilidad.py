@@ -1,10 +1,15 @@
 import pandas as pd
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from src.modelos.entidades import Cuenta, Asiento, DetalleAsiento
+from src.modelos.entidades import Cuenta, Asiento, DetalleAsiento, Empresa
+from src.base_datos.db import ejecutar_en_transaccion
+from src.base_datos.multiempresa import empresa_de_sesion
+from src.base_datos.instrumentacion import instrumentado
 import os
 from datetime import date
 
+@instrumentado("contabilidad.importar_plan_cuentas")
 def importar_plan_cuentas_desde_excel(ruta_archivo: str, db: Session):
     """
     Lee un archivo Excel con MÚLTIPLES HOJAS y carga las cuentas en la base de datos.
@@ -59,10 +64,15 @@ def importar_plan_cuentas_desde_excel(ruta_archivo: str, db: Session):
         db.rollback()
         return False, f"Error crítico al importar: {str(e)}"
 
-def registrar_asiento(db: Session, fecha: date, descripcion: str, movimientos: list):
+def preparar_asiento(db: Session, fecha: date, descripcion: str, movimientos: list):
     """
-    Registra un asiento contable validando partida doble.
+    Agrega un asiento a la sesión SIN hacer commit, para que otros servicios
+    lo incluyan en su propia transacción (un solo commit por operación).
     movimientos: lista de diccionarios [{'cuenta_codigo': str, 'debe': float, 'haber': float}]
+
+    Raises:
+        ValueError: si el asiento está descuadrado, alguna cuenta no existe
+                    o la fecha cae en un ejercicio cerrado
     """
     # 1. Validación de Partida Doble
     total_debe = sum(m['debe'] for m in movimientos)
@@ -70,33 +80,104 @@ def registrar_asiento(db: Session, fecha: date, descripcion: str, movimientos: l
     
     # Usamos round para evitar errores de punto flotante
     if round(total_debe, 2) != round(total_haber, 2):
-        return False, f"Descuadrado: Debe (${total_debe}) != Haber (${total_haber})"
+        raise ValueError(f"Descuadrado: Debe (${total_debe}) != Haber (${total_haber})")
 
-    try:
-        # 2. Crear Cabecera del Asiento
-        nuevo_asiento = Asiento(fecha=fecha, descripcion=descripcion)
-        db.add(nuevo_asiento)
-        db.flush() # Para obtener el ID del asiento antes de commit
+    # 2. Resolver todas las cuentas en una sola consulta; la fecha de cierre
+    #    de la empresa viaja en la misma consulta (subconsulta escalar)
+    codigos = {m['cuenta_codigo'] for m in movimientos}
+    cierre = select(Empresa.cierre_hasta).where(Empresa.id == empresa_de_sesion(db)).scalar_subquery()
+    filas = db.query(Cuenta.codigo, Cuenta.id, cierre).filter(Cuenta.codigo.in_(codigos)).all()
+    cierre_hasta = filas[0][2] if filas else None
+    if cierre_hasta and fecha <= cierre_hasta:
+        raise ValueError(f"El ejercicio {fecha.year} está cerrado: solo se registran asientos posteriores "
+                         f"al {cierre_hasta:%d/%m/%Y}.")
 
-        # 3. Crear Detalles
-        for mov in movimientos:
-            # Buscar la cuenta por código
-            cuenta = db.query(Cuenta).filter(Cuenta.codigo == mov['cuenta_codigo']).first()
-            if not cuenta:
-                db.rollback()
-                return False, f"La cuenta código '{mov['cuenta_codigo']}' no existe."
-
-            detalle = DetalleAsiento(
-                asiento_id=nuevo_asiento.id,
-                cuenta_id=cuenta.id,
-                debe=mov['debe'],
-                haber=mov['haber']
-            )
-            db.add(detalle)
+    ids_cuenta = {codigo: id_cuenta for codigo, id_cuenta, _ in filas}
+    for mov in movimientos:
+        if mov['cuenta_codigo'] not in ids_cuenta:
+            raise ValueError(f"La cuenta código '{mov['cuenta_codigo']}' no existe.")
 
-        db.commit()
-        return True, f"Asiento registrado correctamente. ID: {nuevo_asiento.id}"
+    # 3. Cabecera y detalles (se insertan juntos en el próximo flush)
+    nuevo_asiento = Asiento(fecha=fecha, descripcion=descripcion)
+    for mov in movimientos:
+        nuevo_asiento.detalles.append(DetalleAsiento(
+            cuenta_id=ids_cuenta[mov['cuenta_codigo']],
+            debe=mov['debe'],
+            haber=mov['haber']
+        ))
+
+    db.add(nuevo_asiento)
+    return nuevo_asiento
+
+@instrumentado("contabilidad.registrar_asiento")
+def registrar_asiento(db: Session, fecha: date, descripcion: str, movimientos: list):
+    """
+    Registra un asiento contable validando partida doble.
+    movimientos: lista de diccionarios [{'cuenta_codigo': str, 'debe': float, 'haber': float}]
+    """
+    def operacion():
+        nuevo_asiento = preparar_asiento(db, fecha, descripcion, movimientos)
+        db.flush() # Para obtener el ID del asiento antes de commit
+        return nuevo_asiento.id
+
+    try:
+        # Transacción de escritura con reintentos si otra terminal tiene la BD bloqueada
+        asiento_id = ejecutar_en_transaccion(db, operacion)
+        return True, f"Asiento registrado correctamente. ID: {asiento_id}"
 
+    except ValueError as e:
+        return False, str(e)
     except Exception as e:
-        db.rollback()
-        return False, f"Error al guardar: {str(e)}"
\ No newline at end of file
+        return False, f"Error al guardar: {str(e)}"
+
+@instrumentado("contabilidad.saldo_cuenta_a_fecha")
+def obtener_saldo_cuenta_a_fecha(db: Session, codigo_cuenta: str, fecha: date = None):
+    """
+    Saldo de una cuenta (o de todo un grupo, por prefijo de código) con los
+    asientos hasta `fecha` inclusive; sin fecha toma todos los asientos.
+    Se calcula con una sola consulta agregada y respeta la naturaleza de cada cuenta.
+    Una fecha de un ejercicio cerrado se lee de su archivo (src/servicios/cierre.py).
+
+    Returns:
+        dict: {'codigo', 'fecha', 'debe', 'haber', 'saldo'} o None si no hay cuentas con ese código
+    Raises:
+        ValueError: si la fecha es de un ejercicio cerrado cuyo archivo no se encuentra
+    """
+    if not db.query(Cuenta.id).filter(Cuenta.codigo.like(f"{codigo_cuenta}%")).first():
+        return None
+
+    # Importado aquí: cierre usa preparar_asiento de este módulo
+    from src.servicios.cierre import fecha_cerrada, sumas_archivadas, tiene_archivo
+    if fecha_cerrada(db, fecha):
+        # El detalle del año ya no está en la BD viva: sumas del archivo, sin el asiento de cierre
+        naturalezas = dict(db.query(Cuenta.codigo, Cuenta.naturaleza).filter(Cuenta.codigo.like(f"{codigo_cuenta}%")))
+        query = [
+            (naturalezas[codigo], debe, haber)
+            for codigo, _, debe, haber in sumas_archivadas(db, fecha.year, codigo_cuenta, hasta=fecha)
+        ] if tiene_archivo(db.get_bind(), fecha.year) else []
+    else:
+        # Totales por naturaleza; el JOIN con Asiento permite cortar por fecha
+        query = (
+            db.query(Cuenta.naturaleza, func.sum(DetalleAsiento.debe), func.sum(DetalleAsiento.haber))
+            .join(DetalleAsiento, DetalleAsiento.cuenta_id == Cuenta.id)
+            .join(Asiento, Asiento.id == DetalleAsiento.asiento_id)
+            .filter(Cuenta.codigo.like(f"{codigo_cuenta}%"))
+            .group_by(Cuenta.naturaleza)
+        )
+        if fecha:
+            query = query.filter(Asiento.fecha <= fecha)
+
+    total_debe = total_haber = saldo = 0.0
+    for naturaleza, debe, haber in query:
+        debe, haber = debe or 0.0, haber or 0.0
+        total_debe += debe
+        total_haber += haber
+        saldo += (debe - haber) if naturaleza.upper() == 'DEUDORA' else (haber - debe)
+
+    return {
+        'codigo': codigo_cuenta,
+        'fecha': fecha,
+        'debe': round(total_debe, 2),
+        'haber': round(total_haber, 2),
+        'saldo': round(saldo, 2),
+    }
@@ -0,0 +1,325 @@
+# src/servicios/copias.py
+"""
+Copias de seguridad, restauración y limpieza rápida de la BD.
+
+Todo se apoya en la API de backup de SQLite (sqlite3.Connection.backup),
+que copia la BD página por página respetando los bloqueos de SQLite:
+
+- crear_copia: copia en línea. La BD está en WAL y la copia se hace en un
+  solo paso, dentro de una transacción de lectura: ve una foto consistente
+  y no detiene los asientos que se registren mientras tanto. Se escribe en
+  un temporal que se renombra al terminar (nunca queda una copia a medias).
+- restaurar_copia: revisa la copia, guarda una del estado actual y vuelca
+  la copia sobre la BD viva.
+- limpiar_empresa: si la BD es solo de la empresa activa, arma una BD vacía
+  con el esquema actual y la vuelca sobre la viva (el archivo queda del
+  tamaño de una BD nueva, sin DELETE fila por fila ni VACUUM aparte).
+
+El "intercambio" de archivos se hace volcando con backup sobre la BD viva y
+no renombrando el archivo: así SQLite descarta el WAL y el -shm viejos (un
+WAL de otra BD junto al archivo nuevo lo corrompería), las conexiones ya
+abiertas ven la BD nueva y funciona en Windows, donde no se puede reemplazar
+un archivo abierto.
+
+Los archivos de ejercicios cerrados (src/servicios/cierre.py) son aparte:
+la copia es solo de la BD viva.
+
+Uso:
+    python -m src.servicios.copias crear
+    python -m src.servicios.copias listar
+    python -m src.servicios.copias restaurar datos/copias/contabilidad_20250131_180000.sqlite
+"""
+import argparse
+import os
+import sqlite3
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.base_datos.db import BUSY_TIMEOUT_MS, DB_NAME, crear_motor, init_db
+from src.base_datos.instrumentacion import instrumentado
+from src.base_datos.migraciones import TABLAS_POR_EMPRESA
+from src.base_datos.multiempresa import empresa_de_sesion
+from src.modelos.entidades import (
+    Asiento, Cuenta, DetalleAsiento, Empresa, LoteInventario, MovimientoInventario, Producto,
+)
+from src.reportes.resultado import ResultadoReporte
+from src.servicios.integridad import reiniciar_control
+
+CARPETA_COPIAS = os.path.join("datos", "copias")
+
+# Una copia que no tenga estas tablas no es de este sistema
+TABLAS_REQUERIDAS = {'empresa', 'cuentas', 'asientos', 'detalles_asiento'}
+
+
+def _conectar(ruta: str):
+    """Conexión directa (sin SQLAlchemy) que espera el bloqueo como las del sistema."""
+    conexion = sqlite3.connect(ruta, isolation_level=None)
+    conexion.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conexion
+
+
+def _volcar(ruta_origen: str, ruta_destino: str):
+    """
+    Copia completa de ruta_origen sobre ruta_destino con la API de backup.
+    Returns:
+        int: páginas copiadas
+    """
+    origen, destino = _conectar(ruta_origen), _conectar(ruta_destino)
+    try:
+        # Un solo paso (pages=-1): con varios pasos, cada escritura de otra
+        # conexión sobre el origen obligaría a empezar la copia de nuevo, y
+        # con asientos entrando seguido la copia podría no terminar nunca.
+        # Por eso no hay avance intermedio que informar.
+        origen.backup(destino, pages=-1)
+        return destino.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        origen.close()
+        destino.close()
+
+
+def _tamano_mb(ruta: str) -> float:
+    return sum(os.path.getsize(ruta + s) for s in ("", "-wal") if os.path.exists(ruta + s)) / 2**20
+
+
+def _checkpoint(ruta: str):
+    """Pasa el WAL al archivo y lo vacía (el archivo queda con el tamaño real de la BD)."""
+    conexion = _conectar(ruta)
+    try:
+        conexion.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conexion.close()
+
+
+def ruta_nueva_copia(ruta_bd: str = DB_NAME, sufijo: str = "") -> str:
+    """Ruta por defecto de una copia hecha ahora: datos/copias/<nombre>_<AAAAMMDD_HHMMSS><sufijo>.sqlite"""
+    nombre = os.path.splitext(os.path.basename(ruta_bd))[0]
+    return os.path.join(CARPETA_COPIAS, f"{nombre}_{datetime.now():%Y%m%d_%H%M%S}{sufijo}.sqlite")
+
+
+@instrumentado("copias.crear")
+def crear_copia(ruta_bd: str = DB_NAME, destino: str = None):
+    """
+    Copia en línea de la BD (se puede seguir registrando mientras se hace).
+    Por defecto va a datos/copias/<nombre>_<AAAAMMDD_HHMMSS>.sqlite.
+
+    Returns:
+        tuple: (exito, mensaje, ruta de la copia)
+    """
+    if not os.path.isfile(ruta_bd):
+        return False, f"No existe {ruta_bd}", None
+    destino = destino or ruta_nueva_copia(ruta_bd)
+    os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+
+    temporal = f"{destino}.tmp"
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    try:
+        _volcar(ruta_bd, temporal)
+        # La copia queda en un solo archivo, sin -wal ni -shm
+        conexion = _conectar(temporal)
+        conexion.execute("PRAGMA journal_mode=DELETE")
+        conexion.close()
+    except Exception as e:
+        # Fallida o cancelada: no queda el temporal
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        if not isinstance(e, sqlite3.Error):
+            raise
+        return False, f"No se pudo copiar la BD: {e}", None
+
+    os.replace(temporal, destino)
+    return True, f"Copia guardada en {destino} ({_tamano_mb(destino):.1f} MB)", destino
+
+
+def generar_copia(db: Session, nombre_archivo: str, progreso=None):
+    """
+    Adaptador para el GestorTrabajos (en_memoria=False): copia en segundo
+    plano la BD de la sesión en nombre_archivo. La copia es un solo paso
+    (ver _volcar): se puede cancelar antes de empezar, no a la mitad.
+    Returns:
+        ResultadoReporte (extra: 'ruta')
+    """
+    resultado = ResultadoReporte(progreso=progreso)
+    resultado.notificar("copia")
+
+    ok, msg, ruta = crear_copia(db.get_bind().url.database, nombre_archivo)
+    resultado.marcar("copia")
+    if not ok:
+        return resultado.fallo(msg)
+    resultado.exito, resultado.mensaje, resultado.extra['ruta'] = True, msg, ruta
+    return resultado
+
+
+def listar_copias(carpeta: str = CARPETA_COPIAS):
+    """
+    Returns:
+        list: [(ruta, fecha de modificación, MB)] de la más nueva a la más vieja
+    """
+    if not os.path.isdir(carpeta):
+        return []
+    copias = [os.path.join(carpeta, n) for n in os.listdir(carpeta) if n.endswith(".sqlite")]
+    return sorted(
+        ((ruta, datetime.fromtimestamp(os.path.getmtime(ruta)), _tamano_mb(ruta)) for ruta in copias),
+        key=lambda c: c[1], reverse=True
+    )
+
+
+def _revisar_copia(ruta: str):
+    """Mensaje de error si la copia no sirve para restaurar, None si está bien."""
+    if not os.path.isfile(ruta):
+        return f"No existe {ruta}"
+    try:
+        conexion = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+        try:
+            tablas = {n for (n,) in conexion.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            revision = conexion.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            conexion.close()
+    except sqlite3.Error as e:
+        return f"{ruta} no es una BD válida: {e}"
+    if not TABLAS_REQUERIDAS <= tablas:
+        return f"{ruta} no es una copia del sistema contable."
+    if revision != "ok":
+        return f"La copia está dañada: {revision}"
+    return None
+
+
+@instrumentado("copias.restaurar")
+def restaurar_copia(ruta_copia: str, ruta_bd: str = DB_NAME, respaldar: bool = True):
+    """
+    Reemplaza el contenido de la BD por el de una copia. Antes guarda una
+    copia del estado actual (respaldar=True), por si hay que volver atrás.
+    La copia puede ser de una versión anterior: al final se aplican las
+    migraciones.
+
+    Returns:
+        tuple: (exito, mensaje)
+    """
+    # 1. Revisar la copia antes de tocar nada
+    error = _revisar_copia(ruta_copia)
+    if error:
+        return False, error
+
+    # 2. Copia del estado actual
+    aviso = ""
+    if respaldar and os.path.isfile(ruta_bd):
+        ok, msg, ruta_respaldo = crear_copia(ruta_bd, ruta_nueva_copia(ruta_bd, "_antes_de_restaurar"))
+        if not ok:
+            return False, msg
+        aviso = f" El estado anterior quedó en {ruta_respaldo}."
+
+    # 3. Volcar la copia sobre la BD viva y actualizar su esquema
+    try:
+        _volcar(ruta_copia, ruta_bd)
+        _checkpoint(ruta_bd)
+    except sqlite3.Error as e:
+        return False, f"No se pudo restaurar: {e}"
+    motor = crear_motor(ruta_bd)
+    try:
+        init_db(motor)
+    finally:
+        motor.dispose()
+    return True, f"BD restaurada desde {ruta_copia}.{aviso}"
+
+
+def _hay_otras_empresas(db: Session, empresa_id: int) -> bool:
+    if db.query(Empresa.id).filter(Empresa.id != empresa_id).first():
+        return True
+    # Filas huérfanas de otra empresa (sin registro en empresa) también se conservan
+    return any(
+        db.execute(text(f"SELECT 1 FROM {tabla} WHERE empresa_id <> :e LIMIT 1"), {'e': empresa_id}).first()
+        for tabla in TABLAS_POR_EMPRESA
+    )
+
+
+@instrumentado("copias.limpiar_empresa")
+def limpiar_empresa(db: Session):
+    """
+    Borra todos los datos de la empresa de la sesión (asientos, plan de
+    cuentas, inventario y sus datos de empresa).
+
+    Si la BD es solo de esa empresa, la recrea vacía con el esquema actual y
+    la vuelca sobre la viva. Si hay otras empresas, borra con un DELETE por
+    tabla (limitado a la empresa) y compacta con VACUUM.
+
+    Returns:
+        tuple: (exito, mensaje)
+    """
+    empresa_id = empresa_de_sesion(db)
+    motor = db.get_bind()
+    ruta_bd = motor.url.database
+    en_archivo = ruta_bd not in (None, "", ":memory:")
+
+    # 1. BD de una sola empresa: recrear y volcar
+    if en_archivo and not _hay_otras_empresas(db, empresa_id):
+        db.rollback()
+        antes = _tamano_mb(ruta_bd)
+        nueva = f"{ruta_bd}.nueva"
+        for sufijo in ("", "-wal", "-shm"):
+            if os.path.exists(nueva + sufijo):
+                os.remove(nueva + sufijo)
+        motor_nuevo = crear_motor(nueva)
+        try:
+            init_db(motor_nuevo)
+        finally:
+            motor_nuevo.dispose()
+        try:
+            _volcar(nueva, ruta_bd)
+            _checkpoint(ruta_bd)
+        except sqlite3.Error as e:
+            return False, f"No se pudo recrear la BD: {e}"
+        finally:
+            for sufijo in ("", "-wal", "-shm"):
+                if os.path.exists(nueva + sufijo):
+                    os.remove(nueva + sufijo)
+        return True, f"Base de datos recreada vacía ({antes:.1f} MB -> {_tamano_mb(ruta_bd):.1f} MB)."
+
+    # 2. Hay otras empresas: un DELETE por tabla, primero detalles y luego maestros
+    #    (las consultas ya se limitan a la empresa; Empresa no, se filtra a mano).
+    #    Antes se descarta su punto de control de integridad: así los triggers
+    #    no anotan cada fila borrada
+    try:
+        reiniciar_control(db)
+        borradas = sum(
+            db.query(modelo).delete(synchronize_session=False)
+            for modelo in (DetalleAsiento, Asiento, LoteInventario, MovimientoInventario, Producto, Cuenta)
+        )
+        borradas += db.query(Empresa).filter(Empresa.id == empresa_id).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        return False, f"Error: {str(e)}"
+
+    if en_archivo:
+        with motor.connect() as conexion:
+            conexion.connection.driver_connection.execute("VACUUM")
+    return True, f"Se eliminaron {borradas} registros de la empresa."
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("accion", choices=["crear", "listar", "restaurar"])
+    parser.add_argument("copia", nargs="?", help="copia a restaurar (o destino de la copia a crear)")
+    parser.add_argument("--bd", default=DB_NAME, help="BD viva (por defecto la del sistema)")
+    args = parser.parse_args()
+
+    if args.accion == "listar":
+        for ruta, fecha, mb in listar_copias():
+            print(f"{fecha:%d/%m/%Y %H:%M:%S}  {mb:8.1f} MB  {ruta}")
+        return
+
+    if args.accion == "crear":
+        ok, msg, _ = crear_copia(args.bd, args.copia)
+    elif not args.copia:
+        parser.error("indique la copia a restaurar")
+    else:
+        ok, msg = restaurar_copia(args.copia, args.bd)
+    print(f"{'✓' if ok else '✗'} {msg}")
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
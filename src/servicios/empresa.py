@@ -1,13 +1,16 @@
 # src/servicios/empresa.py
 from sqlalchemy.orm import Session
 from src.modelos.entidades import Empresa
+from src.base_datos.instrumentacion import instrumentado
+from src.base_datos.multiempresa import empresa_de_sesion
 
+@instrumentado("empresa.configurar")
 def configurar_empresa(db: Session, datos: dict):
     """
-    Crea o actualiza los datos de la empresa.
-    Solo puede haber UNA empresa en el sistema.
+    Crea o actualiza los datos de la empresa de la sesión
+    (ver src/base_datos/multiempresa.py).
     """
-    empresa_existente = db.query(Empresa).first()
+    empresa_existente = obtener_empresa(db)
     
     if empresa_existente:
         # Actualizar datos existentes
@@ -17,7 +20,7 @@ def configurar_empresa(db: Session, datos: dict):
         mensaje = "Datos de empresa actualizados"
     else:
         # Crear nueva empresa
-        empresa_existente = Empresa(**datos)
+        empresa_existente = Empresa(id=empresa_de_sesion(db), **datos)
         db.add(empresa_existente)
         mensaje = "Empresa registrada exitosamente"
     
@@ -29,15 +32,39 @@ def configurar_empresa(db: Session, datos: dict):
         db.rollback()
         return False, f"Error: {str(e)}", None
 
+@instrumentado("empresa.crear")
+def crear_empresa(db: Session, datos: dict):
+    """
+    Registra otra empresa en la misma BD, con su propio plan de cuentas,
+    asientos e inventario. Para trabajar sobre ella hay que abrir sesiones
+    con su id (sesion_de_empresa o fijar_empresa_activa).
+    """
+    if db.query(Empresa.id).filter(Empresa.ruc == datos.get('ruc')).first():
+        return False, f"Ya existe una empresa con RUC {datos.get('ruc')}", None
+
+    empresa = Empresa(**datos)
+    db.add(empresa)
+    try:
+        db.commit()
+        db.refresh(empresa)
+        return True, f"Empresa registrada con el número {empresa.id}", empresa
+    except Exception as e:
+        db.rollback()
+        return False, f"Error: {str(e)}", None
+
+def listar_empresas(db: Session):
+    """Todas las empresas de la BD, en orden de id."""
+    return db.query(Empresa).order_by(Empresa.id).all()
+
 def obtener_empresa(db: Session):
     """
-    Obtiene los datos de la empresa configurada.
+    Obtiene los datos de la empresa de la sesión.
     Retorna None si no existe.
     """
-    return db.query(Empresa).first()
+    return db.get(Empresa, empresa_de_sesion(db))
 
 def empresa_configurada(db: Session):
     """
-    Verifica si ya existe una empresa configurada.
+    Verifica si la empresa de la sesión ya está configurada.
     """
-    return db.query(Empresa).first() is not None
+    return obtener_empresa(db) is not None
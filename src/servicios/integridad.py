@@ -0,0 +1,304 @@
+# src/servicios/integridad.py
+"""
+Verificador de integridad del libro diario, incremental con punto de control.
+
+registrar_asiento solo deja pasar asientos cuadrados, pero nada revisa lo que
+se cambia directamente en SQLite (otra herramienta, una copia vieja, un
+borrado a mano). Este verificador revisa con consultas agrupadas (una por
+regla, sin recorrer los asientos en Python):
+- cada asiento cuadra (Debe = Haber, redondeado a centavos);
+- cada asiento tiene líneas y cada línea tiene su asiento;
+- cada línea apunta a una cuenta que existe, de la misma empresa;
+- no hay montos nulos ni negativos.
+
+Punto de control (tabla integridad_control, uno por empresa): último asiento
+y última línea verificados, y una huella de las líneas verificadas. La huella
+es la suma (módulo 2^64) de un hash de cada línea: no depende del orden y se
+actualiza sumando las líneas nuevas y las versiones que anotan los triggers
+de integridad_cambios (restando la que se va y sumando la que queda), sin
+volver a leer el libro.
+
+Las verificaciones siguientes solo revisan los asientos nuevos (id mayor al
+del punto de control) y los que tienen cambios anotados. La verificación
+completa revisa todo el libro y recalcula la huella: si no coincide con la
+del punto de control más los cambios anotados, se cambiaron líneas ya
+verificadas sin pasar por los triggers (p. ej. se restauró un archivo viejo
+o se borraron los triggers); se informa y la huella recalculada pasa a ser
+la nueva referencia. El punto de control solo avanza si las reglas se
+cumplen: un asiento con error se sigue informando hasta que se corrija.
+
+Uso:
+    python -m src.servicios.integridad
+    python -m src.servicios.integridad --completa --bd datos/contabilidad.sqlite
+"""
+import argparse
+import hashlib
+import os
+import struct
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.base_datos.db import DB_NAME, crear_motor, ejecutar_en_transaccion
+from src.base_datos.instrumentacion import instrumentado
+from src.base_datos.multiempresa import empresa_de_sesion, sesion_de_empresa
+
+# Ids de ejemplo que se muestran por regla
+MUESTRA = 20
+
+MODULO_HUELLA = 2 ** 64
+
+# Asientos a revisar en la verificación incremental (tabla temporal de la conexión)
+_ALCANCE = "integridad_alcance"
+
+# Regla -> descripción
+REGLAS = {
+    'descuadrados': "Asientos con Debe distinto de Haber",
+    'sin_detalle': "Asientos sin líneas",
+    'lineas_huerfanas': "Líneas de un asiento que no existe",
+    'cuenta_inexistente': "Líneas con una cuenta que no existe",
+    'otra_empresa': "Líneas con asiento o cuenta de otra empresa",
+    'montos_invalidos': "Líneas con montos nulos o negativos",
+}
+
+# Una pasada por tabla; cada consulta devuelve (regla, id) de cada fila con
+# error. {asientos} / {detalles} se reemplazan por el filtro de alcance o por nada.
+CONSULTAS_REGLAS = (
+    """
+    SELECT CASE WHEN COUNT(d.id) = 0 THEN 'sin_detalle' ELSE 'descuadrados' END, a.id
+    FROM asientos a
+    LEFT JOIN detalles_asiento d ON d.empresa_id = a.empresa_id AND d.asiento_id = a.id
+    WHERE a.empresa_id = :e {asientos}
+    GROUP BY a.id
+    HAVING COUNT(d.id) = 0 OR ROUND(TOTAL(d.debe) - TOTAL(d.haber), 2) <> 0
+    """,
+    """
+    SELECT CASE
+               WHEN a.id IS NULL THEN 'lineas_huerfanas'
+               WHEN c.id IS NULL THEN 'cuenta_inexistente'
+               WHEN a.empresa_id <> d.empresa_id OR c.empresa_id <> d.empresa_id THEN 'otra_empresa'
+               ELSE 'montos_invalidos'
+           END, d.id
+    FROM detalles_asiento d
+    LEFT JOIN asientos a ON a.id = d.asiento_id
+    LEFT JOIN cuentas c ON c.id = d.cuenta_id
+    WHERE d.empresa_id = :e {detalles}
+      AND (a.id IS NULL OR c.id IS NULL OR a.empresa_id <> d.empresa_id OR c.empresa_id <> d.empresa_id
+           OR d.debe IS NULL OR d.haber IS NULL OR d.debe < 0 OR d.haber < 0)
+    """,
+)
+
+_LINEA = struct.Struct("<qqqdd")
+
+
+def _huella_linea(detalle_id, asiento_id, cuenta_id, debe, haber) -> int:
+    """Hash de 64 bits de una línea (los montos exactos, no redondeados)."""
+    try:
+        contenido = _LINEA.pack(detalle_id, asiento_id, cuenta_id, debe, haber)
+    except (struct.error, TypeError):
+        # Valores que no son números (NULL, texto): se usa su repr
+        contenido = repr((detalle_id, asiento_id, cuenta_id, debe, haber)).encode()
+    return int.from_bytes(hashlib.blake2b(contenido, digest_size=8).digest(), "big")
+
+
+def _huella(filas):
+    """
+    Huella de filas (detalle_id, asiento_id, cuenta_id, debe, haber, signo).
+    Returns:
+        tuple: (suma de signo * hash módulo 2^64, suma de los signos = líneas)
+    """
+    total = cantidad = 0
+    for *linea, signo in filas:
+        total += signo * _huella_linea(*linea)
+        cantidad += signo
+    return total % MODULO_HUELLA, cantidad
+
+
+def _tiene_registro(db: Session) -> bool:
+    """La BD tiene las tablas del verificador (las crea ejecutar_migraciones)."""
+    return db.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'integridad_control'"
+    )).first() is not None
+
+
+def reiniciar_control(db: Session):
+    """
+    Descarta el punto de control y los cambios anotados de la empresa de la
+    sesión: la próxima verificación es completa. Lo usan los procesos que
+    borran en bloque filas ya verificadas (cierre de ejercicio, limpieza),
+    para que los triggers no anoten cada fila borrada. No hace commit.
+    """
+    if not _tiene_registro(db):
+        return
+    parametros = {'e': empresa_de_sesion(db)}
+    db.execute(text("DELETE FROM integridad_control WHERE empresa_id = :e"), parametros)
+    db.execute(text("DELETE FROM integridad_cambios WHERE empresa_id = :e"), parametros)
+
+
+def _aplicar_reglas(db: Session, empresa_id: int, con_alcance: bool):
+    """Ejecuta las reglas (todo el libro o solo el alcance). Returns: {regla: [ids]} con las que fallan."""
+    filtros = {'asientos': "", 'detalles': ""}
+    if con_alcance:
+        filtros = {'asientos': f"AND a.id IN (SELECT asiento_id FROM temp.{_ALCANCE})",
+                   'detalles': f"AND d.asiento_id IN (SELECT asiento_id FROM temp.{_ALCANCE})"}
+    errores = {}
+    for consulta in CONSULTAS_REGLAS:
+        for regla, fila_id in db.execute(text(consulta.format(**filtros)), {'e': empresa_id}):
+            errores.setdefault(regla, []).append(fila_id)
+    return errores
+
+
+def _leer_control(db: Session, empresa_id: int):
+    return db.execute(text(
+        "SELECT ultimo_asiento, ultimo_detalle, huella, lineas FROM integridad_control WHERE empresa_id = :e"
+    ), {'e': empresa_id}).first()
+
+
+def _revisar(db: Session, empresa_id: int, completa: bool):
+    """
+    Lectura (sin escribir nada): reglas, huella y el punto de control nuevo.
+    Todo sale de la misma instantánea de lectura.
+    """
+    control = _leer_control(db, empresa_id)
+    completa = completa or control is None
+    e = {'e': empresa_id}
+    # Las líneas se leen con el cursor del driver (misma transacción): son
+    # todas en la verificación completa y así no se arma una Row por línea
+    cursor = db.connection().connection.driver_connection
+    lineas = (
+        "SELECT id, asiento_id, cuenta_id, debe, haber, 1 FROM detalles_asiento "
+        "WHERE empresa_id = :e AND id > :desde AND id <= :hasta"
+    )
+
+    ultimo_cambio = db.execute(text(
+        "SELECT COALESCE(MAX(id), 0) FROM integridad_cambios WHERE empresa_id = :e"), e).scalar()
+    # Ids de toda la BD (MAX sobre la clave primaria, inmediato): lo que pasa
+    # de ahí en adelante es nuevo, sea de esta empresa o de otra
+    ultimo_asiento = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM asientos")).scalar()
+    ultimo_detalle = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM detalles_asiento")).scalar()
+    verificado = control.ultimo_detalle if control else 0
+
+    # Cambios anotados sobre líneas ya verificadas: -versión anterior, +versión nueva
+    delta, delta_lineas = 0, 0
+    if control:
+        delta, delta_lineas = _huella(cursor.execute("""
+            SELECT detalle_id, asiento_id, cuenta_id, debe, haber, signo FROM integridad_cambios
+            WHERE empresa_id = :e AND id <= :cambio AND signo <> 0 AND detalle_id <= :verificado
+        """, {**e, 'cambio': ultimo_cambio, 'verificado': verificado}))
+
+    informe = {'modo': "completa" if completa else "incremental", 'huella_coincide': None}
+    if completa:
+        # 1. Todo el libro; la huella de lo ya verificado se compara con la esperada
+        errores = _aplicar_reglas(db, empresa_id, con_alcance=False)
+        huella, cantidad = _huella(cursor.execute(lineas, {**e, 'desde': 0, 'hasta': verificado}))
+        if control:
+            informe['huella_coincide'] = huella == (int(control.huella, 16) + delta) % MODULO_HUELLA
+        informe['asientos_revisados'] = db.execute(
+            text("SELECT COUNT(*) FROM asientos WHERE empresa_id = :e"), e).scalar()
+    else:
+        # 2. Solo asientos nuevos y los que tienen cambios anotados
+        db.execute(text(f"CREATE TEMP TABLE IF NOT EXISTS {_ALCANCE} (asiento_id INTEGER PRIMARY KEY)"))
+        db.execute(text(f"DELETE FROM temp.{_ALCANCE}"))
+        db.execute(text(f"""
+            INSERT INTO temp.{_ALCANCE} (asiento_id)
+            SELECT asiento_id FROM integridad_cambios WHERE empresa_id = :e AND id <= :cambio
+            UNION SELECT asiento_id FROM detalles_asiento WHERE empresa_id = :e AND id > :detalle
+            UNION SELECT id FROM asientos WHERE empresa_id = :e AND id > :asiento
+        """), {**e, 'cambio': ultimo_cambio, 'detalle': verificado, 'asiento': control.ultimo_asiento})
+        informe['asientos_revisados'] = db.execute(text(f"SELECT COUNT(*) FROM temp.{_ALCANCE}")).scalar()
+        errores = _aplicar_reglas(db, empresa_id, con_alcance=True)
+        huella = (int(control.huella, 16) + delta) % MODULO_HUELLA
+        cantidad = control.lineas + delta_lineas
+        ultimo_asiento = max(ultimo_asiento, control.ultimo_asiento)
+        ultimo_detalle = max(ultimo_detalle, verificado)
+
+    # 3. Líneas nuevas desde el punto de control
+    huella_nuevas, nuevas = _huella(cursor.execute(lineas, {**e, 'desde': verificado, 'hasta': ultimo_detalle}))
+    informe['lineas_nuevas'] = nuevas
+    informe['errores'] = errores
+    nuevo_control = {
+        **e, 'asiento': ultimo_asiento, 'detalle': ultimo_detalle, 'cambio': ultimo_cambio,
+        'huella': f"{(huella + huella_nuevas) % MODULO_HUELLA:016x}", 'lineas': cantidad + nuevas,
+        'fecha': datetime.now().isoformat(timespec="seconds"),
+    }
+    return informe, nuevo_control
+
+
+def _guardar_control(db: Session, control: dict):
+    """Punto de control nuevo y borrado de los cambios ya aplicados (los posteriores a la lectura quedan)."""
+    db.execute(text("""
+        INSERT OR REPLACE INTO integridad_control (empresa_id, ultimo_asiento, ultimo_detalle, huella, lineas, fecha)
+        VALUES (:e, :asiento, :detalle, :huella, :lineas, :fecha)
+    """), control)
+    db.execute(text("DELETE FROM integridad_cambios WHERE empresa_id = :e AND id <= :cambio"), control)
+
+
+@instrumentado("integridad.verificar")
+def verificar_integridad(db: Session, completa: bool = False):
+    """
+    Verifica el libro diario de la empresa de la sesión. Sin punto de control
+    previo (o con completa=True) revisa todo; si no, solo lo nuevo y lo
+    cambiado desde la última verificación sin errores.
+
+    Returns:
+        tuple: (exito, mensaje, informe) con informe {'modo', 'asientos_revisados',
+        'lineas_nuevas', 'errores': {regla: [ids]}, 'huella_coincide', 'segundos'}
+    """
+    if not _tiene_registro(db):
+        return False, "La BD no tiene las tablas del verificador (ejecute init_db).", None
+
+    inicio = time.perf_counter()
+    empresa_id = empresa_de_sesion(db)
+
+    # 1. Lectura en una sola instantánea (no bloquea a quien registra asientos)
+    db.rollback()
+    try:
+        informe, control = _revisar(db, empresa_id, completa)
+    finally:
+        db.rollback()
+
+    # 2. El punto de control avanza solo si las reglas se cumplen. Una huella
+    #    distinta se informa una vez: la verificación completa ya revisó todo
+    #    y su huella pasa a ser la nueva referencia
+    if not informe['errores']:
+        ejecutar_en_transaccion(db, lambda: _guardar_control(db, control))
+    sin_errores = not informe['errores'] and informe['huella_coincide'] is not False
+    informe['segundos'] = time.perf_counter() - inicio
+
+    revisados = f"{informe['asientos_revisados']} asiento(s) revisados ({informe['modo']})"
+    if sin_errores:
+        return True, f"Libro íntegro: {revisados}.", informe
+
+    partes = [f"{REGLAS[regla]}: {len(ids)}" for regla, ids in informe['errores'].items()]
+    if informe['huella_coincide'] is False:
+        partes.append("líneas ya verificadas cambiaron sin quedar anotadas")
+    return False, f"Problemas de integridad en {revisados}: " + "; ".join(partes) + ".", informe
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bd", default=DB_NAME, help="BD a verificar (por defecto la del sistema)")
+    parser.add_argument("--empresa", type=int, default=1, help="id de la empresa")
+    parser.add_argument("--completa", action="store_true", help="revisar todo el libro y recalcular la huella")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.bd):
+        raise SystemExit(f"No existe {args.bd}")
+    motor = crear_motor(args.bd)
+    try:
+        with sesion_de_empresa(sessionmaker(bind=motor, autoflush=False), args.empresa) as db:
+            ok, msg, informe = verificar_integridad(db, args.completa)
+    finally:
+        motor.dispose()
+
+    print(f"{'✓' if ok else '✗'} {msg}")
+    for regla, ids in (informe or {}).get('errores', {}).items():
+        print(f"  {REGLAS[regla]}: {', '.join(map(str, ids[:MUESTRA]))}{' ...' if len(ids) > MUESTRA else ''}")
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 from datetime import date
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
-from src.modelos.entidades import Producto, MovimientoInventario
-from src.servicios.contabilidad import registrar_asiento
+from src.modelos.entidades import Producto, MovimientoInventario, LoteInventario
+from src.servicios.contabilidad import preparar_asiento
+from src.base_datos.db import ejecutar_en_transaccion
+from src.base_datos.instrumentacion import instrumentado
 
 
 
@@ -15,6 +18,7 @@ CTA_VENTAS = "4.1.01"            # Ventas productos terminados
 CTA_COSTO_VENTAS = "5.1.01"      # Para demo como “costo de ventas” (si tu plan tiene otra mejor, cámbiala)
 
 
+@instrumentado("inventario.crear_producto")
 def crear_producto(db: Session, codigo: str, nombre: str):
     """
     Crea un producto neutro. 
@@ -26,10 +30,82 @@ def crear_producto(db: Session, codigo: str, nombre: str):
     db.commit()
     return p
 
-def registrar_compra(db: Session, codigo_prod: str, fecha: date, cantidad: int, costo_unit: float):
-    """Registra una entrada al inventario"""
+def _ajustar_stock(db: Session, producto_id: int, cantidad: int, valor: float):
+    """
+    Suma (o resta, con valores negativos) al saldo denormalizado del producto.
+    Es un UPDATE atómico en SQL: no depende del valor leído en memoria.
+    """
+    db.execute(
+        update(Producto)
+        .where(Producto.id == producto_id)
+        .values(
+            stock_actual=Producto.stock_actual + cantidad,
+            valor_actual=Producto.valor_actual + valor
+        )
+    )
+
+@instrumentado("inventario.verificar_stock")
+def verificar_stock_productos(db: Session, corregir: bool = False):
+    """
+    Compara stock_actual / valor_actual de cada producto contra la suma de sus
+    lotes abiertos, en una sola consulta agrupada.
+    Con corregir=True reescribe los productos descuadrados.
+
+    Returns:
+        list: [{'codigo', 'stock_actual', 'stock_lotes', 'valor_actual', 'valor_lotes'}]
+    """
+    saldos = db.query(
+        LoteInventario.producto_id.label("producto_id"),
+        func.sum(LoteInventario.saldo_cantidad).label("stock"),
+        func.sum(LoteInventario.saldo_cantidad * LoteInventario.costo_unitario).label("valor")
+    ).filter(LoteInventario.saldo_cantidad > 0)\
+     .group_by(LoteInventario.producto_id)\
+     .subquery()
+
+    filas = db.query(
+        Producto.id,
+        Producto.codigo,
+        Producto.stock_actual,
+        Producto.valor_actual,
+        func.coalesce(saldos.c.stock, 0),
+        func.coalesce(saldos.c.valor, 0.0)
+    ).outerjoin(saldos, saldos.c.producto_id == Producto.id)\
+     .order_by(Producto.codigo)\
+     .all()
+
+    diferencias = []
+    for prod_id, codigo, stock, valor, stock_lotes, valor_lotes in filas:
+        if stock == stock_lotes and round(valor, 2) == round(valor_lotes, 2):
+            continue
+        diferencias.append({
+            'codigo': codigo,
+            'stock_actual': stock,
+            'stock_lotes': stock_lotes,
+            'valor_actual': valor,
+            'valor_lotes': valor_lotes
+        })
+        if corregir:
+            db.execute(
+                update(Producto)
+                .where(Producto.id == prod_id)
+                .values(stock_actual=stock_lotes, valor_actual=valor_lotes)
+            )
+
+    if corregir and diferencias:
+        db.commit()
+
+    return diferencias
+
+def _preparar_compra(db: Session, codigo_prod: str, fecha: date, cantidad: int, costo_unit: float):
+    """
+    Agrega a la sesión la entrada al inventario y su lote, sin commit.
+
+    Raises:
+        ValueError: si el producto no existe
+    """
     prod = db.query(Producto).filter(Producto.codigo == codigo_prod).first()
-    if not prod: return False, "Producto no existe"
+    if not prod:
+        raise ValueError("Producto no existe")
 
     total = cantidad * costo_unit
     
@@ -40,78 +116,58 @@ def registrar_compra(db: Session, codigo_prod: str, fecha: date, cantidad: int,
         cantidad=cantidad,
         costo_unitario=costo_unit,
         costo_total=total,
-        saldo_cantidad=cantidad  # Mantenemos el saldo por lote para que el reporte FIFO sea posible
+        saldo_cantidad=cantidad
     )
-    
-    db.add(nuevo_mov)
-    db.commit()
-    return True, "Compra registrada exitosamente."
 
-def registrar_compra_con_asiento(
-    db: Session,
-    codigo_prod: str,
-    fecha: date,
-    cantidad: int,
-    costo_unit: float,
-    es_credito: bool = False
-):
-    ok, msg = registrar_compra(db, codigo_prod, fecha, cantidad, costo_unit)
-    if not ok:
-        return False, msg
-
-    total = cantidad * costo_unit
-
-    # Compra contado => Haber Caja. Compra crédito => Haber Proveedores.
-    cuenta_haber = CTA_PROVEEDORES if es_credito else CTA_CAJA
-
-    movimientos = [
-        {"cuenta_codigo": CTA_INVENTARIO, "debe": total, "haber": 0.0},
-        {"cuenta_codigo": cuenta_haber,   "debe": 0.0,  "haber": total},
-    ]
-
-    ok2, msg2 = registrar_asiento(
-        db,
-        fecha,
-        f"Compra inventario {codigo_prod} x{cantidad} (sin IVA)",
-        movimientos
+    # Cada compra abre un lote que las ventas irán consumiendo (FIFO)
+    lote = LoteInventario(
+        movimiento=nuevo_mov,
+        producto_id=prod.id,
+        fecha=fecha,
+        costo_unitario=costo_unit,
+        cantidad_inicial=cantidad,
+        saldo_cantidad=cantidad
     )
-    if not ok2:
-        return False, f"Compra OK, pero asiento falló: {msg2}"
-
-    return True, "Compra + asiento registrados."
+    
+    db.add(nuevo_mov)
+    db.add(lote)
+    _ajustar_stock(db, prod.id, cantidad, total)
+    return nuevo_mov
 
-def registrar_venta(db: Session, codigo_prod: str, fecha: date, cantidad: int):
+def _preparar_venta(db: Session, codigo_prod: str, fecha: date, cantidad: int):
     """
-    Registra una salida. 
+    Agrega a la sesión la salida del inventario consumiendo lotes FIFO, sin commit.
     Usamos la lógica de lotes para actualizar la disponibilidad en la BD, 
     permitiendo que los reportes recalculen el costo según el método elegido.
+
+    Returns:
+        tuple: (movimiento de venta, costo total de la salida)
+
+    Raises:
+        ValueError: si el producto no existe, no hay stock suficiente o sus
+        lotes abiertos no alcanzan a cubrir el stock (ver verificar_stock_productos)
     """
-    prod = db.query(Producto).filter(Producto.codigo == codigo_prod).first()
-    if not prod: return False, "Producto no existe"
-
-    # 1. Validación de Stock Total
-    # Sumamos el saldo disponible en todos los lotes de compra
-    stock_actual = db.query(MovimientoInventario).filter(
-        MovimientoInventario.producto_id == prod.id,
-        MovimientoInventario.tipo == 'COMPRA'
-    ).with_entities(MovimientoInventario.saldo_cantidad).all()
-    
-    total_disponible = sum(s[0] for s in stock_actual)
-    
-    if cantidad > total_disponible:
-        return False, f"Stock insuficiente. Disponible: {total_disponible}"
+    # populate_existing: releer el stock aunque el producto ya esté en la sesión,
+    # porque otra terminal pudo haber vendido desde entonces
+    prod = db.query(Producto).filter(Producto.codigo == codigo_prod).populate_existing().first()
+    if not prod:
+        raise ValueError("Producto no existe")
+
+    # 1. Validación de Stock Total (saldo denormalizado en el propio producto)
+    if cantidad > prod.stock_actual:
+        raise ValueError(f"Stock insuficiente. Disponible: {prod.stock_actual}")
+
+    # 2. Lotes abiertos del producto, del más antiguo al más nuevo
+    # (la consulta se resuelve con el índice parcial ix_lotes_empresa_abiertos)
+    lotes = db.query(LoteInventario)\
+              .filter(LoteInventario.producto_id == prod.id)\
+              .filter(LoteInventario.saldo_cantidad > 0)\
+              .order_by(LoteInventario.fecha.asc(), LoteInventario.id.asc())\
+              .all()
 
-    # 2. Consumo de lotes (Lógica base para la BD)
-    # Buscamos lotes con saldo, del más antiguo al más nuevo
+    # 3. Consumo de lotes
     cantidad_pendiente = cantidad
     costo_total_salida = 0.0
-    
-    lotes = db.query(MovimientoInventario)\
-              .filter(MovimientoInventario.producto_id == prod.id)\
-              .filter(MovimientoInventario.tipo == 'COMPRA')\
-              .filter(MovimientoInventario.saldo_cantidad > 0)\
-              .order_by(MovimientoInventario.fecha.asc(), MovimientoInventario.id.asc())\
-              .all()
 
     for lote in lotes:
         if cantidad_pendiente == 0: break
@@ -122,7 +178,13 @@ def registrar_venta(db: Session, codigo_prod: str, fecha: date, cantidad: int):
         lote.saldo_cantidad -= tomar
         cantidad_pendiente -= tomar
 
-    # 3. Registrar el movimiento de Venta
+    # El stock del producto alcanza pero sus lotes no: el costo de la salida quedaría corto.
+    # La transacción que llama deshace lo consumido de los lotes.
+    if cantidad_pendiente > 0:
+        raise ValueError(f"Lotes inconsistentes con el stock de {prod.codigo}: "
+                         f"faltan {cantidad_pendiente} unidades en lotes abiertos.")
+
+    # 4. Registrar el movimiento de Venta
     # El costo_unitario guardado es un promedio de la operación para el Libro Diario
     costo_unitario_operacion = costo_total_salida / cantidad
 
@@ -137,10 +199,81 @@ def registrar_venta(db: Session, codigo_prod: str, fecha: date, cantidad: int):
     )
     
     db.add(venta)
-    db.commit()
+    _ajustar_stock(db, prod.id, -cantidad, -costo_total_salida)
+    return venta, costo_total_salida
+
+@instrumentado("inventario.registrar_compra")
+def registrar_compra(db: Session, codigo_prod: str, fecha: date, cantidad: int, costo_unit: float):
+    """Registra una entrada al inventario"""
+    try:
+        ejecutar_en_transaccion(db, lambda: _preparar_compra(db, codigo_prod, fecha, cantidad, costo_unit))
+        return True, "Compra registrada exitosamente."
+    except ValueError as e:
+        return False, str(e)
+
+@instrumentado("inventario.registrar_compra_con_asiento")
+def registrar_compra_con_asiento(
+    db: Session,
+    codigo_prod: str,
+    fecha: date,
+    cantidad: int,
+    costo_unit: float,
+    es_credito: bool = False
+):
+    """
+    Registra la compra y su asiento en UNA sola transacción (todo o nada).
+
+    Returns:
+        tuple: (ok, mensaje, resultado) donde resultado trae los IDs ya confirmados
+               {'movimiento_id', 'asiento_ids'} o None si falló.
+    """
+    total = cantidad * costo_unit
+
+    # Compra contado => Haber Caja. Compra crédito => Haber Proveedores.
+    cuenta_haber = CTA_PROVEEDORES if es_credito else CTA_CAJA
+
+    movimientos = [
+        {"cuenta_codigo": CTA_INVENTARIO, "debe": total, "haber": 0.0},
+        {"cuenta_codigo": cuenta_haber,   "debe": 0.0,  "haber": total},
+    ]
+
+    def operacion():
+        compra = _preparar_compra(db, codigo_prod, fecha, cantidad, costo_unit)
+        asiento = preparar_asiento(
+            db,
+            fecha,
+            f"Compra inventario {codigo_prod} x{cantidad} (sin IVA)",
+            movimientos
+        )
+        db.flush()
+        return {'movimiento_id': compra.id, 'asiento_ids': [asiento.id]}
+
+    try:
+        resultado = ejecutar_en_transaccion(db, operacion)
+    except ValueError as e:
+        return False, str(e), None
+    except Exception as e:
+        return False, f"Error al guardar la compra: {str(e)}", None
+
+    return True, "Compra + asiento registrados.", resultado
+
+@instrumentado("inventario.registrar_venta")
+def registrar_venta(db: Session, codigo_prod: str, fecha: date, cantidad: int):
+    """
+    Registra una salida. 
+    Returns:
+        tuple: (ok, mensaje, costo_total_salida)
+    """
+    try:
+        _, costo_total_salida = ejecutar_en_transaccion(
+            db, lambda: _preparar_venta(db, codigo_prod, fecha, cantidad)
+        )
+    except ValueError as e:
+        return False, str(e), 0.0
     
     return True, "Venta registrada.", costo_total_salida
 
+@instrumentado("inventario.registrar_venta_con_asientos")
 def registrar_venta_con_asientos(
     db: Session,
     codigo_prod: str,
@@ -149,40 +282,60 @@ def registrar_venta_con_asientos(
     precio_unit_venta: float,
     es_credito: bool = False
 ):
-    # 1) Registrar salida inventario y obtener costo real (según tu lógica)
-    ok, msg, costo_total = registrar_venta(db, codigo_prod, fecha, cantidad)
-    if not ok:
-        return False, msg
+    """
+    Registra la salida de inventario, el asiento de ingreso y el de costo
+    en UNA sola transacción: o se guardan los tres o ninguno.
+    La transacción toma el bloqueo de escritura al empezar (BEGIN IMMEDIATE),
+    así dos terminales no pueden consumir el mismo lote a la vez.
 
+    Returns:
+        tuple: (ok, mensaje, resultado) donde resultado trae los IDs ya confirmados
+               {'movimiento_id', 'asiento_ids', 'costo_total'} o None si falló.
+    """
     total_venta = cantidad * precio_unit_venta
-
-    # 2) Asiento de INGRESO
     cuenta_debe = CTA_CLIENTES if es_credito else CTA_CAJA
-    mov_ingreso = [
-        {"cuenta_codigo": cuenta_debe, "debe": total_venta, "haber": 0.0},
-        {"cuenta_codigo": CTA_VENTAS,  "debe": 0.0,        "haber": total_venta},
-    ]
-    ok1, msg1 = registrar_asiento(
-        db,
-        fecha,
-        f"Venta {codigo_prod} x{cantidad} (sin IVA) {'CRÉDITO' if es_credito else 'CONTADO'}",
-        mov_ingreso
-    )
-    if not ok1:
-        return False, f"Venta OK, pero asiento de ingreso falló: {msg1}"
 
-    # 3) Asiento de COSTO (COGS)
-    mov_costo = [
-        {"cuenta_codigo": CTA_COSTO_VENTAS, "debe": costo_total, "haber": 0.0},
-        {"cuenta_codigo": CTA_INVENTARIO,   "debe": 0.0,        "haber": costo_total},
-    ]
-    ok2, msg2 = registrar_asiento(
-        db,
-        fecha,
-        f"Costo de venta {codigo_prod} x{cantidad}",
-        mov_costo
-    )
-    if not ok2:
-        return False, f"Asiento ingreso OK, pero costo falló: {msg2}"
+    def operacion():
+        # 1) Salida de inventario y costo real (según tu lógica)
+        venta, costo_total = _preparar_venta(db, codigo_prod, fecha, cantidad)
+
+        # 2) Asiento de INGRESO
+        mov_ingreso = [
+            {"cuenta_codigo": cuenta_debe, "debe": total_venta, "haber": 0.0},
+            {"cuenta_codigo": CTA_VENTAS,  "debe": 0.0,        "haber": total_venta},
+        ]
+        asiento_ingreso = preparar_asiento(
+            db,
+            fecha,
+            f"Venta {codigo_prod} x{cantidad} (sin IVA) {'CRÉDITO' if es_credito else 'CONTADO'}",
+            mov_ingreso
+        )
+
+        # 3) Asiento de COSTO (COGS)
+        mov_costo = [
+            {"cuenta_codigo": CTA_COSTO_VENTAS, "debe": costo_total, "haber": 0.0},
+            {"cuenta_codigo": CTA_INVENTARIO,   "debe": 0.0,        "haber": costo_total},
+        ]
+        asiento_costo = preparar_asiento(
+            db,
+            fecha,
+            f"Costo de venta {codigo_prod} x{cantidad}",
+            mov_costo
+        )
+
+        # 4) Un solo flush para todo (el commit lo hace ejecutar_en_transaccion)
+        db.flush()
+        return {
+            'movimiento_id': venta.id,
+            'asiento_ids': [asiento_ingreso.id, asiento_costo.id],
+            'costo_total': costo_total
+        }
+
+    try:
+        resultado = ejecutar_en_transaccion(db, operacion)
+    except ValueError as e:
+        return False, str(e), None
+    except Exception as e:
+        return False, f"Error al guardar la venta: {str(e)}", None
 
-    return True, "Venta + asientos (ingreso y costo) registrados."
+    return True, "Venta + asientos (ingreso y costo) registrados.", resultado
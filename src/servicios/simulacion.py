@@ -0,0 +1,177 @@
+# src/servicios/simulacion.py
+"""
+Simulación ("qué pasaría si") sobre una copia en memoria de la BD.
+
+Copia la BD viva a `:memory:` con la API de backup de SQLite (una foto
+consistente que no detiene a quien esté registrando asientos) y abre una
+sesión de la misma empresa sobre la copia. Los asientos tentativos se
+registran con los servicios de siempre (registrar_asiento, compras, ventas)
+pasando esa sesión, y los Estados Financieros se generan con los mismos
+generadores del menú. Al cerrar la simulación la copia se descarta: nada
+llega a la BD viva.
+
+La comparación antes/después no vuelve a sumar todo el libro: los saldos
+de partida se calculan una vez al abrir la simulación y después solo se
+recalculan las cuentas que tocan los asientos registrados en la copia.
+
+Uso:
+    with Simulacion(db) as sim:
+        registrar_asiento(sim.db, fecha, "Ajuste tentativo", movimientos)
+        comparacion = sim.comparacion()
+        er, bg = sim.generar_estados("datos/simulacion")
+"""
+import os
+import sqlite3
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.base_datos.db import BUSY_TIMEOUT_MS, crear_motor
+from src.base_datos.multiempresa import empresa_de_sesion, sesion_de_empresa
+from src.modelos.entidades import Asiento, DetalleAsiento
+from src.reportes.generadores.utilidades import sumas_por_cuenta
+
+# Clase de cuenta (primer dígito del código) -> rubro de los estados
+RUBROS = {
+    "1": "activo", "2": "pasivo", "3": "patrimonio",
+    "4": "ingresos", "5": "gastos", "6": "costos",
+}
+
+# Diferencias menores a esto se consideran cero (redondeo a centavos)
+TOLERANCIA = 0.005
+
+
+def copiar_a_memoria(ruta_bd: str):
+    """
+    Motor sobre una BD en memoria con el contenido de ruta_bd.
+    StaticPool: todas las sesiones usan la misma conexión (cada conexión a
+    `:memory:` sería una BD vacía distinta).
+    """
+    motor = crear_motor(":memory:", poolclass=StaticPool, connect_args={'check_same_thread': False})
+    origen = sqlite3.connect(ruta_bd)
+    try:
+        origen.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        with motor.connect() as conexion:
+            origen.backup(conexion.connection.driver_connection, pages=-1)
+    finally:
+        origen.close()
+    return motor
+
+
+def saldos_por_cuenta(db: Session, cuenta_ids=None):
+    """
+    Saldo de cada cuenta con movimientos según su naturaleza (Debe - Haber
+    en las deudoras, Haber - Debe en las acreedoras).
+    Returns:
+        dict: {cuenta_id: (codigo, nombre, saldo)}
+    """
+    saldos = {}
+    for cuenta, debe, haber in sumas_por_cuenta(db, cuenta_ids=cuenta_ids):
+        debe, haber = debe or 0.0, haber or 0.0
+        saldo = debe - haber if (cuenta.naturaleza or "").upper() == "DEUDORA" else haber - debe
+        saldos[cuenta.id] = (cuenta.codigo, cuenta.nombre, saldo)
+    return saldos
+
+
+def totales_estados(saldos: dict):
+    """
+    Totales de los estados a partir de saldos_por_cuenta: un valor por rubro,
+    la utilidad neta (ingresos - costos - gastos) y la diferencia del balance
+    (activo - pasivo - patrimonio - utilidad, 0 si cuadra).
+    """
+    totales = dict.fromkeys(RUBROS.values(), 0.0)
+    for codigo, _, saldo in saldos.values():
+        rubro = RUBROS.get(codigo[:1])
+        if rubro:
+            totales[rubro] += saldo
+    totales['utilidad_neta'] = totales['ingresos'] - totales['costos'] - totales['gastos']
+    totales['diferencia'] = (
+        totales['activo'] - totales['pasivo'] - totales['patrimonio'] - totales['utilidad_neta']
+    )
+    return {k: round(v, 2) for k, v in totales.items()}
+
+
+class Simulacion:
+    """
+    Copia en memoria de la BD de `db` con una sesión de la misma empresa
+    (`sim.db`). Se usa como context manager; al salir la copia se descarta.
+    """
+
+    def __init__(self, db: Session):
+        # 1. Copiar la BD viva a memoria
+        self.motor = copiar_a_memoria(db.get_bind().url.database)
+        self.db = sesion_de_empresa(sessionmaker(bind=self.motor, autoflush=False), empresa_de_sesion(db))
+
+        # 2. Punto de partida: último asiento y saldos de la copia
+        self._ultimo_asiento = self.db.query(func.max(Asiento.id)).scalar() or 0
+        self.saldos_iniciales = saldos_por_cuenta(self.db)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+    def cerrar(self):
+        """Descarta la copia (y todo lo registrado en ella)."""
+        self.db.close()
+        self.motor.dispose()
+
+    def asientos_simulados(self):
+        """Asientos registrados en la copia desde que se abrió la simulación."""
+        return (
+            self.db.query(Asiento)
+            .filter(Asiento.id > self._ultimo_asiento)
+            .order_by(Asiento.id)
+            .all()
+        )
+
+    def comparacion(self):
+        """
+        Saldos y totales antes y después de los asientos simulados.
+        Solo se vuelven a sumar las cuentas que aparecen en esos asientos.
+        Returns:
+            dict con 'antes' y 'despues' (totales_estados) y 'cuentas'
+            [(codigo, nombre, saldo_antes, saldo_despues)] de las cuentas tocadas
+        """
+        tocadas = [
+            cuenta_id for (cuenta_id,) in
+            self.db.query(DetalleAsiento.cuenta_id)
+            .filter(DetalleAsiento.asiento_id > self._ultimo_asiento)
+            .distinct()
+        ]
+        nuevos = saldos_por_cuenta(self.db, tocadas) if tocadas else {}
+        saldos = {**self.saldos_iniciales, **nuevos}
+
+        cuentas = []
+        for cuenta_id, (codigo, nombre, despues) in sorted(nuevos.items(), key=lambda c: c[1][0]):
+            antes = self.saldos_iniciales.get(cuenta_id, (codigo, nombre, 0.0))[2]
+            if abs(despues - antes) > TOLERANCIA:
+                cuentas.append((codigo, nombre, round(antes, 2), round(despues, 2)))
+
+        return {
+            'antes': totales_estados(self.saldos_iniciales),
+            'despues': totales_estados(saldos),
+            'cuentas': cuentas,
+        }
+
+    def generar_estados(self, carpeta: str = "."):
+        """
+        Estado de Resultados y Balance General de la copia, con los
+        generadores del menú, en simulacion_estado_resultados.pdf y
+        simulacion_balance_general.pdf.
+        Returns:
+            tuple: (ResultadoReporte del ER, ResultadoReporte del BG)
+        """
+        from src.reportes.generadores import generar_balance_general, generar_estado_resultados
+
+        os.makedirs(carpeta, exist_ok=True)
+        er = generar_estado_resultados(
+            self.db, nombre_archivo=os.path.join(carpeta, "simulacion_estado_resultados.pdf")
+        )
+        bg = generar_balance_general(
+            self.db, er.extra.get('utilidad_neta', 0.0),
+            nombre_archivo=os.path.join(carpeta, "simulacion_balance_general.pdf")
+        )
+        return er, bg
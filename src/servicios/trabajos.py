@@ -0,0 +1,154 @@
+"""
+Trabajos en segundo plano para los reportes del menú.
+
+Un reporte grande puede tardar minutos en ReportLab. En vez de bloquear la
+terminal, el menú lo envía al GestorTrabajos: corre en un hilo aparte con su
+propia sesión (WAL permite seguir registrando asientos mientras tanto), informa
+filas y páginas a medida que avanza y se puede cancelar.
+
+El PDF se arma en memoria y recién al terminar bien se escribe el archivo
+destino, así un trabajo cancelado o fallido no deja un PDF a medias. Los
+trabajos que no conviene armar en memoria (copias de la BD) reciben la ruta
+y escriben el archivo ellos mismos (en_memoria=False).
+"""
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+
+from src.base_datos.db import SessionLocal
+from src.base_datos.multiempresa import empresa_activa, sesion_de_empresa
+from src.reportes.resultado import ReporteCancelado, ResultadoReporte
+
+# Estados de un trabajo
+EN_COLA = "EN COLA"
+EJECUTANDO = "EJECUTANDO"
+COMPLETADO = "COMPLETADO"
+FALLIDO = "FALLIDO"
+CANCELADO = "CANCELADO"
+
+
+@dataclass
+class Trabajo:
+    id: int
+    titulo: str
+    nombre_archivo: str
+    estado: str = EN_COLA
+    fase: str = ""
+    filas: int = 0
+    paginas: int = 0
+    mensaje: str = ""
+    resultado: ResultadoReporte = None
+    creado: float = field(default_factory=time.time)
+    inicio: float = None
+    fin: float = None
+    _cancelar: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def terminado(self) -> bool:
+        return self.estado in (COMPLETADO, FALLIDO, CANCELADO)
+
+    @property
+    def segundos(self) -> float:
+        if not self.inicio:
+            return 0.0
+        return (self.fin or time.time()) - self.inicio
+
+
+class GestorTrabajos:
+    """
+    Uso:
+        gestor = GestorTrabajos()
+        trabajo = gestor.enviar("Libro Diario", generar_pdf_libro_diario, "libro_diario.pdf")
+        ...  # trabajo.estado / trabajo.filas / trabajo.paginas se actualizan solos
+        gestor.cancelar(trabajo.id)
+    """
+
+    def __init__(self, fabrica_sesiones=SessionLocal, max_hilos: int = 1):
+        self.fabrica_sesiones = fabrica_sesiones
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="reportes")
+        self._trabajos = {}
+        self._ids = itertools.count(1)
+        self._candado = threading.Lock()
+
+    def enviar(self, titulo: str, generador, nombre_archivo: str, en_memoria: bool = True, **kwargs) -> Trabajo:
+        """
+        Encola generador(db, nombre_archivo=<BytesIO>, progreso=<función>, **kwargs),
+        que debe devolver un ResultadoReporte (todos los generadores de src/reportes lo hacen).
+        Con en_memoria=False el generador recibe la ruta y escribe el archivo él mismo.
+        """
+        with self._candado:
+            trabajo = Trabajo(id=next(self._ids), titulo=titulo, nombre_archivo=nombre_archivo)
+            self._trabajos[trabajo.id] = trabajo
+        # El reporte es de la empresa activa al enviarlo, aunque después se cambie en el menú
+        self._pool.submit(self._ejecutar, trabajo, generador, empresa_activa(), en_memoria, kwargs)
+        return trabajo
+
+    def cancelar(self, trabajo_id: int) -> bool:
+        """Pide detener el trabajo; se detiene en el próximo aviso de progreso. False si ya terminó."""
+        trabajo = self._trabajos.get(trabajo_id)
+        if not trabajo or trabajo.terminado:
+            return False
+        trabajo._cancelar.set()
+        return True
+
+    def listar(self) -> list:
+        with self._candado:
+            return sorted(self._trabajos.values(), key=lambda t: t.id)
+
+    def activos(self) -> int:
+        return sum(1 for t in self.listar() if not t.terminado)
+
+    def limpiar_terminados(self):
+        with self._candado:
+            self._trabajos = {i: t for i, t in self._trabajos.items() if not t.terminado}
+
+    def cerrar(self):
+        """Cancela lo pendiente y espera a que terminen los hilos (al salir del sistema)."""
+        for trabajo in self.listar():
+            trabajo._cancelar.set()
+        self._pool.shutdown(wait=True)
+
+    # --- Hilo trabajador ---------------------------------------------------
+
+    def _ejecutar(self, trabajo: Trabajo, generador, empresa_id: int, en_memoria: bool, kwargs):
+        if trabajo._cancelar.is_set():
+            trabajo.estado, trabajo.mensaje = CANCELADO, "Cancelado antes de empezar."
+            return
+
+        trabajo.estado, trabajo.inicio = EJECUTANDO, time.time()
+
+        def progreso(fase, resultado):
+            trabajo.fase, trabajo.filas, trabajo.paginas = fase, resultado.filas, resultado.paginas
+            if trabajo._cancelar.is_set():
+                raise ReporteCancelado()
+
+        db = sesion_de_empresa(self.fabrica_sesiones, empresa_id)
+        try:
+            destino = BytesIO() if en_memoria else trabajo.nombre_archivo
+            resultado = generador(db, nombre_archivo=destino, progreso=progreso, **kwargs)
+            trabajo.resultado = resultado
+            trabajo.filas, trabajo.paginas = resultado.filas, resultado.paginas
+
+            if resultado.exito and not en_memoria:
+                trabajo.estado, trabajo.mensaje = COMPLETADO, resultado.mensaje
+            elif resultado.exito:
+                # Reemplazo atómico: nunca queda un PDF a medio escribir
+                temporal = f"{trabajo.nombre_archivo}.tmp"
+                with open(temporal, "wb") as f:
+                    f.write(destino.getvalue())
+                os.replace(temporal, trabajo.nombre_archivo)
+                trabajo.estado, trabajo.mensaje = COMPLETADO, resultado.mensaje
+            else:
+                trabajo.estado, trabajo.mensaje = FALLIDO, resultado.mensaje
+
+        except ReporteCancelado:
+            trabajo.estado, trabajo.mensaje = CANCELADO, "Cancelado por el usuario."
+        except Exception as e:
+            trabajo.estado, trabajo.mensaje = FALLIDO, f"Error: {str(e)}"
+        finally:
+            trabajo.fin = time.time()
+            db.close()
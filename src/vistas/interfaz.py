@@ -0,0 +1,229 @@
+# src/vistas/interfaz.py
+"""
+Componentes de interfaz de terminal compartidos por los menús.
+
+Selector paginado: en vez de cargar todo el plan de cuentas (o todos los
+productos) en una sola tabla de rich, se pide y se dibuja solo la página
+visible. Las páginas se piden con paginación keyset sobre `codigo`
+(WHERE codigo > último visto ... LIMIT n), así ir a la página 500 cuesta lo
+mismo que ir a la 1; con OFFSET la base de datos recorrería todas las anteriores.
+"""
+from rich.console import Console
+from rich.markup import escape
+from rich.prompt import Prompt
+from rich.table import Table
+from sqlalchemy import and_, func, or_, true
+from sqlalchemy.orm import Session, aliased
+
+console = Console()
+
+TAMANO_PAGINA = 20
+
+
+class PaginadorCodigos:
+    """
+    Páginas de un modelo con columna `codigo`, en orden de código.
+
+    Con jerarquia=True los códigos se tratan como árbol por niveles
+    ("1" > "1.1" > "1.1.01"): solo se ven los niveles hasta `nivel`, más los
+    hijos directos de los códigos expandidos.
+    """
+
+    def __init__(self, db: Session, modelo, filtros=(), tamano: int = TAMANO_PAGINA, jerarquia: bool = False):
+        self.db = db
+        self.modelo = modelo
+        self.filtros = list(filtros)
+        self.tamano = tamano
+        self.jerarquia = jerarquia
+        self.nivel = 1
+        self.expandidos = set()
+        self.filas = []
+        self.hay_anterior = False
+        self.hay_siguiente = False
+
+    # --- Consultas ---------------------------------------------------------
+
+    def _profundidad(self, columna):
+        """Cantidad de puntos del código: 0 para "1", 1 para "1.1", etc."""
+        return func.length(columna) - func.length(func.replace(columna, ".", ""))
+
+    def _condiciones(self):
+        condiciones = list(self.filtros)
+        if self.jerarquia:
+            codigo = self.modelo.codigo
+            visibles = [self._profundidad(codigo) <= self.nivel - 1]
+            for padre in self.expandidos:
+                # Hijos directos: entre "padre." y "padre/" ('/' sigue a '.' en ASCII) con un nivel más
+                visibles.append(and_(
+                    codigo > f"{padre}.", codigo < f"{padre}/",
+                    self._profundidad(codigo) == padre.count(".") + 1
+                ))
+            condiciones.append(or_(*visibles))
+        return condiciones
+
+    def _cargar(self, condicion_clave, descendente: bool = False):
+        codigo = self.modelo.codigo
+        orden = codigo.desc() if descendente else codigo
+        filas = (
+            self.db.query(self.modelo)
+            .filter(*self._condiciones(), condicion_clave)
+            .order_by(orden)
+            .limit(self.tamano + 1)
+            .all()
+        )
+        hay_mas = len(filas) > self.tamano
+        filas = filas[:self.tamano]
+        if descendente:
+            filas.reverse()
+        return filas, hay_mas
+
+    def _existe(self, condicion_clave) -> bool:
+        return self.db.query(self.modelo.id).filter(*self._condiciones(), condicion_clave).first() is not None
+
+    def _mostrar(self, filas, hay_anterior, hay_siguiente):
+        self.filas, self.hay_anterior, self.hay_siguiente = filas, hay_anterior, hay_siguiente
+        return self.filas
+
+    # --- Navegación --------------------------------------------------------
+
+    def ir_a(self, codigo: str = ""):
+        """Página que empieza en el primer código visible >= codigo ("" = la primera)."""
+        filas, hay_siguiente = self._cargar(self.modelo.codigo >= codigo)
+        if not filas and codigo:
+            # Más allá del último código: mostrar la última página
+            return self.ultima()
+        hay_anterior = bool(filas) and self._existe(self.modelo.codigo < filas[0].codigo)
+        return self._mostrar(filas, hay_anterior, hay_siguiente)
+
+    def ultima(self):
+        filas, hay_anterior = self._cargar(true(), descendente=True)
+        return self._mostrar(filas, hay_anterior, False)
+
+    def siguiente(self):
+        if not self.hay_siguiente:
+            return self.filas
+        filas, hay_siguiente = self._cargar(self.modelo.codigo > self.filas[-1].codigo)
+        return self._mostrar(filas, True, hay_siguiente)
+
+    def anterior(self):
+        if not self.hay_anterior:
+            return self.filas
+        filas, hay_anterior = self._cargar(self.modelo.codigo < self.filas[0].codigo, descendente=True)
+        return self._mostrar(filas, hay_anterior, True)
+
+    def recargar(self):
+        """Vuelve a pedir la página actual (tras expandir o contraer)."""
+        return self.ir_a(self.filas[0].codigo if self.filas else "")
+
+    def nivel_minimo(self) -> int:
+        """Nivel del código menos profundo: en un plan sin cuentas raíz ("1", "2"...) el árbol empieza ahí."""
+        profundidad = self.db.query(func.min(self._profundidad(self.modelo.codigo))).filter(*self.filtros).scalar()
+        return (profundidad or 0) + 1
+
+    def total(self) -> int:
+        return self.db.query(func.count(self.modelo.id)).filter(*self._condiciones()).scalar()
+
+    # --- Árbol -------------------------------------------------------------
+
+    def con_hijos(self) -> set:
+        """Códigos de la página actual que tienen subcuentas (una sola consulta)."""
+        if not self.jerarquia or not self.filas:
+            return set()
+        # Alias del ORM (no de la tabla) para que el filtro de empresa alcance a los dos
+        padre, hijo = aliased(self.modelo, name="padre"), aliased(self.modelo, name="hijo")
+        existe_hijo = (
+            self.db.query(hijo.id)
+            .filter(hijo.codigo > padre.codigo + ".", hijo.codigo < padre.codigo + "/")
+            .exists()
+        )
+        return {
+            codigo for (codigo,) in self.db.query(padre.codigo)
+            .filter(padre.codigo.in_([f.codigo for f in self.filas]), existe_hijo)
+        }
+
+    def expandir(self, codigo: str = None):
+        """Sin código: un nivel más en todo el árbol. Con código: sus hijos (y el camino hasta él)."""
+        if codigo is None:
+            self.nivel += 1
+        else:
+            partes = codigo.split(".")
+            self.expandidos.update(".".join(partes[:i]) for i in range(1, len(partes) + 1))
+        return self.recargar()
+
+    def contraer(self, codigo: str = None):
+        """Sin código: un nivel menos en todo el árbol (y se olvidan las expansiones). Con código: oculta lo que cuelga de él."""
+        if codigo is None:
+            self.nivel = max(1, self.nivel - 1)
+            self.expandidos.clear()
+            return self.recargar()
+
+        self.expandidos = {e for e in self.expandidos if e != codigo and not e.startswith(f"{codigo}.")}
+        if self.filas and self.filas[0].codigo.startswith(f"{codigo}."):
+            # La página empezaba dentro de lo que se ocultó: volver al código contraído
+            return self.ir_a(codigo)
+        return self.recargar()
+
+
+def selector_paginado(db: Session, modelo, titulo: str, columnas, filtros=(), jerarquia: bool = False,
+                      tamano: int = TAMANO_PAGINA):
+    """
+    Muestra el selector paginado y retorna el código elegido, o None si se cancela.
+
+    columnas: lista de (encabezado, función(objeto) -> str, estilo)
+    """
+    paginador = PaginadorCodigos(db, modelo, filtros, tamano, jerarquia)
+    if jerarquia:
+        paginador.nivel = paginador.nivel_minimo()
+    paginador.ir_a()
+    if not paginador.filas:
+        return None
+    total = paginador.total()
+
+    while True:
+        con_hijos = paginador.con_hijos()
+        table = Table(title=f"{titulo} ({total:,} visibles)", show_header=True, header_style="bold magenta")
+        table.add_column("#", style="dim", width=4)
+        table.add_column("Código", style="cyan")
+        for encabezado, _, estilo in columnas:
+            table.add_column(encabezado, style=estilo)
+
+        for idx, fila in enumerate(paginador.filas, start=1):
+            codigo = fila.codigo
+            if jerarquia:
+                marca = ("▾ " if codigo in paginador.expandidos else "▸ ") if codigo in con_hijos else "  "
+                codigo = f"{'  ' * codigo.count('.')}{marca}{codigo}"
+            table.add_row(str(idx), codigo, *(funcion(fila) for _, funcion, _ in columnas))
+        console.print(table)
+
+        ayuda = ["[#] elegir", "[Enter/s] siguiente" if paginador.hay_siguiente else "",
+                 "[a] anterior" if paginador.hay_anterior else "", "[i código] ir a"]
+        if jerarquia:
+            ayuda += [f"[+/-] nivel ({paginador.nivel})", "[e código] expandir", "[c código] contraer"]
+        ayuda.append("[0] cancelar")
+        console.print(f"[dim]{escape('  '.join(a for a in ayuda if a))}[/dim]")
+
+        comando = Prompt.ask("[bold green]Opción[/bold green]", default="s", show_default=False).strip()
+        accion, _, argumento = comando.partition(" ")
+        accion, argumento = accion.lower(), argumento.strip()
+
+        if accion == "0":
+            return None
+        if accion.isdigit():
+            numero = int(accion)
+            if 1 <= numero <= len(paginador.filas):
+                return paginador.filas[numero - 1].codigo
+            console.print("[red]Número inválido[/red]")
+        elif accion == "s":
+            paginador.siguiente()
+        elif accion == "a":
+            paginador.anterior()
+        elif accion == "i" and argumento:
+            paginador.ir_a(argumento)
+        elif jerarquia and accion in ("+", "-"):
+            paginador.expandir() if accion == "+" else paginador.contraer()
+            total = paginador.total()
+        elif jerarquia and accion in ("e", "c") and argumento:
+            paginador.expandir(argumento) if accion == "e" else paginador.contraer(argumento)
+            total = paginador.total()
+        else:
+            console.print("[red]Opción no reconocida[/red]")